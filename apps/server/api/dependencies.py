@@ -8,8 +8,9 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from database.connection import get_db
 from database import crud
-from database.models import User, APIKey, CustomIntegration, Project, Conversation
+from database.models import User, APIKey, CustomIntegration, Project, Conversation, Job
 from config.settings import settings
+from utils.tokens import decode_token, TokenError
 
 # DATABASE DEPENDENCY
 
@@ -22,17 +23,46 @@ def get_database_session():
 
 # USER AUTHENTICATION DEPENDENCY
 
+def get_token_claims(
+    authorization: Optional[str] = Header(None)
+) -> Optional[dict]:
+    """
+    Verify the bearer access token, if any, and return its claims
+    Usage: claims: Optional[dict] = Depends(get_token_claims)
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+    try:
+        return decode_token(token.strip())
+    except TokenError:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
 async def get_current_user(
+    claims: Optional[dict] = Depends(get_token_claims),
     x_user_id: Optional[str] = Header(None, alias="X-User-ID"),
     db: Session = Depends(get_db)
 ) -> User:
     """
-    Get current user from header and validate authentication
+    Get current user from the access token and validate authentication
     Usage: current_user: User = Depends(get_current_user)
     
-    Note: This is a basic implementation. For production, implement JWT token validation.
+    A valid token is trusted without reading the users table; the returned
+    User is not attached to the session and only carries id and email.
+    The X-User-ID header (checked against the database) is only accepted
+    while the auth_legacy_user_id_header setting is on.
     """
-    if not x_user_id:
+    if claims is not None:
+        return User(id=claims["sub"], email=claims.get("email"))
+    
+    if not x_user_id or not settings.auth_legacy_user_id_header:
         raise HTTPException(status_code=401, detail="Authentication required")
     
     # Validate user_id format (basic validation)
@@ -207,6 +237,41 @@ async def verify_conversation_ownership(
     
     return conversation
 
+
+async def verify_job_ownership(
+    user: User,
+    job_id: int,
+    db: Session = Depends(get_db)
+) -> Job:
+    """
+    Verify that the user owns the background job
+    
+    Args:
+        user: Authenticated user object
+        job_id: Job ID
+        db: Database session
+        
+    Returns:
+        Job object
+        
+    Raises:
+        HTTPException: If job doesn't exist or user doesn't own it
+    """
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+    
+    if job.user_id != user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="You don't have permission to access this job"
+        )
+    
+    return job
+
 # OPTIONAL: API KEY VALIDATION
 
 async def verify_api_key(
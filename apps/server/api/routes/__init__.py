@@ -1,3 +1,3 @@
-from . import health, auth, chat, projects, conversations, api_keys, custom_integrations, ollama
+from . import health, auth, chat, projects, conversations, api_keys, custom_integrations, ollama, jobs, uploads, files
 
-__all__ = ["health", "auth", "chat", "projects", "conversations", "api_keys", "custom_integrations", "ollama"]
\ No newline at end of file
+__all__ = ["health", "auth", "chat", "projects", "conversations", "api_keys", "custom_integrations", "ollama", "jobs", "uploads", "files"]
\ No newline at end of file
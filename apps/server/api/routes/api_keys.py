@@ -8,7 +8,7 @@ from database.connection import get_db
 from database import crud
 from database.models import APIKey, User, CustomIntegration
 from models.schemas import APIKeyCreate, APIKeyResponse
-from utils.encryption import encrypt_key, decrypt_key
+from utils.encryption import encrypt_key
 from utils.cache import clear_api_key_cache
 from api.dependencies import get_current_user, verify_user_ownership, verify_api_key_ownership
 from utils.security import validate_provider, sanitize_error_message, sanitize_request_body
@@ -196,7 +196,7 @@ async def get_decrypted_key(
         # Verify API key ownership
         api_key = await verify_api_key_ownership(current_user, provider, db)
         
-        decrypted_key = decrypt_key(api_key.encrypted_key)
+        decrypted_key = crud.decrypt_api_key(db, api_key)
         
         return {
             "provider": provider,
@@ -256,7 +256,7 @@ async def test_api_key(
         # Verify API key ownership
         api_key = await verify_api_key_ownership(current_user, provider, db)
         
-        decrypted_key = decrypt_key(api_key.encrypted_key)
+        decrypted_key = crud.decrypt_api_key(db, api_key)
         
         # For custom integrations, fetch the integration details
         base_url = None
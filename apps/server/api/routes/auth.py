@@ -2,20 +2,43 @@ import logging
 import uuid
 import secrets
 from datetime import datetime, timedelta
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from database.connection import get_db
 from database import crud
 from database.models import User
-from models.schemas import UserCreate, UserLogin, ForgotPasswordRequest, ResetPasswordRequest
+from models.schemas import UserCreate, UserLogin, RefreshTokenRequest, LogoutRequest, ForgotPasswordRequest, ResetPasswordRequest
+from utils.cache import clear_user_cache
 from utils.security import sanitize_error_message
 from utils.email import send_password_reset_email
+from utils.passwords import hash_password_async, check_password_async
+from utils.tokens import create_access_token, create_refresh_token, decode_token, denylist, TokenError, REFRESH
 from config.settings import settings
-from api.dependencies import get_current_user, verify_user_ownership
+from api.dependencies import get_current_user, get_token_claims, verify_user_ownership
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+def _issue_tokens(db: Session, user: User) -> dict:
+    """New access and refresh token for the user; the refresh token is recorded"""
+    access_token, _ = create_access_token(user.id, user.email)
+    refresh_token, refresh_claims = create_refresh_token(user.id)
+    crud.create_refresh_token(
+        db, user.id, refresh_claims["jti"], datetime.utcfromtimestamp(refresh_claims["exp"])
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.auth_access_token_ttl
+    }
+
+def _revoke_sessions(db: Session, user_id: str):
+    """Sign the user out everywhere: refresh tokens and access tokens issued so far"""
+    crud.revoke_user_refresh_tokens(db, user_id)
+    denylist.revoke_user(user_id)
+
 @router.post("/signup")
 async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     """User registration"""
@@ -25,13 +48,14 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Email already registered")
         
         user_id = f"user_{uuid.uuid4().hex[:12]}"
+        password_hash = await hash_password_async(user_data.password)
         
         user = crud.create_user(
             db,
             user_id=user_id,
             email=user_data.email,
-            password=user_data.password,
-            display_name=user_data.display_name
+            display_name=user_data.display_name,
+            password_hash=password_hash
         )
         
         return {
@@ -40,7 +64,8 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
                 "id": user.id,
                 "email": user.email,
                 "display_name": user.display_name
-            }
+            },
+            **_issue_tokens(db, user)
         }
         
     except HTTPException:
@@ -57,7 +82,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
         if not user:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        if not crud.verify_password(credentials.password, user.password_hash):
+        if not await check_password_async(credentials.password, user.password_hash):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         return {
@@ -66,7 +91,8 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
                 "id": user.id,
                 "email": user.email,
                 "display_name": user.display_name
-            }
+            },
+            **_issue_tokens(db, user)
         }
         
     except HTTPException:
@@ -74,6 +100,72 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     except Exception as e:
         logger.error(f"Login error: {e}")
         raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to login"))
+
+@router.post("/refresh")
+async def refresh(request: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access and refresh token"""
+    try:
+        try:
+            claims = decode_token(request.refresh_token, REFRESH)
+        except TokenError:
+            raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+        
+        record = crud.get_refresh_token(db, claims["jti"])
+        if not record or record.user_id != claims["sub"]:
+            raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+        
+        # Each refresh token can be exchanged once. Seeing one again means it
+        # was copied, so end every session of the user
+        if not crud.revoke_refresh_token(db, record.jti):
+            _revoke_sessions(db, record.user_id)
+            logger.warning(f"Refresh token reused for user {record.user_id}; sessions revoked")
+            raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+        
+        user = crud.get_user_by_id(db, record.user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+        
+        return {
+            "success": True,
+            **_issue_tokens(db, user)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Refresh token error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to refresh session"))
+
+@router.post("/logout")
+async def logout(
+    request: Optional[LogoutRequest] = None,
+    current_user: User = Depends(get_current_user),
+    claims: Optional[dict] = Depends(get_token_claims),
+    db: Session = Depends(get_db)
+):
+    """Revoke the access token used for this request and the given refresh token"""
+    try:
+        if claims is not None:
+            denylist.revoke(claims)
+        
+        if request and request.refresh_token:
+            try:
+                refresh_claims = decode_token(request.refresh_token, REFRESH)
+            except TokenError:
+                refresh_claims = None
+            if refresh_claims and refresh_claims["sub"] == current_user.id:
+                crud.revoke_refresh_token(db, refresh_claims["jti"])
+        
+        return {
+            "success": True,
+            "message": "Logged out"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Logout error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to logout"))
     
 @router.post("/change-password")
 async def change_password(
@@ -99,7 +191,7 @@ async def change_password(
             raise HTTPException(status_code=404, detail="User not found")
         
         # Verify current password
-        if not crud.verify_password(current_password, user.password_hash):
+        if not await check_password_async(current_password, user.password_hash):
             raise HTTPException(status_code=401, detail="Current password is incorrect")
         
         # Validate new password
@@ -107,18 +199,21 @@ async def change_password(
             raise HTTPException(status_code=400, detail="New password must be at least 8 characters")
         
         # Hash new password
-        import bcrypt
-        new_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        new_hash = await hash_password_async(new_password)
         
         # Update password
         user.password_hash = new_hash
         db.commit()
         
+        # Other sessions end; this one continues with new tokens
+        _revoke_sessions(db, user_id)
+        
         logger.info(f"Password changed for user {user_id}")
         
         return {
             "success": True,
-            "message": "Password changed successfully"
+            "message": "Password changed successfully",
+            **_issue_tokens(db, user)
         }
         
     except HTTPException:
@@ -190,8 +285,7 @@ async def reset_password(request: ResetPasswordRequest, db: Session = Depends(ge
             raise HTTPException(status_code=404, detail="User not found")
         
         # Hash new password
-        import bcrypt
-        new_hash = bcrypt.hashpw(request.new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        new_hash = await hash_password_async(request.new_password)
         
         # Update password
         user.password_hash = new_hash
@@ -199,6 +293,7 @@ async def reset_password(request: ResetPasswordRequest, db: Session = Depends(ge
         
         # Mark token as used
         crud.mark_password_reset_token_used(db, token_record.id)
+        _revoke_sessions(db, user.id)
         
         logger.info(f"Password reset completed for user {user.id}")
         
@@ -239,6 +334,8 @@ async def delete_account(
         
         if not deleted:
             raise HTTPException(status_code=500, detail="Failed to delete account")
+        clear_user_cache(user_id)
+        denylist.revoke_user(user_id)
         
         logger.info(f"Account deleted for user {user_id}")
         
@@ -1,21 +1,26 @@
 import logging
 import os
-import uuid
 import asyncio
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, BackgroundTasks, Form
 from sqlalchemy.orm import Session
 from database.connection import get_db
+from config.settings import settings
 from database import crud
+from database.archive import ensure_conversation_hot
+from database.blobs import acquire_blob_async, release_blob, get_files_text_async
 from database.models import User, Message, Conversation
 from api.dependencies import get_current_user, verify_user_ownership
 from models.schemas import ChatRequest, ChatResponse
 from services.mem0_client import mem0_client
 from services.llm_router import route_chat
+from services.ingestion import enqueue_ingestion
 from utils.prompt import compose_prompt
-from utils.file_extractor import extract_text_from_file
-from utils.encryption import decrypt_key
 from utils.security import validate_file_upload, sanitize_error_message, validate_message
-from utils.cache import get_cached_api_key, set_cached_api_key, clear_api_key_cache
+from utils.uploads import save_upload
+from utils.cache import (
+    get_cached_api_key, set_cached_api_key, clear_api_key_cache, set_api_key_missing,
+    get_cached_integration, set_cached_integration, set_integration_missing, is_missing
+)
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -29,6 +34,17 @@ VALID_MISTRAL_MODELS = [
     'open-mixtral-8x7b'
 ]
 
+def _files_content(files: list, texts: list, kind: str) -> list:
+    """Pair files with their extracted text; files without text are skipped"""
+    contents = []
+    for file, extracted_text in zip(files, texts):
+        if extracted_text:
+            contents.append({"filename": file.filename, "content": extracted_text})
+            logger.info(f"Extracted {len(extracted_text)} characters from {kind} file {file.filename}")
+        else:
+            logger.warning(f"Could not extract text from {kind} file {file.filename}")
+    return contents
+
 def _add_memory_background(user_id: str, user_message: str, assistant_message: str, project_id: int = None):
     """Background task to add memory to Mem0 (non-blocking)"""
     try:
@@ -76,6 +92,8 @@ async def chat(
             conversation = crud.get_conversation(db, int(request.session_id))
             if conversation and conversation.user_id != request.user_id:
                 raise HTTPException(status_code=403, detail="You don't have permission to access this conversation")
+            # Continuing an archived conversation brings its history back first
+            ensure_conversation_hot(db, conversation)
         
         if not conversation:
             conversation = crud.create_conversation(
@@ -96,8 +114,14 @@ async def chat(
         # 3. Fetch API key and custom integration (database operations, sequential)
         custom_integration = None
         if request.model_provider and request.model_provider.startswith("custom_"):
-            custom_integration = crud.get_custom_integration_by_provider_id(db, request.user_id, request.model_provider)
-            if not custom_integration:
+            custom_integration = get_cached_integration(request.user_id, request.model_provider)
+            if custom_integration is None:
+                integration = crud.get_custom_integration_by_provider_id(db, request.user_id, request.model_provider)
+                if integration:
+                    custom_integration = set_cached_integration(request.user_id, integration)
+                else:
+                    set_integration_missing(request.user_id, request.model_provider)
+            if not custom_integration or is_missing(custom_integration):
                 raise HTTPException(
                     status_code=404,
                     detail=f"Custom integration '{request.model_provider}' not found"
@@ -105,16 +129,20 @@ async def chat(
             logger.info(f"Using custom integration: {custom_integration.name} (provider_id: {request.model_provider})")
         
         # Check cache first to avoid database query and decryption
+        # (a negative entry means we recently found no key in the database)
         api_key = get_cached_api_key(request.user_id, request.model_provider)
+        key_known_missing = is_missing(api_key)
+        if key_known_missing:
+            api_key = None
         
         # For custom integrations with base_url, API key is optional
         if custom_integration and custom_integration.base_url:
             # Custom integration with base_url - API key is optional (can use placeholder)
             if not api_key:
-                api_key_obj = crud.get_api_key(db, request.user_id, request.model_provider)
+                api_key_obj = None if key_known_missing else crud.get_api_key(db, request.user_id, request.model_provider)
                 if api_key_obj:
                     try:
-                        api_key = decrypt_key(api_key_obj.encrypted_key)
+                        api_key = crud.decrypt_api_key(db, api_key_obj)
                         set_cached_api_key(request.user_id, request.model_provider, api_key)
                         logger.info(f"API key found and cached for user {request.user_id}, provider {request.model_provider}")
                     except Exception as e:
@@ -123,6 +151,8 @@ async def chat(
                         api_key = "ollama"  # Placeholder for Ollama or similar services
                         logger.info(f"Using placeholder API key for custom integration {request.model_provider} with base_url")
                 else:
+                    if not key_known_missing:
+                        set_api_key_missing(request.user_id, request.model_provider)
                     # No API key found, but base_url exists - use placeholder
                     api_key = "ollama"  # Placeholder for services that don't require real API keys
                     logger.info(f"Using placeholder API key for custom integration {request.model_provider} with base_url")
@@ -132,10 +162,10 @@ async def chat(
             # Standard providers or custom integrations without base_url - API key is required
             if not api_key:
                 # Cache miss - fetch from database and decrypt
-                api_key_obj = crud.get_api_key(db, request.user_id, request.model_provider)
+                api_key_obj = None if key_known_missing else crud.get_api_key(db, request.user_id, request.model_provider)
                 if api_key_obj:
                     try:
-                        api_key = decrypt_key(api_key_obj.encrypted_key)
+                        api_key = crud.decrypt_api_key(db, api_key_obj)
                         # Cache the decrypted key for future requests
                         set_cached_api_key(request.user_id, request.model_provider, api_key)
                         logger.info(f"API key found and cached for user {request.user_id}, provider {request.model_provider}")
@@ -146,6 +176,8 @@ async def chat(
                             detail=f"Failed to decrypt API key for {request.model_provider}. Please update your API key in Settings."
                         )
                 else:
+                    if not key_known_missing:
+                        set_api_key_missing(request.user_id, request.model_provider)
                     logger.warning(f"No API key found in database for user {request.user_id}, provider {request.model_provider}")
                     raise HTTPException(
                         status_code=400,
@@ -171,44 +203,21 @@ async def chat(
         db.commit()
         db.refresh(user_message_obj)
         
-        # 5. Fetch and extract content from project files (if project_id exists)
-        project_files_content = []
+        # 5. Fetch project files (if project_id exists) and chat attached files
+        project_files = []
         if conversation.project_id:
             project_files = crud.get_project_files(db, conversation.project_id)
             if project_files:
                 logger.info(f"Found {len(project_files)} project files for project {conversation.project_id}")
-                for project_file in project_files:
-                    try:
-                        extracted_text = extract_text_from_file(project_file.storage_path, project_file.file_type)
-                        if extracted_text:
-                            project_files_content.append({
-                                "filename": project_file.filename,
-                                "content": extracted_text
-                            })
-                            logger.info(f"Extracted {len(extracted_text)} characters from project file {project_file.filename}")
-                        else:
-                            logger.warning(f"Could not extract text from project file {project_file.filename}")
-                    except Exception as e:
-                        logger.error(f"Error extracting content from project file {project_file.filename}: {e}")
-        
-        # 6. Fetch and extract content from chat attached files
-        chat_files_content = []
         chat_files = crud.get_chat_files(db, conversation.id)
         if chat_files:
             logger.info(f"Found {len(chat_files)} attached files for conversation {conversation.id}")
-            for chat_file in chat_files:
-                try:
-                    extracted_text = extract_text_from_file(chat_file.storage_path, chat_file.file_type)
-                    if extracted_text:
-                        chat_files_content.append({
-                            "filename": chat_file.filename,
-                            "content": extracted_text
-                        })
-                        logger.info(f"Extracted {len(extracted_text)} characters from chat file {chat_file.filename}")
-                    else:
-                        logger.warning(f"Could not extract text from chat file {chat_file.filename}")
-                except Exception as e:
-                    logger.error(f"Error extracting content from chat file {chat_file.filename}: {e}")
+        
+        # 6. Extract their content in parallel, off the event loop. For
+        # archives, only the members relevant to the message are included
+        texts = await get_files_text_async(db, project_files + chat_files, validated_message)
+        project_files_content = _files_content(project_files, texts[:len(project_files)], "project")
+        chat_files_content = _files_content(chat_files, texts[len(project_files):], "chat")
         
         # 7. Compose prompt with memories, project files, and chat files
         prompt = compose_prompt(memories, validated_message, project_files_content, chat_files_content)
@@ -320,51 +329,52 @@ async def upload_file(
         if not file.filename or not file.filename.strip():
             raise HTTPException(status_code=400, detail="Filename is required")
         
-        # Read file content to get size
-        content = await file.read()
-        file_size = len(content)
-        
-        # Validate file upload
-        validate_file_upload(file.filename, file_size, file.content_type)
-        
-        # Create uploads directory
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Generate unique filename
-        file_ext = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # Save file
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        # Validate name and type before reading; size is enforced while streaming
+        validate_file_upload(file.filename, 0, file.content_type)
         
-        # Save file info to database if conversation_id is provided
-        chat_file = None
+        # Verify conversation belongs to user before storing anything
         if conversation_id:
-            # Verify conversation belongs to user
             conversation = crud.get_conversation(db, conversation_id)
             if not conversation:
                 raise HTTPException(status_code=404, detail="Conversation not found")
             if conversation.user_id != current_user.id:
                 raise HTTPException(status_code=403, detail="You don't have permission to add files to this conversation")
-            
-            # Create chat file record
-            chat_file = crud.create_chat_file(
-                db,
-                conversation_id=conversation_id,
-                filename=file.filename,
-                file_size=file_size,
-                storage_path=file_path,
-                file_type=file.content_type
-            )
+        
+        # Stream to disk, then store by content hash (identical files share one copy);
+        # handing the file to the storage backend may be a network upload
+        stored = await save_upload(file, settings.upload_blob_dir)
+        blob = await acquire_blob_async(db, stored, 1 if conversation_id else 0)
+        file_size = stored.size
+        file_path = blob.storage_path
+        unique_filename = os.path.basename(file_path)
+        
+        # Save file info to database if conversation_id is provided
+        chat_file = None
+        job_id = None
+        if conversation_id:
+            try:
+                chat_file = crud.create_chat_file(
+                    db,
+                    conversation_id=conversation_id,
+                    filename=file.filename,
+                    file_size=file_size,
+                    storage_path=file_path,
+                    file_type=file.content_type,
+                    blob_id=blob.id
+                )
+            except Exception:
+                db.rollback()
+                release_blob(db, blob.id)
+                raise
+            # Extraction and indexing continue in the background
+            job_id = enqueue_ingestion(db, current_user.id, chat_file)
             logger.info(f"File uploaded and saved to database: {file.filename} -> {unique_filename} (conversation_id: {conversation_id})")
         else:
             logger.info(f"File uploaded: {file.filename} -> {unique_filename} (no conversation_id provided)")
         
         return {
             "success": True,
+            "job_id": job_id,
             "file": {
                 "id": chat_file.id if chat_file else None,
                 "filename": file.filename,
@@ -372,6 +382,7 @@ async def upload_file(
                 "size": file_size,
                 "content_type": file.content_type,
                 "path": file_path,
+                "sha256": stored.sha256,
                 "conversation_id": conversation_id
             }
         }
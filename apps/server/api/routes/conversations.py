@@ -1,14 +1,16 @@
 import logging
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
 from typing import List
 from database.connection import get_db
 from database import crud
+from database.search import search_conversations as run_search
+from database.archive import ensure_conversation_hot
 from database.models import User
 from api.dependencies import get_current_user, verify_user_ownership, verify_conversation_ownership
 from utils.security import validate_name, sanitize_error_message
-from models.schemas import ConversationResponse, MessageResponse, ConversationUpdate
+from models.schemas import ConversationResponse, MessageResponse, ConversationUpdate, ConversationSearchResponse, SearchHit
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/conversations", tags=["conversations"])
@@ -43,6 +45,35 @@ async def get_conversations(
         logger.error(f"Get conversations error: {e}")
         raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to retrieve conversations"))
 
+@router.get("/{user_id}/search", response_model=ConversationSearchResponse)
+async def search_conversations(
+    user_id: str,
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over the user's messages and conversation titles"""
+    try:
+        # Verify user ownership
+        verify_user_ownership(current_user, user_id, "conversations")
+        
+        # Fetch one extra hit to know whether another page exists
+        hits = run_search(db, user_id, q, limit=limit + 1, offset=offset)
+        return ConversationSearchResponse(
+            query=q,
+            results=[SearchHit(**hit) for hit in hits[:limit]],
+            limit=limit,
+            offset=offset,
+            has_more=len(hits) > limit
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search conversations error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to search conversations"))
+
 @router.get("/{conversation_id}/messages", response_model=List[MessageResponse])
 async def get_messages(
     conversation_id: int,
@@ -52,7 +83,9 @@ async def get_messages(
     """Get all messages in a conversation"""
     try:
         # Verify conversation ownership
-        await verify_conversation_ownership(current_user, conversation_id, db)
+        conversation = await verify_conversation_ownership(current_user, conversation_id, db)
+        # Archived conversations are rehydrated on first open
+        ensure_conversation_hot(db, conversation)
         
         messages = crud.get_conversation_messages(db, conversation_id)
         return [
@@ -88,6 +121,7 @@ async def get_conversation_details(
             "model_used": conversation.model_used,
             "message_count": conversation.message_count,
             "project_id": conversation.project_id,
+            "is_archived": bool(conversation.is_archived),
             "created_at": str(conversation.created_at),
             "updated_at": str(conversation.updated_at)
         }
@@ -200,13 +234,9 @@ async def delete_conversation(
         # Verify conversation ownership
         await verify_conversation_ownership(current_user, conversation_id, db)
         
-        conversation = crud.get_conversation(db, conversation_id)
-        if not conversation:
+        if not crud.delete_conversation(db, conversation_id):
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        db.delete(conversation)
-        db.commit()
-        
         return {"success": True}
     except HTTPException:
         raise
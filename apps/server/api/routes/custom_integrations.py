@@ -8,6 +8,7 @@ from database.connection import get_db
 from database import crud
 from database.models import User
 from api.dependencies import get_current_user, verify_user_ownership, verify_integration_ownership
+from utils.cache import clear_integration_cache
 from utils.security import validate_name, validate_url, sanitize_error_message
 from pydantic import BaseModel
 
@@ -74,6 +75,7 @@ async def update_custom_integration(
             update_data["provider_id"] = new_provider_id
         
         updated_integration = crud.update_custom_integration(db, integration_id, **update_data)
+        clear_integration_cache(current_user.id)
         
         if updated_integration:
             logger.info(f"Updated custom integration: {integration_id}")
@@ -113,6 +115,7 @@ async def delete_custom_integration(
         await verify_integration_ownership(current_user, integration_id, db)
         
         success = crud.delete_custom_integration(db, integration_id)
+        clear_integration_cache(current_user.id)
         
         if success:
             logger.info(f"Deleted custom integration: {integration_id}")
@@ -219,6 +222,7 @@ async def create_custom_integration(
             api_type=integration_data.api_type or "openai",
             logo_url=validated_logo_url
         )
+        clear_integration_cache(user_id)
         
         logger.info(f"Created custom integration for user {user_id}: {validated_name}")
         
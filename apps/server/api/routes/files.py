@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import mimetypes
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.orm import Session
+from typing import Optional, Union
+from database.connection import get_db
+from database.models import User, ChatFile, ProjectFile
+from api.dependencies import get_current_user, verify_project_ownership, verify_conversation_ownership
+from utils.security import sanitize_error_message
+from utils.storage import LocalCopy, get_storage
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/files", tags=["files"])
+
+# Types browsers can preview safely; everything else (notably SVG and XML,
+# which can carry script) is sent as an attachment
+_INLINE_TYPES = {
+    'pdf': 'application/pdf',
+    'txt': 'text/plain',
+    'md': 'text/markdown',
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+
+def _media_type(filename: str) -> tuple:
+    """Content type and disposition, from the extension rather than the uploader's claim"""
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if ext in _INLINE_TYPES:
+        return _INLINE_TYPES[ext], "inline"
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream", "attachment"
+
+
+class _LocalFileResponse(FileResponse):
+    """FileResponse that keeps the cached copy until it has been sent"""
+
+    def __init__(self, local: LocalCopy, **kwargs):
+        super().__init__(local.path, **kwargs)
+        self.local = local
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await asyncio.to_thread(self.local.close)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def _serve_file(file_row: Union[ChatFile, ProjectFile], if_none_match: Optional[str], download: bool) -> Response:
+    """
+    Send a stored file. Range and If-Range requests are answered by
+    FileResponse from the file on disk (streamed in chunks, or handed to the
+    server with the pathsend extension where supported), so large files are
+    never read into memory. The ETag is the content hash: file content never
+    changes, so a matching If-None-Match gets a 304 without touching storage.
+    """
+    headers = {"Cache-Control": "private, no-cache", "X-Content-Type-Options": "nosniff"}
+    if file_row.blob is not None:
+        headers["ETag"] = f'"{file_row.blob.sha256}"'
+        if _etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    key = file_row.blob.storage_path if file_row.blob is not None else file_row.storage_path
+    if not key:
+        raise HTTPException(status_code=404, detail="File content not found")
+    try:
+        # Remote backends serve from the local read cache
+        local = await asyncio.to_thread(get_storage().local_file, key)
+    except FileNotFoundError:
+        logger.warning(f"Stored content missing for {file_row.filename}: {key}")
+        raise HTTPException(status_code=404, detail="File content not found")
+
+    media_type, disposition = _media_type(file_row.filename)
+    return _LocalFileResponse(
+        local,
+        media_type=media_type,
+        filename=file_row.filename,
+        headers=headers,
+        content_disposition_type="attachment" if download else disposition
+    )
+
+@router.get("/chat/{file_id}")
+async def download_chat_file(
+    file_id: int,
+    download: bool = Query(False),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download (or preview) a file attached to a conversation"""
+    try:
+        file_obj = db.query(ChatFile).filter(ChatFile.id == file_id).first()
+        if not file_obj:
+            raise HTTPException(status_code=404, detail="File not found")
+        await verify_conversation_ownership(current_user, file_obj.conversation_id, db)
+        return await _serve_file(file_obj, if_none_match, download)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Download chat file error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to download file"))
+
+@router.get("/project/{file_id}")
+async def download_project_file(
+    file_id: int,
+    download: bool = Query(False),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download (or preview) a project file"""
+    try:
+        file_obj = db.query(ProjectFile).filter(ProjectFile.id == file_id).first()
+        if not file_obj:
+            raise HTTPException(status_code=404, detail="File not found")
+        await verify_project_ownership(current_user, file_obj.project_id, db)
+        return await _serve_file(file_obj, if_none_match, download)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Download project file error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to download file"))
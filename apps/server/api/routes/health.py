@@ -1,10 +1,19 @@
+import asyncio
+import time
+import logging
 from fastapi import APIRouter, Query, Depends
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from database.connection import get_db
+from database.connection import get_db, engine, read_engine
+from database.pool_metrics import pool_summary
+from database.file_gc import get_file_gc
 from database import crud
+from config.settings import settings
+from utils.passwords import get_password_hasher
 from models.schemas import HealthResponse, ModelsResponse
 from typing import Optional
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/")
@@ -22,6 +31,51 @@ async def health_check():
     """Health check endpoint"""
     return HealthResponse(status="ok")
 
+def _ping_database() -> float:
+    """Round trip of SELECT 1 on the primary, in milliseconds"""
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return round((time.perf_counter() - start) * 1000, 2)
+
+@router.get("/health/db")
+async def database_health():
+    """Database reachability plus connection pool metrics (primary and replica)"""
+    status = "ok"
+    latency_ms = None
+    try:
+        # A worker thread: waiting on an exhausted pool mustn't stall the event loop
+        latency_ms = await asyncio.to_thread(_ping_database)
+    except Exception as e:
+        logger.error(f"Database health check failed: {e}")
+        status = "error"
+    
+    primary = pool_summary(engine)
+    if status == "ok" and primary and primary.get("recent_timeouts"):
+        # Reachable, but requests have lately been failing to get a connection
+        status = "degraded"
+    
+    return {
+        "status": status,
+        "latency_ms": latency_ms,
+        "pool": primary,
+        "replica_pool": pool_summary(read_engine)
+    }
+
+@router.get("/health/storage")
+async def storage_health():
+    """Stored file garbage collection metrics (this process)"""
+    collector = get_file_gc()
+    return {
+        "backend": settings.storage_backend,
+        "gc": dict(collector.stats) if collector else None
+    }
+
+@router.get("/health/auth")
+async def auth_health():
+    """Password hashing pool metrics (this process)"""
+    return {"password_hashing": get_password_hasher().stats()}
+
 @router.get("/models", response_model=ModelsResponse)
 async def get_models(
     user_id: Optional[str] = Query(None, description="User ID to get available models for"),
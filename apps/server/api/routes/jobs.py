@@ -0,0 +1,87 @@
+import logging
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from database.connection import get_db
+from database.jobs import job_payload
+from database.models import User, Job
+from api.dependencies import get_current_user, verify_job_ownership
+from utils.security import sanitize_error_message
+from models.schemas import JobResponse, JobProgressResponse
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _timestamp(value) -> Optional[str]:
+    return str(value) if value else None
+
+
+def _job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        error=job.error,
+        file_id=job_payload(job).get("file_id"),
+        created_at=str(job.created_at),
+        updated_at=_timestamp(job.updated_at),
+        finished_at=_timestamp(job.finished_at)
+    )
+
+@router.get("", response_model=List[JobResponse])
+async def get_jobs(
+    status: Optional[str] = Query(None, max_length=20),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the user's most recent background jobs"""
+    try:
+        query = db.query(Job).filter(Job.user_id == current_user.id)
+        if status:
+            query = query.filter(Job.status == status)
+        jobs = query.order_by(desc(Job.id)).limit(limit).all()
+        return [_job_response(job) for job in jobs]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get jobs error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to retrieve jobs"))
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the status of a background job"""
+    try:
+        job = await verify_job_ownership(current_user, job_id, db)
+        return _job_response(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get job error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to retrieve job"))
+
+@router.get("/{job_id}/progress", response_model=JobProgressResponse)
+async def get_job_progress(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the progress of a background job (small response for polling)"""
+    try:
+        job = await verify_job_ownership(current_user, job_id, db)
+        return JobProgressResponse(id=job.id, status=job.status, stage=job.stage, progress=job.progress)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get job progress error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to retrieve job progress"))
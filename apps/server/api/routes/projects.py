@@ -3,12 +3,16 @@ from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
 from sqlalchemy.orm import Session
 from typing import List
 from database.connection import get_db
+from database.blobs import acquire_blob_async, release_blob
+from config.settings import settings
 from database import crud
 from database.models import User
 from api.dependencies import get_current_user, verify_user_ownership, verify_project_ownership
 from utils.security import validate_name, validate_file_upload, sanitize_error_message
+from utils.uploads import save_upload
 from models.schemas import ProjectCreate, ProjectUpdate, ProjectResponse
 from services.mem0_client import mem0_client
+from services.ingestion import enqueue_ingestion
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/projects", tags=["projects"])
@@ -130,9 +134,6 @@ async def upload_project_file(
 ):
     """Upload file to project"""
     try:
-        import os
-        import uuid
-        
         # Verify project ownership
         await verify_project_ownership(current_user, project_id, db)
         
@@ -140,37 +141,37 @@ async def upload_project_file(
         if not file.filename:
             raise HTTPException(status_code=400, detail="Filename is required")
         
-        # Read file content to get size
-        content = await file.read()
-        file_size = len(content)
-        
-        # Validate file upload
-        validate_file_upload(file.filename, file_size, file.content_type)
-        
-        # Create uploads directory
-        upload_dir = "uploads/projects"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Generate unique filename
-        file_ext = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-        file_path = os.path.join(upload_dir, unique_filename)
+        # Validate name and type before reading; size is enforced while streaming
+        validate_file_upload(file.filename, 0, file.content_type)
         
-        # Save file
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        # Stream to disk, then store by content hash (identical files share one copy);
+        # handing the file to the storage backend may be a network upload
+        stored = await save_upload(file, settings.upload_blob_dir)
+        blob = await acquire_blob_async(db, stored)
+        file_size = stored.size
         
         # Store in database
-        project_file = crud.create_project_file(
-            db,
-            project_id=project_id,
-            filename=file.filename,
-            file_size=file_size,
-            storage_url=file_path
-        )
+        try:
+            project_file = crud.create_project_file(
+                db,
+                project_id=project_id,
+                filename=file.filename,
+                file_size=file_size,
+                storage_url=blob.storage_path,
+                file_type=file.content_type,
+                blob_id=blob.id
+            )
+        except Exception:
+            db.rollback()
+            release_blob(db, blob.id)
+            raise
+        
+        # Extraction, indexing and memory seeding continue in the background
+        job_id = enqueue_ingestion(db, current_user.id, project_file, project_id=project_id)
         
         return {
             "success": True,
+            "job_id": job_id,
             "file": {
                 "id": project_file.id,
                 "filename": file.filename,
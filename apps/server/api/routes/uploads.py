@@ -0,0 +1,234 @@
+import logging
+import re
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from sqlalchemy.orm import Session
+from typing import Optional
+from database.connection import get_db
+from database.blobs import acquire_blob_async, release_blob
+from database import crud
+from database.models import User, UploadSession
+from database.upload_sessions import (
+    UploadSessionError, COMPLETE, COMPLETING, create_session, count_open_sessions, save_chunk,
+    assemble_upload, finish_session_async, reopen_session, discard_session_async, purge_expired_sessions_async
+)
+from config.settings import settings
+from api.dependencies import get_current_user, verify_project_ownership, verify_conversation_ownership
+from models.schemas import UploadSessionCreate, UploadSessionResponse
+from services.ingestion import enqueue_ingestion
+from utils.security import validate_file_upload, sanitize_error_message
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+_SHA256 = re.compile(r"^[0-9a-fA-F]{64}$")
+
+
+def _session_response(session: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        id=session.id,
+        filename=session.filename,
+        size=session.size,
+        offset=session.received,
+        status=session.status,
+        max_chunk_size=settings.upload_session_max_chunk,
+        expires_at=str(session.expires_at)
+    )
+
+
+def _get_session(db: Session, upload_id: str, user: User) -> UploadSession:
+    session = db.get(UploadSession, upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if session.user_id != user.id:
+        raise HTTPException(status_code=403, detail="You don't have permission to access this upload")
+    return session
+
+
+def _file_response(session: UploadSession, file_id: int, job_id: Optional[int]) -> dict:
+    return {
+        "success": True,
+        "job_id": job_id,
+        "file": {
+            "id": file_id,
+            "filename": session.filename,
+            "size": session.size,
+            "content_type": session.content_type,
+            "project_id": session.project_id,
+            "conversation_id": session.conversation_id
+        }
+    }
+
+@router.post("", response_model=UploadSessionResponse)
+async def create_upload(
+    request: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Start a resumable upload of a large file to a project or conversation"""
+    try:
+        if (request.project_id is None) == (request.conversation_id is None):
+            raise HTTPException(status_code=400, detail="Give either project_id or conversation_id")
+        if request.project_id is not None:
+            await verify_project_ownership(current_user, request.project_id, db)
+        else:
+            await verify_conversation_ownership(current_user, request.conversation_id, db)
+
+        if not request.filename or not request.filename.strip():
+            raise HTTPException(status_code=400, detail="Filename is required")
+        # Name and type only: the size limit for resumable uploads is larger
+        validate_file_upload(request.filename, 0, request.content_type)
+        if request.size <= 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        if request.size > settings.upload_session_max_size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File size exceeds maximum allowed size ({settings.upload_session_max_size // (1024 * 1024)}MB)"
+            )
+        if request.sha256 and not _SHA256.match(request.sha256):
+            raise HTTPException(status_code=400, detail="sha256 must be 64 hex characters")
+
+        await purge_expired_sessions_async(db)
+        if count_open_sessions(db, current_user.id) >= settings.upload_session_max_open:
+            raise HTTPException(status_code=429, detail="Too many uploads in progress")
+
+        session = create_session(
+            db,
+            user_id=current_user.id,
+            filename=request.filename,
+            size=request.size,
+            content_type=request.content_type,
+            project_id=request.project_id,
+            conversation_id=request.conversation_id,
+            sha256=request.sha256
+        )
+        return _session_response(session)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Create upload error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to start upload"))
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the offset to resume an upload from"""
+    try:
+        return _session_response(_get_session(db, upload_id, current_user))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get upload error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to retrieve upload"))
+
+@router.put("/{upload_id}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    content_length: Optional[int] = Header(None),
+    x_chunk_sha256: Optional[str] = Header(None, alias="X-Chunk-SHA256"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Add the chunk starting at offset (raw request body). An optional
+    X-Chunk-SHA256 header is checked against the received bytes.
+    """
+    try:
+        session = _get_session(db, upload_id, current_user)
+        if content_length is not None and content_length > settings.upload_session_max_chunk:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Chunk exceeds maximum chunk size ({settings.upload_session_max_chunk // (1024 * 1024)}MB)"
+            )
+        session = await save_chunk(db, session, offset, request.stream(), sha256=x_chunk_sha256)
+        return _session_response(session)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload chunk error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to store chunk"))
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Join the received chunks into the file and attach it; safe to repeat"""
+    try:
+        session = _get_session(db, upload_id, current_user)
+        if session.status == COMPLETE:
+            # The client didn't see the first answer
+            return _file_response(session, session.file_id, session.job_id)
+
+        stored = await assemble_upload(db, session)
+        try:
+            blob = await acquire_blob_async(db, stored)
+        except Exception:
+            reopen_session(db, session)
+            raise
+        try:
+            if session.project_id is not None:
+                file_row = crud.create_project_file(
+                    db,
+                    project_id=session.project_id,
+                    filename=session.filename,
+                    file_size=stored.size,
+                    storage_url=blob.storage_path,
+                    file_type=session.content_type,
+                    blob_id=blob.id
+                )
+            else:
+                file_row = crud.create_chat_file(
+                    db,
+                    conversation_id=session.conversation_id,
+                    filename=session.filename,
+                    file_size=stored.size,
+                    storage_path=blob.storage_path,
+                    file_type=session.content_type,
+                    blob_id=blob.id
+                )
+        except Exception:
+            db.rollback()
+            release_blob(db, blob.id)
+            reopen_session(db, session)
+            raise
+
+        # Extraction, indexing and memory seeding continue in the background
+        job_id = enqueue_ingestion(db, current_user.id, file_row, project_id=session.project_id)
+        await finish_session_async(db, session, file_row.id, job_id)
+        logger.info(f"Resumable upload completed: {session.filename} ({stored.size} bytes) -> file {file_row.id}")
+        return _file_response(session, file_row.id, job_id)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Complete upload error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to complete upload"))
+
+@router.delete("/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Abandon an upload and delete its chunks"""
+    try:
+        session = _get_session(db, upload_id, current_user)
+        if session.status == COMPLETING:
+            raise HTTPException(status_code=409, detail="Upload is being completed")
+        if session.status != COMPLETE:
+            await discard_session_async(db, session)
+        return {"success": True}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Abort upload error: {e}")
+        raise HTTPException(status_code=500, detail=sanitize_error_message(e, "Failed to abort upload"))
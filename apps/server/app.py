@@ -8,14 +8,16 @@ from api.routes import custom_integrations
 from config.settings import settings
 from database.connection import engine
 from database import models
+from database.search import install_search_index
 
 # Import route modules
-from api.routes import health, auth, chat, projects, conversations, api_keys, ollama
+from api.routes import health, auth, chat, projects, conversations, api_keys, ollama, jobs, uploads, files
 
 # Create tables (skip in test environment)
 import os
 if os.getenv("ENVIRONMENT") != "test":
     models.Base.metadata.create_all(bind=engine)
+    install_search_index(engine)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -70,8 +72,8 @@ app.add_middleware(
     allow_origins=cors_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-User-ID"],
-    expose_headers=["Content-Type"],
+    allow_headers=["Content-Type", "Authorization", "X-User-ID", "X-Chunk-SHA256", "Range", "If-None-Match"],
+    expose_headers=["Content-Type", "Content-Range", "Content-Disposition", "ETag"],
     max_age=3600,
 )
 
@@ -84,17 +86,43 @@ app.include_router(conversations.router)
 app.include_router(api_keys.router)
 app.include_router(custom_integrations.router)
 app.include_router(ollama.router)
+app.include_router(jobs.router)
+app.include_router(uploads.router)
+app.include_router(files.router)
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"{settings.app_name} v{settings.app_version} starting up...")
     logger.info(f"Database: {settings.database_url.split('@')[1] if '@' in settings.database_url else 'configured'}")
+    # Fail fast on a misconfigured storage backend rather than on the first upload
+    from utils.storage import get_storage
+    get_storage()
+    if settings.cache_invalidation_bus and not settings.cache_redis_url:
+        from database.invalidation import start_invalidation_bus
+        start_invalidation_bus(engine, poll_interval=settings.cache_invalidation_poll_interval)
+    # Background jobs; handlers are registered by the route modules (tests
+    # drive the queue themselves)
+    if os.getenv("ENVIRONMENT") != "test":
+        from database.jobs import start_job_queue
+        start_job_queue(engine)
+        from database.file_gc import start_file_gc
+        start_file_gc(engine)
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info(f"{settings.app_name} shutting down...")
+    from database.jobs import stop_job_queue
+    await stop_job_queue()
+    from database.file_gc import stop_file_gc
+    stop_file_gc()
+    from database.invalidation import stop_invalidation_bus
+    stop_invalidation_bus()
+    from utils.extraction_pool import shutdown_extraction_pool
+    shutdown_extraction_pool()
+    from utils.passwords import shutdown_password_hasher
+    shutdown_password_hasher()
 
 if __name__ == "__main__":
     import uvicorn
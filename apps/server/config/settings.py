@@ -14,6 +14,127 @@ class Settings(BaseSettings):
     db_user: str = "postgres"
     db_password: str = "password"
     db_name: str = "sharedlm"
+
+    # Optional read replica for read-heavy paths (history, project files, models)
+    database_read_replica_url: str = ""
+
+    # Connection pools (PostgreSQL/MySQL and SQLite files)
+    db_pool_size: int = 20
+    db_max_overflow: int = 30
+    db_replica_pool_size: int = 20
+    db_replica_max_overflow: int = 30
+    db_pool_timeout: int = 10  # Seconds to wait for a free connection
+    db_pool_recycle: int = 3600  # Seconds before a connection is replaced
+    db_pool_pre_ping: bool = True
+    # Checkouts that wait at least this long are logged (0 disables)
+    db_pool_slow_wait_ms: int = 500
+    
+    # SQLite tuning
+    sqlite_busy_timeout: int = 20  # Seconds to wait on a locked database
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size: int = -128000  # Negative = KiB (128MB)
+    sqlite_mmap_size: int = 268435456  # 256MB
+    sqlite_threads: int = 4
+
+    # Message bodies at least this many characters long are stored compressed
+    # on SQLite (0 disables). PostgreSQL already compresses large values via TOAST.
+    message_compression_threshold: int = 2048
+    message_compression_level: int = 6
+    
+    # Conversations untouched for this many days are moved to cold storage
+    archive_after_days: int = 180
+    archive_chunk_size: int = 100
+    
+    # In-memory caches (decrypted API keys): LRU bounds (0 = unbounded) and
+    # how often expired entries are swept, in seconds (0 = only on read)
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 16 * 1024 * 1024
+    cache_sweep_interval: int = 60
+    # Shared cache across workers, e.g. redis://localhost:6379/0 (empty = per-process)
+    cache_redis_url: str = ""
+    # Seconds a worker keeps its local copy of a shared entry; bounds staleness
+    # if an invalidation broadcast is missed
+    cache_near_ttl: int = 30
+    # Seconds to remember that an API key / custom integration doesn't exist
+    cache_negative_ttl: int = 30
+    # Without a shared cache, keep per-process caches coherent across workers
+    # through a change-log table in the application database
+    cache_invalidation_bus: bool = False
+    cache_invalidation_poll_interval: float = 1.0
+    
+    # Uploads are copied to disk in chunks of this many bytes
+    upload_chunk_size: int = 1024 * 1024
+    # Content-addressed store shared by chat and project uploads; uploads are
+    # spooled here before being handed to the storage backend
+    upload_blob_dir: str = "uploads/blobs"
+    # Where blob content lives: "local" (upload_blob_dir on this node) or "s3"
+    # (an S3-compatible object store shared by all nodes; needs boto3)
+    storage_backend: str = "local"
+    storage_s3_bucket: str = ""
+    storage_s3_prefix: str = ""
+    # Empty = AWS; set for MinIO, R2 and other S3-compatible services
+    storage_s3_endpoint_url: str = ""
+    storage_s3_region: str = ""
+    # Empty = the usual AWS credential chain (environment, instance role, ...)
+    storage_s3_access_key_id: str = ""
+    storage_s3_secret_access_key: str = ""
+    # Local read-through cache of remote blobs (0 = unbounded)
+    storage_cache_dir: str = "uploads/cache"
+    storage_cache_max_bytes: int = 1024 * 1024 * 1024
+    # Resumable uploads (create a session, PUT chunks, finalize) for files
+    # larger than a single request allows: total size, size of one chunk,
+    # open sessions per user, and seconds an idle session is kept
+    upload_session_max_size: int = 512 * 1024 * 1024
+    upload_session_max_chunk: int = 16 * 1024 * 1024
+    upload_session_max_open: int = 5
+    upload_session_ttl: int = 24 * 3600
+    # Storage keys of chunks that haven't been joined into a file yet
+    upload_session_dir: str = "uploads/sessions"
+    # Stored files nothing refers to any more (unattached uploads, leftovers
+    # of crashed requests, files of rows deleted before blobs existed) are
+    # removed in the background: seconds between passes (0 = off), storage
+    # keys checked per pass, and the minimum age of anything removed so
+    # in-flight uploads are never touched
+    file_gc_interval: float = 600.0
+    file_gc_batch_size: int = 500
+    file_gc_grace_period: int = 6 * 3600
+    # Directories written directly by older versions (not by the storage backend)
+    file_gc_legacy_dirs: List[str] = ["uploads", "uploads/projects"]
+    
+    # Document text extraction runs in worker processes (0 = worker thread,
+    # no isolation); each file gets a time limit and a memory cap (0 = none)
+    extraction_workers: int = 2
+    extraction_timeout: float = 30.0
+    extraction_memory_mb: int = 1024
+    # Text budget per extracted file (characters) and PDF page limit; 0 = none
+    extraction_max_chars: int = 200000
+    # Rows/items/records included from CSV, JSON and XML files
+    extraction_max_rows: int = 1000
+    pdf_max_pages: int = 1000
+    # Archives (zip/tar/gzip) are read member by member in memory, never
+    # unpacked to disk; these caps on members and decompressed bytes guard
+    # against zip bombs
+    archive_max_members: int = 500
+    archive_max_total_bytes: int = 100 * 1024 * 1024
+    archive_max_member_bytes: int = 20 * 1024 * 1024
+    
+    # Background jobs (post-upload extraction, indexing and memory seeding)
+    # are queued in the application database. Worker tasks per process
+    # (0 = this process doesn't run jobs) and jobs running at once per user
+    job_workers: int = 2
+    job_user_concurrency: int = 2
+    job_poll_interval: float = 1.0
+    # Failed jobs are retried after base * 2^(attempt - 1) seconds, up to max
+    job_max_attempts: int = 3
+    job_retry_base_delay: float = 5.0
+    job_retry_max_delay: float = 300.0
+    # Seconds a job may run before it is stopped and counted as a failed
+    # attempt; jobs of a process that died are picked up after twice this
+    job_timeout: float = 600.0
+    # Characters of a new project file's text added to the project's memory
+    # (0 = don't seed memory from files)
+    ingestion_memory_excerpt_chars: int = 2000
     
     # API Keys (Fallback)
     openai_api_key: str = ""
@@ -23,6 +144,26 @@ class Settings(BaseSettings):
     
     # Encryption (NEW)
     encryption_key: str = ""
+    # Retired keys, comma separated - still accepted for decryption while rows
+    # are re-encrypted with encryption_key
+    encryption_previous_keys: str = ""
+    
+    # Signed session tokens. Set a long random secret shared by all workers;
+    # empty = a random one per process (tokens stop working on restart and
+    # aren't accepted by other workers)
+    auth_token_secret: str = ""
+    # Lifetime of access tokens, in seconds; also how long a revocation can
+    # take to reach other worker processes
+    auth_access_token_ttl: int = 15 * 60
+    auth_refresh_token_ttl: int = 30 * 24 * 3600
+    # Legacy: also accept a bare X-User-ID header from clients that don't send
+    # tokens yet. Anyone can forge it, so only turn it on while migrating
+    auth_legacy_user_id_header: bool = False
+    
+    # Password hashing (bcrypt) runs on its own thread pool; calls waiting
+    # beyond max_pending are refused with a 503
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
     
     # Email Configuration
     smtp_host: str = "smtp.gmail.com"
@@ -0,0 +1,182 @@
+"""
+Hot/cold tiering for conversations
+
+Conversations that have not been touched for ``archive_after_days`` have their
+messages moved out of the hot ``messages`` table into a single compressed blob
+in ``conversation_archives``. Opening an archived conversation rehydrates it
+transparently. Neither move changes ``updated_at``, so archiving never
+reorders a user's history.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import update, or_
+from sqlalchemy.orm import Session
+from database.models import Conversation, ConversationArchive, Message
+from config.settings import settings
+from utils.compression import compress_text, decompress_text
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize_messages(messages: List[Message]) -> str:
+    return json.dumps([
+        {
+            "id": m.id,
+            "role": m.role,
+            "content": m.content,
+            "model": m.model,
+            "created_at": m.created_at.isoformat() if m.created_at else None,
+        }
+        for m in messages
+    ], ensure_ascii=False)
+
+
+def _set_archived(db: Session, conversation_id: int, archived: bool):
+    # Core UPDATE so the updated_at onupdate hook doesn't fire
+    db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(
+            is_archived=archived,
+            archived_at=datetime.utcnow() if archived else None,
+            updated_at=Conversation.updated_at
+        )
+    )
+
+
+def archive_conversation(db: Session, conversation: Conversation) -> int:
+    """
+    Move a conversation's messages into cold storage (caller commits).
+
+    Returns:
+        Number of messages archived
+    """
+    messages = db.query(Message).filter(
+        Message.conversation_id == conversation.id
+    ).order_by(Message.created_at, Message.id).all()
+
+    existing = db.get(ConversationArchive, conversation.id)
+    if existing:
+        # Messages added since an earlier archive are merged into the blob
+        messages_payload = json.loads(decompress_text(existing.payload, existing.payload_encoding))
+        messages_payload.extend(json.loads(_serialize_messages(messages)))
+        serialized = json.dumps(messages_payload, ensure_ascii=False)
+        count = len(messages_payload)
+    else:
+        serialized = _serialize_messages(messages)
+        count = len(messages)
+
+    payload, encoding = compress_text(serialized, threshold=1)
+    if existing:
+        existing.payload = payload
+        existing.payload_encoding = encoding
+        existing.message_count = count
+        existing.archived_at = datetime.utcnow()
+    else:
+        db.add(ConversationArchive(
+            conversation_id=conversation.id,
+            payload=payload,
+            payload_encoding=encoding,
+            message_count=count
+        ))
+
+    for message in messages:
+        db.delete(message)
+    _set_archived(db, conversation.id, True)
+    return len(messages)
+
+
+def restore_conversation(db: Session, conversation: Conversation) -> int:
+    """
+    Move an archived conversation's messages back into the hot table.
+
+    Returns:
+        Number of messages restored
+    """
+    archive = db.get(ConversationArchive, conversation.id)
+    restored = 0
+    if archive:
+        entries = json.loads(decompress_text(archive.payload, archive.payload_encoding))
+        original_ids = [entry["id"] for entry in entries if entry.get("id")]
+        # SQLite can hand an archived id to a new row; those entries get a fresh id
+        taken = {
+            row[0] for row in db.query(Message.id).filter(Message.id.in_(original_ids)).all()
+        } if original_ids else set()
+
+        for entry in entries:
+            created_at = entry.get("created_at")
+            message = Message(
+                conversation_id=conversation.id,
+                role=entry["role"],
+                content=entry["content"],
+                model=entry.get("model"),
+                created_at=datetime.fromisoformat(created_at) if created_at else None
+            )
+            if entry.get("id") and entry["id"] not in taken:
+                message.id = entry["id"]
+            db.add(message)
+            restored += 1
+        db.delete(archive)
+
+    _set_archived(db, conversation.id, False)
+    db.commit()
+    db.refresh(conversation)
+    logger.info(f"Restored {restored} archived messages for conversation {conversation.id}")
+    return restored
+
+
+def ensure_conversation_hot(db: Session, conversation: Optional[Conversation]) -> Optional[Conversation]:
+    """Rehydrate the conversation if it is archived; cheap no-op otherwise"""
+    if conversation is not None and conversation.is_archived:
+        restore_conversation(db, conversation)
+    return conversation
+
+
+def archive_old_conversations(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Archive conversations not updated within ``older_than_days``, in chunks.
+
+    Each chunk is committed on its own so the job holds locks briefly and can
+    be interrupted and rerun at any point.
+
+    Returns:
+        Counters: conversations, messages
+    """
+    older_than_days = settings.archive_after_days if older_than_days is None else older_than_days
+    chunk_size = settings.archive_chunk_size if chunk_size is None else chunk_size
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    stats = {"conversations": 0, "messages": 0}
+
+    last_id = 0
+    while True:
+        chunk = db.query(Conversation).filter(
+            Conversation.id > last_id,
+            Conversation.updated_at < cutoff,
+            or_(Conversation.is_archived == False, Conversation.is_archived.is_(None)),
+            Conversation.message_count > 0
+        ).order_by(Conversation.id).limit(chunk_size).all()
+        if not chunk:
+            break
+
+        for conversation in chunk:
+            stats["conversations"] += 1
+            if dry_run:
+                stats["messages"] += conversation.message_count or 0
+            else:
+                stats["messages"] += archive_conversation(db, conversation)
+
+        last_id = chunk[-1].id
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        logger.info(f"Archived {stats['conversations']} conversations ({stats['messages']} messages) so far")
+
+    return stats
@@ -0,0 +1,375 @@
+"""
+Content-addressed storage for uploaded files
+
+Every distinct upload (by SHA-256) is stored once in ``file_blobs`` and shared
+by all ``chat_files``/``project_files`` rows that attach the same bytes. The
+blob keeps a reference count: attaching a file takes a reference, deleting a
+file row releases it, and the blob and its stored content go away at zero.
+Content lives in the configured storage backend (utils.storage) under the
+blob's ``storage_path`` key.
+Text extracted from a blob is stored on it, so identical attachments are
+parsed once. Archives store a member listing there instead, with each
+member's text and term index in ``file_blob_members``; reads pick the
+members relevant to the question (see utils.archive_extractor).
+
+Blob files are only removed after the transaction that dropped the last
+reference commits (see release_blobs/remove_blob_files), so a failed delete
+never leaves a row pointing at a missing file.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from database.models import FileBlob, FileBlobMember
+from config.settings import settings
+from utils.archive_extractor import (
+    SUMMARY_PREFIX, ArchiveText, archive_kind, extract_archive, extract_text_or_archive,
+    format_archive, select_archive_text, select_members
+)
+from utils.compression import compress_text, decompress_text
+from utils.file_extractor import extract_text_from_file
+from utils.extraction_pool import extract_text_async
+from utils.storage import LocalCopy, get_storage
+from utils.uploads import StoredUpload
+
+logger = logging.getLogger(__name__)
+
+
+def blob_path(sha256: str, blob_dir: Optional[str] = None) -> str:
+    """Storage key for a new blob with this hash"""
+    blob_dir = blob_dir or settings.upload_blob_dir
+    # Unique suffix so a blob re-created after deletion never shares a path
+    # with a file still waiting to be removed
+    return os.path.join(blob_dir, sha256[:2], f"{sha256}-{uuid.uuid4().hex[:8]}")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove file {path}: {e}")
+
+
+def _reserve_blob(db: Session, stored: StoredUpload, refs: int) -> Tuple[FileBlob, bool]:
+    """
+    Take references on the blob for the upload's content, adding the row if
+    the content is new. Doesn't commit. Returns the blob and whether it's new.
+    """
+    for _ in range(3):
+        blob = db.query(FileBlob).filter(FileBlob.sha256 == stored.sha256).first()
+        if blob is not None:
+            # Atomic increment; 0 rows means the blob was just released
+            updated = db.query(FileBlob).filter(FileBlob.id == blob.id).update(
+                {FileBlob.ref_count: FileBlob.ref_count + refs}, synchronize_session=False
+            )
+            if not updated:
+                db.rollback()
+                continue
+            return blob, False
+
+        blob = FileBlob(
+            sha256=stored.sha256,
+            size=stored.size,
+            storage_path=blob_path(stored.sha256),
+            ref_count=refs
+        )
+        db.add(blob)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Same content stored concurrently by another request
+            db.rollback()
+            continue
+        return blob, True
+
+    raise RuntimeError(f"Could not store upload {stored.sha256}")
+
+
+def _store_content(key: str, stored: StoredUpload, new: bool):
+    """Storage side of acquire_blob(); uses no database session"""
+    storage = get_storage()
+    if new:
+        try:
+            storage.store_file(key, stored.path)
+        except Exception:
+            _remove(stored.path)
+            raise
+    elif storage.exists(key):
+        _remove(stored.path)
+    else:
+        logger.warning(f"Blob content {key} was missing; restoring it from the new upload")
+        storage.store_file(key, stored.path)
+
+
+def acquire_blob(db: Session, stored: StoredUpload, refs: int = 1) -> FileBlob:
+    """
+    Store a streamed upload by content hash and take references on it.
+
+    If the content is already stored, the new copy is discarded and the
+    existing blob is reused. Commits.
+
+    Args:
+        stored: Upload written by utils.uploads.save_upload()
+        refs: References to take (0 for uploads not attached to anything yet)
+    """
+    blob, new = _reserve_blob(db, stored, refs)
+    try:
+        _store_content(blob.storage_path, stored, new)
+    except Exception:
+        db.rollback()
+        raise
+    db.commit()
+    db.refresh(blob)
+    return blob
+
+
+async def acquire_blob_async(db: Session, stored: StoredUpload, refs: int = 1) -> FileBlob:
+    """
+    acquire_blob() from async code: the session is used on the calling
+    thread and only the storage I/O runs in a worker thread
+    """
+    blob, new = _reserve_blob(db, stored, refs)
+    try:
+        await asyncio.to_thread(_store_content, blob.storage_path, stored, new)
+    except BaseException:
+        db.rollback()
+        raise
+    db.commit()
+    db.refresh(blob)
+    return blob
+
+
+def release_blobs(db: Session, blob_ids: Iterable[Optional[int]]) -> List[str]:
+    """
+    Drop one reference per id (ids may repeat, None is ignored) and delete
+    blobs left without references. Does not commit.
+
+    Returns:
+        Storage keys of the deleted blobs, to pass to remove_blob_files()
+        after the caller commits
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id is not None)
+    if not counts:
+        return []
+    for blob_id, count in counts.items():
+        db.query(FileBlob).filter(FileBlob.id == blob_id).update(
+            {FileBlob.ref_count: FileBlob.ref_count - count}, synchronize_session=False
+        )
+    dead = db.query(FileBlob.id, FileBlob.storage_path).filter(
+        FileBlob.id.in_(list(counts)),
+        FileBlob.ref_count <= 0
+    ).all()
+    if dead:
+        dead_ids = [row.id for row in dead]
+        db.query(FileBlobMember).filter(FileBlobMember.blob_id.in_(dead_ids)).delete(synchronize_session=False)
+        db.query(FileBlob).filter(FileBlob.id.in_(dead_ids)).delete(synchronize_session=False)
+    return [row.storage_path for row in dead]
+
+
+def remove_blob_files(keys: Iterable[str]):
+    """Delete the content of blobs released by a committed transaction"""
+    storage = get_storage()
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not remove blob content {key}: {e}")
+
+
+def release_blob(db: Session, blob_id: int):
+    """Give back a reference taken with acquire_blob() that ended up unused. Commits."""
+    released = release_blobs(db, [blob_id])
+    db.commit()
+    remove_blob_files(released)
+
+
+def _file_type(file) -> Optional[str]:
+    return file.file_type or os.path.splitext(file.filename or "")[1].lower() or None
+
+
+def _stored_text(db: Session, file, query: Optional[str]) -> Optional[str]:
+    blob = file.blob
+    if blob is None or blob.extracted_text is None:
+        return None
+    text = decompress_text(blob.extracted_text, blob.extracted_encoding)
+    if not text.startswith(SUMMARY_PREFIX):
+        return text
+    return _select_stored_members(db, blob, text, query)
+
+
+def _select_stored_members(db: Session, blob: FileBlob, summary: str, query: Optional[str]) -> str:
+    """Archive listing plus the stored members relevant to query; only their texts are loaded"""
+    index = db.query(FileBlobMember.id, FileBlobMember.terms, FileBlobMember.char_count).filter(
+        FileBlobMember.blob_id == blob.id
+    ).order_by(FileBlobMember.position).all()
+    if not index:
+        return summary
+    chosen = select_members(query, [(row.terms, row.char_count) for row in index], settings.extraction_max_chars)
+    rows = db.query(FileBlobMember.name, FileBlobMember.text, FileBlobMember.text_encoding).filter(
+        FileBlobMember.id.in_([index[i].id for i in chosen])
+    ).order_by(FileBlobMember.position).all()
+    return format_archive(
+        summary,
+        [(row.name, decompress_text(row.text, row.text_encoding)) for row in rows],
+        omitted=len(index) - len(chosen)
+    )
+
+
+def _store_text(db: Session, blob: FileBlob, extracted: str):
+    # Don't pin failures - a later read may succeed (e.g. once a parser is installed)
+    if not extracted or extracted.startswith("[Error"):
+        return
+    stored, encoding = compress_text(extracted)
+    try:
+        db.query(FileBlob).filter(FileBlob.id == blob.id).update(
+            {FileBlob.extracted_text: stored, FileBlob.extracted_encoding: encoding},
+            synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not store extracted text for blob {blob.id}: {e}")
+        return
+    set_committed_value(blob, "extracted_text", stored)
+    set_committed_value(blob, "extracted_encoding", encoding)
+
+
+def _store_archive(db: Session, blob: FileBlob, archive: ArchiveText):
+    if archive.summary.startswith("[Error"):
+        return
+    try:
+        for position, member in enumerate(archive.members):
+            text, encoding = compress_text(member.text)
+            db.add(FileBlobMember(
+                blob_id=blob.id,
+                position=position,
+                name=member.name[:1000],
+                size=member.size,
+                char_count=len(member.text),
+                terms=member.terms,
+                text=text,
+                text_encoding=encoding
+            ))
+        db.flush()
+    except Exception as e:
+        # Typically the same archive indexed concurrently by another request
+        db.rollback()
+        logger.warning(f"Could not store archive members for blob {blob.id}: {e}")
+        return
+    _store_text(db, blob, archive.summary)
+
+
+def store_extraction(db: Session, file, extracted, query: Optional[str] = None) -> str:
+    """Store a fresh extraction on the file's blob and return the text to use"""
+    if isinstance(extracted, ArchiveText):
+        if file.blob is not None:
+            _store_archive(db, file.blob, extracted)
+        return select_archive_text(extracted, query)
+    if file.blob is not None:
+        _store_text(db, file.blob, extracted)
+    return extracted
+
+
+def _blob_key(file) -> Optional[str]:
+    """Storage key of the file's blob; None for files uploaded before blobs existed"""
+    return file.blob.storage_path if file.blob is not None else None
+
+
+def _local_source(file) -> LocalCopy:
+    """Local file to extract from (remote blobs are fetched into the storage cache); close when done"""
+    key = _blob_key(file)
+    # Files uploaded before blobs existed are read from their own path every time
+    return LocalCopy(file.storage_path) if key is None else get_storage().local_file(key)
+
+
+def get_file_text(db: Session, file, query: Optional[str] = None) -> str:
+    """
+    Extracted text for a ChatFile or ProjectFile.
+
+    Text is extracted once per blob and stored on it; files uploaded before
+    blobs existed are read from their own path every time. For archives,
+    the members most relevant to query are included.
+    """
+    stored = _stored_text(db, file, query)
+    if stored is not None:
+        return stored
+    try:
+        local = _local_source(file)
+    except FileNotFoundError:
+        logger.error(f"Content of file {file.filename} is missing from storage")
+        return ""
+    with local:
+        kind = archive_kind(local.path, _file_type(file))
+        if kind:
+            extracted = extract_archive(local.path, kind)
+        else:
+            extracted = extract_text_from_file(local.path, _file_type(file))
+    return store_extraction(db, file, extracted, query)
+
+
+def get_stored_text(db: Session, file) -> Optional[str]:
+    """Text already extracted for the file's blob, or None"""
+    return _stored_text(db, file, None)
+
+
+async def extract_file_async(file):
+    """
+    Parse a file in the extraction process pool without storing the result;
+    pass it to store_extraction().
+
+    Returns:
+        Text (errors as "[Error: ...]" text), or ArchiveText for archives
+
+    Raises:
+        FileNotFoundError: If the content is missing from storage
+    """
+    # Resolved here: the file's session must not be used from the worker thread
+    key = _blob_key(file)
+    if key is None:
+        local = LocalCopy(file.storage_path)
+    else:
+        local = await asyncio.to_thread(get_storage().local_file, key)
+    try:
+        return await extract_text_async(local.path, _file_type(file), extractor=extract_text_or_archive)
+    finally:
+        # Kept until the pool process has read it
+        await asyncio.to_thread(local.close)
+
+
+async def get_file_text_async(db: Session, file, query: Optional[str] = None) -> str:
+    """get_file_text() with parsing done in the extraction process pool"""
+    return (await get_files_text_async(db, [file], query))[0]
+
+
+async def get_files_text_async(db: Session, files: list, query: Optional[str] = None) -> List[str]:
+    """
+    get_file_text_async() for several files, parsed concurrently.
+
+    Only the parsing runs concurrently. The session is used before it
+    (stored texts) and after it (storing new extractions, one file at a
+    time), so one file's commit or rollback never lands in the middle of
+    another file's work on the same session. Files that fail yield "".
+    """
+    texts = [_stored_text(db, file, query) for file in files]
+    pending = [i for i, text in enumerate(texts) if text is None]
+
+    async def parse(file):
+        try:
+            return await extract_file_async(file)
+        except FileNotFoundError:
+            logger.error(f"Content of file {file.filename} is missing from storage")
+        except Exception as e:
+            logger.error(f"Error extracting content from file {file.filename}: {e}")
+        return None
+
+    results = await asyncio.gather(*(parse(files[i]) for i in pending))
+    for i, extracted in zip(pending, results):
+        texts[i] = "" if extracted is None else store_extraction(db, files[i], extracted, query)
+    return texts
@@ -1,8 +1,11 @@
 import os
+from contextlib import contextmanager
 from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
+from config.settings import settings
+from database.pool_metrics import InstrumentedQueuePool, instrument_engine
 
 load_dotenv()
 
@@ -11,53 +14,143 @@ DATABASE_URL = os.getenv(
     "sqlite:///./sharedlm.db"
 )
 
-if DATABASE_URL.startswith('sqlite'):
-    # Optimized SQLite engine with better performance settings
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={
-            'check_same_thread': False,
-            'timeout': 20  # Reduced timeout for faster failure detection
-        },
+# Optional read replica - read-only CRUD paths are routed here when configured
+READ_REPLICA_URL = settings.database_read_replica_url or None
+
+
+def _create_engine(url: str, pool_size: int, max_overflow: int):
+    """Create an engine with the tuning used for the given database backend"""
+    if url.startswith('sqlite'):
+        # Optimized SQLite engine with better performance settings
+        options = {}
+        if ":memory:" not in url and "mode=memory" not in url:
+            # File databases share a connection pool sized like the others;
+            # in-memory ones keep SQLAlchemy's default
+            options["poolclass"] = InstrumentedQueuePool
+            options["pool_size"] = pool_size
+            options["max_overflow"] = max_overflow
+            options["pool_timeout"] = settings.db_pool_timeout
+            options["pool_recycle"] = settings.db_pool_recycle
+        sqlite_engine = create_engine(
+            url,
+            connect_args={
+                'check_same_thread': False,
+                'timeout': settings.sqlite_busy_timeout
+            },
+            echo=False,
+            future=True,
+            **options
+        )
+        event.listen(sqlite_engine, "connect", set_sqlite_pragma)
+        instrument_engine(sqlite_engine, settings.db_pool_slow_wait_ms)
+        return sqlite_engine
+
+    # Optimized PostgreSQL/MySQL connection pool
+    pooled_engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_pre_ping=settings.db_pool_pre_ping,  # Verify connections before using
+        pool_recycle=settings.db_pool_recycle,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout,  # Timeout for getting connection from pool
         echo=False,
         future=True
     )
-    
-    @event.listens_for(engine, "connect")
-    def set_sqlite_pragma(dbapi_conn, connection_record):
-        cursor = dbapi_conn.cursor()
+    instrument_engine(pooled_engine, settings.db_pool_slow_wait_ms)
+    return pooled_engine
+
+
+def set_sqlite_pragma(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    try:
+        # Performance optimizations (see the sqlite_* settings)
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")  # WAL for better concurrency
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")  # Balance between safety and speed
+        cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+        cursor.execute("PRAGMA foreign_keys=ON")  # Maintain data integrity
+        cursor.execute("PRAGMA temp_store=MEMORY")  # Store temp tables in memory
+        # Memory-mapped I/O for faster reads (if supported)
         try:
-            # Performance optimizations
-            cursor.execute("PRAGMA journal_mode=WAL")  # Write-Ahead Logging for better concurrency
-            cursor.execute("PRAGMA synchronous=NORMAL")  # Balance between safety and speed
-            cursor.execute("PRAGMA cache_size=-128000")  # Increased cache (128MB) for better performance
-            cursor.execute("PRAGMA foreign_keys=ON")  # Maintain data integrity
-            cursor.execute("PRAGMA temp_store=MEMORY")  # Store temp tables in memory
-            # Memory-mapped I/O for faster reads (if supported)
-            try:
-                cursor.execute("PRAGMA mmap_size=268435456")  # 256MB memory-mapped I/O
-            except:
-                pass  # Not all SQLite versions support this
-            # Thread-safe mode for better concurrency
-            cursor.execute("PRAGMA threads=4")  # Use multiple threads if available
-        except Exception:
-            pass  # Ignore errors for pragmas that may not be supported
-        finally:
-            cursor.close()
-else:
-    # Optimized PostgreSQL/MySQL connection pool
-    engine = create_engine(
-        DATABASE_URL,
-        pool_pre_ping=True,  # Verify connections before using
-        pool_recycle=3600,  # Recycle connections after 1 hour
-        pool_size=20,  # Increased pool size for better concurrency
-        max_overflow=30,  # Allow more overflow connections
-        pool_timeout=10,  # Timeout for getting connection from pool
-        echo=False,
-        future=True
+            cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        except:
+            pass  # Not all SQLite versions support this
+        # Thread-safe mode for better concurrency
+        cursor.execute(f"PRAGMA threads={int(settings.sqlite_threads)}")  # Use multiple threads if available
+    except Exception:
+        pass  # Ignore errors for pragmas that may not be supported
+    finally:
+        cursor.close()
+
+
+engine = _create_engine(DATABASE_URL, settings.db_pool_size, settings.db_max_overflow)
+
+read_engine = None
+if READ_REPLICA_URL:
+    read_engine = _create_engine(
+        READ_REPLICA_URL,
+        settings.db_replica_pool_size,
+        settings.db_replica_max_overflow
     )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class RoutingSession(Session):
+    """
+    Session that sends replica-safe reads to the read engine.
+
+    Reads are only routed to the replica inside a ``use_replica`` block, and
+    once the session has written anything it sticks to the primary for the
+    rest of its life so a request always reads its own writes.
+    """
+
+    def __init__(self, *args, replica_bind=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_bind = replica_bind
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if getattr(clause, "is_dml", False):
+            # Bulk UPDATE/DELETE statements bypass the flush
+            self.info["wrote"] = True
+        if (
+            self.replica_bind is not None
+            and self.info.get("use_replica")
+            and not self.info.get("wrote")
+        ):
+            return self.replica_bind
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _stick_to_primary(session, flush_context, instances):
+    """
+    Pin the session to the primary once it writes data. Set before the
+    flush so statements issued during it (e.g. server defaults read back)
+    go to the primary too.
+    """
+    session.info["wrote"] = True
+
+
+@contextmanager
+def use_replica(db: Session):
+    """
+    Route the reads issued inside this block to the read replica (if any).
+    Works with any session; plain sessions simply ignore the hint.
+    """
+    previous = db.info.get("use_replica", False)
+    db.info["use_replica"] = True
+    try:
+        yield db
+    finally:
+        db.info["use_replica"] = previous
+
+
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=RoutingSession,
+    replica_bind=read_engine
+)
 
 Base = declarative_base()
 
@@ -67,4 +160,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
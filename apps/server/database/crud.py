@@ -1,9 +1,16 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, text
+from sqlalchemy import desc, text, update
 from typing import List, Optional
-from database.models import User, APIKey, Project, Conversation, Message, ProjectFile, ChatFile, CustomIntegration, PasswordResetToken
-import bcrypt
+from database.models import User, APIKey, Project, Conversation, ConversationArchive, Message, ProjectFile, ChatFile, CustomIntegration, PasswordResetToken, RefreshToken
+from database.connection import use_replica
+from database.blobs import release_blobs, remove_blob_files
+from utils.encryption import decrypt_and_rotate
+from utils.passwords import hash_password, check_password
+import logging
 from datetime import datetime
+from sqlalchemy.orm.attributes import set_committed_value
+
+logger = logging.getLogger(__name__)
 
 
 def _normalize_email(email: str) -> str:
@@ -13,9 +20,18 @@ def _normalize_email(email: str) -> str:
     return email.strip().lower()
 
 
-def create_user(db: Session, user_id: str, email: str, password: str, display_name: str = None):
+def create_user(
+    db: Session,
+    user_id: str,
+    email: str,
+    password: str = None,
+    display_name: str = None,
+    password_hash: str = None
+):
+    # Async callers hash with utils.passwords.hash_password_async() and pass password_hash
     normalized_email = _normalize_email(email)
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    if password_hash is None:
+        password_hash = hash_password(password)
     
     user = User(
         id=user_id,
@@ -36,7 +52,7 @@ def get_user_by_id(db: Session, user_id: str):
     return db.query(User).filter(User.id == user_id).first()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return check_password(plain_password, hashed_password)
 
 def create_api_key(db: Session, user_id: str, provider: str, encrypted_key: str, key_name: str = None, key_preview: str = None):
     # Use provided key_preview or generate from encrypted_key as fallback
@@ -57,7 +73,8 @@ def create_api_key(db: Session, user_id: str, provider: str, encrypted_key: str,
     return api_key
 
 def get_user_api_keys(db: Session, user_id: str):
-    return db.query(APIKey).filter(APIKey.user_id == user_id, APIKey.is_active == True).all()
+    with use_replica(db):
+        return db.query(APIKey).filter(APIKey.user_id == user_id, APIKey.is_active == True).all()
 
 def get_api_key(db: Session, user_id: str, provider: str):
     return db.query(APIKey).filter(
@@ -66,6 +83,33 @@ def get_api_key(db: Session, user_id: str, provider: str):
         APIKey.is_active == True
     ).first()
 
+def decrypt_api_key(db: Session, api_key: APIKey) -> str:
+    """
+    Decrypt a stored API key, re-encrypting it with the current key if it
+    was written under a retired one (best effort - the read never fails on it).
+
+    The re-encryption is written on its own short transaction, so the
+    caller's session is neither committed nor rolled back.
+    """
+    stored = api_key.encrypted_key
+    plaintext, rotated = decrypt_and_rotate(stored)
+    # A session that has already written may hold locks the separate
+    # transaction would wait on; the key is rotated on a later read instead
+    if rotated and not db.info.get("wrote"):
+        try:
+            with db.bind.begin() as conn:
+                # Only replace the value we decrypted, in case it changed meanwhile
+                updated = conn.execute(
+                    update(APIKey)
+                    .where(APIKey.id == api_key.id, APIKey.encrypted_key == stored)
+                    .values(encrypted_key=rotated)
+                ).rowcount
+            if updated:
+                set_committed_value(api_key, "encrypted_key", rotated)
+        except Exception as e:
+            logger.warning(f"Could not re-encrypt API key {api_key.id}: {e}")
+    return plaintext
+
 def create_custom_integration(
     db: Session,
     user_id: str,
@@ -89,10 +133,11 @@ def create_custom_integration(
     return integration
 
 def get_user_custom_integrations(db: Session, user_id: str):
-    return db.query(CustomIntegration).filter(
-        CustomIntegration.user_id == user_id,
-        CustomIntegration.is_active == True
-    ).order_by(desc(CustomIntegration.created_at)).all()
+    with use_replica(db):
+        return db.query(CustomIntegration).filter(
+            CustomIntegration.user_id == user_id,
+            CustomIntegration.is_active == True
+        ).order_by(desc(CustomIntegration.created_at)).all()
 
 def get_custom_integration(db: Session, integration_id: int):
     return db.query(CustomIntegration).filter(
@@ -165,8 +210,10 @@ def update_project(db: Session, project_id: int, **kwargs):
 def delete_project(db: Session, project_id: int):
     project = db.query(Project).filter(Project.id == project_id).first()
     if project:
+        released = release_blobs(db, [f.blob_id for f in project.files])
         db.delete(project)
         db.commit()
+        remove_blob_files(released)
     return True
 
 def create_conversation(db: Session, user_id: str, title: str = None, model_used: str = None, project_id: int = None):
@@ -182,14 +229,16 @@ def create_conversation(db: Session, user_id: str, title: str = None, model_used
     return conversation
 
 def get_user_conversations(db: Session, user_id: str, limit: int = 50):
-    return db.query(Conversation).filter(
-        Conversation.user_id == user_id
-    ).order_by(desc(Conversation.updated_at)).limit(limit).all()
+    with use_replica(db):
+        return db.query(Conversation).filter(
+            Conversation.user_id == user_id
+        ).order_by(desc(Conversation.updated_at)).limit(limit).all()
 
 def get_project_conversations(db: Session, project_id: int):
-    return db.query(Conversation).filter(
-        Conversation.project_id == project_id
-    ).order_by(desc(Conversation.updated_at)).all()
+    with use_replica(db):
+        return db.query(Conversation).filter(
+            Conversation.project_id == project_id
+        ).order_by(desc(Conversation.updated_at)).all()
 
 def get_conversation(db: Session, conversation_id: int):
     return db.query(Conversation).filter(Conversation.id == conversation_id).first()
@@ -224,16 +273,21 @@ def create_message(db: Session, conversation_id: int, role: str, content: str, m
     return message
 
 def get_conversation_messages(db: Session, conversation_id: int):
-    return db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at).all()
-
-def create_project_file(db: Session, project_id: int, filename: str, file_size: int, storage_url: str):
+    with use_replica(db):
+        return db.query(Message).filter(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at).all()
+
+def create_project_file(db: Session, project_id: int, filename: str, file_size: int, storage_url: str,
+                        file_type: str = None, blob_id: int = None):
+    # blob_id: a reference already taken with database.blobs.acquire_blob()
     file = ProjectFile(
         project_id=project_id,
         filename=filename,
+        file_type=file_type,
         file_size=file_size,
-        storage_path=storage_url  # Model uses storage_path, not storage_url
+        storage_path=storage_url,  # Model uses storage_path, not storage_url
+        blob_id=blob_id
     )
     db.add(file)
     db.commit()
@@ -241,23 +295,29 @@ def create_project_file(db: Session, project_id: int, filename: str, file_size:
     return file
 
 def get_project_files(db: Session, project_id: int):
-    return db.query(ProjectFile).filter(ProjectFile.project_id == project_id).all()
+    with use_replica(db):
+        return db.query(ProjectFile).filter(ProjectFile.project_id == project_id).all()
 
 def delete_project_file(db: Session, file_id: int):
     file = db.query(ProjectFile).filter(ProjectFile.id == file_id).first()
     if file:
+        released = release_blobs(db, [file.blob_id])
         db.delete(file)
         db.commit()
+        remove_blob_files(released)
         return True
     return False
 
-def create_chat_file(db: Session, conversation_id: int, filename: str, file_size: int, storage_path: str, file_type: str = None):
+def create_chat_file(db: Session, conversation_id: int, filename: str, file_size: int, storage_path: str,
+                     file_type: str = None, blob_id: int = None):
+    # blob_id: a reference already taken with database.blobs.acquire_blob()
     file = ChatFile(
         conversation_id=conversation_id,
         filename=filename,
         file_size=file_size,
         storage_path=storage_path,
-        file_type=file_type
+        file_type=file_type,
+        blob_id=blob_id
     )
     db.add(file)
     db.commit()
@@ -265,7 +325,18 @@ def create_chat_file(db: Session, conversation_id: int, filename: str, file_size
     return file
 
 def get_chat_files(db: Session, conversation_id: int):
-    return db.query(ChatFile).filter(ChatFile.conversation_id == conversation_id).all()
+    with use_replica(db):
+        return db.query(ChatFile).filter(ChatFile.conversation_id == conversation_id).all()
+
+def delete_conversation(db: Session, conversation_id: int):
+    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    if conversation:
+        released = release_blobs(db, [f.blob_id for f in conversation.files])
+        db.delete(conversation)
+        db.commit()
+        remove_blob_files(released)
+        return True
+    return False
 
 def create_password_reset_token(db: Session, user_id: str, token: str, expires_at: datetime):
     """Create a password reset token"""
@@ -302,6 +373,41 @@ def mark_password_reset_token_used(db: Session, token_id: int):
         db.refresh(token)
     return token
 
+def create_refresh_token(db: Session, user_id: str, jti: str, expires_at: datetime):
+    """Record an issued refresh token"""
+    refresh_token = RefreshToken(user_id=user_id, jti=jti, expires_at=expires_at)
+    db.add(refresh_token)
+    db.commit()
+    return refresh_token
+
+def get_refresh_token(db: Session, jti: str):
+    """Get a refresh token record by its token id"""
+    return db.query(RefreshToken).filter(RefreshToken.jti == jti).first()
+
+def revoke_refresh_token(db: Session, jti: str) -> bool:
+    """Revoke a refresh token; False if it was already revoked (or doesn't exist)"""
+    # Conditional update: of two concurrent uses of one token, only one wins
+    updated = db.query(RefreshToken).filter(
+        RefreshToken.jti == jti,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+def revoke_user_refresh_tokens(db: Session, user_id: str) -> int:
+    """Revoke every live refresh token of a user; expired ones are deleted"""
+    now = datetime.utcnow()
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.expires_at < now
+    ).delete(synchronize_session=False)
+    revoked = db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    db.commit()
+    return revoked
+
 def delete_user(db: Session, user_id: str):
     """Delete a user and all associated data (cascade deletes handle related records)"""
     try:
@@ -324,10 +430,20 @@ def delete_user(db: Session, user_id: str):
         )
         conversation_ids = [row[0] for row in conversation_ids_result]
         
+        # Release uploaded file content shared through file_blobs
+        blob_ids = []
+        if conversation_ids:
+            blob_ids += [row[0] for row in db.query(ChatFile.blob_id).filter(
+                ChatFile.conversation_id.in_(conversation_ids)
+            )]
+        
         # 2. Delete messages (via conversations) using raw SQL
         if conversation_ids:
             # Use SQLAlchemy's in_() method which handles the IN clause properly
             db.query(Message).filter(Message.conversation_id.in_(conversation_ids)).delete(synchronize_session=False)
+            db.query(ConversationArchive).filter(
+                ConversationArchive.conversation_id.in_(conversation_ids)
+            ).delete(synchronize_session=False)
         
         # 3. Delete conversations using raw SQL
         db.execute(
@@ -348,6 +464,10 @@ def delete_user(db: Session, user_id: str):
             # Build parameterized query
             placeholders = ','.join([f':pid{i}' for i in range(len(project_ids))])
             params = {f'pid{i}': pid for i, pid in enumerate(project_ids)}
+            blob_ids += [row[0] for row in db.execute(
+                text(f"SELECT blob_id FROM project_files WHERE project_id IN ({placeholders})"),
+                params
+            )]
             db.execute(
                 text(f"DELETE FROM project_files WHERE project_id IN ({placeholders})"),
                 params
@@ -377,13 +497,37 @@ def delete_user(db: Session, user_id: str):
             {"user_id": user_id}
         )
         
-        # 10. Finally, delete the user using raw SQL
+        # 10. Delete background jobs using raw SQL
+        db.execute(
+            text("DELETE FROM jobs WHERE user_id = :user_id"),
+            {"user_id": user_id}
+        )
+        
+        # 11. Delete upload sessions using raw SQL (stored chunks are left for garbage collection)
+        db.execute(
+            text("DELETE FROM upload_chunks WHERE session_id IN (SELECT id FROM upload_sessions WHERE user_id = :user_id)"),
+            {"user_id": user_id}
+        )
+        db.execute(
+            text("DELETE FROM upload_sessions WHERE user_id = :user_id"),
+            {"user_id": user_id}
+        )
+        
+        # 12. Delete refresh tokens using raw SQL
+        db.execute(
+            text("DELETE FROM refresh_tokens WHERE user_id = :user_id"),
+            {"user_id": user_id}
+        )
+        
+        # 13. Finally, delete the user using raw SQL
         db.execute(
             text("DELETE FROM users WHERE id = :user_id"),
             {"user_id": user_id}
         )
         
+        released = release_blobs(db, blob_ids)
         db.commit()
+        remove_blob_files(released)
         return True
     except Exception as e:
         db.rollback()
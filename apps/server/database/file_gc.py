@@ -0,0 +1,252 @@
+"""
+Background removal of stored files nothing refers to
+
+Deleting a file row releases its blob as it goes (database.blobs), but some
+stored files are never referenced or outlive their rows:
+
+- blobs of uploads that were never attached to a conversation (ref_count 0)
+- expired upload sessions, with their chunks
+- content left behind by requests that crashed between writing a file and
+  committing its row (or between committing a delete and removing the file),
+  including spool files of interrupted uploads
+- files written by versions before blobs existed, at the top level of the
+  legacy upload directories, whose rows were deleted without unlinking them
+
+Storage is reconciled against the tables in bounded batches: each pass checks
+at most batch_size keys per directory and remembers where it stopped, so a
+large store is covered over several passes instead of one long scan. Nothing
+younger than the grace period is removed, which protects uploads whose rows
+haven't been committed yet.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session, sessionmaker
+from config.settings import settings
+from database.blobs import remove_blob_files
+from database.models import FileBlob, FileBlobMember, ChatFile, ProjectFile, UploadChunk
+from database.upload_sessions import purge_expired_sessions
+from utils.storage import LocalStorage, StoredObject, get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def _local_files(directory: str, start_after: str = "") -> Iterator[StoredObject]:
+    """Files directly in directory (not in subdirectories), in name order"""
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.is_file(follow_symlinks=False)]
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for entry in sorted(entries, key=lambda entry: entry.name):
+        key = os.path.join(directory, entry.name)
+        if key <= start_after:
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        yield StoredObject(key, stat.st_size, stat.st_mtime)
+
+
+def _spool_files(start_after: str = "") -> Iterator[StoredObject]:
+    # Temporary files of uploads being streamed in (utils.uploads)
+    for obj in _local_files(settings.upload_blob_dir, start_after):
+        if os.path.basename(obj.key).startswith("."):
+            yield obj
+
+
+def _remove_local(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class FileCollector:
+    """Removes unreferenced stored files a batch at a time, in a background thread"""
+
+    def __init__(self, engine, interval: float = 600.0, batch_size: int = 500, grace_period: float = 6 * 3600):
+        self.Session = sessionmaker(bind=engine)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.grace_period = grace_period
+        self.stats = {
+            "passes": 0,
+            "keys_checked": 0,
+            "sessions_purged": 0,
+            "blobs_removed": 0,
+            "files_removed": 0,
+            "bytes_reclaimed": 0,
+            "last_pass_seconds": None
+        }
+        # Where the sweep of each source resumes ("" = from the start)
+        self._cursors: Dict[str, str] = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def _sources(self):
+        storage = get_storage()
+        sources = [
+            (settings.upload_blob_dir, partial(storage.list, settings.upload_blob_dir),
+             (FileBlob.storage_path,), storage.delete),
+            (settings.upload_session_dir, partial(storage.list, settings.upload_session_dir),
+             (UploadChunk.storage_path,), storage.delete),
+        ]
+        if not isinstance(storage, LocalStorage):
+            # Uploads are spooled on this node's disk whatever the backend
+            sources.append(("spool", _spool_files, (), _remove_local))
+        for directory in settings.file_gc_legacy_dirs:
+            if os.path.normpath(directory) != os.path.normpath(settings.storage_cache_dir):
+                sources.append((directory, partial(_local_files, directory),
+                                (ChatFile.storage_path, ProjectFile.storage_path), _remove_local))
+        return sources
+
+    def collect_unreferenced_blobs(self, db: Session) -> Tuple[int, int]:
+        """
+        Delete up to batch_size blobs left without references for longer
+        than the grace period. Commits.
+
+        Returns:
+            (blobs removed, bytes reclaimed)
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace_period)
+        candidates = db.query(FileBlob.id, FileBlob.storage_path, FileBlob.size).filter(
+            FileBlob.ref_count <= 0,
+            FileBlob.created_at < cutoff
+        ).order_by(FileBlob.id).limit(self.batch_size).all()
+        removed = []
+        for blob in candidates:
+            # Unless an upload of the same content took a reference meanwhile
+            deleted = db.query(FileBlob).filter(
+                FileBlob.id == blob.id, FileBlob.ref_count <= 0
+            ).delete(synchronize_session=False)
+            if deleted:
+                db.query(FileBlobMember).filter(FileBlobMember.blob_id == blob.id).delete(synchronize_session=False)
+                removed.append(blob)
+        db.commit()
+        remove_blob_files([blob.storage_path for blob in removed])
+        return len(removed), sum(blob.size for blob in removed)
+
+    def sweep(
+        self,
+        db: Session,
+        source: str,
+        list_objects: Callable[[str], Iterator[StoredObject]],
+        referenced_by: Sequence,
+        remove: Callable[[str], None]
+    ) -> Tuple[int, int, int]:
+        """
+        Check the next batch of a source's keys and remove those no row
+        refers to.
+
+        Args:
+            list_objects: Lists the source's keys after a given key, in order
+            referenced_by: Columns holding keys that are still in use
+            remove: Deletes one key
+
+        Returns:
+            (keys checked, files removed, bytes reclaimed)
+        """
+        batch = list(islice(list_objects(self._cursors.get(source, "")), self.batch_size))
+        # A short batch means the end was reached; start over next time
+        self._cursors[source] = batch[-1].key if len(batch) == self.batch_size else ""
+        cutoff = time.time() - self.grace_period
+        candidates = [obj for obj in batch if obj.modified < cutoff]
+        if not candidates:
+            return len(batch), 0, 0
+
+        keys = [obj.key for obj in candidates]
+        in_use = set()
+        for column in referenced_by:
+            in_use.update(key for (key,) in db.query(column).filter(column.in_(keys)))
+        db.rollback()
+
+        removed = 0
+        reclaimed = 0
+        for obj in candidates:
+            if obj.key in in_use:
+                continue
+            try:
+                remove(obj.key)
+            except Exception as e:
+                logger.warning(f"Could not remove unreferenced file {obj.key}: {e}")
+                continue
+            removed += 1
+            reclaimed += obj.size
+        return len(batch), removed, reclaimed
+
+    def run_once(self) -> Dict[str, int]:
+        """One bounded pass over every source; returns what it removed"""
+        with self._lock:
+            started = time.perf_counter()
+            result = {"keys_checked": 0, "sessions_purged": 0, "blobs_removed": 0, "files_removed": 0, "bytes_reclaimed": 0}
+            with self.Session() as db:
+                result["sessions_purged"] = purge_expired_sessions(db, limit=self.batch_size)
+                result["blobs_removed"], result["bytes_reclaimed"] = self.collect_unreferenced_blobs(db)
+                for source, list_objects, referenced_by, remove in self._sources():
+                    checked, removed, reclaimed = self.sweep(db, source, list_objects, referenced_by, remove)
+                    result["keys_checked"] += checked
+                    result["files_removed"] += removed
+                    result["bytes_reclaimed"] += reclaimed
+
+            for name, value in result.items():
+                self.stats[name] += value
+            self.stats["passes"] += 1
+            self.stats["last_pass_seconds"] = round(time.perf_counter() - started, 3)
+            if result["blobs_removed"] or result["files_removed"] or result["sessions_purged"]:
+                logger.info(
+                    f"File GC removed {result['blobs_removed']} blobs, {result['files_removed']} files and "
+                    f"{result['sessions_purged']} upload sessions ({result['bytes_reclaimed'] / 1024:.1f} KB)"
+                )
+            return result
+
+    def start(self):
+        self._thread = Thread(target=self._run, name="file-gc", daemon=True)
+        self._thread.start()
+        logger.info(f"File GC started (every {self.interval}s, {self.batch_size} keys per directory)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"File GC pass failed: {e}")
+
+
+_collector: Optional[FileCollector] = None
+
+
+def start_file_gc(engine) -> Optional[FileCollector]:
+    """Start the process-wide collector (idempotent; none when file_gc_interval is 0)"""
+    global _collector
+    if _collector is None and settings.file_gc_interval > 0:
+        _collector = FileCollector(
+            engine,
+            interval=settings.file_gc_interval,
+            batch_size=settings.file_gc_batch_size,
+            grace_period=settings.file_gc_grace_period
+        )
+        _collector.start()
+    return _collector
+
+
+def get_file_gc() -> Optional[FileCollector]:
+    return _collector
+
+
+def stop_file_gc():
+    global _collector
+    if _collector is not None:
+        _collector.stop()
+        _collector = None
@@ -0,0 +1,155 @@
+"""
+Cross-process cache invalidation through the application database
+
+For deployments that run several worker processes without a shared cache
+(e.g. single-box SQLite installs). Invalidations are appended to the
+cache_invalidations table; every process polls it in the background and
+evicts the matching entries from its own in-process caches.
+
+Polling is cheap: on SQLite, ``PRAGMA data_version`` tells a connection
+whether any other connection has committed since it last looked, so an idle
+poll doesn't touch the table at all. Other databases read rows past the last
+applied id (a primary-key range scan).
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+from typing import Optional
+from sqlalchemy import func, text
+from sqlalchemy.orm import sessionmaker
+from database.models import CacheInvalidation
+from utils.cache import add_invalidation_hook, remove_invalidation_hook, get_cache
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """Publishes local cache invalidations and applies other processes' ones"""
+
+    def __init__(self, engine, poll_interval: float = 1.0, retention_seconds: int = 3600, batch_size: int = 500):
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine)
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.batch_size = batch_size
+        self.origin = uuid.uuid4().hex
+        self.last_id = 0
+        self.applied = 0
+        self._data_version: Optional[int] = None
+        self._watch_conn = None
+        self._poll_lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self):
+        """Start publishing local invalidations and polling for remote ones"""
+        CacheInvalidation.__table__.create(bind=self.engine, checkfirst=True)
+        with self.Session() as db:
+            # Only changes made from now on matter to this process
+            self.last_id = db.query(func.coalesce(func.max(CacheInvalidation.id), 0)).scalar()
+        if self.engine.dialect.name == "sqlite":
+            # data_version is per connection, so keep one open for watching
+            self._watch_conn = self.engine.connect()
+        add_invalidation_hook(self.publish)
+        self._thread = Thread(target=self._run, name="cache-invalidation-bus", daemon=True)
+        self._thread.start()
+        logger.info(f"Cache invalidation bus started (polling every {self.poll_interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        remove_invalidation_hook(self.publish)
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+        if self._watch_conn is not None:
+            self._watch_conn.close()
+            self._watch_conn = None
+
+    def publish(self, namespace: str, key: Optional[str] = None, tag: Optional[str] = None):
+        """Record an invalidation for other processes (this one has already applied it)"""
+        with self.Session() as db:
+            db.add(CacheInvalidation(namespace=namespace, cache_key=key, tag=tag, origin=self.origin))
+            db.commit()
+
+    def _changed(self) -> bool:
+        if self._watch_conn is None:
+            return True
+        version = self._watch_conn.execute(text("PRAGMA data_version")).scalar()
+        self._watch_conn.commit()
+        changed = version != self._data_version
+        self._data_version = version
+        return changed
+
+    def poll(self) -> int:
+        """Apply new invalidations from other processes; returns how many were applied"""
+        with self._poll_lock:
+            if not self._changed():
+                return 0
+            applied = 0
+            with self.Session() as db:
+                while True:
+                    rows = db.query(CacheInvalidation).filter(
+                        CacheInvalidation.id > self.last_id
+                    ).order_by(CacheInvalidation.id).limit(self.batch_size).all()
+                    if not rows:
+                        break
+                    for row in rows:
+                        self.last_id = row.id
+                        if row.origin != self.origin:
+                            applied += self._apply(row)
+                    if len(rows) < self.batch_size:
+                        break
+            self.applied += applied
+            return applied
+
+    def _apply(self, row: CacheInvalidation) -> int:
+        cache = get_cache(row.namespace)
+        if cache is None:
+            return 0
+        if row.cache_key:
+            cache.delete(row.cache_key)
+        elif row.tag:
+            cache.delete_tag(row.tag)
+        else:
+            cache.clear()
+        return 1
+
+    def prune(self) -> int:
+        """Delete log rows older than the retention window"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        with self.Session() as db:
+            deleted = db.query(CacheInvalidation).filter(
+                CacheInvalidation.created_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+        return deleted
+
+    def _run(self):
+        polls = 0
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+                polls += 1
+                if polls % 600 == 0:
+                    self.prune()
+            except Exception as e:
+                logger.warning(f"Cache invalidation poll failed: {e}")
+
+
+_bus: Optional[InvalidationBus] = None
+
+
+def start_invalidation_bus(engine, poll_interval: float = 1.0) -> InvalidationBus:
+    """Start the process-wide bus (idempotent)"""
+    global _bus
+    if _bus is None:
+        _bus = InvalidationBus(engine, poll_interval=poll_interval)
+        _bus.start()
+    return _bus
+
+
+def stop_invalidation_bus():
+    global _bus
+    if _bus is not None:
+        _bus.stop()
+        _bus = None
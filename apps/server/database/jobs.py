@@ -0,0 +1,363 @@
+"""
+Background job queue in the application database
+
+Jobs are rows in the ``jobs`` table, so they survive restarts and any app
+process can run them. Each process runs a few worker tasks on its event loop
+(JobQueue). A worker claims a due job with a conditional UPDATE, so only one
+worker can move a row from queued to running, then runs the handler
+registered for the job's kind (register_handler).
+
+- At most ``user_concurrency`` jobs of one user run at once, so a bulk
+  upload can't hold up everyone else's files. The check is part of the
+  claiming UPDATE; on PostgreSQL, claims committed at the same moment by
+  different processes can briefly exceed it.
+- A failed job is retried after an exponential backoff until it has used
+  max_attempts; the last error is kept on the row.
+- A job running longer than ``job_timeout`` is cancelled and counts as a
+  failed attempt. One left running by a process that died is picked up
+  again once it has gone twice that long without reporting progress.
+
+Handlers report progress (0-100) and the current stage while they run;
+clients poll GET /jobs/{id}.
+
+The queue's own reads and writes (claims, recovery, progress, outcomes) run
+in worker threads, each with a session of its own, so a busy or locked
+database never stalls the event loop. Handlers get a separate session for
+their work and a detached copy of the job row.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased, sessionmaker
+from database.models import Job
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# report(progress, stage=None) - called by handlers as they go
+Report = Callable[..., None]
+Handler = Callable[[Session, Job, Report], Awaitable[None]]
+
+_handlers: Dict[str, Handler] = {}
+
+
+class JobCancelled(Exception):
+    """Raised by a handler when there is nothing left to do (e.g. its file was deleted); not retried"""
+
+
+def register_handler(kind: str, handler: Handler):
+    """Run jobs of this kind with handler(db, job, report)"""
+    _handlers[kind] = handler
+
+
+def enqueue(db: Session, user_id: str, kind: str, payload: dict, max_attempts: Optional[int] = None) -> Job:
+    """Add a job and wake this process's workers. Commits."""
+    now = datetime.utcnow()
+    job = Job(
+        user_id=user_id,
+        kind=kind,
+        payload=json.dumps(payload),
+        status=QUEUED,
+        progress=0,
+        attempts=0,
+        max_attempts=max_attempts or settings.job_max_attempts,
+        run_after=now,
+        updated_at=now
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if _queue is not None:
+        _queue.notify()
+    return job
+
+
+def job_payload(job: Job) -> dict:
+    return json.loads(job.payload or "{}")
+
+
+def _set_progress(job: Job, values: dict):
+    for name, value in values.items():
+        setattr(job, name, value)
+
+
+class _ProgressWriter:
+    """
+    Saves a running job's progress from a worker thread. report() only
+    records it, so handlers never wait on the database; writes happen in
+    order and close() waits for the last one.
+    """
+
+    def __init__(self, queue: "JobQueue", job_id: int):
+        self.queue = queue
+        self.job_id = job_id
+        self.values = {}
+        self._changed = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    def report(self, progress: int, stage: Optional[str] = None):
+        self.values["progress"] = max(0, min(100, int(progress)))
+        if stage:
+            self.values["stage"] = stage
+        self.values["updated_at"] = datetime.utcnow()  # Heartbeat
+        self._changed.set()
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            values, self.values = self.values, {}
+            if values:
+                try:
+                    await asyncio.to_thread(self.queue._apply, self.job_id, _set_progress, values)
+                except Exception as e:
+                    logger.warning(f"Could not save progress of job {self.job_id}: {e}")
+            if self._closed and not self.values:
+                return
+
+    async def close(self):
+        self._closed = True
+        self._changed.set()
+        await self._task
+
+
+class JobQueue:
+    """Worker tasks claiming and running jobs from the jobs table"""
+
+    def __init__(
+        self,
+        session_factory,
+        workers: int = 2,
+        user_concurrency: int = 2,
+        poll_interval: float = 1.0,
+        retry_base_delay: float = 5.0,
+        retry_max_delay: float = 300.0,
+        job_timeout: float = 600.0
+    ):
+        self.Session = session_factory
+        self.workers = workers
+        self.user_concurrency = user_concurrency
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.job_timeout = job_timeout
+        self.origin = uuid.uuid4().hex
+        self.completed = 0
+        self.failed = 0
+        self._tasks = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop = None
+        self._last_recovery: Optional[datetime] = None
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"job-worker-{i}") for i in range(self.workers)
+        ]
+        logger.info(f"Job queue started ({self.workers} workers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers (a job was just queued)"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Seconds to wait before attempt number attempts + 1"""
+        return min(self.retry_max_delay, self.retry_base_delay * 2 ** max(0, attempts - 1))
+
+    def claim(self, db: Session) -> Optional[Job]:
+        """Move one due job to running for this queue; None when there is none"""
+        now = datetime.utcnow()
+        running = aliased(Job)
+        busy = select(func.count(running.id)).where(
+            running.user_id == Job.user_id, running.status == RUNNING
+        ).scalar_subquery()
+        candidates = db.query(Job.id, Job.user_id).filter(
+            Job.status == QUEUED,
+            Job.run_after <= now,
+            busy < self.user_concurrency
+        ).order_by(Job.run_after, Job.id).limit(self.workers * 4).all()
+
+        for candidate in candidates:
+            user_busy = select(func.count(running.id)).where(
+                running.user_id == candidate.user_id, running.status == RUNNING
+            ).scalar_subquery()
+            claimed = db.query(Job).filter(
+                Job.id == candidate.id,
+                Job.status == QUEUED,
+                user_busy < self.user_concurrency
+            ).update({
+                Job.status: RUNNING,
+                Job.attempts: Job.attempts + 1,
+                Job.worker: self.origin,
+                Job.started_at: now,
+                Job.updated_at: now
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return db.get(Job, candidate.id)
+        return None
+
+    def recover_stale(self, db: Session) -> int:
+        """Fail the current attempt of running jobs whose process died"""
+        if not self.job_timeout:
+            return 0
+        # A live owner gives up on a job after job_timeout, so a row still
+        # running long after that has no owner any more
+        cutoff = datetime.utcnow() - timedelta(seconds=2 * self.job_timeout)
+        stale = db.query(Job).filter(
+            Job.status == RUNNING,
+            Job.updated_at < cutoff,
+            Job.worker != self.origin
+        ).all()
+        for job in stale:
+            self._retry_or_fail(job, "Job stopped responding")
+        db.commit()
+        return len(stale)
+
+    def _retry_or_fail(self, job: Job, error: str):
+        now = datetime.utcnow()
+        job.error = error[:2000]
+        job.updated_at = now
+        if job.attempts < job.max_attempts:
+            job.status = QUEUED
+            job.run_after = now + timedelta(seconds=self.retry_delay(job.attempts))
+        else:
+            job.status = FAILED
+            job.finished_at = now
+
+    def _finish(self, job: Job, status: str, stage: Optional[str] = None, error: Optional[str] = None):
+        now = datetime.utcnow()
+        job.status = status
+        if status == SUCCEEDED:
+            job.progress = 100
+        if stage:
+            job.stage = stage
+        if error:
+            job.error = error[:2000]
+        job.updated_at = now
+        job.finished_at = now
+
+    def _requeue(self, job: Job):
+        # Shutting down: the attempt isn't counted and the job is retried
+        job.status = QUEUED
+        job.attempts -= 1
+        job.updated_at = datetime.utcnow()
+
+    def _apply(self, job_id: int, change: Callable[..., None], *args, **kwargs) -> Optional[str]:
+        """Apply change(job, ...) to the row in a session of its own and commit; returns the new status"""
+        with self.Session() as db:
+            job = db.get(Job, job_id)
+            if job is None:
+                return None
+            change(job, *args, **kwargs)
+            db.commit()
+            return job.status
+
+    async def _change(self, job_id: int, change: Callable[..., None], *args, **kwargs) -> Optional[str]:
+        return await asyncio.to_thread(self._apply, job_id, change, *args, **kwargs)
+
+    def _next_job(self) -> Optional[Job]:
+        """Recover stale jobs now and then, and claim a due one (detached from its session)"""
+        with self.Session() as db:
+            now = datetime.utcnow()
+            if self._last_recovery is None or (now - self._last_recovery).total_seconds() >= min(60, self.job_timeout):
+                self._last_recovery = now
+                self.recover_stale(db)
+            return self.claim(db)
+
+    async def run_job(self, job: Job):
+        """Run a claimed job to its next state"""
+        handler = _handlers.get(job.kind)
+        progress = _ProgressWriter(self, job.id)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for job kind {job.kind}")
+            with self.Session() as db:
+                await asyncio.wait_for(handler(db, job, progress.report), timeout=self.job_timeout or None)
+        except JobCancelled as e:
+            await progress.close()
+            await self._change(job.id, self._finish, CANCELLED, error=str(e))
+        except asyncio.CancelledError:
+            await progress.close()
+            await self._change(job.id, self._requeue)
+            raise
+        except Exception as e:
+            await progress.close()
+            error = "Timed out" if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+            logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {error}")
+            if await self._change(job.id, self._retry_or_fail, error) == FAILED:
+                self.failed += 1
+        else:
+            await progress.close()
+            await self._change(job.id, self._finish, SUCCEEDED, stage="done")
+            self.completed += 1
+
+    async def run_once(self) -> bool:
+        """Claim and run one due job; False when there was nothing to do"""
+        job = await asyncio.to_thread(self._next_job)
+        if job is None:
+            return False
+        await self.run_job(job)
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+
+_queue: Optional[JobQueue] = None
+
+
+def start_job_queue(engine) -> Optional[JobQueue]:
+    """Start this process's workers (idempotent; none when job_workers is 0)"""
+    global _queue
+    if _queue is None and settings.job_workers > 0:
+        _queue = JobQueue(
+            sessionmaker(bind=engine),
+            workers=settings.job_workers,
+            user_concurrency=settings.job_user_concurrency,
+            poll_interval=settings.job_poll_interval,
+            retry_base_delay=settings.job_retry_base_delay,
+            retry_max_delay=settings.job_retry_max_delay,
+            job_timeout=settings.job_timeout
+        )
+        _queue.start()
+    return _queue
+
+
+async def stop_job_queue():
+    global _queue
+    if _queue is not None:
+        queue, _queue = _queue, None
+        await queue.stop()
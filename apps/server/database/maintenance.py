@@ -0,0 +1,124 @@
+"""
+Chunked maintenance jobs over existing rows
+Each job walks the table by primary key in bounded chunks and commits after
+every chunk, so it can run against a live database and be resumed safely.
+"""
+import logging
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from cryptography.fernet import InvalidToken
+from database.models import Message, APIKey
+from config.settings import settings
+from utils.compression import compress_text
+from utils.encryption import decrypt_and_rotate
+
+logger = logging.getLogger(__name__)
+
+
+def compress_existing_messages(
+    db: Session,
+    chunk_size: int = 500,
+    threshold: Optional[int] = None,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Compress message bodies written before compression was enabled.
+
+    Args:
+        db: Database session
+        chunk_size: Rows loaded and committed per chunk
+        threshold: Minimum body length to compress (defaults to settings)
+        dry_run: Measure savings without writing
+
+    Returns:
+        Counters: scanned, compressed, bytes_before, bytes_after
+    """
+    threshold = settings.message_compression_threshold if threshold is None else threshold
+    stats = {"scanned": 0, "compressed": 0, "bytes_before": 0, "bytes_after": 0}
+    if threshold <= 0:
+        return stats
+
+    last_id = 0
+    while True:
+        chunk = db.query(Message).filter(
+            Message.id > last_id,
+            Message.content_encoding.is_(None),
+            func.length(Message._content) >= threshold
+        ).order_by(Message.id).limit(chunk_size).all()
+        if not chunk:
+            break
+
+        for message in chunk:
+            plain = message._content
+            stored, encoding = compress_text(plain, threshold=threshold)
+            stats["scanned"] += 1
+            if not encoding:
+                continue
+            stats["compressed"] += 1
+            stats["bytes_before"] += len(plain.encode("utf-8"))
+            stats["bytes_after"] += len(stored)
+            if not dry_run:
+                message._content = stored
+                message.content_encoding = encoding
+
+        last_id = chunk[-1].id
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        # Keep memory flat across chunks
+        for message in chunk:
+            db.expunge(message)
+        logger.info(f"Compressed {stats['compressed']}/{stats['scanned']} messages (up to id {last_id})")
+
+    return stats
+
+
+def reencrypt_api_keys(
+    db: Session,
+    chunk_size: int = 500,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Re-encrypt stored API keys still using a retired encryption key.
+
+    Reads re-encrypt lazily; this finishes the rows nobody reads so the old
+    key can be removed from ENCRYPTION_PREVIOUS_KEYS.
+
+    Returns:
+        Counters: scanned, rotated, failed (no configured key matches)
+    """
+    stats = {"scanned": 0, "rotated": 0, "failed": 0}
+
+    last_id = 0
+    while True:
+        chunk = db.query(APIKey).filter(
+            APIKey.id > last_id
+        ).order_by(APIKey.id).limit(chunk_size).all()
+        if not chunk:
+            break
+
+        for api_key in chunk:
+            stats["scanned"] += 1
+            try:
+                _, rotated = decrypt_and_rotate(api_key.encrypted_key)
+            except InvalidToken:
+                stats["failed"] += 1
+                logger.warning(f"API key {api_key.id} can't be decrypted with any configured key")
+                continue
+            if rotated:
+                stats["rotated"] += 1
+                if not dry_run:
+                    api_key.encrypted_key = rotated
+
+        last_id = chunk[-1].id
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        for api_key in chunk:
+            db.expunge(api_key)
+        logger.info(f"Re-encrypted {stats['rotated']}/{stats['scanned']} API keys (up to id {last_id})")
+
+    return stats
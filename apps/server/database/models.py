@@ -1,6 +1,11 @@
-from sqlalchemy import Column, String, Integer, Text, Boolean, TIMESTAMP, ForeignKey, func
+from sqlalchemy import Column, String, Integer, Text, Boolean, TIMESTAMP, ForeignKey, UniqueConstraint, Index, func, event, false
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import ColumnElement
 from database.connection import Base
+from utils.compression import compress_text, decompress_text
 
 class User(Base):
     __tablename__ = "users"
@@ -77,6 +82,9 @@ class Conversation(Base):
     model_used = Column(String(100))
     message_count = Column(Integer, default=0)
     is_starred = Column(Boolean, default=False)
+    # Archived conversations keep their messages in conversation_archives
+    is_archived = Column(Boolean, default=False, nullable=False, server_default=false())
+    archived_at = Column(TIMESTAMP, nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
@@ -84,6 +92,33 @@ class Conversation(Base):
     project = relationship("Project", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     files = relationship("ChatFile", back_populates="conversation", cascade="all, delete-orphan")
+    archive = relationship("ConversationArchive", uselist=False, cascade="all, delete-orphan")
+
+
+class ConversationArchive(Base):
+    """Cold storage for the messages of an archived conversation (one compressed blob)"""
+    __tablename__ = "conversation_archives"
+    
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    payload = Column(Text, nullable=False)
+    payload_encoding = Column(String(20), nullable=True)
+    message_count = Column(Integer, default=0)
+    archived_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class _NotInSQL(ColumnElement):
+    """Stands in for a Python-only attribute in queries; compiling it raises"""
+    inherit_cache = True
+    type = Text()
+    
+    def __init__(self, name: str, reason: str):
+        self.name = name
+        self.reason = reason
+
+
+@compiles(_NotInSQL)
+def _refuse_not_in_sql(element, compiler, **kw):
+    raise CompileError(f"{element.name} can't be used in SQL: {element.reason}")
 
 
 class Message(Base):
@@ -92,11 +127,90 @@ class Message(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
     role = Column(String(50), nullable=False)
-    content = Column(Text, nullable=False)
+    # Stored body - may be compressed, see content_encoding. Use .content to read/write.
+    _content = Column("content", Text, nullable=False)
+    content_encoding = Column(String(20), nullable=True)
     model = Column(String(100))
     created_at = Column(TIMESTAMP, server_default=func.now())
     
     conversation = relationship("Conversation", back_populates="messages")
+    
+    @hybrid_property
+    def content(self):
+        """
+        Plain message body, decompressed lazily on first access.
+        
+        Python only: compressed rows hold base64 in the column, so filters,
+        LIKE or ORDER BY on Message.content would silently miss them and
+        raise CompileError instead. Search text through database.search.
+        """
+        stored = self._content
+        cached = self.__dict__.get("_plain_content")
+        if cached is not None and cached[0] is stored:
+            return cached[1]
+        plain = decompress_text(stored, self.content_encoding)
+        self.__dict__["_plain_content"] = (stored, plain)
+        return plain
+    
+    @content.setter
+    def content(self, value):
+        self._content = value
+        self.content_encoding = None
+        self.__dict__["_plain_content"] = (value, value)
+    
+    @content.expression
+    def content(cls):
+        return _NotInSQL("Message.content", "bodies may be stored compressed; use database.search")
+
+
+@event.listens_for(Message, "before_insert")
+@event.listens_for(Message, "before_update")
+def _compress_message_content(mapper, connection, target):
+    """Compress large bodies on the way to SQLite (PostgreSQL TOAST handles its own)"""
+    if connection.dialect.name != "sqlite" or target.content_encoding is not None:
+        return
+    plain = target._content
+    stored, encoding = compress_text(plain)
+    if encoding:
+        target._content = stored
+        target.content_encoding = encoding
+        # Keep the plain text around so this instance never decompresses
+        target.__dict__["_plain_content"] = (stored, plain)
+
+
+class FileBlob(Base):
+    """Uploaded file content, stored once per distinct SHA-256 and shared by file rows"""
+    __tablename__ = "file_blobs"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sha256 = Column(String(64), unique=True, nullable=False)
+    size = Column(Integer, nullable=False)
+    storage_path = Column(String(500), nullable=False)
+    # Number of chat/project file rows pointing here; the blob is removed at zero
+    ref_count = Column(Integer, nullable=False, default=0)
+    # Extracted once and reused by every file row sharing this content
+    extracted_text = Column(Text)
+    extracted_encoding = Column(String(20))
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    
+    members = relationship("FileBlobMember", order_by="FileBlobMember.position", passive_deletes=True)
+
+
+class FileBlobMember(Base):
+    """Extracted text of one member of an archive blob, with its term index"""
+    __tablename__ = "file_blob_members"
+    __table_args__ = (UniqueConstraint("blob_id", "position"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    blob_id = Column(Integer, ForeignKey("file_blobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    name = Column(String(1000), nullable=False)
+    size = Column(Integer, nullable=False)
+    char_count = Column(Integer, nullable=False)
+    # Distinct terms of the name and text, space-delimited (see utils.archive_extractor)
+    terms = Column(Text, nullable=False)
+    text = Column(Text, nullable=False)
+    text_encoding = Column(String(20))
 
 
 class ChatFile(Base):
@@ -108,8 +222,10 @@ class ChatFile(Base):
     file_type = Column(String(50))
     file_size = Column(Integer)
     storage_path = Column(String(500))
+    blob_id = Column(Integer, ForeignKey("file_blobs.id"), index=True)
     uploaded_at = Column(TIMESTAMP, server_default=func.now())
     
+    blob = relationship("FileBlob")
     conversation = relationship("Conversation", back_populates="files")
 
 
@@ -122,8 +238,10 @@ class ProjectFile(Base):
     file_type = Column(String(50))
     file_size = Column(Integer)
     storage_path = Column(String(500))
+    blob_id = Column(Integer, ForeignKey("file_blobs.id"), index=True)
     uploaded_at = Column(TIMESTAMP, server_default=func.now())
     
+    blob = relationship("FileBlob")
     project = relationship("Project", back_populates="files")
 
 
@@ -137,4 +255,96 @@ class PasswordResetToken(Base):
     used = Column(Boolean, default=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
     
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class RefreshToken(Base):
+    """Issued refresh token (utils.tokens); access tokens are not stored"""
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String(32), unique=True, nullable=False)
+    user_id = Column(String(255), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(TIMESTAMP, nullable=False)
+    revoked_at = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+class CacheInvalidation(Base):
+    """Change log used to invalidate in-process caches across worker processes"""
+    __tablename__ = "cache_invalidations"
+    
+    # Monotonic version; workers remember the last id they applied
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    namespace = Column(String(50), nullable=False)
+    cache_key = Column(String(500), nullable=True)
+    tag = Column(String(255), nullable=True)
+    origin = Column(String(32), nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class Job(Base):
+    """Background job run by the database-backed queue (see database.jobs)"""
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(255), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String(50), nullable=False)
+    # JSON arguments for the kind's handler
+    payload = Column(Text, nullable=False, default="{}")
+    # queued -> running -> succeeded / failed / cancelled (back to queued for a retry)
+    status = Column(String(20), nullable=False, default="queued")
+    stage = Column(String(50))
+    progress = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    # Not claimed before this time (retry backoff); UTC
+    run_after = Column(TIMESTAMP, nullable=False)
+    # Last error, kept across retries
+    error = Column(Text)
+    # Queue instance running the job
+    worker = Column(String(32))
+    started_at = Column(TIMESTAMP)
+    # Also the heartbeat of a running job
+    updated_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class UploadSession(Base):
+    """Resumable upload in progress (see database.upload_sessions)"""
+    __tablename__ = "upload_sessions"
+    
+    # Random hex id; also the capability the client resumes with
+    id = Column(String(32), primary_key=True)
+    user_id = Column(String(255), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Where the finished file goes: a project or a conversation
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"))
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100))
+    # Declared total size, bytes received so far, and optional expected SHA-256
+    size = Column(Integer, nullable=False)
+    received = Column(Integer, nullable=False, default=0)
+    sha256 = Column(String(64))
+    # open -> completing -> complete
+    status = Column(String(20), nullable=False, default="open")
+    # Set once completed, so repeating the finalize call returns the same file
+    file_id = Column(Integer)
+    job_id = Column(Integer)
+    expires_at = Column(TIMESTAMP, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    
+    chunks = relationship("UploadChunk", order_by="UploadChunk.offset", passive_deletes=True)
+
+
+class UploadChunk(Base):
+    """One received chunk of an upload session, stored under its own storage key"""
+    __tablename__ = "upload_chunks"
+    __table_args__ = (UniqueConstraint("session_id", "offset"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String(32), ForeignKey("upload_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    offset = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    storage_path = Column(String(500), nullable=False)
@@ -0,0 +1,174 @@
+"""
+Connection pool instrumentation
+
+Counts checkouts, time spent waiting for a connection, overflow usage,
+checkout timeouts and connection age for each engine, so pool sizes can be
+chosen from observed load. Checkout waits are timed inside the pool itself
+(SQLAlchemy has no event for them); everything else uses pool events.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Window for "recent_timeouts": how long one timeout keeps a pool reported as degraded
+RECENT_TIMEOUT_WINDOW_S = 300
+
+
+class PoolMetrics:
+    """Thread-safe counters for one connection pool"""
+
+    def __init__(self, slow_wait_ms: float = 0):
+        self.slow_wait_ms = slow_wait_ms
+        self._lock = threading.Lock()
+        self._connected_at: Dict[int, float] = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self._timeout_times = deque(maxlen=1000)
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.overflow_checkouts = 0
+            self.overflow_peak = 0
+            self.max_connection_age = 0.0
+
+    def record_wait(self, seconds: float, overflow: int = 0):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.overflow_peak = max(self.overflow_peak, overflow)
+        if self.slow_wait_ms and seconds * 1000 >= self.slow_wait_ms:
+            logger.warning(f"Waited {seconds * 1000:.0f}ms for a database connection (overflow={overflow})")
+
+    def record_timeout(self, seconds: float):
+        with self._lock:
+            self.timeouts += 1
+            self._timeout_times.append(time.monotonic())
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        logger.error(f"Timed out after {seconds:.1f}s waiting for a database connection")
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+            self._connected_at[id(dbapi_connection)] = time.monotonic()
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            connected_at = self._connected_at.get(id(dbapi_connection))
+            if connected_at is not None:
+                self.max_connection_age = max(self.max_connection_age, time.monotonic() - connected_at)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception=None):
+        with self._lock:
+            self.invalidations += 1
+
+    def on_close(self, dbapi_connection, connection_record=None):
+        with self._lock:
+            self._connected_at.pop(id(dbapi_connection), None)
+
+    def snapshot(self, pool=None) -> Dict[str, Any]:
+        """Current counters plus the live pool state, if a pool is given"""
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - t for t in self._connected_at.values()]
+            while self._timeout_times and now - self._timeout_times[0] > RECENT_TIMEOUT_WINDOW_S:
+                self._timeout_times.popleft()
+            data = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "recent_timeouts": len(self._timeout_times),
+                "wait_ms_avg": round(self.wait_seconds_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+                "overflow_checkouts": self.overflow_checkouts,
+                "overflow_peak": self.overflow_peak,
+                "open_connections": len(ages),
+                "oldest_connection_age_s": round(max(ages), 1) if ages else 0.0,
+                "max_connection_age_s": round(max([self.max_connection_age] + ages), 1),
+            }
+        if pool is not None:
+            data["pool_class"] = type(pool).__name__
+            if isinstance(pool, QueuePool):
+                data.update({
+                    "size": pool.size(),
+                    "checked_out": pool.checkedout(),
+                    "idle": pool.checkedin(),
+                    "overflow": max(pool.overflow(), 0),
+                    "max_overflow": pool._max_overflow,
+                    "timeout_s": pool.timeout(),
+                })
+        return data
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times each checkout and counts timeouts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep the counters running
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start, self.overflow())
+        return connection
+
+
+def instrument_engine(engine, slow_wait_ms: float = 0) -> PoolMetrics:
+    """
+    Attach pool event listeners to an engine and return its metrics.
+    Engines not using InstrumentedQueuePool still get event-based counters.
+    """
+    metrics = getattr(engine.pool, "metrics", None)
+    if metrics is None:
+        metrics = PoolMetrics()
+        engine.pool.metrics = metrics
+    metrics.slow_wait_ms = slow_wait_ms
+
+    event.listen(engine, "connect", metrics.on_connect)
+    event.listen(engine, "checkin", metrics.on_checkin)
+    event.listen(engine, "invalidate", metrics.on_invalidate)
+    event.listen(engine, "close", metrics.on_close)
+    event.listen(engine, "detach", metrics.on_close)
+    if not isinstance(engine.pool, InstrumentedQueuePool):
+        # No wait timing available - still count checkouts
+        event.listen(engine, "checkout", lambda *args: metrics.record_wait(0.0))
+    return metrics
+
+
+def pool_summary(engine) -> Optional[Dict[str, Any]]:
+    """Metrics snapshot for an engine's pool (None if not instrumented)"""
+    if engine is None:
+        return None
+    metrics = getattr(engine.pool, "metrics", None)
+    if metrics is None:
+        return None
+    return metrics.snapshot(engine.pool)
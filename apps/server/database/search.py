@@ -0,0 +1,301 @@
+"""
+Full-text search over message bodies and conversation titles
+
+SQLite uses FTS5 tables kept in sync incrementally on every insert, update
+and delete. The triggers are plain SQL, so writes from any connection (the
+sqlite3 CLI, maintenance scripts, raw SQL and cascade deletes) keep the index
+consistent. Message bodies stored compressed can't be read by SQL, so the
+message index keeps its own plaintext copy: triggers index plain rows and
+drop deleted ones, and an ORM event indexes compressed rows after they are
+written. PostgreSQL uses GIN indexes over to_tsvector() expressions, which
+the database maintains itself.
+"""
+import logging
+import re
+import weakref
+from typing import List, Dict, Any
+from sqlalchemy import text, event, inspect
+from sqlalchemy.orm import Session
+from database.connection import use_replica
+from database.models import Message
+from utils.compression import sqlite_message_text
+
+logger = logging.getLogger(__name__)
+
+# Markers wrapped around matched terms in snippets (rendered as markdown bold)
+HIGHLIGHT_START = "**"
+HIGHLIGHT_END = "**"
+
+# Title hits are ranked above body hits with the same relevance
+TITLE_WEIGHT = 2.0
+
+SNIPPET_TOKENS = 16
+
+SQLITE_SEARCH_DDL = [
+    # Not external-content: the index stores the plain text itself, because
+    # the messages column may hold compressed bodies. Compressed rows are
+    # indexed by _index_compressed_message() rather than the triggers
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages
+    WHEN new.content_encoding IS NULL BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        DELETE FROM messages_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content, content_encoding ON messages BEGIN
+        DELETE FROM messages_fts WHERE rowid = old.id;
+        INSERT INTO messages_fts(rowid, content)
+        SELECT new.id, new.content WHERE new.content_encoding IS NULL;
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+        title, content='conversations', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversations_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversations_fts_au AFTER UPDATE OF title ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO conversations_fts(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+]
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS idx_messages_content_fts ON messages USING GIN (to_tsvector('simple', content))",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_title_fts ON conversations USING GIN (to_tsvector('simple', coalesce(title, '')))",
+]
+
+SQLITE_SEARCH_QUERY = f"""
+    SELECT c.id AS conversation_id, c.title AS title, NULL AS message_id, NULL AS role,
+           snippet(conversations_fts, 0, :hl_start, :hl_end, '...', {SNIPPET_TOKENS}) AS snippet,
+           -bm25(conversations_fts) * {TITLE_WEIGHT} AS score, c.updated_at AS created_at
+    FROM conversations_fts
+    JOIN conversations c ON c.id = conversations_fts.rowid
+    WHERE conversations_fts MATCH :match AND c.user_id = :user_id
+    UNION ALL
+    SELECT m.conversation_id, c.title, m.id, m.role,
+           snippet(messages_fts, 0, :hl_start, :hl_end, '...', {SNIPPET_TOKENS}),
+           -bm25(messages_fts), m.created_at
+    FROM messages_fts
+    JOIN messages m ON m.id = messages_fts.rowid
+    JOIN conversations c ON c.id = m.conversation_id
+    WHERE messages_fts MATCH :match AND c.user_id = :user_id
+    ORDER BY score DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+POSTGRES_SEARCH_QUERY = f"""
+    SELECT c.id AS conversation_id, c.title AS title, NULL::integer AS message_id, NULL AS role,
+           ts_headline('simple', coalesce(c.title, ''), q, :headline_options) AS snippet,
+           ts_rank(to_tsvector('simple', coalesce(c.title, '')), q) * {TITLE_WEIGHT} AS score,
+           c.updated_at AS created_at
+    FROM conversations c, websearch_to_tsquery('simple', :query) q
+    WHERE c.user_id = :user_id AND to_tsvector('simple', coalesce(c.title, '')) @@ q
+    UNION ALL
+    SELECT m.conversation_id, c.title, m.id, m.role,
+           ts_headline('simple', m.content, q, :headline_options),
+           ts_rank(to_tsvector('simple', m.content), q),
+           m.created_at
+    FROM messages m
+    JOIN conversations c ON c.id = m.conversation_id,
+         websearch_to_tsquery('simple', :query) q
+    WHERE c.user_id = :user_id AND to_tsvector('simple', m.content) @@ q
+    ORDER BY score DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+
+# Engines whose database has the SQLite message index
+_indexed_engines = weakref.WeakSet()
+
+# Compressed rows indexed per statement when backfilling
+BACKFILL_BATCH_SIZE = 500
+
+
+def install_search_index(engine) -> None:
+    """
+    Create the full-text search structures for the engine's dialect.
+    Safe to call on every startup; existing rows are indexed on first install.
+    """
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            _drop_outdated_sqlite_index(conn)
+            existing = conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('messages_fts', 'conversations_fts')"
+            )).scalars().all()
+            for statement in SQLITE_SEARCH_DDL:
+                conn.execute(text(statement))
+            # Backfill rows written before the index existed
+            if "messages_fts" not in existing:
+                _backfill_messages(conn)
+            if "conversations_fts" not in existing:
+                conn.execute(text("INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild')"))
+        elif dialect == "postgresql":
+            for statement in POSTGRES_SEARCH_DDL:
+                conn.execute(text(statement))
+        else:
+            logger.warning(f"Full-text search is not supported on {dialect}; falling back to LIKE queries")
+    if dialect == "sqlite":
+        _indexed_engines.add(engine)
+
+
+def _drop_outdated_sqlite_index(conn) -> None:
+    """
+    Drop an external-content message index: it either read the raw (possibly
+    compressed) column or called a Python SQL function from its triggers,
+    which broke writes from connections that hadn't registered it
+    """
+    definition = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    )).scalar()
+    if definition and "content=" in definition:
+        logger.info("Rebuilding messages_fts to store decompressed message bodies")
+        for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE messages_fts"))
+        conn.execute(text("DROP VIEW IF EXISTS messages_search_source"))
+
+
+def _backfill_messages(conn) -> None:
+    """Index messages written before the index existed"""
+    conn.execute(text(
+        "INSERT INTO messages_fts(rowid, content) SELECT id, content FROM messages WHERE content_encoding IS NULL"
+    ))
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, content, content_encoding FROM messages "
+            "WHERE content_encoding IS NOT NULL AND id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        conn.execute(
+            text("INSERT INTO messages_fts(rowid, content) VALUES (:id, :content)"),
+            [{"id": row.id, "content": sqlite_message_text(row.content, row.content_encoding)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+
+@event.listens_for(Message, "after_insert")
+@event.listens_for(Message, "after_update")
+def _index_compressed_message(mapper, connection, target):
+    """Index a compressed body the triggers skipped (they can't decompress it)"""
+    if target.content_encoding is None or connection.engine not in _indexed_engines:
+        return
+    state = inspect(target)
+    if not (state.attrs._content.history.has_changes() or state.attrs.content_encoding.history.has_changes()):
+        return
+    # The update trigger has already removed the old entry
+    connection.execute(
+        text("INSERT INTO messages_fts(rowid, content) VALUES (:id, :content)"),
+        {"id": target.id, "content": sqlite_message_text(target._content, target.content_encoding)}
+    )
+
+
+def build_match_expression(query: str) -> str:
+    """
+    Turn free-form user input into a safe FTS5 MATCH expression.
+    Every term is quoted (so FTS5 operators in user input are inert) and the
+    last term is treated as a prefix for search-as-you-type.
+    """
+    terms = re.findall(r"\w+", query or "", re.UNICODE)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_conversations(
+    db: Session,
+    user_id: str,
+    query: str,
+    limit: int = 20,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Search a user's message bodies and conversation titles.
+
+    Returns ranked hits (best first), each with the conversation, the matching
+    message (None for title hits) and a highlighted snippet.
+    """
+    if not query or not query.strip():
+        return []
+
+    dialect = db.get_bind().dialect.name
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+
+    with use_replica(db):
+        if dialect == "sqlite":
+            match = build_match_expression(query)
+            if not match:
+                return []
+            rows = db.execute(text(SQLITE_SEARCH_QUERY), {
+                **params,
+                "match": match,
+                "hl_start": HIGHLIGHT_START,
+                "hl_end": HIGHLIGHT_END,
+            }).mappings().all()
+        elif dialect == "postgresql":
+            rows = db.execute(text(POSTGRES_SEARCH_QUERY), {
+                **params,
+                "query": query,
+                "headline_options": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1, MaxWords=24, MinWords=8",
+            }).mappings().all()
+        else:
+            rows = _search_like(db, query, params)
+
+    return [
+        {
+            "conversation_id": row["conversation_id"],
+            "title": row["title"],
+            "message_id": row["message_id"],
+            "role": row["role"],
+            "snippet": row["snippet"],
+            "score": float(row["score"] or 0),
+            "created_at": str(row["created_at"]) if row["created_at"] else None,
+        }
+        for row in rows
+    ]
+
+
+def _search_like(db: Session, query: str, params: Dict[str, Any]):
+    """Unranked substring search for databases without full-text support"""
+    pattern = f"%{query.strip()}%"
+    return db.execute(text("""
+        SELECT c.id AS conversation_id, c.title AS title, NULL AS message_id, NULL AS role,
+               c.title AS snippet, 1.0 AS score, c.updated_at AS created_at
+        FROM conversations c
+        WHERE c.user_id = :user_id AND c.title LIKE :pattern
+        UNION ALL
+        SELECT m.conversation_id, c.title, m.id, m.role,
+               substr(m.content, 1, 200), 0.5, m.created_at
+        FROM messages m
+        JOIN conversations c ON c.id = m.conversation_id
+        WHERE c.user_id = :user_id AND m.content LIKE :pattern
+        ORDER BY score DESC
+        LIMIT :limit OFFSET :offset
+    """), {**params, "pattern": pattern}).mappings().all()
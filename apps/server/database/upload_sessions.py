@@ -0,0 +1,336 @@
+"""
+Resumable uploads for files too large for a single request
+
+1. create_session() records the file's name, size and destination.
+2. Each chunk is PUT with its byte offset (save_chunk). It is spooled to
+   disk while its SHA-256 is computed, checked against the client's, and
+   handed to the storage backend under its own key.
+3. assemble_upload() streams the chunks back in order into one file and
+   checks the whole-file hash; the route then stores it as a blob like any
+   other upload.
+
+A chunk is only recorded once it has arrived whole, so after a dropped
+connection the client reads the session's offset and resumes from the end
+of the last complete chunk. Chunks live in the storage backend, so any app
+node can take the next chunk or the finalize call. Memory use per request
+stays at one read buffer whatever the file size.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from config.settings import settings
+from database.models import UploadSession, UploadChunk
+from utils.storage import get_storage
+from utils.uploads import StoredUpload, save_stream
+
+logger = logging.getLogger(__name__)
+
+OPEN = "open"
+COMPLETING = "completing"
+COMPLETE = "complete"
+
+_COPY_CHUNK = 1024 * 1024
+
+
+class UploadSessionError(Exception):
+    """A request the upload protocol can't accept; status is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def chunk_path(session_id: str, offset: int) -> str:
+    """Storage key for a chunk"""
+    # Unique suffix: a chunk that lost a race for its offset is deleted
+    # without touching the winner's
+    return os.path.join(settings.upload_session_dir, session_id, f"{offset:012d}-{uuid.uuid4().hex[:8]}")
+
+
+def _remove_chunks(keys: List[str]):
+    storage = get_storage()
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not remove upload chunk {key}: {e}")
+
+
+def create_session(
+    db: Session,
+    user_id: str,
+    filename: str,
+    size: int,
+    content_type: Optional[str] = None,
+    project_id: Optional[int] = None,
+    conversation_id: Optional[int] = None,
+    sha256: Optional[str] = None
+) -> UploadSession:
+    """Start a resumable upload (the caller has validated the file and destination). Commits."""
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        project_id=project_id,
+        conversation_id=conversation_id,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        received=0,
+        sha256=sha256.lower() if sha256 else None,
+        status=OPEN,
+        expires_at=datetime.utcnow() + timedelta(seconds=settings.upload_session_ttl)
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def count_open_sessions(db: Session, user_id: str) -> int:
+    return db.query(UploadSession).filter(
+        UploadSession.user_id == user_id,
+        UploadSession.status == OPEN,
+        UploadSession.expires_at > datetime.utcnow()
+    ).count()
+
+
+def check_open(session: UploadSession):
+    """Raise unless the session still accepts chunks"""
+    if session.status == COMPLETE:
+        raise UploadSessionError("Upload is already complete", 409)
+    if session.status != OPEN:
+        raise UploadSessionError("Upload is being completed", 409)
+    if session.expires_at < datetime.utcnow():
+        raise UploadSessionError("Upload session expired", 410)
+
+
+async def save_chunk(
+    db: Session,
+    session: UploadSession,
+    offset: int,
+    chunks: AsyncIterator[bytes],
+    sha256: Optional[str] = None
+) -> UploadSession:
+    """
+    Store the chunk starting at offset. Commits.
+
+    Args:
+        chunks: The chunk's bytes as they arrive (e.g. request.stream())
+        sha256: Client's hash of the chunk; a mismatch rejects the chunk
+
+    Raises:
+        UploadSessionError: If the offset isn't the end of the received
+            bytes (409), the checksum doesn't match or the chunk is empty
+        HTTPException: If the chunk runs past the declared size or the
+            chunk size limit
+    """
+    check_open(session)
+    if offset != session.received:
+        raise UploadSessionError(f"Expected offset {session.received}", 409)
+    limit = min(settings.upload_session_max_chunk, session.size - offset)
+    if limit <= 0:
+        raise UploadSessionError("All bytes have been received; complete the upload", 409)
+
+    stored = await save_stream(chunks, settings.upload_blob_dir, max_size=limit)
+    key = chunk_path(session.id, offset)
+    try:
+        if stored.size == 0:
+            raise UploadSessionError("Empty chunk")
+        if sha256 and sha256.lower() != stored.sha256:
+            raise UploadSessionError("Chunk checksum mismatch")
+        await asyncio.to_thread(get_storage().store_file, key, stored.path)
+    except BaseException:
+        if os.path.exists(stored.path):
+            os.remove(stored.path)
+        raise
+
+    # Record the chunk unless a concurrent request stored this offset first
+    updated = db.query(UploadSession).filter(
+        UploadSession.id == session.id,
+        UploadSession.received == offset,
+        UploadSession.status == OPEN
+    ).update({
+        UploadSession.received: UploadSession.received + stored.size,
+        UploadSession.expires_at: datetime.utcnow() + timedelta(seconds=settings.upload_session_ttl)
+    }, synchronize_session=False)
+    if updated:
+        db.add(UploadChunk(
+            session_id=session.id, offset=offset, size=stored.size, sha256=stored.sha256, storage_path=key
+        ))
+        db.commit()
+    else:
+        db.rollback()
+    db.refresh(session)
+    if not updated:
+        await asyncio.to_thread(_remove_chunks, [key])
+        raise UploadSessionError(f"Expected offset {session.received}", 409)
+    return session
+
+
+def _assemble(keys: List[str], upload_dir: str) -> StoredUpload:
+    storage = get_storage()
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=upload_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as target:
+            for key in keys:
+                with storage.open(key) as source:
+                    while True:
+                        data = source.read(_COPY_CHUNK)
+                        if not data:
+                            break
+                        digest.update(data)
+                        target.write(data)
+                        size += len(data)
+            target.flush()
+            os.fsync(target.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return StoredUpload(temp_path, os.path.basename(temp_path), size, digest.hexdigest())
+
+
+async def assemble_upload(db: Session, session: UploadSession) -> StoredUpload:
+    """
+    Join the chunks of a fully received session into one spooled file,
+    ready for database.blobs.acquire_blob(). The session is left
+    "completing" for finish_session(), or reopen_session() on failure.
+
+    Raises:
+        UploadSessionError: If bytes are missing or the file doesn't match
+            the SHA-256 given when the session was created (the session is
+            then discarded: the client has to start over)
+    """
+    check_open(session)
+    if session.received != session.size:
+        raise UploadSessionError(f"Upload incomplete: {session.received} of {session.size} bytes received", 409)
+    chunks = db.query(UploadChunk).filter(UploadChunk.session_id == session.id).order_by(UploadChunk.offset).all()
+    expected = 0
+    for chunk in chunks:
+        if chunk.offset != expected:
+            raise UploadSessionError(f"Upload is missing bytes at offset {expected}", 409)
+        expected += chunk.size
+    # Read now: the commit below expires the rows, and the worker thread
+    # that copies them must not touch the session
+    keys = [chunk.storage_path for chunk in chunks]
+
+    # Only one finalize call gets to build the file. The expiry is pushed
+    # back so the file collector doesn't purge the chunks while they're read
+    claimed = db.query(UploadSession).filter(
+        UploadSession.id == session.id, UploadSession.status == OPEN
+    ).update({
+        UploadSession.status: COMPLETING,
+        UploadSession.expires_at: datetime.utcnow() + timedelta(seconds=settings.upload_session_ttl)
+    }, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        raise UploadSessionError("Upload is already being completed", 409)
+    db.refresh(session)
+
+    try:
+        stored = await asyncio.to_thread(_assemble, keys, settings.upload_blob_dir)
+    except BaseException:
+        reopen_session(db, session)
+        raise
+    if stored.size != session.size or (session.sha256 and stored.sha256 != session.sha256):
+        os.remove(stored.path)
+        await discard_session_async(db, session)
+        raise UploadSessionError("File checksum mismatch; start a new upload")
+    return stored
+
+
+def reopen_session(db: Session, session: UploadSession):
+    """Let a session whose completion failed be completed again. Commits."""
+    db.rollback()
+    db.query(UploadSession).filter(
+        UploadSession.id == session.id, UploadSession.status == COMPLETING
+    ).update({UploadSession.status: OPEN}, synchronize_session=False)
+    db.commit()
+
+
+def _complete_session_rows(db: Session, session: UploadSession, file_id: int, job_id: Optional[int]) -> List[str]:
+    """Mark the session complete and delete its chunk rows. Commits. Returns the chunks' storage keys."""
+    keys = [key for (key,) in db.query(UploadChunk.storage_path).filter(UploadChunk.session_id == session.id)]
+    db.query(UploadChunk).filter(UploadChunk.session_id == session.id).delete(synchronize_session=False)
+    session.status = COMPLETE
+    session.file_id = file_id
+    session.job_id = job_id
+    # Kept for a while so a repeated finalize call gets the same answer
+    session.expires_at = datetime.utcnow() + timedelta(seconds=settings.upload_session_ttl)
+    db.commit()
+    return keys
+
+
+def finish_session(db: Session, session: UploadSession, file_id: int, job_id: Optional[int]):
+    """Mark the session complete and drop its chunks. Commits."""
+    _remove_chunks(_complete_session_rows(db, session, file_id, job_id))
+
+
+async def finish_session_async(db: Session, session: UploadSession, file_id: int, job_id: Optional[int]):
+    """finish_session() from async code; only the storage deletes run in a worker thread"""
+    keys = _complete_session_rows(db, session, file_id, job_id)
+    await asyncio.to_thread(_remove_chunks, keys)
+
+
+def _delete_session_rows(db: Session, session: UploadSession) -> List[str]:
+    """Delete a session and its chunk rows. Commits. Returns the chunks' storage keys."""
+    keys = [key for (key,) in db.query(UploadChunk.storage_path).filter(UploadChunk.session_id == session.id)]
+    db.query(UploadChunk).filter(UploadChunk.session_id == session.id).delete(synchronize_session=False)
+    db.delete(session)
+    db.commit()
+    return keys
+
+
+def discard_session(db: Session, session: UploadSession):
+    """Delete a session and its stored chunks. Commits."""
+    _remove_chunks(_delete_session_rows(db, session))
+
+
+async def discard_session_async(db: Session, session: UploadSession):
+    """
+    discard_session() from async code: the session is used on the calling
+    thread and only the storage deletes run in a worker thread
+    """
+    keys = _delete_session_rows(db, session)
+    await asyncio.to_thread(_remove_chunks, keys)
+
+
+def _delete_expired_rows(db: Session, limit: int) -> Tuple[int, List[str]]:
+    """Delete sessions past their expiry. Commits. Returns how many, and their chunks' storage keys."""
+    now = datetime.utcnow()
+    expired = db.query(UploadSession).filter(
+        UploadSession.expires_at < now,
+        # A session being assembled is left alone unless its finalize call
+        # died long ago (the claim already pushed its expiry back one TTL)
+        or_(
+            UploadSession.status != COMPLETING,
+            UploadSession.expires_at < now - timedelta(seconds=settings.upload_session_ttl)
+        )
+    ).limit(limit).all()
+    keys = []
+    for session in expired:
+        keys.extend(_delete_session_rows(db, session))
+    return len(expired), keys
+
+
+def purge_expired_sessions(db: Session, limit: int = 100) -> int:
+    """Discard sessions past their expiry, with their chunks; returns how many"""
+    count, keys = _delete_expired_rows(db, limit)
+    _remove_chunks(keys)
+    return count
+
+
+async def purge_expired_sessions_async(db: Session, limit: int = 100) -> int:
+    """purge_expired_sessions() from async code; only the storage deletes run in a worker thread"""
+    count, keys = _delete_expired_rows(db, limit)
+    await asyncio.to_thread(_remove_chunks, keys)
+    return count
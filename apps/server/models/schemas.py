@@ -56,6 +56,12 @@ class UserLogin(BaseModel):
     email: str
     password: str
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class ForgotPasswordRequest(BaseModel):
     email: str
 
@@ -103,6 +109,22 @@ class ConversationUpdate(BaseModel):
     project_id: Optional[int] = None
     is_starred: Optional[bool] = None
 
+class SearchHit(BaseModel):
+    conversation_id: int
+    title: Optional[str]
+    message_id: Optional[int]
+    role: Optional[str]
+    snippet: Optional[str]
+    score: float
+    created_at: Optional[str]
+
+class ConversationSearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+    limit: int
+    offset: int
+    has_more: bool
+
 # MESSAGE SCHEMAS
 
 class MessageResponse(BaseModel):
@@ -118,6 +140,47 @@ class FileUploadResponse(BaseModel):
     success: bool
     file: dict
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+    # Exactly one destination
+    project_id: Optional[int] = None
+    conversation_id: Optional[int] = None
+    # Optional SHA-256 of the whole file, checked when the upload completes
+    sha256: Optional[str] = None
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: str
+    size: int
+    offset: int
+    status: str
+    max_chunk_size: int
+    expires_at: str
+
+# BACKGROUND JOB SCHEMAS
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    stage: Optional[str]
+    progress: int
+    attempts: int
+    max_attempts: int
+    error: Optional[str]
+    file_id: Optional[int]
+    created_at: str
+    updated_at: Optional[str]
+    finished_at: Optional[str]
+
+class JobProgressResponse(BaseModel):
+    id: int
+    status: str
+    stage: Optional[str]
+    progress: int
+
 # API KEY SCHEMAS
 
 class APIKeyCreate(BaseModel):
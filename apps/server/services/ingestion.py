@@ -0,0 +1,94 @@
+"""
+Post-upload processing of chat and project files
+
+The upload routes stream the file in (hashing it on the way), store it by
+content hash and return. The rest runs as an "ingest_file" background job
+(database.jobs): parsing the file in the extraction pool, storing the text
+and archive member index on its blob, and seeding the project's memory with
+the beginning of a new project file.
+
+Everything a step produces is stored on the blob, so a retried job resumes
+at the step that failed, and the first chat turn that reads the file finds
+its text ready. Files whose text is already stored (identical content
+uploaded before) skip straight to memory seeding.
+"""
+import asyncio
+import logging
+from typing import Optional
+from sqlalchemy.orm import Session
+from config.settings import settings
+from database.blobs import extract_file_async, get_stored_text, store_extraction
+from database.jobs import JobCancelled, enqueue, job_payload, register_handler
+from database.models import ChatFile, Job, ProjectFile
+from services.mem0_client import mem0_client
+
+logger = logging.getLogger(__name__)
+
+INGEST_FILE = "ingest_file"
+
+_FILE_MODELS = {"chat": ChatFile, "project": ProjectFile}
+
+
+def enqueue_ingestion(db: Session, user_id: str, file, project_id: Optional[int] = None) -> Optional[int]:
+    """
+    Queue the post-upload processing of a ChatFile or ProjectFile. Commits.
+
+    Returns:
+        The job id, or None if the job couldn't be queued (the file is then
+        extracted on first read, as before jobs existed)
+    """
+    kind = "project" if isinstance(file, ProjectFile) else "chat"
+    try:
+        job = enqueue(db, user_id, INGEST_FILE, {
+            "file_kind": kind,
+            "file_id": file.id,
+            "project_id": project_id
+        })
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not queue processing of file {file.id}: {e}")
+        return None
+    return job.id
+
+
+def _memory_message(filename: str, text: str) -> str:
+    limit = settings.ingestion_memory_excerpt_chars
+    excerpt = text[:limit]
+    if len(text) > limit:
+        excerpt += "\n[...]"
+    return f"I added the file {filename} to this project. It begins:\n\n{excerpt}"
+
+
+async def ingest_file(db: Session, job: Job, report):
+    """Extract, index and (for project files) seed memory for an uploaded file"""
+    payload = job_payload(job)
+    file = db.get(_FILE_MODELS[payload["file_kind"]], payload["file_id"])
+    if file is None:
+        raise JobCancelled("The file was deleted before it was processed")
+
+    text = get_stored_text(db, file)
+    if text is None:
+        report(10, "extracting")
+        try:
+            extracted = await extract_file_async(file)
+        except FileNotFoundError:
+            raise RuntimeError("File content is missing from storage")
+        if isinstance(extracted, str) and extracted.startswith("[Error"):
+            raise RuntimeError(extracted.strip("[]"))
+        report(60, "indexing")
+        text = store_extraction(db, file, extracted)
+
+    project_id = payload.get("project_id")
+    if project_id and text and settings.ingestion_memory_excerpt_chars > 0:
+        report(80, "seeding memory")
+        added = await asyncio.to_thread(
+            mem0_client.add_memory,
+            user_id=job.user_id,
+            messages=[{"role": "user", "content": _memory_message(file.filename, text)}],
+            project_id=project_id
+        )
+        if not added:
+            raise RuntimeError("Could not add the file to project memory")
+
+
+register_handler(INGEST_FILE, ingest_file)
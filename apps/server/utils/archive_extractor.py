@@ -0,0 +1,385 @@
+"""
+Text extraction from zip, tar and gzip archives
+
+Members are read out of the archive into memory one at a time - nothing is
+unpacked to disk - and passed to the regular extractors by their file
+extension. Binary members and nested archives are skipped. The number of
+members and the decompressed bytes are capped (settings.archive_*) to stop
+zip bombs; sizes are counted as bytes are actually read, so a lying header
+doesn't get around the limits.
+
+Each member's text is kept separately with the set of terms it contains
+(index_terms), so a prompt can include just the members relevant to the
+question (select_members) instead of the whole archive.
+"""
+import gzip
+import logging
+import math
+import os
+import re
+import tarfile
+import zipfile
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from config.settings import settings
+from utils.file_extractor import _TextBuilder, extract_text_from_bytes, extract_text_from_file
+
+logger = logging.getLogger(__name__)
+
+# Summaries start with this, which lets stored texts be told apart cheaply
+SUMMARY_PREFIX = "Archive ("
+
+# Types that are never opened as archives (a .docx is a zip, but a document)
+_DOCUMENT_TYPES = {
+    'pdf', 'txt', 'text', 'plain', 'md', 'markdown', 'csv', 'json', 'xml', 'doc', 'msword', 'docx',
+    'vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+# Binary formats the extractors understand; everything else with a NUL byte is skipped
+_BINARY_DOCUMENTS = {'.pdf', '.docx'}
+_NESTED_ARCHIVES = {'.zip', '.tar', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.jar', '.whl'}
+_BINARY_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.webp', '.tif', '.tiff', '.psd',
+    '.mp3', '.wav', '.ogg', '.flac', '.mp4', '.mov', '.avi', '.mkv', '.webm',
+    '.exe', '.dll', '.so', '.dylib', '.o', '.a', '.class', '.pyc', '.bin', '.dat',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot', '.sqlite', '.db', '.doc', '.xls', '.ppt',
+}
+_SNIFF_BYTES = 8192
+
+_TERM = re.compile(r"\w{3,}")
+
+
+class ArchiveMember(NamedTuple):
+    """Extracted text of one archive member"""
+    name: str
+    size: int
+    text: str
+    terms: str
+
+
+class ArchiveText(NamedTuple):
+    """An extracted archive: a listing of every member, and member texts"""
+    summary: str
+    members: List[ArchiveMember]
+
+
+class _Limits:
+    """Member and decompressed-byte budget for one archive"""
+
+    def __init__(self, max_members: int, max_total_bytes: int, max_member_bytes: int):
+        self.max_members = max_members
+        self.max_total_bytes = max_total_bytes
+        self.max_member_bytes = max_member_bytes
+        self.members = 0
+        self.total = 0
+        self.stopped: Optional[str] = None
+
+    def add_member(self) -> bool:
+        self.members += 1
+        if self.max_members and self.members > self.max_members:
+            self.stopped = f"archive limit of {self.max_members} files reached"
+            return False
+        return True
+
+    def add_bytes(self, count: int) -> bool:
+        self.total += count
+        if self.max_total_bytes and self.total > self.max_total_bytes:
+            self.stopped = f"archive limit of {format_size(self.max_total_bytes)} decompressed reached"
+            return False
+        return True
+
+    def too_large(self, size: int) -> bool:
+        return bool(self.max_member_bytes) and size > self.max_member_bytes
+
+    def read_size(self) -> int:
+        """Bytes to read from the next member: one past what either limit allows"""
+        limit = self.max_member_bytes or math.inf
+        if self.max_total_bytes:
+            limit = min(limit, self.max_total_bytes - self.total)
+        return -1 if limit == math.inf else limit + 1
+
+
+def format_size(size: int) -> str:
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def archive_kind(file_path: str, file_type: Optional[str] = None) -> Optional[str]:
+    """
+    'zip', 'tar' or 'gzip' if the file's content is an archive, else None.
+    Files whose type names a document format are not inspected.
+    """
+    if file_type and file_type.split('/')[-1].lstrip('.').lower() in _DOCUMENT_TYPES:
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            magic = f.read(4)
+        if magic.startswith(b"PK") and zipfile.is_zipfile(file_path):
+            return 'zip'
+        if tarfile.is_tarfile(file_path):
+            return 'tar'
+        if magic.startswith(b"\x1f\x8b"):
+            return 'gzip'
+    except (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile) as e:
+        logger.debug(f"Could not inspect {file_path} for an archive: {e}")
+    return None
+
+
+def _skip_reason(name: str) -> Optional[str]:
+    ext = os.path.splitext(name)[1].lower()
+    if ext in _NESTED_ARCHIVES:
+        return "nested archive"
+    if ext in _BINARY_EXTENSIONS:
+        return "binary"
+    return None
+
+
+def _iter_zip(file_path: str, limits: _Limits) -> Iterator[Tuple[str, int, Optional[bytes], Optional[str]]]:
+    with zipfile.ZipFile(file_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if not limits.add_member():
+                return
+            reason = _skip_reason(info.filename)
+            if not reason and info.flag_bits & 0x1:
+                reason = "encrypted"
+            if not reason and limits.too_large(info.file_size):
+                reason = "too large"
+            if reason:
+                yield info.filename, info.file_size, None, reason
+                continue
+            try:
+                with archive.open(info) as member:
+                    data = member.read(limits.read_size())
+            except (zipfile.BadZipFile, NotImplementedError, RuntimeError, OSError, EOFError) as e:
+                logger.warning(f"Could not read archive member {info.filename}: {e}")
+                yield info.filename, info.file_size, None, "unreadable"
+                continue
+            if not limits.add_bytes(len(data)):
+                return
+            if limits.too_large(len(data)):
+                yield info.filename, len(data), None, "too large"
+            else:
+                yield info.filename, len(data), data, None
+
+
+def _iter_tar(file_path: str, limits: _Limits) -> Iterator[Tuple[str, int, Optional[bytes], Optional[str]]]:
+    # Stream mode reads the (possibly compressed) archive front to back once
+    with tarfile.open(file_path, mode="r|*") as archive:
+        for info in archive:
+            # Skipping a member in a stream still decompresses it, so every
+            # header and member counts against the byte limit
+            if not limits.add_bytes(tarfile.BLOCKSIZE + (info.size if info.isfile() else 0)):
+                return
+            if not info.isfile():
+                continue
+            if not limits.add_member():
+                return
+            reason = _skip_reason(info.name) or ("too large" if limits.too_large(info.size) else None)
+            if reason:
+                yield info.name, info.size, None, reason
+                continue
+            member = archive.extractfile(info)
+            yield info.name, info.size, member.read() if member else b"", None
+
+
+def _gzip_name(f) -> Optional[str]:
+    """Original file name from a gzip header, if recorded"""
+    header = f.read(10)
+    if len(header) < 10 or not header[3] & 0x08:  # FNAME
+        return None
+    if header[3] & 0x04:  # FEXTRA comes first
+        extra = f.read(2)
+        f.read(int.from_bytes(extra, "little"))
+    name = bytearray()
+    while len(name) < 1024:
+        char = f.read(1)
+        if not char or char == b"\0":
+            break
+        name += char
+    return os.path.basename(name.decode('latin-1')) or None
+
+
+def _iter_gzip(file_path: str, limits: _Limits) -> Iterator[Tuple[str, int, Optional[bytes], Optional[str]]]:
+    with open(file_path, 'rb') as raw:
+        name = _gzip_name(raw) or "content"
+        raw.seek(0)
+        limits.add_member()
+        if _skip_reason(name):
+            yield name, 0, None, _skip_reason(name)
+            return
+        with gzip.GzipFile(fileobj=raw) as member:
+            data = member.read(limits.read_size())
+        if not limits.add_bytes(len(data)):
+            return
+        if limits.too_large(len(data)):
+            yield name, len(data), None, "too large"
+        else:
+            yield name, len(data), data, None
+
+
+_READERS = {'zip': _iter_zip, 'tar': _iter_tar, 'gzip': _iter_gzip}
+
+
+def _looks_binary(name: str, data: bytes) -> bool:
+    if os.path.splitext(name)[1].lower() in _BINARY_DOCUMENTS:
+        return False
+    return b"\0" in data[:_SNIFF_BYTES]
+
+
+def _tokens(text: str) -> List[str]:
+    return _TERM.findall(text.lower())
+
+
+def index_terms(name: str, text: str) -> str:
+    """Distinct terms of a member's name and text, space-delimited for lookups"""
+    return " " + " ".join(sorted(set(_tokens(name)) | set(_tokens(text)))) + " "
+
+
+def extract_archive(
+    file_path: str,
+    kind: Optional[str] = None,
+    max_members: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    max_member_bytes: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> ArchiveText:
+    """
+    Extract the text of each supported member of an archive.
+
+    Args:
+        kind: 'zip', 'tar' or 'gzip' (detected from the content if omitted)
+        max_members, max_total_bytes, max_member_bytes: Limits
+            (default to settings.archive_*, 0 = none)
+        max_chars: Text budget per member (defaults to settings.extraction_max_chars)
+    """
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
+    limits = _Limits(
+        settings.archive_max_members if max_members is None else max_members,
+        settings.archive_max_total_bytes if max_total_bytes is None else max_total_bytes,
+        settings.archive_max_member_bytes if max_member_bytes is None else max_member_bytes
+    )
+    kind = kind or archive_kind(file_path)
+    if kind not in _READERS:
+        return ArchiveText("[Error: Not a supported archive]", [])
+
+    members = []
+    listing = []
+    try:
+        for name, size, data, reason in _READERS[kind](file_path, limits):
+            if data is not None and _looks_binary(name, data):
+                reason = "binary"
+            if reason is None:
+                text = extract_text_from_bytes(data, name).strip()
+                if max_chars:
+                    text = text[:max_chars]
+                if not text or text.startswith("[Error"):
+                    reason = "no text"
+            if reason:
+                listing.append(f"- {name} ({format_size(size)}, skipped: {reason})")
+                continue
+            listing.append(f"- {name} ({format_size(size)})")
+            members.append(ArchiveMember(name, size, text, index_terms(name, text)))
+    except Exception as e:
+        logger.error(f"Error reading archive {file_path}: {e}")
+        if not listing:
+            return ArchiveText(f"[Error: Could not read archive. File type: {kind}]", [])
+        limits.stopped = "the rest of the archive could not be read"
+
+    files = f"{len(listing)} file" + ("" if len(listing) == 1 else "s")
+    summary = [f"{SUMMARY_PREFIX}{kind}) with {files}, text extracted from {len(members)}:"]
+    summary += listing
+    if limits.stopped:
+        logger.warning(f"Stopped reading archive {file_path}: {limits.stopped}")
+        summary.append(f"[Stopped: {limits.stopped}]")
+    return ArchiveText("\n".join(summary), members)
+
+
+def _score(terms: str, query_terms: List[str], weights: dict) -> float:
+    return sum(weights[term] for term in query_terms if f" {term} " in terms)
+
+
+def select_members(query: Optional[str], members: Sequence[Tuple[str, int]], max_chars: int) -> List[int]:
+    """
+    Choose which members to include in a prompt.
+
+    Members sharing the rarest query terms come first (terms found in every
+    member carry no weight) and those scoring under half the best match are
+    left out; if nothing matches, members are taken in archive order.
+    Members are added while they fit the character budget.
+
+    Args:
+        members: (terms from index_terms(), text length) per member
+
+    Returns:
+        Indices of the chosen members, in archive order
+    """
+    order = list(range(len(members)))
+    query_terms = sorted(set(_tokens(query or "")))
+    if query_terms and members:
+        document_counts = {
+            term: sum(1 for terms, _ in members if f" {term} " in terms) for term in query_terms
+        }
+        weights = {
+            term: math.log((len(members) + 1) / (count + 1)) for term, count in document_counts.items()
+        }
+        scores = [_score(terms, query_terms, weights) for terms, _ in members]
+        best = max(scores)
+        if best > 0:
+            # Members that only share a common word or two with the question don't count
+            order = sorted((i for i in order if scores[i] >= best / 2), key=lambda i: -scores[i])
+
+    chosen = []
+    used = 0
+    for i in order:
+        length = members[i][1]
+        if max_chars and chosen and used + length > max_chars:
+            continue
+        chosen.append(i)
+        used += length
+        if max_chars and used >= max_chars:
+            break
+    return sorted(chosen)
+
+
+def format_archive(summary: str, members: Sequence[Tuple[str, str]], omitted: int = 0,
+                   max_chars: Optional[int] = None) -> str:
+    """Archive text for a prompt: the listing, then the (name, text) of each included member"""
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
+    builder = _TextBuilder(max_chars)
+    builder.add(summary)
+    if omitted:
+        builder.add(f"[{omitted} more files not included here; mention a file by name to see its content]")
+    for name, text in members:
+        if not builder.add(f"\n=== {name} ===\n{text}"):
+            break
+    return builder.text()
+
+
+def select_archive_text(archive: ArchiveText, query: Optional[str] = None, max_chars: Optional[int] = None) -> str:
+    """Prompt text for an in-memory ArchiveText, with the members relevant to query"""
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
+    chosen = select_members(query, [(m.terms, len(m.text)) for m in archive.members], max_chars)
+    return format_archive(
+        archive.summary,
+        [(archive.members[i].name, archive.members[i].text) for i in chosen],
+        omitted=len(archive.members) - len(chosen),
+        max_chars=max_chars
+    )
+
+
+def extract_text_from_archive(file_path: str, kind: Optional[str] = None) -> str:
+    """Text of an archive: the member listing followed by member texts, up to the text budget"""
+    return select_archive_text(extract_archive(file_path, kind))
+
+
+def extract_text_or_archive(file_path: str, file_type: Optional[str] = None):
+    """
+    extract_text_from_file(), except that archives come back as ArchiveText
+    with their members separate, ready to be indexed
+    """
+    kind = archive_kind(file_path, file_type)
+    if kind:
+        return extract_archive(file_path, kind)
+    return extract_text_from_file(file_path, file_type)
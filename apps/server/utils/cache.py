@@ -1,89 +1,426 @@
 """
 Simple in-memory cache for API keys and other frequently accessed data
 Cache expires after a configurable TTL to balance performance and security
+
+Entries are kept in LRU order and the cache can be bounded by entry count
+and/or approximate size in bytes; the least recently used entries are evicted
+first. Expired entries are removed on read and by an optional background
+sweeper, so keys that are never read again don't stay in memory.
+
+Entries can carry tags (e.g. the owning user); a tag index makes dropping a
+whole group cost O(entries in the group) instead of a scan of the cache.
+
+Caches implement CacheBackend. With CACHE_REDIS_URL set, the global caches
+are shared across workers (see utils/redis_cache.py); otherwise each process
+keeps its own SimpleCache.
 """
+import heapq
 import logging
+import sys
 import time
-from typing import Optional, Dict, Any
-from threading import Lock
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Set, Callable
+from threading import Lock, Thread, Event
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
-class SimpleCache:
-    """Thread-safe in-memory cache with TTL"""
+
+def _estimate_size(key: str, value: Any) -> int:
+    """Approximate memory footprint of an entry (shallow for containers)"""
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "tags")
+    
+    def __init__(self, value: Any, expires_at: float, size: int, tags: Tuple[str, ...] = ()):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+
+
+def _sweep_loop(cache_ref, interval: float, stop: Event):
+    # Holds only a weak reference so an unused cache can still be collected
+    while not stop.wait(interval):
+        cache = cache_ref()
+        if cache is None:
+            return
+        try:
+            cache.purge_expired()
+        except Exception as e:
+            logger.error(f"Cache sweep failed: {e}")
+        del cache
+
+
+class CacheBackend(ABC):
+    """Interface shared by the in-process and shared cache implementations"""
+    
+    default_ttl: int
+    
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+    
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()):
+        ...
+    
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+    
+    @abstractmethod
+    def delete_tag(self, tag: str) -> int:
+        ...
     
-    def __init__(self, default_ttl: int = 300):  # 5 minutes default TTL
-        self._cache: Dict[str, Dict[str, Any]] = {}
+    @abstractmethod
+    def clear(self):
+        ...
+    
+    @abstractmethod
+    def size(self) -> int:
+        ...
+    
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+    
+    def close(self):
+        pass
+
+
+class SimpleCache(CacheBackend):
+    """Thread-safe in-memory LRU cache with TTL"""
+    
+    def __init__(
+        self,
+        default_ttl: int = 300,  # 5 minutes default TTL
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sweep_interval: Optional[float] = None
+    ):
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        # (expires_at, key) min-heap for the sweeper; stale items are skipped
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._tags: Dict[str, Set[str]] = {}
         self._lock = Lock()
         self.default_ttl = default_ttl
+        self.max_entries = max_entries or None
+        self.max_bytes = max_bytes or None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._stop_sweeper = Event()
+        if sweep_interval:
+            Thread(
+                target=_sweep_loop,
+                args=(weakref.ref(self), sweep_interval, self._stop_sweeper),
+                name="cache-sweeper",
+                daemon=True
+            ).start()
+    
+    def __del__(self):
+        stop = getattr(self, "_stop_sweeper", None)
+        if stop is not None:
+            stop.set()
+    
+    def _remove(self, key: str) -> Optional[_Entry]:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._untag(key, entry)
+        return entry
+    
+    def _untag(self, key: str, entry: _Entry):
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if it exists and hasn't expired"""
         with self._lock:
-            if key not in self._cache:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
                 return None
             
-            entry = self._cache[key]
-            if time.time() > entry['expires_at']:
+            if time.time() > entry.expires_at:
                 # Entry expired, remove it
-                del self._cache[key]
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
                 return None
             
-            return entry['value']
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry.value
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """Set value in cache with optional custom TTL"""
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()):
+        """Set value in cache with optional custom TTL and group tags"""
         with self._lock:
             ttl = ttl if ttl is not None else self.default_ttl
-            self._cache[key] = {
-                'value': value,
-                'expires_at': time.time() + ttl
-            }
+            expires_at = time.time() + ttl
+            self._remove(key)
+            entry = _Entry(value, expires_at, _estimate_size(key, value), tuple(tags))
+            self._cache[key] = entry
+            self._bytes += entry.size
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            self._evict()
+            if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+                self._rebuild_heap()
+    
+    def _evict(self):
+        """Drop least recently used entries until within budget"""
+        while self._cache and (
+            (self.max_entries and len(self._cache) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key, entry = self._cache.popitem(last=False)
+            self._bytes -= entry.size
+            self._untag(key, entry)
+            self.evictions += 1
+    
+    def _rebuild_heap(self):
+        self._expiry_heap = [(entry.expires_at, key) for key, entry in self._cache.items()]
+        heapq.heapify(self._expiry_heap)
+    
+    def purge_expired(self) -> int:
+        """Remove every expired entry; returns how many were removed"""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                expires_at, key = heapq.heappop(heap)
+                entry = self._cache.get(key)
+                # Skip heap items left behind by overwritten or deleted keys
+                if entry is not None and entry.expires_at == expires_at:
+                    self._remove(key)
+                    removed += 1
+            self.expirations += removed
+        return removed
     
     def delete(self, key: str):
         """Delete key from cache"""
         with self._lock:
-            if key in self._cache:
-                del self._cache[key]
+            self._remove(key)
+    
+    def delete_tag(self, tag: str) -> int:
+        """Delete every entry carrying the tag; returns how many were removed"""
+        with self._lock:
+            keys = self._tags.pop(tag, ())
+            for key in list(keys):
+                self._remove(key)
+            return len(keys)
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Delete every key starting with prefix; returns how many were removed.
+        Scans the whole cache - prefer tags for anything on a request path.
+        """
+        with self._lock:
+            keys = [key for key in self._cache if key.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
     
     def clear(self):
         """Clear all cache entries"""
         with self._lock:
             self._cache.clear()
+            self._expiry_heap.clear()
+            self._tags.clear()
+            self._bytes = 0
     
     def size(self) -> int:
         """Get number of cache entries"""
         with self._lock:
             return len(self._cache)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss, eviction and expiry counters plus current usage"""
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._cache),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+    
+    def close(self):
+        """Stop the background sweeper"""
+        self._stop_sweeper.set()
+
+def _user_tag(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+# Named caches, so invalidations from other processes can find them
+_caches: Dict[str, CacheBackend] = {}
+
+# Called with (namespace, key, tag) after a local invalidation so it can be
+# forwarded to other processes (see database/invalidation.py)
+_invalidation_hooks: List[Callable[..., None]] = []
+
+
+def get_cache(namespace: str) -> Optional[CacheBackend]:
+    return _caches.get(namespace)
+
+
+def add_invalidation_hook(hook: Callable[..., None]):
+    if hook not in _invalidation_hooks:
+        _invalidation_hooks.append(hook)
+
+
+def remove_invalidation_hook(hook: Callable[..., None]):
+    if hook in _invalidation_hooks:
+        _invalidation_hooks.remove(hook)
+
+
+def _broadcast_invalidation(namespace: str, key: Optional[str] = None, tag: Optional[str] = None):
+    for hook in list(_invalidation_hooks):
+        try:
+            hook(namespace, key=key, tag=tag)
+        except Exception as e:
+            logger.warning(f"Cache invalidation broadcast failed for '{namespace}': {e}")
+
+
+def create_cache(namespace: str, default_ttl: int) -> CacheBackend:
+    """
+    Build a cache for the configured backend and register it under namespace.
+    Falls back to an in-process cache if the shared backend is unavailable.
+    """
+    cache = _build_cache(namespace, default_ttl)
+    _caches[namespace] = cache
+    return cache
+
+
+def _build_cache(namespace: str, default_ttl: int) -> CacheBackend:
+    local = SimpleCache(
+        default_ttl=default_ttl,
+        max_entries=settings.cache_max_entries,
+        max_bytes=settings.cache_max_bytes,
+        sweep_interval=settings.cache_sweep_interval
+    )
+    if not settings.cache_redis_url:
+        return local
+    try:
+        from utils.redis_cache import RedisCache, connect
+        return RedisCache(connect(settings.cache_redis_url), namespace, default_ttl=default_ttl, local=local)
+    except ImportError:
+        logger.warning("CACHE_REDIS_URL is set but the redis package is not installed; using a per-process cache")
+    except Exception as e:
+        logger.warning(f"Shared cache unavailable ({e}); using a per-process cache")
+    return local
+
 
 # Global cache instance for API keys
 # TTL of 10 minutes - balance between performance and security
 # API keys are decrypted on access, so caching decrypted keys for a short time is safe
-api_key_cache = SimpleCache(default_ttl=600)  # 10 minutes
+api_key_cache = create_cache("api_keys", default_ttl=600)  # 10 minutes
+
+# Custom integration settings looked up on every chat request
+integration_cache = create_cache("integrations", default_ttl=300)  # 5 minutes
+
+# Cached in place of a value to remember that it doesn't exist, so repeated
+# requests for a missing key/integration don't hit the database every time.
+# A plain string so it round-trips through every backend.
+MISSING = "__sharedlm_missing__"
+
+
+def is_missing(value: Any) -> bool:
+    """True if a cached value is a negative entry"""
+    return isinstance(value, str) and value == MISSING
+
 
 def get_cached_api_key(user_id: str, provider: str) -> Optional[str]:
-    """Get decrypted API key from cache"""
+    """
+    Get decrypted API key from cache.
+    Returns MISSING if the user is known to have no key for the provider.
+    """
     cache_key = f"api_key:{user_id}:{provider}"
     return api_key_cache.get(cache_key)
 
 def set_cached_api_key(user_id: str, provider: str, decrypted_key: str):
     """Store decrypted API key in cache"""
     cache_key = f"api_key:{user_id}:{provider}"
-    api_key_cache.set(cache_key, decrypted_key, ttl=600)  # 10 minutes
+    api_key_cache.set(cache_key, decrypted_key, ttl=600, tags=(_user_tag(user_id),))  # 10 minutes
+
+def set_api_key_missing(user_id: str, provider: str):
+    """Remember briefly that the user has no key for the provider"""
+    cache_key = f"api_key:{user_id}:{provider}"
+    api_key_cache.set(cache_key, MISSING, ttl=settings.cache_negative_ttl, tags=(_user_tag(user_id),))
 
 def clear_api_key_cache(user_id: str, provider: str = None):
     """Clear API key cache for user/provider combination"""
     if provider:
         cache_key = f"api_key:{user_id}:{provider}"
         api_key_cache.delete(cache_key)
+        _broadcast_invalidation("api_keys", key=cache_key)
     else:
         # Clear all keys for this user
-        # Note: This is a simple implementation - in production, consider using a more efficient structure
-        with api_key_cache._lock:
-            keys_to_delete = [
-                key for key in api_key_cache._cache.keys() 
-                if key.startswith(f"api_key:{user_id}:")
-            ]
-            for key in keys_to_delete:
-                del api_key_cache._cache[key]
+        api_key_cache.delete_tag(_user_tag(user_id))
+        _broadcast_invalidation("api_keys", tag=_user_tag(user_id))
+
+def get_cached_integration(user_id: str, provider_id: str) -> Optional[Any]:
+    """
+    Get a cached snapshot of a custom integration's connection settings.
+    Returns MISSING if the integration is known not to exist.
+    """
+    return integration_cache.get(f"integration:{user_id}:{provider_id}")
+
+def set_cached_integration(user_id: str, integration) -> SimpleNamespace:
+    """
+    Cache the fields chat needs from a custom integration.
+    A plain snapshot is stored (not the ORM object) so it outlives the session.
+    """
+    snapshot = SimpleNamespace(
+        id=integration.id,
+        name=integration.name,
+        provider_id=integration.provider_id,
+        base_url=integration.base_url,
+        api_type=integration.api_type,
+        is_active=integration.is_active
+    )
+    integration_cache.set(
+        f"integration:{user_id}:{integration.provider_id}",
+        snapshot,
+        tags=(_user_tag(user_id),)
+    )
+    return snapshot
+
+def set_integration_missing(user_id: str, provider_id: str):
+    """Remember briefly that the user has no such custom integration"""
+    integration_cache.set(
+        f"integration:{user_id}:{provider_id}",
+        MISSING,
+        ttl=settings.cache_negative_ttl,
+        tags=(_user_tag(user_id),)
+    )
+
+def clear_integration_cache(user_id: str):
+    """Clear all cached custom integrations for a user"""
+    integration_cache.delete_tag(_user_tag(user_id))
+    _broadcast_invalidation("integrations", tag=_user_tag(user_id))
 
+def clear_user_cache(user_id: str):
+    """Drop everything cached for a user (account deletion, credential changes)"""
+    clear_api_key_cache(user_id)
+    clear_integration_cache(user_id)
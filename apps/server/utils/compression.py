@@ -0,0 +1,62 @@
+"""
+Transparent compression for large text values stored in the database
+Bodies above a size threshold are zlib-compressed and base64-encoded so they
+still fit in a TEXT column; a separate encoding marker records how to read them.
+"""
+import base64
+import logging
+import zlib
+from typing import Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Marker stored alongside compressed values
+ENCODING_ZLIB = "zlib"
+
+
+def compress_text(value: str, threshold: Optional[int] = None, level: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    """
+    Compress a text value if it is large enough to be worth it.
+
+    Args:
+        value: Plain text
+        threshold: Minimum length (in characters) to compress; 0 disables compression
+        level: zlib compression level
+
+    Returns:
+        (stored_value, encoding) - encoding is None when the value is stored as-is
+    """
+    threshold = settings.message_compression_threshold if threshold is None else threshold
+    level = settings.message_compression_level if level is None else level
+
+    if not value or threshold <= 0 or len(value) < threshold:
+        return value, None
+
+    raw = value.encode("utf-8")
+    compressed = base64.b64encode(zlib.compress(raw, level)).decode("ascii")
+    # Incompressible input (already compressed data, random tokens) stays plain
+    if len(compressed) >= len(raw):
+        return value, None
+    return compressed, ENCODING_ZLIB
+
+
+def decompress_text(stored: str, encoding: Optional[str]) -> str:
+    """Reverse compress_text()"""
+    if not encoding or stored is None:
+        return stored
+    if encoding == ENCODING_ZLIB:
+        return zlib.decompress(base64.b64decode(stored)).decode("utf-8")
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def sqlite_message_text(stored, encoding):
+    """
+    decompress_text() for the SQLite full-text index.
+    Never raises - it runs inside ORM flushes, where an exception would abort the write.
+    """
+    try:
+        return decompress_text(stored, encoding)
+    except Exception as e:
+        logger.error(f"Failed to decompress stored text ({encoding}): {e}")
+        return stored
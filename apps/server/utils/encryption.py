@@ -1,13 +1,35 @@
-"""Encryption utilities for API keys"""
-from cryptography.fernet import Fernet
+"""Encryption utilities for API keys
+
+ENCRYPTION_KEY encrypts everything new. Keys being rotated out go in
+ENCRYPTION_PREVIOUS_KEYS (comma separated) so existing rows still decrypt;
+decrypt_and_rotate() re-encrypts them with the current key as they are read.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from config.settings import settings
 
-def get_cipher():
-    """Get Fernet cipher for encryption/decryption"""
+
+@lru_cache(maxsize=4)
+def _build_ciphers(encryption_key: str, previous_keys: str) -> Tuple[Fernet, MultiFernet]:
+    primary = Fernet(encryption_key.encode())
+    previous = [Fernet(key.strip().encode()) for key in previous_keys.split(",") if key.strip()]
+    return primary, MultiFernet([primary] + previous)
+
+
+def _ciphers() -> Tuple[Fernet, MultiFernet]:
     encryption_key = settings.encryption_key
     if not encryption_key:
         raise ValueError("ENCRYPTION_KEY not set in environment variables")
-    return Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
+    if isinstance(encryption_key, bytes):
+        encryption_key = encryption_key.decode()
+    # Cached per key configuration, so changing settings takes effect immediately
+    return _build_ciphers(encryption_key, settings.encryption_previous_keys or "")
+
+
+def get_cipher() -> MultiFernet:
+    """Get the (cached) cipher for encryption/decryption"""
+    return _ciphers()[1]
 
 def encrypt_key(api_key: str) -> str:
     """Encrypt API key"""
@@ -19,3 +41,20 @@ def decrypt_key(encrypted_key: str) -> str:
     cipher = get_cipher()
     return cipher.decrypt(encrypted_key.encode()).decode()
 
+def decrypt_and_rotate(encrypted_key: str) -> Tuple[str, Optional[str]]:
+    """
+    Decrypt a value and report whether it needs re-encrypting.
+
+    Returns:
+        (plaintext, new_token) - new_token is None when the value is already
+        encrypted with the current key, otherwise the value re-encrypted
+    """
+    primary, cipher = _ciphers()
+    token = encrypted_key.encode()
+    try:
+        return primary.decrypt(token).decode(), None
+    except InvalidToken:
+        pass
+    # Raises InvalidToken if no configured key matches
+    plaintext = cipher.decrypt(token)
+    return plaintext.decode(), primary.encrypt(plaintext).decode()
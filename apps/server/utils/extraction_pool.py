@@ -0,0 +1,185 @@
+"""
+Document extraction in a separate process pool
+
+PDF/DOCX parsing is CPU-bound and some files take pathologically long, so it
+runs in a small pool of worker processes instead of on the event loop. At most
+``extraction_workers`` files are parsed at once; each gets
+``extraction_timeout`` seconds (queueing time not included) and workers are
+started with an address-space limit of ``extraction_memory_mb``. Each worker
+is its own single-process executor running one file at a time, so a file
+that times out (or crashes its worker) only takes that worker down: it is
+killed and replaced while the other workers carry on with their files.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Set
+from config.settings import settings
+from utils.file_extractor import extract_text_from_file
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker(memory_limit_bytes: int):
+    if memory_limit_bytes and resource is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+        except (ValueError, OSError) as e:
+            logger.warning(f"Could not limit extraction worker memory: {e}")
+
+
+class ExtractionPool:
+    """Bounded set of worker processes that can kill runaway tasks"""
+
+    def __init__(self, workers: int, timeout: float, memory_mb: int = 0):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_limit_bytes = memory_mb * 1024 * 1024 if memory_mb > 0 else 0
+        self.timeouts = 0
+        self.restarts = 0
+        self._lock = threading.Lock()
+        # Workers waiting for a file, and every live worker
+        self._idle: List[ProcessPoolExecutor] = []
+        self._all: Set[ProcessPoolExecutor] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _checkout(self) -> ProcessPoolExecutor:
+        """An idle worker, or a new one (callers hold a slot, so there are at most `workers`)"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            worker = ProcessPoolExecutor(
+                max_workers=1,
+                # Never fork: the server runs background threads (cache
+                # sweepers, invalidation listeners) that must not be copied
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_bytes,)
+            )
+            self._all.add(worker)
+            return worker
+
+    def _checkin(self, worker: ProcessPoolExecutor):
+        with self._lock:
+            if worker in self._all:
+                self._idle.append(worker)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._slots
+
+    def _kill(self, worker: ProcessPoolExecutor):
+        """Terminate one worker; the next file gets a fresh one"""
+        with self._lock:
+            self._all.discard(worker)
+            self.restarts += 1
+        for process in list((worker._processes or {}).values()):
+            process.terminate()
+        worker.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None):
+        """
+        Run fn(*args) in a worker process.
+
+        Raises:
+            asyncio.TimeoutError: If the call ran longer than the timeout
+                (its worker has been killed)
+            BrokenProcessPool: If the worker died, e.g. at the memory limit
+        """
+        timeout = self.timeout if timeout is None else timeout
+        async with self._get_slots():
+            worker = self._checkout()
+            try:
+                future = asyncio.get_running_loop().run_in_executor(worker, fn, *args)
+                result = await asyncio.wait_for(future, timeout=timeout or None)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._kill(worker)
+                raise
+            except (BrokenProcessPool, asyncio.CancelledError):
+                # A dead worker, or one still busy with a call nobody waits for
+                self._kill(worker)
+                raise
+            except BaseException:
+                # The call itself failed (or was cancelled); the worker is fine
+                self._checkin(worker)
+                raise
+            self._checkin(worker)
+            return result
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._all, self._idle = self._all, set(), []
+        for worker in workers:
+            worker.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[ExtractionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> Optional[ExtractionPool]:
+    """The shared pool, or None when process extraction is disabled"""
+    global _pool
+    if settings.extraction_workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool(
+                workers=settings.extraction_workers,
+                timeout=settings.extraction_timeout,
+                memory_mb=settings.extraction_memory_mb
+            )
+        return _pool
+
+
+def shutdown_extraction_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+async def extract_text_async(
+    file_path: str,
+    file_type: Optional[str] = None,
+    extractor: Callable = extract_text_from_file
+):
+    """
+    extract_text_from_file() without blocking the event loop.
+
+    Failures come back as "[Error: ...]" text like the extractor's own.
+
+    Args:
+        extractor: Module-level function called as extractor(file_path, file_type),
+            e.g. archive_extractor.extract_text_or_archive
+    """
+    pool = get_extraction_pool()
+    if pool is None:
+        # Still off the event loop, but without isolation or a time limit
+        return await asyncio.to_thread(extractor, file_path, file_type)
+    try:
+        return await pool.run(extractor, file_path, file_type)
+    except asyncio.TimeoutError:
+        logger.error(f"Text extraction timed out after {pool.timeout}s: {file_path}")
+        return "[Error: Text extraction timed out]"
+    except BrokenProcessPool:
+        # Typically the memory limit - the worker died mid-parse
+        logger.error(f"Text extraction worker crashed: {file_path}")
+        return "[Error: Text extraction failed]"
+    except MemoryError:
+        logger.error(f"Text extraction ran out of memory: {file_path}")
+        return "[Error: File too large to extract]"
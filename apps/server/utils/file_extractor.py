@@ -2,15 +2,137 @@
 Utility functions for extracting text content from various file types
 """
 import os
+import codecs
+import csv
+import io
+import json
 import logging
-from typing import Optional
+import math
+import mmap
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Tuple, Union
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Extractors take a file path, or the content itself as bytes (archive members)
+Source = Union[str, bytes]
+
+
+class _TextBuilder:
+    """Collects output lines up to a character budget"""
+    
+    def __init__(self, max_chars: int = 0):
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.full = False
+    
+    def add(self, line: str) -> bool:
+        """Append a line; returns False once the budget is used up"""
+        if self.full:
+            return False
+        # Length of the joined text, counting the newline before this line
+        length = self.length + (1 if self.parts else 0) + len(line)
+        if self.max_chars and length > self.max_chars:
+            room = max(0, self.max_chars - self.length - (1 if self.parts else 0))
+            if room:
+                self.parts.append(line[:room])
+            self.parts.append(f"[Truncated: text limit of {self.max_chars} characters reached]")
+            self.full = True
+            return False
+        self.parts.append(line)
+        self.length = length
+        return True
+    
+    def text(self) -> str:
+        return "\n".join(self.parts).strip()
+
+
+class _BytesMap(io.BytesIO):
+    """In-memory content with the parts of the mmap interface the extractors use"""
+    
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.data = data
+    
+    def find(self, sub: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        return self.data.find(sub, start, len(self.data) if end is None else end)
+    
+    def __getitem__(self, key):
+        return self.data[key]
+    
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+def _describe(source: Source) -> str:
+    """Name of a source for log messages"""
+    return source if isinstance(source, str) else f"<{len(source)} bytes>"
+
+
+@contextmanager
+def _mapped(file_path: Source):
+    """Read-only memory map of a file (None for an empty file)"""
+    if isinstance(file_path, bytes):
+        yield _BytesMap(file_path) if file_path else None
+        return
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield None
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _iter_lines(mapped) -> Iterator[str]:
+    """Decoded lines of a memory-mapped file, one at a time"""
+    for number, line in enumerate(iter(mapped.readline, b"")):
+        text = line.decode('utf-8', errors='ignore')
+        yield text.lstrip('\ufeff') if number == 0 else text
+
+
+def _normalize_file_type(file_path: str, file_type: Optional[str]) -> str:
+    # Determine file type from extension if not provided
+    if not file_type:
+        _, ext = os.path.splitext(file_path)
+        return ext.lower()
+    # Extract extension from MIME type if needed
+    if '/' in file_type:
+        return file_type.split('/')[-1]
+    return file_type
+
+
+def _extract(source: Source, file_type: str) -> str:
+    """Dispatch to the extractor for a normalized file type"""
+    if file_type in ['.txt', '.text', 'txt', 'text/plain']:
+        return extract_text_from_txt(source)
+    elif file_type in ['.pdf', 'pdf', 'application/pdf']:
+        return extract_text_from_pdf(source)
+    elif file_type in ['.docx', 'docx', 'vnd.openxmlformats-officedocument.wordprocessingml.document',
+                       'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
+        return extract_text_from_docx(source)
+    elif file_type in ['.doc', 'doc', 'msword', 'application/msword']:
+        return extract_text_from_doc(source)
+    elif file_type in ['.md', 'md', 'markdown', 'text/markdown']:
+        return extract_text_from_txt(source)  # Markdown is plain text
+    elif file_type in ['.csv', 'csv', 'text/csv']:
+        return extract_text_from_csv(source)
+    elif file_type in ['.json', 'json', 'application/json']:
+        return extract_text_from_json(source)
+    elif file_type in ['.xml', 'xml', 'application/xml', 'text/xml']:
+        return extract_text_from_xml(source)
+    else:
+        logger.warning(f"Unsupported file type: {file_type}. Attempting to read as text.")
+        return extract_text_from_txt(source)
+
 
 def extract_text_from_file(file_path: str, file_type: Optional[str] = None) -> str:
     """
     Extract text content from a file based on its extension or MIME type.
+    Archives (zip/tar/gzip) are recognised by content, see utils.archive_extractor.
     
     Args:
         file_path: Path to the file
@@ -23,39 +145,35 @@ def extract_text_from_file(file_path: str, file_type: Optional[str] = None) -> s
         logger.error(f"File not found: {file_path}")
         return ""
     
-    # Determine file type from extension if not provided
-    if not file_type:
-        _, ext = os.path.splitext(file_path)
-        file_type = ext.lower()
-    else:
-        # Extract extension from MIME type if needed
-        if '/' in file_type:
-            file_type = file_type.split('/')[-1]
-    
+    file_type = _normalize_file_type(file_path, file_type)
     try:
-        # Handle different file types
-        if file_type in ['.txt', '.text', 'txt', 'text/plain']:
-            return extract_text_from_txt(file_path)
-        elif file_type in ['.pdf', 'pdf', 'application/pdf']:
-            return extract_text_from_pdf(file_path)
-        elif file_type in ['.docx', 'docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-            return extract_text_from_docx(file_path)
-        elif file_type in ['.doc', 'doc', 'application/msword']:
-            return extract_text_from_doc(file_path)
-        elif file_type in ['.md', 'md', 'markdown', 'text/markdown']:
-            return extract_text_from_txt(file_path)  # Markdown is plain text
-        elif file_type in ['.csv', 'csv', 'text/csv']:
-            return extract_text_from_csv(file_path)
-        else:
-            logger.warning(f"Unsupported file type: {file_type}. Attempting to read as text.")
-            return extract_text_from_txt(file_path)
+        from utils.archive_extractor import archive_kind, extract_text_from_archive
+        kind = archive_kind(file_path, file_type)
+        if kind:
+            return extract_text_from_archive(file_path, kind)
+        return _extract(file_path, file_type)
     except Exception as e:
         logger.error(f"Error extracting text from {file_path}: {e}")
         return f"[Error: Could not extract text from file. File type: {file_type}]"
 
 
-def extract_text_from_txt(file_path: str) -> str:
+def extract_text_from_bytes(data: bytes, filename: str) -> str:
+    """
+    Extract text from in-memory content, choosing the extractor by the
+    filename's extension (used for archive members)
+    """
+    file_type = _normalize_file_type(filename, None)
+    try:
+        return _extract(data, file_type)
+    except Exception as e:
+        logger.error(f"Error extracting text from {filename}: {e}")
+        return f"[Error: Could not extract text from file. File type: {file_type}]"
+
+
+def extract_text_from_txt(file_path: Source) -> str:
     """Extract text from plain text files"""
+    if isinstance(file_path, bytes):
+        return file_path.decode('utf-8', errors='ignore')
     try:
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
             return f.read()
@@ -64,40 +182,174 @@ def extract_text_from_txt(file_path: str) -> str:
         return ""
 
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF files"""
+def parse_page_range(spec: str, page_count: int) -> List[int]:
+    """
+    Turn a page selection like "1-3,7,10-" into 0-based page indices.
+    Pages are 1-based and inclusive; pages past the end are dropped.
+    """
+    indices = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, _, last = part.partition("-")
+            start = int(first) if first.strip() else 1
+            end = int(last) if last.strip() else page_count
+        else:
+            start = end = int(part)
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range: {part}")
+        indices.extend(range(start - 1, min(end, page_count)))
+    return indices
+
+
+def iter_pdf_pages(file_path: Source, pages: Optional[str] = None, max_pages: int = 0) -> Iterator[str]:
+    """
+    Yield the text of each selected page, parsing one page at a time.
+    Stopping the iteration early skips parsing the remaining pages.
+    
+    Args:
+        pages: Optional page selection, e.g. "1-5,8" (see parse_page_range)
+        max_pages: Stop after this many pages (0 = no limit)
+    """
+    import PyPDF2
+    with (io.BytesIO(file_path) if isinstance(file_path, bytes) else open(file_path, 'rb')) as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        page_count = len(pdf_reader.pages)
+        indices = parse_page_range(pages, page_count) if pages else range(page_count)
+        for n, index in enumerate(indices):
+            if max_pages and n >= max_pages:
+                logger.info(f"Stopped PDF extraction at the {max_pages} page limit ({page_count} pages): {_describe(file_path)}")
+                return
+            yield pdf_reader.pages[index].extract_text() or ""
+
+
+def extract_text_from_pdf(
+    file_path: Source,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    pages: Optional[str] = None
+) -> str:
+    """
+    Extract text from PDF files
+    
+    Args:
+        max_pages: Page limit (defaults to settings.pdf_max_pages, 0 = none)
+        max_chars: Stop once this much text is collected
+            (defaults to settings.extraction_max_chars, 0 = none)
+        pages: Optional page selection, e.g. "1-5,8"
+    """
+    max_pages = settings.pdf_max_pages if max_pages is None else max_pages
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
     try:
-        import PyPDF2
-        text = ""
-        with open(file_path, 'rb') as f:
-            pdf_reader = PyPDF2.PdfReader(f)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text.strip()
+        builder = _TextBuilder(max_chars)
+        page_iter = iter_pdf_pages(file_path, pages=pages, max_pages=max_pages)
+        for page_text in page_iter:
+            if not builder.add(page_text):
+                page_iter.close()
+                break
+        return builder.text()
     except ImportError:
         logger.error("PyPDF2 is not installed. Please install it to extract PDF text.")
         return "[Error: PDF extraction requires PyPDF2 library]"
     except Exception as e:
-        logger.error(f"Error extracting text from PDF {file_path}: {e}")
+        logger.error(f"Error extracting text from PDF {_describe(file_path)}: {e}")
         return ""
 
 
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text from DOCX files"""
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P, _W_T, _W_TAB, _W_BR, _W_CR = (_WORD_NS + tag for tag in ("p", "t", "tab", "br", "cr"))
+_W_TBL, _W_TR, _W_TC, _W_BODY = (_WORD_NS + tag for tag in ("tbl", "tr", "tc", "body"))
+
+
+def iter_docx_blocks(file_path: Source) -> Iterator[str]:
+    """
+    Yield the paragraphs and table rows of a DOCX body in document order,
+    streaming word/document.xml out of the zip with iterparse. A table row
+    comes out as its cells joined with " | "; nested tables are flattened
+    into the enclosing cell.
+    """
+    # defusedxml refuses entity declarations (entity-expansion bombs) and
+    # external references; the stdlib parser would expand them
+    from defusedxml.ElementTree import iterparse
+    source = io.BytesIO(file_path) if isinstance(file_path, bytes) else file_path
+    with zipfile.ZipFile(source) as package, package.open("word/document.xml") as document:
+        runs = []    # One entry per open paragraph (text boxes nest them): its text so far
+        cells = []   # One entry per open table: cells of the current row so far
+        cell = []    # One entry per open cell: its paragraphs so far
+        body = None
+        for event, elem in iterparse(document, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == _W_P:
+                    runs.append([])
+                elif tag == _W_TBL:
+                    cells.append([])
+                elif tag == _W_TR and cells:
+                    cells[-1] = []
+                elif tag == _W_TC:
+                    cell.append([])
+                elif tag == _W_BODY:
+                    body = elem
+                continue
+            
+            if tag == _W_T and runs:
+                runs[-1].append(elem.text or "")
+            elif tag == _W_TAB and runs:
+                runs[-1].append("\t")
+            elif tag in (_W_BR, _W_CR) and runs:
+                runs[-1].append("\n")
+            elif tag == _W_P:
+                text = "".join(runs.pop())
+                if cell:
+                    if text:
+                        cell[-1].append(text)
+                else:
+                    yield text
+                    if body is not None:
+                        # Drop finished top-level blocks so memory stays flat
+                        body.clear()
+            elif tag == _W_TC and cell:
+                text = " ".join(cell.pop())
+                if cells:
+                    cells[-1].append(text)
+            elif tag == _W_TR and cells:
+                row = " | ".join(cells[-1])
+                if len(cells) > 1 and cell:
+                    cell[-1].append(row)
+                else:
+                    yield row
+            elif tag == _W_TBL and cells:
+                cells.pop()
+                if not cells and body is not None:
+                    body.clear()
+
+
+def extract_text_from_docx(file_path: Source, max_chars: Optional[int] = None) -> str:
+    """
+    Extract text from DOCX files: paragraphs and table rows in document order
+    
+    Args:
+        max_chars: Stop once this much text is collected
+            (defaults to settings.extraction_max_chars, 0 = none)
+    """
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
+    builder = _TextBuilder(max_chars)
+    blocks = iter_docx_blocks(file_path)
     try:
-        from docx import Document
-        doc = Document(file_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text.strip()
-    except ImportError:
-        logger.error("python-docx is not installed. Please install it to extract DOCX text.")
-        return "[Error: DOCX extraction requires python-docx library]"
+        for block in blocks:
+            if not builder.add(block):
+                break
+        return builder.text()
     except Exception as e:
-        logger.error(f"Error extracting text from DOCX {file_path}: {e}")
-        return ""
+        logger.error(f"Error extracting text from DOCX {_describe(file_path)}: {e}")
+        return builder.text()
+    finally:
+        blocks.close()
 
 
-def extract_text_from_doc(file_path: str) -> str:
+def extract_text_from_doc(file_path: Source) -> str:
     """Extract text from DOC files (legacy Word format)"""
     # DOC files are binary and harder to parse without external tools
     # For now, return a message indicating it's not supported
@@ -105,17 +357,287 @@ def extract_text_from_doc(file_path: str) -> str:
     return "[Note: Legacy .doc files are not supported. Please convert to .docx or .pdf format]"
 
 
-def extract_text_from_csv(file_path: str) -> str:
-    """Extract text from CSV files"""
+class _ColumnStats:
+    """Single-pass summary of one CSV column"""
+    
+    MAX_DISTINCT = 1000
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.empty = 0
+        self.numeric = 0
+        self.low = math.inf
+        self.high = -math.inf
+        self.total = 0.0
+        self.values = Counter()
+        self.overflow = False
+    
+    def add(self, value: str):
+        value = value.strip()
+        if not value:
+            self.empty += 1
+            return
+        self.count += 1
+        # Only all-numeric columns get numeric stats, so stop parsing after the first miss
+        if self.numeric == self.count - 1:
+            try:
+                number = float(value)
+            except ValueError:
+                number = math.nan
+            if math.isfinite(number):
+                self.numeric += 1
+                if number < self.low:
+                    self.low = number
+                if number > self.high:
+                    self.high = number
+                self.total += number
+        # Bounded distinct tracking; past the cap only known values are counted
+        if value in self.values or not self.overflow:
+            self.values[value] += 1
+            if len(self.values) >= self.MAX_DISTINCT:
+                self.overflow = True
+    
+    def describe(self) -> str:
+        if not self.count:
+            return f"- {self.name}: empty"
+        empty = f", {self.empty} empty" if self.empty else ""
+        if self.numeric == self.count:
+            return (f"- {self.name}: numeric, min {self.low:g}, max {self.high:g}, "
+                    f"mean {self.total / self.count:g}{empty}")
+        distinct = f"{len(self.values)}{'+' if self.overflow else ''}"
+        common = ", ".join(f"{v[:40]} ({n})" for v, n in self.values.most_common(3) if n > 1)
+        return (f"- {self.name}: text, {distinct} distinct values{empty}"
+                + (f", most common: {common}" if common else ""))
+
+
+def extract_text_from_csv(file_path: Source, max_rows: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    """
+    Extract text from CSV files: a per-column summary over every row,
+    followed by the rows themselves up to the row and character limits
+    """
+    max_rows = settings.extraction_max_rows if max_rows is None else max_rows
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
     try:
-        import csv
-        text_lines = []
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            csv_reader = csv.reader(f)
+        with _mapped(file_path) as mapped:
+            if mapped is None:
+                return ""
+            csv_reader = csv.reader(_iter_lines(mapped))
+            header = next(csv_reader, None)
+            if not header:
+                return ""
+            header = [name.strip() or f"column {i + 1}" for i, name in enumerate(header)]
+            columns = [_ColumnStats(name) for name in header]
+            rows = _TextBuilder(max_chars)
+            rows.add(", ".join(header))
+            row_count = 0
             for row in csv_reader:
-                text_lines.append(", ".join(row))
-        return "\n".join(text_lines)
+                if not row:
+                    continue
+                row_count += 1
+                for column, value in zip(columns, row):
+                    column.add(value)
+                if not max_rows or row_count <= max_rows:
+                    rows.add(", ".join(row))
+        
+        summary = [f"CSV with {row_count} rows and {len(header)} columns", "Columns:"]
+        summary += [column.describe() for column in columns]
+        if max_rows and row_count > max_rows and not rows.full:
+            rows.add(f"[Truncated: showing the first {max_rows} of {row_count} rows]")
+        return "\n".join(summary) + "\n\n" + rows.text()
     except Exception as e:
-        logger.error(f"Error extracting text from CSV {file_path}: {e}")
+        logger.error(f"Error extracting text from CSV {_describe(file_path)}: {e}")
         return ""
 
+
+class _JsonStream:
+    """Parses JSON values one at a time from a memory-mapped file"""
+    
+    CHUNK_SIZE = 64 * 1024
+    WHITESPACE = " \t\r\n"
+    
+    def __init__(self, mapped):
+        self.mapped = mapped
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self) -> bool:
+        # Read at least as much as is buffered, so re-parsing a large value
+        # after each refill stays linear overall
+        data = self.mapped.read(max(self.CHUNK_SIZE, len(self.buffer) - self.pos))
+        text = self.decoder.decode(data, final=not data)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        if not data:
+            self.eof = True
+        return bool(data)
+    
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos] if self.pos < len(self.buffer) else ""
+    
+    def take(self) -> str:
+        char = self.peek()
+        self.pos += 1
+        return char
+    
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _is_json_lines(mapped, max_line: int = 1024 * 1024) -> bool:
+    """True if the first line is a complete JSON value with more content after it"""
+    end = mapped.find(b"\n", 0, max_line)
+    if end == -1:
+        return False
+    # Is there anything but whitespace after the first line?
+    pos = end
+    while pos < len(mapped) and not mapped[pos:pos + 65536].strip():
+        pos += 65536
+    if pos >= len(mapped):
+        return False
+    try:
+        json.loads(mapped[:end].decode('utf-8', errors='ignore').lstrip('\ufeff'))
+        return True
+    except ValueError:
+        return False
+
+
+def iter_json_items(file_path: Source) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    Yield the top-level items of a JSON file one at a time: (None, element)
+    for an array or JSON Lines, (key, value) for an object. Only one item is
+    held in memory at once.
+    """
+    with _mapped(file_path) as mapped:
+        if mapped is None:
+            return
+        stream = _JsonStream(mapped)
+        first = stream.peek()
+        if first in "[{" and not _is_json_lines(mapped):
+            stream.take()
+            close = "]" if first == "[" else "}"
+            if stream.peek() == close:
+                return
+            while True:
+                if first == "{":
+                    key = stream.value()
+                    if stream.take() != ":":
+                        raise ValueError("Expected ':' in JSON object")
+                    yield str(key), stream.value()
+                else:
+                    yield None, stream.value()
+                separator = stream.take()
+                if separator == close:
+                    return
+                if separator != ",":
+                    raise ValueError(f"Expected ',' or '{close}' in JSON")
+        else:
+            # JSON Lines, or a single scalar
+            while stream.peek():
+                yield None, stream.value()
+
+
+def _json_line(key: Optional[str], value: Any) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return f"{key}: {text}" if key is not None else text
+
+
+def extract_text_from_json(file_path: Source, max_rows: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    """Extract text from JSON files, one top-level item per line"""
+    max_rows = settings.extraction_max_rows if max_rows is None else max_rows
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
+    builder = _TextBuilder(max_chars)
+    count = 0
+    items = iter_json_items(file_path)
+    try:
+        for key, value in items:
+            if max_rows and count >= max_rows:
+                builder.add(f"[Truncated: showing the first {max_rows} items]")
+                break
+            count += 1
+            if not builder.add(_json_line(key, value)):
+                break
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.warning(f"Invalid JSON in {_describe(file_path)}, reading as text: {e}")
+        if not count:
+            return extract_text_from_txt(file_path)[:max_chars or None]
+    except Exception as e:
+        logger.error(f"Error extracting text from JSON {_describe(file_path)}: {e}")
+        return ""
+    finally:
+        items.close()
+    return builder.text()
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ""
+
+
+def extract_text_from_xml(file_path: Source, max_rows: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    """
+    Extract text from XML files as "path: text" lines, streaming with
+    iterparse and discarding each element once read. max_rows limits the
+    number of top-level records (children of the root element). Documents
+    declaring entities are refused (see iter_docx_blocks).
+    """
+    from defusedxml.ElementTree import iterparse
+    max_rows = settings.extraction_max_rows if max_rows is None else max_rows
+    max_chars = settings.extraction_max_chars if max_chars is None else max_chars
+    builder = _TextBuilder(max_chars)
+    try:
+        with _mapped(file_path) as mapped:
+            if mapped is None:
+                return ""
+            path = []
+            root = None
+            records = 0
+            for event, elem in iterparse(mapped, events=("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    elif len(path) == 1:
+                        records += 1
+                        if max_rows and records > max_rows:
+                            builder.add(f"[Truncated: showing the first {max_rows} records]")
+                            break
+                    path.append(_local_name(elem.tag))
+                    continue
+                
+                text = (elem.text or "").strip()
+                attributes = ", ".join(f"{_local_name(k)}={v}" for k, v in elem.attrib.items())
+                if text or attributes:
+                    label = "/".join(path[1:]) or path[0]
+                    if attributes:
+                        label += f" [{attributes}]"
+                    if not builder.add(f"{label}: {text}" if text else label):
+                        break
+                path.pop()
+                elem.clear()
+                if len(path) == 1:
+                    # Drop finished records so memory stays flat
+                    root.clear()
+        return builder.text()
+    except Exception as e:
+        logger.error(f"Error extracting text from XML {_describe(file_path)}: {e}")
+        return builder.text()
@@ -0,0 +1,138 @@
+"""
+Password hashing off the event loop
+
+bcrypt is slow on purpose (a few hundred milliseconds per hash or check at
+the default cost), so calling it from an async route stalls every other
+request on the worker. Routes await hash_password_async() and
+check_password_async() instead, which run bcrypt on a dedicated pool of
+``password_hash_workers`` threads (bcrypt releases the GIL while hashing).
+
+The pool is separate from the default executor used by asyncio.to_thread, so
+a burst of logins can't hold up file I/O, and its queue is bounded: once
+``password_hash_max_pending`` calls are waiting for a thread, further ones
+are refused with a 503 rather than queueing for seconds. Queue and run times
+are recorded for /health/auth.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+import bcrypt
+from fastapi import HTTPException
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Bounded thread pool for bcrypt calls, with queue-time metrics"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 64):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.calls = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.run_seconds = 0.0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+    def _timed(self, submitted: float, fn: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._in_flight -= 1
+                self.calls += 1
+                self.queue_seconds += started - submitted
+                self.max_queue_seconds = max(self.max_queue_seconds, started - submitted)
+                self.run_seconds += finished - started
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) on the pool.
+
+        Raises:
+            HTTPException: 503 if too many calls are already waiting
+        """
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many sign-in requests, please try again shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self._in_flight += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, time.perf_counter(), fn, *args
+            )
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        return await future
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "avg_queue_ms": round(self.queue_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+                "max_queue_ms": round(self.max_queue_seconds * 1000, 2),
+                "avg_run_ms": round(self.run_seconds / self.calls * 1000, 2) if self.calls else 0.0
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher: Optional[PasswordHasher] = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """The shared pool (created on first use)"""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher(
+                workers=settings.password_hash_workers,
+                max_pending=settings.password_hash_max_pending
+            )
+        return _hasher
+
+
+def shutdown_password_hasher():
+    global _hasher
+    with _hasher_lock:
+        hasher, _hasher = _hasher, None
+    if hasher is not None:
+        hasher.shutdown()
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password() without blocking the event loop"""
+    return await get_password_hasher().run(hash_password, password)
+
+
+async def check_password_async(password: str, password_hash: str) -> bool:
+    """check_password() without blocking the event loop"""
+    return await get_password_hasher().run(check_password, password, password_hash)
@@ -0,0 +1,239 @@
+"""
+Shared cache backend speaking the Redis protocol
+
+Entries live in Redis so every worker sees the same data. Each worker keeps a
+short-lived local copy (near cache) to avoid a network round trip per read.
+Writes and invalidations are broadcast on a pub/sub channel so other workers
+drop their local copies immediately; the near-cache TTL bounds staleness if a
+broadcast is missed.
+
+Values are encrypted with the application key before they leave the process,
+since the API key cache holds decrypted credentials.
+"""
+import json
+import logging
+import uuid
+import weakref
+from types import SimpleNamespace
+from threading import Event, Thread
+from typing import Any, Dict, Iterable, Optional
+from config.settings import settings
+from utils.cache import CacheBackend, SimpleCache
+from utils.encryption import encrypt_key, decrypt_key
+
+logger = logging.getLogger(__name__)
+
+
+def connect(url: str):
+    """Create a Redis client for the URL (requires the redis package)"""
+    import redis
+    client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+    client.ping()
+    return client
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, SimpleNamespace):
+        return {"__namespace__": {k: _encode(v) for k, v in vars(value).items()}}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"__namespace__"}:
+            return SimpleNamespace(**{k: _decode(v) for k, v in value["__namespace__"].items()})
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def _text(data) -> str:
+    return data.decode("utf-8") if isinstance(data, bytes) else data
+
+
+def _listen(cache_ref, pubsub, stop: Event):
+    # Holds only a weak reference so an unused cache can still be collected
+    while not stop.is_set():
+        try:
+            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener error: {e}")
+            stop.wait(1.0)
+            continue
+        if not message or message.get("type") != "message":
+            continue
+        cache = cache_ref()
+        if cache is None:
+            break
+        cache._apply_invalidation(message["data"])
+        del cache
+    try:
+        pubsub.close()
+    except Exception:
+        pass
+
+
+class RedisCache(CacheBackend):
+    """Cache shared between workers through Redis, with a local near cache"""
+
+    def __init__(
+        self,
+        client,
+        namespace: str,
+        default_ttl: int = 300,
+        local: Optional[SimpleCache] = None,
+        near_ttl: Optional[int] = None
+    ):
+        self.client = client
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.local = local or SimpleCache(default_ttl=default_ttl)
+        self.near_ttl = settings.cache_near_ttl if near_ttl is None else near_ttl
+        self.channel = f"sharedlm:cache:{namespace}:invalidate"
+        self.origin = uuid.uuid4().hex
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.errors = 0
+
+        self._stop_listener = Event()
+        pubsub = client.pubsub()
+        pubsub.subscribe(self.channel)
+        Thread(
+            target=_listen,
+            args=(weakref.ref(self), pubsub, self._stop_listener),
+            name=f"cache-invalidation-{namespace}",
+            daemon=True
+        ).start()
+
+    def __del__(self):
+        stop = getattr(self, "_stop_listener", None)
+        if stop is not None:
+            stop.set()
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"cache:{self.namespace}:tag:{tag}"
+
+    def _error(self, action: str, e: Exception):
+        self.errors += 1
+        logger.warning(f"Shared cache {action} failed for '{self.namespace}': {e}")
+
+    def _publish(self, op: str, **fields):
+        try:
+            self.client.publish(self.channel, json.dumps({"op": op, "origin": self.origin, **fields}))
+        except Exception as e:
+            self._error("broadcast", e)
+
+    def _apply_invalidation(self, data):
+        """Apply an invalidation broadcast by another worker to the local copy"""
+        try:
+            message = json.loads(_text(data))
+        except (TypeError, ValueError):
+            logger.warning("Ignoring malformed cache invalidation message")
+            return
+        if message.get("origin") == self.origin:
+            return
+        op = message.get("op")
+        if op == "delete":
+            self.local.delete(message["key"])
+        elif op == "tag":
+            self.local.delete_tag(message["tag"])
+        elif op == "clear":
+            self.local.clear()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        try:
+            stored = self.client.get(self._key(key))
+        except Exception as e:
+            self._error("read", e)
+            return None
+        if stored is None:
+            self.shared_misses += 1
+            return None
+        try:
+            payload = json.loads(decrypt_key(_text(stored)))
+        except Exception as e:
+            # Written with another key or corrupted - treat as a miss
+            self._error("decode", e)
+            return None
+        self.shared_hits += 1
+        value = _decode(payload["v"])
+        self.local.set(key, value, ttl=min(self.near_ttl, self.default_ttl), tags=payload.get("t", ()))
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()):
+        ttl = ttl if ttl is not None else self.default_ttl
+        tags = tuple(tags)
+        self.local.set(key, value, ttl=min(self.near_ttl, ttl), tags=tags)
+        try:
+            payload = encrypt_key(json.dumps({"v": _encode(value), "t": list(tags)}))
+            name = self._key(key)
+            self.client.set(name, payload, ex=max(int(ttl), 1))
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                self.client.sadd(tag_key, name)
+                # Tag sets live as long as their newest entry
+                self.client.expire(tag_key, max(int(ttl), 1))
+        except Exception as e:
+            self._error("write", e)
+            return
+        # Other workers may hold the previous value
+        self._publish("delete", key=key)
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        try:
+            self.client.delete(self._key(key))
+        except Exception as e:
+            self._error("delete", e)
+        self._publish("delete", key=key)
+
+    def delete_tag(self, tag: str) -> int:
+        removed = self.local.delete_tag(tag)
+        try:
+            tag_key = self._tag_key(tag)
+            names = list(self.client.smembers(tag_key))
+            self.client.delete(*names, tag_key)
+            removed = len(names)
+        except Exception as e:
+            self._error("delete", e)
+        self._publish("tag", tag=tag)
+        return removed
+
+    def clear(self):
+        self.local.clear()
+        try:
+            names = list(self.client.scan_iter(match=f"cache:{self.namespace}:*"))
+            if names:
+                self.client.delete(*names)
+        except Exception as e:
+            self._error("clear", e)
+        self._publish("clear")
+
+    def size(self) -> int:
+        """Entries held in this worker's near cache"""
+        return self.local.size()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "namespace": self.namespace,
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+            "errors": self.errors,
+            "local": self.local.stats(),
+        }
+
+    def close(self):
+        self._stop_listener.set()
+        self.local.close()
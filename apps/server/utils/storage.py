@@ -0,0 +1,581 @@
+"""
+Storage backends for uploaded file content
+
+Blob content is addressed by key (database.blobs.blob_path). The backend is
+chosen with STORAGE_BACKEND:
+
+- ``local``: files under the working directory, keyed by relative path.
+  Only usable by a single app node.
+- ``s3``: any S3-compatible object store (AWS S3, MinIO, R2, ...), shared by
+  all nodes. Requires the boto3 package. Remote blobs are read through a
+  local cache of recently used files (CachedStorage), since the extractors
+  need a file on disk and the same documents are read on every chat turn.
+
+Uploads are still spooled to local disk first (utils.uploads) because the
+key depends on the content hash; store_file() then hands the file over.
+Blobs are immutable - new content always gets a new key - so cached copies
+never go stale.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import BinaryIO, Callable, Iterator, NamedTuple, Optional
+from config.settings import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: cached files are only protected within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_COPY_CHUNK = 1024 * 1024
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified: float  # Unix timestamp
+
+
+class LocalCopy:
+    """
+    A local file with the content of a key (see StorageBackend.local_file).
+    The file is kept until close(); use as a context manager.
+    """
+
+    def __init__(self, path: str, release: Optional[Callable[[], None]] = None):
+        self.path = path
+        self._release = release
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __enter__(self) -> "LocalCopy":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StorageBackend(ABC):
+    """Interface for blob storage drivers"""
+
+    @abstractmethod
+    def put(self, key: str, stream: BinaryIO):
+        """Store the content of a readable binary stream under key"""
+
+    def put_file(self, key: str, path: str):
+        """Store a local file under key, leaving the file in place"""
+        with open(path, 'rb') as f:
+            self.put(key, f)
+
+    def store_file(self, key: str, path: str):
+        """Store a local file under key and take it over (it is moved or deleted)"""
+        self.put_file(key, path)
+        os.remove(path)
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Stream the content of key; the caller closes it"""
+
+    @abstractmethod
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        """Up to length bytes of key starting at offset start"""
+
+    def download(self, key: str, path: str):
+        """Copy the content of key to a local file"""
+        with self.open(key) as source, open(path, 'wb') as target:
+            shutil.copyfileobj(source, target, _COPY_CHUNK)
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove key; missing keys are ignored"""
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """
+        Path of a local file with the content of key, e.g. for the extractors
+
+        Raises:
+            FileNotFoundError: If key doesn't exist
+        """
+
+    def local_file(self, key: str) -> LocalCopy:
+        """
+        local_path(), with the file kept in place until the returned copy is
+        closed. Use this when the file is read after the call returns.
+
+        Raises:
+            FileNotFoundError: If key doesn't exist
+        """
+        return LocalCopy(self.local_path(key))
+
+    @abstractmethod
+    def list(self, prefix: str, start_after: str = "") -> Iterator[StoredObject]:
+        """Keys under the directory prefix in ascending order, starting after start_after"""
+
+
+class LocalStorage(StorageBackend):
+    """Files on this machine; keys are paths relative to root"""
+
+    def __init__(self, root: str = ""):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put(self, key: str, stream: BinaryIO):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".put-", suffix=".part", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(stream, f, _COPY_CHUNK)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def store_file(self, key: str, path: str):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        os.replace(path, target)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), 'rb')
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            return f.read(length)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> str:
+        path = self._path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path
+
+    def list(self, prefix: str, start_after: str = "") -> Iterator[StoredObject]:
+        # One directory in memory at a time. Entries are visited in the
+        # order their full keys sort in (a directory sorts as name + sep),
+        # so subtrees entirely before start_after are skipped unread.
+        try:
+            entries = list(os.scandir(self._path(prefix)))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        is_dir = {entry.name: entry.is_dir(follow_symlinks=False) for entry in entries}
+        entries.sort(key=lambda entry: entry.name + (os.sep if is_dir[entry.name] else ""))
+        for entry in entries:
+            key = os.path.join(prefix, entry.name)
+            if is_dir[entry.name]:
+                if key + os.sep > start_after or start_after.startswith(key + os.sep):
+                    yield from self.list(key, start_after)
+            elif key > start_after and entry.is_file(follow_symlinks=False):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield StoredObject(key, stat.st_size, stat.st_mtime)
+
+
+def _not_found(error: Exception) -> bool:
+    # botocore ClientError, without importing botocore
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible object store; keys are object keys under prefix"""
+
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        """
+        Args:
+            client: boto3 S3 client (see connect_s3), or anything with the same methods
+        """
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def put(self, key: str, stream: BinaryIO):
+        # Managed transfer: large streams go up as a multipart upload in chunks
+        self.client.upload_fileobj(stream, self.bucket, self._key(key))
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except Exception as e:
+            if _not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self._key(key), Range=f"bytes={start}-{start + length - 1}"
+            )
+        except Exception as e:
+            if _not_found(e):
+                raise FileNotFoundError(key) from e
+            if getattr(e, "response", {}).get("Error", {}).get("Code") == "InvalidRange":
+                return b""  # Starts past the end
+            raise
+        with response["Body"] as body:
+            return body.read()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except Exception as e:
+            if _not_found(e):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except Exception as e:
+            if _not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def local_path(self, key: str) -> str:
+        raise NotImplementedError("S3Storage has no local files; read it through CachedStorage")
+
+    def list(self, prefix: str, start_after: str = "") -> Iterator[StoredObject]:
+        params = {"Bucket": self.bucket, "Prefix": self._key(prefix.rstrip("/") + "/")}
+        if start_after:
+            params["StartAfter"] = self._key(start_after)
+        while True:
+            page = self.client.list_objects_v2(**params)
+            for item in page.get("Contents", []):
+                yield StoredObject(item["Key"][len(self.prefix):], item["Size"], item["LastModified"].timestamp())
+            if not page.get("IsTruncated"):
+                return
+            params["ContinuationToken"] = page["NextContinuationToken"]
+
+
+class CachedStorage(StorageBackend):
+    """
+    Read-through cache of a remote backend on local disk.
+
+    local_file() downloads a blob on first use and serves it from the cache
+    afterwards; uploads keep their spooled file as the cached copy. The
+    least recently used files are evicted once the cache is over max_bytes,
+    except files still in use through local_file().
+    The cache directory can be shared by all worker processes on a node.
+    Each process tracks the files it has used, and (on POSIX) files in use
+    hold a shared lock that other processes' eviction respects.
+    """
+
+    def __init__(self, remote: StorageBackend, cache_dir: str, max_bytes: int):
+        self.remote = remote
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Cache path -> size, least recently used first; read from disk on first use
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+        self._pins = Counter()
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest())
+
+    def _load_index(self):
+        # Caller holds the lock. Files left by earlier runs, oldest first
+        if self._index is not None:
+            return
+        entries = []
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        except FileNotFoundError:
+            pass
+        self._index = OrderedDict((path, size) for _, path, size in sorted(entries))
+        self._total = sum(self._index.values())
+
+    def _used(self, path: str, size: int):
+        """Record path as the most recently used file"""
+        with self._lock:
+            self._load_index()
+            self._total += size - self._index.pop(path, 0)
+            self._index[path] = size
+
+    def _forget(self, path: str):
+        # Caller holds the lock
+        if self._index is not None:
+            self._total -= self._index.pop(path, 0)
+
+    def _cached(self, key: str) -> Optional[str]:
+        path = self._cache_path(key)
+        try:
+            os.utime(path)  # Keeps the order for the next process that loads the index
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(path)
+            return None
+        self._used(path, size)
+        return path
+
+    def _evict(self):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            self._load_index()
+            for path in list(self._index):
+                if self._total <= self.max_bytes:
+                    break
+                if not self._pins[path] and _remove_unused(path):
+                    self._forget(path)
+
+    def _temp_file(self) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".fetch-", suffix=".part", dir=self.cache_dir)
+        os.close(fd)
+        return temp_path
+
+    def put(self, key: str, stream: BinaryIO):
+        self.remote.put(key, stream)
+
+    def store_file(self, key: str, path: str):
+        self.remote.put_file(key, path)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        size = os.path.getsize(path)
+        cache_path = self._cache_path(key)
+        try:
+            os.replace(path, cache_path)
+        except OSError:
+            # e.g. the spool directory is on another filesystem
+            os.remove(path)
+            return
+        self._used(cache_path, size)
+        self._evict()
+
+    def open(self, key: str) -> BinaryIO:
+        path = self._cached(key)
+        if path:
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                pass  # Evicted meanwhile
+        return self.remote.open(key)
+
+    def read_range(self, key: str, start: int, length: int) -> bytes:
+        # Ranges of uncached blobs go straight to the remote rather than
+        # pulling in the whole file
+        path = self._cached(key)
+        if path is not None:
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    return f.read(length)
+            except FileNotFoundError:
+                pass  # Evicted meanwhile
+        return self.remote.read_range(key, start, length)
+
+    def exists(self, key: str) -> bool:
+        return self.remote.exists(key)
+
+    def size(self, key: str) -> int:
+        path = self._cached(key)
+        return os.path.getsize(path) if path else self.remote.size(key)
+
+    def delete(self, key: str):
+        self.remote.delete(key)
+        path = self._cache_path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._forget(path)
+
+    def list(self, prefix: str, start_after: str = "") -> Iterator[StoredObject]:
+        return self.remote.list(prefix, start_after)
+
+    def _open_cached(self, path: str) -> Optional[BinaryIO]:
+        """Open and share-lock a cached file; None if it isn't cached"""
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_SH)
+            # Another process may have evicted it between open and lock
+            try:
+                current = os.path.samestat(os.fstat(handle.fileno()), os.stat(path))
+            except FileNotFoundError:
+                current = False
+            if not current:
+                handle.close()
+                return None
+        return handle
+
+    def _download(self, key: str, path: str) -> BinaryIO:
+        """Fetch key into the cache, returning the file open and share-locked"""
+        temp_path = self._temp_file()
+        handle = None
+        try:
+            self.remote.download(key, temp_path)
+            handle = open(temp_path, 'rb')
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_SH)
+            os.replace(temp_path, path)
+        except BaseException:
+            if handle is not None:
+                handle.close()
+            os.remove(temp_path)
+            raise
+        return handle
+
+    def _acquire(self, key: str):
+        """Cached path of key and an open, pinned handle on it"""
+        path = self._cache_path(key)
+        handle = self._open_cached(path)
+        if handle is not None:
+            self.hits += 1
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+        else:
+            self.misses += 1
+            handle = self._download(key, path)
+        with self._lock:
+            self._pins[path] += 1
+        self._used(path, os.fstat(handle.fileno()).st_size)
+        self._evict()
+        return path, handle
+
+    def _release(self, path: str, handle: BinaryIO, evict: bool = True):
+        handle.close()
+        with self._lock:
+            self._pins[path] -= 1
+            if not self._pins[path]:
+                del self._pins[path]
+        if evict:
+            # A file kept past the budget while in use goes now
+            self._evict()
+
+    def local_file(self, key: str) -> LocalCopy:
+        path, handle = self._acquire(key)
+        return LocalCopy(path, lambda: self._release(path, handle))
+
+    def local_path(self, key: str) -> str:
+        """
+        Path of the cached copy. It isn't evicted by this call, but can be
+        once other files are cached; callers that read it later should use
+        local_file()
+        """
+        path, handle = self._acquire(key)
+        self._release(path, handle, evict=False)
+        return path
+
+
+def _remove_unused(path: str) -> bool:
+    """Delete a cache file unless a process holds it through local_file(); True once it's gone"""
+    try:
+        with open(path, 'rb') as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def connect_s3():
+    """Create an S3 client from settings (requires the boto3 package)"""
+    import boto3
+    return boto3.client(
+        "s3",
+        endpoint_url=settings.storage_s3_endpoint_url or None,
+        region_name=settings.storage_s3_region or None,
+        aws_access_key_id=settings.storage_s3_access_key_id or None,
+        aws_secret_access_key=settings.storage_s3_secret_access_key or None
+    )
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def _build_storage() -> StorageBackend:
+    backend = settings.storage_backend.lower()
+    if backend == "local":
+        return LocalStorage()
+    if backend == "s3":
+        if not settings.storage_s3_bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires STORAGE_S3_BUCKET")
+        try:
+            client = connect_s3()
+        except ImportError as e:
+            # No silent fallback to local disk: other nodes couldn't read those files
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package") from e
+        remote = S3Storage(client, settings.storage_s3_bucket, settings.storage_s3_prefix)
+        return CachedStorage(remote, settings.storage_cache_dir, settings.storage_cache_max_bytes)
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {settings.storage_backend}")
+
+
+def get_storage() -> StorageBackend:
+    """The configured storage backend (created on first use)"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = _build_storage()
+        return _storage
+
+
+def set_storage(storage: Optional[StorageBackend]):
+    """Replace the storage backend (None = rebuild from settings on next use)"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
@@ -0,0 +1,183 @@
+"""
+Signed session tokens
+
+/auth/login issues a short-lived access token and a long-lived refresh
+token, both JWTs signed with HMAC-SHA256 (HS256) using auth_token_secret.
+Checking an access token is an HMAC, a JSON decode and a dictionary lookup:
+get_current_user no longer reads the users table on every request.
+
+Refresh tokens are also recorded in the refresh_tokens table and can only be
+exchanged once, at /auth/refresh, for a new pair. Their revocation is
+therefore authoritative across processes. Access tokens are never stored;
+revoking one (logout, password change, account deletion) adds it, or a
+per-user "issued before" cutoff, to an in-memory denylist. Entries are
+dropped once the tokens they cover would have expired anyway, so the list
+stays as small as the number of recent revocations. Other worker processes
+stop accepting a revoked access token when it expires, at most
+auth_access_token_ttl seconds later.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+class TokenError(Exception):
+    """The token is malformed, forged, expired, revoked or of the wrong type"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+_secret: Optional[bytes] = None
+_secret_lock = threading.Lock()
+
+
+def _get_secret() -> bytes:
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            if settings.auth_token_secret:
+                _secret = settings.auth_token_secret.encode("utf-8")
+            else:
+                logger.warning("AUTH_TOKEN_SECRET is not set; using a random per-process secret")
+                _secret = secrets.token_bytes(32)
+        return _secret
+
+
+def reset_secret():
+    """Re-read auth_token_secret on next use (e.g. after changing settings)"""
+    global _secret
+    with _secret_lock:
+        _secret = None
+
+
+def _sign(signing_input: str) -> str:
+    return _b64encode(hmac.new(_get_secret(), signing_input.encode("ascii"), hashlib.sha256).digest())
+
+
+def encode_token(claims: Dict[str, Any]) -> str:
+    signing_input = _b64encode(json.dumps(_HEADER, separators=(",", ":")).encode()) + "." + \
+        _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return signing_input + "." + _sign(signing_input)
+
+
+class TokenDenylist:
+    """Revoked access tokens, kept only until they would have expired"""
+
+    def __init__(self):
+        self._tokens: Dict[str, float] = {}  # jti -> exp
+        self._users: Dict[str, float] = {}  # user id -> tokens issued before this are revoked
+        self._lock = threading.Lock()
+
+    def revoke(self, claims: Dict[str, Any]):
+        with self._lock:
+            self._tokens[claims["jti"]] = claims["exp"]
+            self._prune()
+
+    def revoke_user(self, user_id: str):
+        """Revoke every token issued to the user up to now"""
+        with self._lock:
+            # Rounded like "iat", so tokens issued right after still count as newer
+            self._users[user_id] = round(time.time(), 3)
+            self._prune()
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        # Plain dict reads; no lock needed on the request path
+        if claims.get("jti") in self._tokens:
+            return True
+        cutoff = self._users.get(claims.get("sub"))
+        return cutoff is not None and claims.get("iat", 0) < cutoff
+
+    def _prune(self):
+        now = time.time()
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        # Access tokens are the only ones checked here; refresh tokens are
+        # revoked in the database
+        oldest = now - settings.auth_access_token_ttl
+        self._users = {user_id: cutoff for user_id, cutoff in self._users.items() if cutoff > oldest}
+
+    def clear(self):
+        with self._lock:
+            self._tokens = {}
+            self._users = {}
+
+    def __len__(self) -> int:
+        return len(self._tokens) + len(self._users)
+
+
+denylist = TokenDenylist()
+
+
+def decode_token(token: str, token_type: str = ACCESS) -> Dict[str, Any]:
+    """
+    Verify a token and return its claims.
+
+    Raises:
+        TokenError: If the signature doesn't match, or the token has expired,
+            has been revoked or isn't a token_type token
+    """
+    try:
+        token.encode("ascii")
+        header, payload, signature = token.split(".")
+    except (UnicodeEncodeError, ValueError):
+        raise TokenError("Malformed token")
+    if not hmac.compare_digest(signature, _sign(header + "." + payload)):
+        raise TokenError("Invalid token signature")
+    try:
+        if json.loads(_b64decode(header)).get("alg") != "HS256":
+            raise TokenError("Unsupported token algorithm")
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, AttributeError):
+        raise TokenError("Malformed token")
+    if not isinstance(claims, dict) or claims.get("type") != token_type:
+        raise TokenError("Wrong token type")
+    if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] <= time.time():
+        raise TokenError("Token has expired")
+    if token_type == ACCESS and denylist.is_revoked(claims):
+        raise TokenError("Token has been revoked")
+    return claims
+
+
+def _new_token(user_id: str, token_type: str, ttl: int, **extra) -> Tuple[str, Dict[str, Any]]:
+    now = time.time()
+    claims = {
+        "sub": user_id,
+        "type": token_type,
+        "jti": uuid.uuid4().hex,
+        # Fractional: a revocation and the tokens issued right after it can
+        # fall in the same second
+        "iat": round(now, 3),
+        "exp": int(now + ttl),
+        **extra
+    }
+    return encode_token(claims), claims
+
+
+def create_access_token(user_id: str, email: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """New access token and its claims"""
+    return _new_token(user_id, ACCESS, settings.auth_access_token_ttl, email=email)
+
+
+def create_refresh_token(user_id: str) -> Tuple[str, Dict[str, Any]]:
+    """New refresh token and its claims (the caller records the jti)"""
+    return _new_token(user_id, REFRESH, settings.auth_refresh_token_ttl)
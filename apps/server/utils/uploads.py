@@ -0,0 +1,121 @@
+"""
+Streaming storage for uploaded files
+
+Uploads are copied to disk chunk by chunk instead of being read into memory,
+so memory use per upload stays constant. The size limit is checked as bytes
+arrive, the SHA-256 of the content is computed along the way, and the file
+only appears under its final name once it is complete (temp file + rename).
+Disk writes run in a worker thread to keep the event loop free.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from typing import AsyncIterator, NamedTuple, Optional
+from fastapi import HTTPException, UploadFile
+from config.settings import settings
+from utils.security import MAX_FILE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    stored_name: str
+    size: int
+    sha256: str
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"File size exceeds maximum allowed size ({max_size // (1024 * 1024)}MB)"
+    )
+
+
+def _discard(buffer, path: str):
+    buffer.close()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _finish(buffer, temp_path: str, final_path: str):
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+    os.replace(temp_path, final_path)
+
+
+async def _read_chunks(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def save_upload(
+    file: UploadFile,
+    upload_dir: str,
+    max_size: int = MAX_FILE_SIZE,
+    chunk_size: Optional[int] = None
+) -> StoredUpload:
+    """
+    Stream an upload into upload_dir under a unique name.
+
+    Raises:
+        HTTPException: If the upload exceeds max_size (nothing is left on disk)
+    """
+    chunk_size = chunk_size or settings.upload_chunk_size
+
+    # Reject up front when the size is already known
+    if file.size is not None and file.size > max_size:
+        raise _too_large(max_size)
+
+    file_ext = os.path.splitext(file.filename or "")[1]
+    return await save_stream(_read_chunks(file, chunk_size), upload_dir, max_size, suffix=file_ext)
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    upload_dir: str,
+    max_size: int = MAX_FILE_SIZE,
+    suffix: str = ""
+) -> StoredUpload:
+    """
+    Write a stream of byte chunks (e.g. a raw request body) into upload_dir
+    under a unique name, like save_upload().
+
+    Raises:
+        HTTPException: If the stream exceeds max_size (nothing is left on disk)
+    """
+    await asyncio.to_thread(os.makedirs, upload_dir, exist_ok=True)
+    stored_name = f"{uuid.uuid4().hex}{suffix}"
+    final_path = os.path.join(upload_dir, stored_name)
+    # Same directory as the final file so the rename is atomic
+    fd, temp_path = await asyncio.to_thread(
+        tempfile.mkstemp, prefix=".upload-", suffix=".part", dir=upload_dir
+    )
+
+    buffer = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_size:
+                raise _too_large(max_size)
+            digest.update(chunk)
+            await asyncio.to_thread(buffer.write, chunk)
+        await asyncio.to_thread(_finish, buffer, temp_path, final_path)
+    except BaseException:
+        await asyncio.to_thread(_discard, buffer, temp_path)
+        raise
+
+    return StoredUpload(final_path, stored_name, size, digest.hexdigest())
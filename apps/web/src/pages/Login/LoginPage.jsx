@@ -28,7 +28,7 @@ function LoginPage() {
       
       if (response.success) {
         // Store user info using auth utility
-        setAuth(response.user);
+        setAuth(response.user, response);
         
         // Log successful login
         logEvent(EventType.LOGIN, LogLevel.INFO, 'User logged in successfully', {
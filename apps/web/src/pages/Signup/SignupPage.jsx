@@ -99,7 +99,7 @@ function SignupPage() {
       
       if (response.success) {
         // Store user session using auth utility
-        setAuth(response.user);
+        setAuth(response.user, response);
         
         // Log successful signup
         logEvent(EventType.SIGNUP, LogLevel.INFO, 'New user registered', {
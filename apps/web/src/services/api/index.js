@@ -1,4 +1,4 @@
-import { getAuthHeaders } from '../../utils/auth';
+import { getAuthHeaders, getRefreshToken, setTokens } from '../../utils/auth';
 import { extendSession, checkSession } from '../../utils/sessionManager';
 import rateLimiter from '../../utils/rateLimiter';
 import { logEvent, EventType, LogLevel } from '../../utils/auditLogger';
@@ -38,14 +38,52 @@ class APIService {
     }
   }
 
+  /**
+   * Exchange the stored refresh token for a new access and refresh token.
+   * Concurrent callers share one request: a refresh token can be used only
+   * once, and the server ends every session when it sees one reused.
+   * @returns {Promise<boolean>} - true if new tokens were stored
+   */
+  refreshTokens() {
+    if (!this.pendingRefresh) {
+      this.pendingRefresh = this.requestNewTokens().finally(() => {
+        this.pendingRefresh = null;
+      });
+    }
+    return this.pendingRefresh;
+  }
+
+  async requestNewTokens() {
+    const refreshToken = getRefreshToken();
+    if (!refreshToken) {
+      return false;
+    }
+
+    try {
+      const response = await fetch(`${API_BASE_URL}/auth/refresh`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: refreshToken })
+      });
+      if (!response.ok) {
+        return false;
+      }
+      setTokens(await response.json());
+      return true;
+    } catch {
+      return false;
+    }
+  }
+
   /**
    * Make authenticated API request with rate limiting and session management
    * @param {string} url - API endpoint
    * @param {object} options - Fetch options
    * @param {number} timeout - Custom timeout in milliseconds (optional)
+   * @param {boolean} isRetry - Whether this is the retry after refreshing tokens
    * @returns {Promise<Response>}
    */
-  async makeRequest(url, options = {}, timeout = null) {
+  async makeRequest(url, options = {}, timeout = null, isRetry = false) {
     // Check session validity (don't redirect, just check)
     // Health check and auth endpoints don't require authentication
     const isAuthEndpoint = url.includes('/auth/login') || url.includes('/auth/signup') || url.includes('/health');
@@ -104,8 +142,13 @@ class APIService {
         extendSession();
       }
 
-      // Handle 401 Unauthorized - redirect to login
+      // Handle 401 Unauthorized - refresh the access token and retry once,
+      // otherwise redirect to login
       if (response.status === 401) {
+        if (!isRetry && !isAuthEndpoint && await this.refreshTokens()) {
+          return this.makeRequest(url, options, timeout, true);
+        }
+
         logEvent(
           EventType.UNAUTHORIZED_ACCESS,
           LogLevel.SECURITY,
@@ -236,7 +279,10 @@ class APIService {
         throw new Error(error.detail || 'Failed to change password');
       }
 
-      return await response.json();
+      // Other sessions were signed out; this one continues with new tokens
+      const data = await response.json();
+      setTokens(data);
+      return data;
     } catch (error) {
       if (process.env.NODE_ENV !== 'production') {
         console.error('Change password failed:', error);
@@ -621,6 +667,20 @@ class APIService {
     }
   }
 
+  async searchConversations(userId, query, limit = 20, offset = 0) {
+    try {
+      const params = new URLSearchParams({ q: query, limit: String(limit), offset: String(offset) });
+      const response = await this.makeRequest(`${API_BASE_URL}/conversations/${userId}/search?${params}`);
+      if (!response.ok) throw new Error('Failed to search conversations');
+      return await response.json();
+    } catch (error) {
+      if (process.env.NODE_ENV !== 'production') {
+        console.error('Search conversations failed:', error);
+      }
+      return { query, results: [], limit, offset, has_more: false };
+    }
+  }
+
   async createConversation(userId, title = null, modelUsed = null, projectId = null) {
     try {
       const response = await this.makeRequest(`${API_BASE_URL}/conversations/create`, {
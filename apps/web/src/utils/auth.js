@@ -22,7 +22,7 @@ export const getUserId = () => {
 };
 
 /**
- * Get authentication token (JWT or session token)
+ * Get access token
  * @returns {string|null}
  */
 export const getAuthToken = () => {
@@ -44,6 +44,29 @@ export const getAuthToken = () => {
   return null;
 };
 
+/**
+ * Get refresh token, used to obtain a new access token
+ * @returns {string|null}
+ */
+export const getRefreshToken = () => {
+  return sessionStorage.getItem('refresh_token');
+};
+
+/**
+ * Store the access and refresh token from a login, signup or refresh response
+ * @param {object} tokens - Response carrying access_token and refresh_token
+ */
+export const setTokens = (tokens) => {
+  if (tokens?.access_token) {
+    sessionStorage.setItem('auth_token', tokens.access_token);
+    // Remove legacy token from localStorage if exists
+    localStorage.removeItem('auth_token');
+  }
+  if (tokens?.refresh_token) {
+    sessionStorage.setItem('refresh_token', tokens.refresh_token);
+  }
+};
+
 /**
  * Get authorization header for API requests
  * @returns {object}
@@ -53,15 +76,7 @@ export const getAuthHeaders = () => {
     'Content-Type': 'application/json'
   };
 
-  const userId = getUserId();
   const token = getAuthToken();
-
-  // Add user ID header (temporary until JWT is implemented)
-  if (userId) {
-    headers['X-User-ID'] = userId;
-  }
-
-  // Add authorization token if available (for future JWT implementation)
   if (token) {
     headers['Authorization'] = `Bearer ${token}`;
   }
@@ -74,25 +89,20 @@ export const getAuthHeaders = () => {
  */
 export const clearAuth = () => {
   clearSession();
-  // Clear token if using JWT
   sessionStorage.removeItem('auth_token');
+  sessionStorage.removeItem('refresh_token');
   localStorage.removeItem('auth_token');
 };
 
 /**
- * Set authentication data after login
- * @param {object} userData - User data from login response
+ * Set authentication data after login or signup
+ * @param {object} userData - User data from the response
+ * @param {object} tokens - The response's access_token and refresh_token (optional)
  */
-export const setAuth = (userData) => {
+export const setAuth = (userData, tokens = null) => {
   // Use sessionManager to create session with expiration
   createSession(userData);
-  
-  // Store JWT token if provided (preferred method)
-  if (userData.token) {
-    sessionStorage.setItem('auth_token', userData.token);
-    // Remove legacy token from localStorage if exists
-    localStorage.removeItem('auth_token');
-  }
+  setTokens(tokens);
 };
 
 /**
@@ -53,7 +53,7 @@ const handleGoogleCallback = async (response) => {
         email: data.email,
         name: data.name,
         display_name: data.name
-      });
+      }, data);
       
       // Redirect to chat
       window.location.href = '/chat';
@@ -155,7 +155,7 @@ export const handleGithubCallback = async () => {
         email: data.email,
         name: data.name,
         display_name: data.name
-      });
+      }, data);
       
       // Redirect to chat
       window.location.href = '/chat';
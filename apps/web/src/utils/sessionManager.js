@@ -31,11 +31,6 @@ export const createSession = (userData) => {
       localStorage.setItem('sharedlm_user_name', '');
     }
   }
-  
-  // Store token if provided (for JWT)
-  if (userData.token) {
-    sessionStorage.setItem('auth_token', userData.token);
-  }
 };
 
 /**
@@ -95,6 +90,7 @@ export const clearSession = () => {
   localStorage.removeItem('sharedlm_full_name');
   localStorage.removeItem('sharedlm_user_name');
   sessionStorage.removeItem('auth_token');
+  sessionStorage.removeItem('refresh_token');
   
   // Clear API keys from localStorage
   localStorage.removeItem('sharedlm_api_openai');
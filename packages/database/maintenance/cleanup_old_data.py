@@ -31,7 +31,7 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sharedlm.db")
 
 
 def archive_old_conversations(months=6, dry_run=True):
-    """Archive conversations older than specified months"""
+    """Move conversations older than specified months into compressed cold storage"""
     
     print("=" * 80)
     print("Archive Old Conversations")
@@ -39,52 +39,25 @@ def archive_old_conversations(months=6, dry_run=True):
     print("")
     
     try:
-        engine = create_engine(DATABASE_URL)
+        from database.connection import SessionLocal
+        from database.archive import archive_old_conversations as run_archive
         
-        cutoff_date = datetime.now() - timedelta(days=months * 30)
-        cutoff_str = cutoff_date.strftime('%Y-%m-%d')
+        db = SessionLocal()
+        try:
+            stats = run_archive(db, older_than_days=months * 30, dry_run=dry_run)
+        finally:
+            db.close()
         
-        with engine.connect() as conn:
-            result = conn.execute(text(f"""
-                SELECT COUNT(*) FROM conversations 
-                WHERE updated_at < '{cutoff_str}' 
-                AND is_archived = 0
-            """)).fetchone()
-            
-            count = result[0]
-            
-            if count == 0:
-                print(f"✅ No conversations older than {months} months to archive")
-                return
-            
-            print(f"Found {count} conversations older than {months} months")
-            print(f"Cutoff date: {cutoff_str}")
-            
-            if dry_run:
-                print("\n📊 Preview (DRY RUN - No changes):")
-                conversations = conn.execute(text(f"""
-                    SELECT id, title, updated_at, message_count 
-                    FROM conversations 
-                    WHERE updated_at < '{cutoff_str}' 
-                    AND is_archived = 0
-                    LIMIT 10
-                """)).fetchall()
-                
-                for conv in conversations:
-                    print(f"   • {conv[1][:50]} ({conv[3]} msgs, {conv[2]})")
-                
-                if count > 10:
-                    print(f"   ... and {count - 10} more")
-            else:
-                print(f"\n🗄️  Archiving {count} conversations...")
-                conn.execute(text(f"""
-                    UPDATE conversations 
-                    SET is_archived = 1 
-                    WHERE updated_at < '{cutoff_str}' 
-                    AND is_archived = 0
-                """))
-                conn.commit()
-                print("✅ Conversations archived")
+        if stats["conversations"] == 0:
+            print(f"✅ No conversations older than {months} months to archive")
+            return
+        
+        if dry_run:
+            print(f"📊 Would archive {stats['conversations']} conversations "
+                  f"({stats['messages']} messages) (DRY RUN)")
+        else:
+            print(f"✅ Archived {stats['conversations']} conversations ({stats['messages']} messages)")
+            print("   Archived conversations are restored automatically when opened")
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compress Existing Message Bodies in the SharedLM Database
+Run from: packages/database/maintenance/
+Compresses: messages at or above MESSAGE_COMPRESSION_THRESHOLD characters (SQLite)
+Requires: migration/add_message_compression.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent.parent
+backend_dir = project_root / 'apps' / 'server'
+
+if not backend_dir.exists():
+    print(f"❌ Backend directory not found: {backend_dir}")
+    sys.exit(1)
+
+sys.path.insert(0, str(backend_dir))
+os.chdir(backend_dir)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config.settings import settings
+from database.connection import SessionLocal, engine
+from database.maintenance import compress_existing_messages
+
+
+def compress_messages(chunk_size=500, dry_run=True):
+    """Compress large message bodies in chunks"""
+    
+    print("=" * 80)
+    print("Compress Message Bodies")
+    print("=" * 80)
+    print("")
+    
+    if engine.dialect.name != "sqlite":
+        print("✅ Not needed: PostgreSQL compresses large values itself (TOAST)")
+        return
+    
+    threshold = settings.message_compression_threshold
+    if threshold <= 0:
+        print("❌ Compression is disabled (MESSAGE_COMPRESSION_THRESHOLD=0)")
+        return
+    
+    print(f"Threshold: {threshold} characters, chunk size: {chunk_size}")
+    
+    db = SessionLocal()
+    try:
+        stats = compress_existing_messages(db, chunk_size=chunk_size, dry_run=dry_run)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return
+    finally:
+        db.close()
+    
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    verb = "Would compress" if dry_run else "Compressed"
+    print(f"\n{'📊' if dry_run else '✅'} {verb} {stats['compressed']} of {stats['scanned']} large messages")
+    print(f"   Before: {stats['bytes_before'] / 1024:.2f} KB")
+    print(f"   After: {stats['bytes_after'] / 1024:.2f} KB")
+    print(f"   Saved: {saved / 1024:.2f} KB")
+    
+    if not dry_run and saved > 0:
+        print("\n💡 Run cleanup_old_data.py → Vacuum Database to return the space to the OS.")
+
+
+def main():
+    print("Mode:")
+    print("  1. DRY RUN (Preview only)")
+    print("  2. EXECUTE (Actually compress)")
+    print("")
+    
+    mode = input("Enter mode (1 or 2): ").strip()
+    dry_run = mode != '2'
+    
+    if not dry_run:
+        confirm = input("\n⚠️  This will modify your database. Continue? (yes/no): ").strip().lower()
+        if confirm != 'yes':
+            print("Cancelled.")
+            return
+    
+    print("")
+    compress_messages(dry_run=dry_run)
+    print("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Re-encrypt Stored API Keys After an Encryption Key Rotation
+Run from: packages/database/maintenance/
+Rotation: set the new key as ENCRYPTION_KEY, move the old one to
+ENCRYPTION_PREVIOUS_KEYS, restart the server, then run this script. Once it
+reports nothing left to rotate, the old key can be removed.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent.parent
+backend_dir = project_root / 'apps' / 'server'
+
+if not backend_dir.exists():
+    print(f"❌ Backend directory not found: {backend_dir}")
+    sys.exit(1)
+
+sys.path.insert(0, str(backend_dir))
+os.chdir(backend_dir)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config.settings import settings
+from database.connection import SessionLocal
+from database.maintenance import reencrypt_api_keys
+
+
+def rotate_encryption_key(chunk_size=500, dry_run=True):
+    """Re-encrypt API keys still using a retired key, in chunks"""
+    
+    print("=" * 80)
+    print("Re-encrypt API Keys")
+    print("=" * 80)
+    print("")
+    
+    if not settings.encryption_key:
+        print("❌ ENCRYPTION_KEY is not set")
+        return
+    
+    retired = [key for key in settings.encryption_previous_keys.split(",") if key.strip()]
+    print(f"Retired keys configured: {len(retired)}, chunk size: {chunk_size}")
+    
+    db = SessionLocal()
+    try:
+        stats = reencrypt_api_keys(db, chunk_size=chunk_size, dry_run=dry_run)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return
+    finally:
+        db.close()
+    
+    verb = "Would re-encrypt" if dry_run else "Re-encrypted"
+    print(f"\n{'📊' if dry_run else '✅'} {verb} {stats['rotated']} of {stats['scanned']} API keys")
+    if stats["failed"]:
+        print(f"⚠️  {stats['failed']} keys can't be decrypted with any configured key")
+    elif not dry_run and retired:
+        print("\n💡 All keys use ENCRYPTION_KEY now; ENCRYPTION_PREVIOUS_KEYS can be cleared.")
+
+
+def main():
+    print("Mode:")
+    print("  1. DRY RUN (Preview only)")
+    print("  2. EXECUTE (Actually re-encrypt)")
+    print("")
+    
+    mode = input("Enter mode (1 or 2): ").strip()
+    dry_run = mode != '2'
+    
+    if not dry_run:
+        confirm = input("\n⚠️  This will modify your database. Continue? (yes/no): ").strip().lower()
+        if confirm != 'yes':
+            print("Cancelled.")
+            return
+    
+    print("")
+    rotate_encryption_key(dry_run=dry_run)
+    print("")
+
+
+if __name__ == "__main__":
+    main()
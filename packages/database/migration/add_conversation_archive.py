@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Add conversation archival (hot/cold storage) to existing database
+Run from: packages/database/migration/
+Adds: conversations.is_archived, conversations.archived_at, conversation_archives table
+"""
+
+import os
+import sys
+from pathlib import Path
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent.parent
+backend_dir = project_root / 'apps' / 'server'
+
+if not backend_dir.exists():
+    print(f"❌ Backend directory not found: {backend_dir}")
+    sys.exit(1)
+
+sys.path.insert(0, str(backend_dir))
+os.chdir(backend_dir)
+
+print(f"✅ Working from: {os.getcwd()}\n")
+
+from sqlalchemy import create_engine, text, inspect
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sharedlm.db")
+
+
+def add_conversation_archive():
+    print("=" * 80)
+    print("Add Conversation Archive Migration")
+    print("=" * 80)
+    print("")
+    
+    try:
+        engine = create_engine(DATABASE_URL)
+        
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('conversations')]
+        tables = inspector.get_table_names()
+        
+        with engine.connect() as conn:
+            if 'is_archived' not in columns:
+                print("📦 Adding conversations.is_archived...")
+                conn.execute(text("ALTER TABLE conversations ADD COLUMN is_archived BOOLEAN NOT NULL DEFAULT FALSE"))
+            else:
+                print("✅ conversations.is_archived already exists")
+            
+            if 'archived_at' not in columns:
+                print("📦 Adding conversations.archived_at...")
+                conn.execute(text("ALTER TABLE conversations ADD COLUMN archived_at TIMESTAMP"))
+            else:
+                print("✅ conversations.archived_at already exists")
+            
+            if 'conversation_archives' not in tables:
+                print("📦 Creating conversation_archives table...")
+                conn.execute(text("""
+                    CREATE TABLE conversation_archives (
+                        conversation_id INTEGER PRIMARY KEY REFERENCES conversations(id) ON DELETE CASCADE,
+                        payload TEXT NOT NULL,
+                        payload_encoding VARCHAR(20),
+                        message_count INTEGER DEFAULT 0,
+                        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """))
+            else:
+                print("✅ conversation_archives already exists")
+            
+            conn.commit()
+        
+        print("\n" + "=" * 80)
+        print("Migration Complete")
+        print("=" * 80)
+        print("\nNext steps:")
+        print("1. Restart your backend server")
+        print("2. Run maintenance/cleanup_old_data.py (option 1) to archive old conversations")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = add_conversation_archive()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Add content-addressed upload storage to existing database
+Run from: packages/database/migration/
+Adds: file_blobs table, chat_files.blob_id, project_files.blob_id
+Then moves existing uploads into the blob store, keeping one copy per distinct file
+"""
+
+import os
+import sys
+from pathlib import Path
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent.parent
+backend_dir = project_root / 'apps' / 'server'
+
+if not backend_dir.exists():
+    print(f"❌ Backend directory not found: {backend_dir}")
+    sys.exit(1)
+
+sys.path.insert(0, str(backend_dir))
+os.chdir(backend_dir)
+
+print(f"✅ Working from: {os.getcwd()}\n")
+
+import hashlib
+from sqlalchemy import create_engine, text, inspect
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sharedlm.db")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backfill_blobs(conn):
+    """Attach files uploaded before blobs existed to blobs, removing duplicate copies"""
+    from database.blobs import blob_path
+
+    linked = 0
+    missing = 0
+    freed = 0
+    for table in ("chat_files", "project_files"):
+        rows = conn.execute(text(
+            f"SELECT id, storage_path FROM {table} WHERE blob_id IS NULL AND storage_path IS NOT NULL"
+        )).fetchall()
+        for file_id, storage_path in rows:
+            if not os.path.isfile(storage_path):
+                missing += 1
+                continue
+            sha256 = _sha256(storage_path)
+            blob = conn.execute(
+                text("SELECT id, storage_path FROM file_blobs WHERE sha256 = :sha"),
+                {"sha": sha256}
+            ).fetchone()
+            if blob is None:
+                target = blob_path(sha256)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(storage_path, target)
+                conn.execute(
+                    text("INSERT INTO file_blobs (sha256, size, storage_path, ref_count) VALUES (:sha, :size, :path, 1)"),
+                    {"sha": sha256, "size": os.path.getsize(target), "path": target}
+                )
+                blob_id = conn.execute(
+                    text("SELECT id FROM file_blobs WHERE sha256 = :sha"), {"sha": sha256}
+                ).scalar()
+            else:
+                blob_id, target = blob
+                conn.execute(
+                    text("UPDATE file_blobs SET ref_count = ref_count + 1 WHERE id = :id"),
+                    {"id": blob_id}
+                )
+                if os.path.abspath(storage_path) != os.path.abspath(target):
+                    freed += os.path.getsize(storage_path)
+                    os.remove(storage_path)
+            conn.execute(
+                text(f"UPDATE {table} SET blob_id = :blob_id, storage_path = :path WHERE id = :id"),
+                {"blob_id": blob_id, "path": target, "id": file_id}
+            )
+            # Commit per file so rows never point at a file that was moved away
+            conn.commit()
+            linked += 1
+
+    print(f"✅ Linked {linked} existing files to blobs ({freed / (1024 * 1024):.1f}MB of duplicates removed)")
+    if missing:
+        print(f"⚠️  {missing} file rows point at missing files and were left unchanged")
+
+
+def add_file_blobs():
+    print("=" * 80)
+    print("Add File Blobs Migration")
+    print("=" * 80)
+    print("")
+
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        inspector = inspect(engine)
+        tables = inspector.get_table_names()
+
+        with engine.connect() as conn:
+            if 'file_blobs' not in tables:
+                print("📦 Creating file_blobs table...")
+                conn.execute(text("""
+                    CREATE TABLE file_blobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        sha256 VARCHAR(64) NOT NULL UNIQUE,
+                        size INTEGER NOT NULL,
+                        storage_path VARCHAR(500) NOT NULL,
+                        ref_count INTEGER NOT NULL DEFAULT 0,
+                        extracted_text TEXT,
+                        extracted_encoding VARCHAR(20),
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """))
+            else:
+                print("✅ file_blobs already exists")
+
+            for table in ("chat_files", "project_files"):
+                columns = [col['name'] for col in inspector.get_columns(table)]
+                if 'blob_id' not in columns:
+                    print(f"📦 Adding {table}.blob_id...")
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN blob_id INTEGER REFERENCES file_blobs(id)"))
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_blob_id ON {table} (blob_id)"))
+                else:
+                    print(f"✅ {table}.blob_id already exists")
+
+            conn.commit()
+
+            print("\n📦 Moving existing uploads into the blob store...")
+            backfill_blobs(conn)
+
+        print("\n" + "=" * 80)
+        print("Migration Complete")
+        print("=" * 80)
+        print("\nNext steps:")
+        print("1. Restart your backend server")
+
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = add_file_blobs()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Add message compression marker column to existing database
+Run from: packages/database/migration/
+Adds: messages.content_encoding (NULL = stored as plain text)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+script_dir = Path(__file__).parent
+project_root = script_dir.parent.parent.parent
+backend_dir = project_root / 'apps' / 'server'
+
+if not backend_dir.exists():
+    print(f"❌ Backend directory not found: {backend_dir}")
+    sys.exit(1)
+
+sys.path.insert(0, str(backend_dir))
+os.chdir(backend_dir)
+
+print(f"✅ Working from: {os.getcwd()}\n")
+
+from sqlalchemy import create_engine, text, inspect
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sharedlm.db")
+
+
+def add_message_compression_column():
+    print("=" * 80)
+    print("Add messages.content_encoding Migration")
+    print("=" * 80)
+    print("")
+    
+    try:
+        engine = create_engine(DATABASE_URL)
+        
+        inspector = inspect(engine)
+        columns = [col['name'] for col in inspector.get_columns('messages')]
+        
+        if 'content_encoding' in columns:
+            print("✅ messages.content_encoding already exists!")
+            return True
+        
+        print("📦 Adding content_encoding column...")
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE messages ADD COLUMN content_encoding VARCHAR(20)"))
+            conn.commit()
+        
+        print("✅ Column added successfully!")
+        print("\n" + "=" * 80)
+        print("Migration Complete")
+        print("=" * 80)
+        print("\nNext steps:")
+        print("1. Restart your backend server (new large messages are stored compressed)")
+        print("2. Run maintenance/compress_messages.py to compress existing messages")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = add_message_compression_column()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,81 @@
+"""
+Benchmark: SimpleCache get/set throughput under thread contention
+
+Runs a mixed read/write workload (Zipf-like key popularity, 90% reads) from
+several threads against an unbounded cache and against bounded LRU caches
+(entry and byte budgets, with the background sweeper running), and reports
+operations per second, hit rate and evictions.
+
+Run from the repository root:
+    python test/benchmarks/bench_cache.py [--threads 8] [--ops 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../apps/server")))
+os.environ.setdefault("ENVIRONMENT", "test")
+
+from utils.cache import SimpleCache
+
+
+def worker(cache: SimpleCache, keys, ops: int, read_ratio: float, seed: int, start: threading.Barrier):
+    rng = random.Random(seed)
+    value = "sk-" + "x" * 48  # Roughly the size of a decrypted API key
+    # Skewed popularity: a few hot users, a long tail of one-off visitors
+    picks = [keys[min(int(rng.paretovariate(0.6)) - 1, len(keys) - 1)] for _ in range(ops)]
+    reads = [rng.random() < read_ratio for _ in range(ops)]
+    start.wait()
+    for key, is_read in zip(picks, reads):
+        if is_read:
+            if cache.get(key) is None:
+                cache.set(key, value)
+        else:
+            cache.set(key, value)
+
+
+def run(label: str, cache: SimpleCache, threads: int, ops: int, keyspace: int, read_ratio: float):
+    keys = [f"api_key:user{i}:openai" for i in range(keyspace)]
+    barrier = threading.Barrier(threads + 1)
+    pool = [
+        threading.Thread(target=worker, args=(cache, keys, ops // threads, read_ratio, i, barrier))
+        for i in range(threads)
+    ]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    print(f"{label:28}{ops / elapsed / 1000:>10.0f}k{stats['hits'] / max(lookups, 1) * 100:>9.1f}%"
+          f"{stats['entries']:>10}{stats['evictions']:>11}{stats['bytes'] / 1e6:>9.1f}MB")
+    cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--keyspace", type=int, default=50000)
+    parser.add_argument("--read-ratio", type=float, default=0.9)
+    args = parser.parse_args()
+
+    print(f"threads: {args.threads}, ops: {args.ops}, keys: {args.keyspace}, reads: {args.read_ratio:.0%}")
+    print(f"{'':28}{'ops/s':>11}{'hit rate':>10}{'entries':>10}{'evictions':>11}{'memory':>11}")
+    configs = (
+        ("unbounded", dict()),
+        ("max_entries=1000", dict(max_entries=1000, sweep_interval=1)),
+        ("max_bytes=256KB", dict(max_bytes=256 * 1024, sweep_interval=1)),
+    )
+    for label, options in configs:
+        run(label, SimpleCache(default_ttl=600, **options), args.threads, args.ops, args.keyspace, args.read_ratio)
+
+
+if __name__ == "__main__":
+    main()
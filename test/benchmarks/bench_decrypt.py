@@ -0,0 +1,57 @@
+"""
+Benchmark: API key decrypt throughput
+
+Compares building a new Fernet per call (the previous get_cipher behaviour)
+with the cached cipher, for tokens under the current key and for tokens
+under a retired key (MultiFernet tries the current key first).
+
+Run from the repository root:
+    python test/benchmarks/bench_decrypt.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../apps/server")))
+os.environ.setdefault("ENVIRONMENT", "test")
+
+from cryptography.fernet import Fernet
+from config.settings import settings
+from utils.encryption import decrypt_key
+
+
+def rebuild_per_call(token: str) -> str:
+    # What every decrypt_key call used to do
+    return Fernet(settings.encryption_key.encode()).decrypt(token.encode()).decode()
+
+
+def measure(label: str, fn, token: str, iterations: int):
+    fn(token)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(token)
+    elapsed = time.perf_counter() - start
+    print(f"{label:36}{iterations / elapsed / 1000:>9.1f}k/s{elapsed / iterations * 1e6:>9.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    retired = Fernet.generate_key().decode()
+    settings.encryption_key = Fernet.generate_key().decode()
+    settings.encryption_previous_keys = retired
+    current_token = Fernet(settings.encryption_key.encode()).encrypt(b"sk-" + b"x" * 48).decode()
+    retired_token = Fernet(retired.encode()).encrypt(b"sk-" + b"x" * 48).decode()
+
+    print(f"iterations: {args.iterations}")
+    print(f"{'':36}{'throughput':>11}{'per call':>11}")
+    measure("new Fernet per call", rebuild_per_call, current_token, args.iterations)
+    measure("cached cipher", decrypt_key, current_token, args.iterations)
+    measure("cached cipher, retired-key token", decrypt_key, retired_token, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
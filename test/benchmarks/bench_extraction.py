@@ -0,0 +1,93 @@
+"""
+Benchmark: request latency while documents are being extracted
+
+Simulates chat traffic (small requests every few milliseconds) while several
+large files are extracted concurrently, and reports request latency
+percentiles. "inline" calls extract_text_from_file() directly in the async
+handler like chat() used to; "pool" goes through the extraction process pool.
+
+Run from the repository root:
+    python test/benchmarks/bench_extraction.py [--files 4] [--rows 200000] [--workers 2]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../apps/server")))
+os.environ.setdefault("ENVIRONMENT", "test")
+
+from utils.file_extractor import extract_text_from_file
+from utils.extraction_pool import ExtractionPool
+
+
+def make_csv(path: str, rows: int):
+    with open(path, "w") as f:
+        for i in range(rows):
+            f.write(f"{i},customer {i},{i * 3.7:.2f},\"note, with comma {i}\",2024-01-{i % 28 + 1:02d}\n")
+
+
+async def traffic(stop: asyncio.Event, latencies: list, interval: float = 0.005):
+    # Each "request" just needs the event loop; its latency is how long it waited for it
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append(time.perf_counter() - start - interval)
+
+
+async def extract_inline(path: str):
+    return extract_text_from_file(path, ".csv")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(label: str, extract, paths):
+    latencies = []
+    stop = asyncio.Event()
+    load = asyncio.create_task(traffic(stop, latencies))
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    await asyncio.gather(*(extract(p) for p in paths))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await load
+    ms = [v * 1000 for v in latencies]
+    print(f"{label:10}{elapsed:>9.2f}s{statistics.median(ms):>10.1f}{percentile(ms, 99):>10.1f}{max(ms):>10.1f}")
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"data{i}.csv")
+            make_csv(path, args.rows)
+            paths.append(path)
+        size_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+        print(f"{args.files} CSV files, {size_mb:.0f}MB total, {args.workers} workers\n")
+        print(f"{'mode':10}{'total':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+
+        await run("inline", extract_inline, paths)
+
+        pool = ExtractionPool(workers=args.workers, timeout=600)
+        # Start the worker processes before measuring
+        await asyncio.gather(*(pool.run(len, "") for _ in range(args.workers)))
+        await run("pool", lambda p: pool.run(extract_text_from_file, p, ".csv"), paths)
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=2)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
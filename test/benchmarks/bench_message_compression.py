@@ -0,0 +1,126 @@
+"""
+Benchmark: on-disk size and read-path overhead of message body compression
+
+Writes the same synthetic chat history into two SQLite databases - one with
+compression disabled, one with the default threshold - then compares file
+size and the time to load and read back every message body.
+
+Run from the repository root:
+    python test/benchmarks/bench_message_compression.py [--messages 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../apps/server")))
+os.environ.setdefault("ENVIRONMENT", "test")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from config.settings import settings
+from database.connection import Base
+from database.models import User, Conversation, Message
+
+WORDS = (
+    "the model returns a response with context memory project file user assistant "
+    "database query index performance latency throughput request cache token prompt "
+    "function class return import value error handler config setting deploy server"
+).split()
+
+
+def synthetic_body(rng: random.Random) -> str:
+    """Mix of short prompts, long replies and pasted documents"""
+    kind = rng.random()
+    if kind < 0.5:
+        length = rng.randint(40, 400)
+    elif kind < 0.9:
+        length = rng.randint(1500, 12000)
+    else:
+        length = rng.randint(20000, 100000)
+    parts, size = [], 0
+    while size < length:
+        if rng.random() < 0.1:
+            chunk = "\n```python\ndef handler(request):\n    return cache.get(request.user_id)\n```\n"
+        else:
+            chunk = " ".join(rng.choice(WORDS) for _ in range(12)) + ". "
+        parts.append(chunk)
+        size += len(chunk)
+    return "".join(parts)[:length]
+
+
+def build_database(path: str, threshold: int, bodies) -> float:
+    settings.message_compression_threshold = threshold
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    start = time.perf_counter()
+    with Session() as db:
+        db.add(User(id="bench", email="bench@example.com", password_hash="x"))
+        for i in range(0, len(bodies), 50):
+            conversation = Conversation(user_id="bench", title=f"Chat {i}")
+            db.add(conversation)
+            db.flush()
+            for body in bodies[i:i + 50]:
+                db.add(Message(conversation_id=conversation.id, role="assistant", content=body))
+        db.commit()
+    write_time = time.perf_counter() - start
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+    engine.dispose()
+    return write_time
+
+
+def read_back(path: str) -> float:
+    engine = create_engine(f"sqlite:///{path}")
+    Session = sessionmaker(bind=engine)
+    start = time.perf_counter()
+    with Session() as db:
+        total = 0
+        for message in db.query(Message).yield_per(500):
+            total += len(message.content)
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bodies = [synthetic_body(rng) for _ in range(args.messages)]
+    raw_bytes = sum(len(b.encode("utf-8")) for b in bodies)
+    default_threshold = settings.message_compression_threshold
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_db = os.path.join(tmp, "plain.db")
+        packed_db = os.path.join(tmp, "compressed.db")
+        plain_write = build_database(plain_db, 0, bodies)
+        packed_write = build_database(packed_db, default_threshold, bodies)
+
+        # Warm the page cache once, then time
+        read_back(plain_db), read_back(packed_db)
+        plain_read = min(read_back(plain_db) for _ in range(3))
+        packed_read = min(read_back(packed_db) for _ in range(3))
+
+        plain_size = os.path.getsize(plain_db)
+        packed_size = os.path.getsize(packed_db)
+
+    print(f"messages: {args.messages}, raw body bytes: {raw_bytes / 1e6:.1f} MB, threshold: {default_threshold} chars")
+    print(f"{'':12}{'db size':>12}{'write':>10}{'read all':>10}{'per msg':>10}")
+    for label, size, write, read in (
+        ("plain", plain_size, plain_write, plain_read),
+        ("compressed", packed_size, packed_write, packed_read),
+    ):
+        print(f"{label:12}{size / 1e6:>10.1f}MB{write:>9.2f}s{read:>9.2f}s{read / args.messages * 1e6:>8.0f}us")
+    print(f"space saved: {(1 - packed_size / plain_size) * 100:.1f}%, "
+          f"read overhead: {(packed_read - plain_read) / args.messages * 1e6:+.0f}us/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: chat latency during a login burst
+
+Runs a stream of lightweight "chat" requests (an await that should come
+back at once) on the event loop while a burst of logins checks bcrypt
+hashes, and reports the chat requests' latency. Compares checking the
+password inline in the async route (the previous behaviour) with
+check_password_async(), which runs bcrypt on the bounded pool.
+
+Run from the repository root:
+    python test/benchmarks/bench_password_hashing.py [--logins 20] [--interval-ms 10]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../apps/server")))
+os.environ.setdefault("ENVIRONMENT", "test")
+
+from utils.passwords import hash_password, check_password, check_password_async, get_password_hasher
+
+
+async def login_inline(password: str, password_hash: str):
+    # What the login route used to do
+    check_password(password, password_hash)
+
+
+async def login_pooled(password: str, password_hash: str):
+    await check_password_async(password, password_hash)
+
+
+async def chat_requests(stop: asyncio.Event, interval: float, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0)  # Stands in for a request that only needs the loop
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def run(login, logins: int, interval: float, password_hash: str):
+    stop = asyncio.Event()
+    latencies = []
+    chat = asyncio.create_task(chat_requests(stop, interval, latencies))
+    await asyncio.sleep(interval * 5)  # Let the chat stream start
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login("correct horse", password_hash) for _ in range(logins)))
+    burst = time.perf_counter() - started
+
+    stop.set()
+    await chat
+    return burst, latencies
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--interval-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    password_hash = hash_password("correct horse")
+    interval = args.interval_ms / 1000
+    hasher = get_password_hasher()
+
+    print(f"logins: {args.logins}, chat request every {args.interval_ms}ms, pool workers: {hasher.workers}")
+    print(f"{'':18}{'burst':>9}{'chat p50':>11}{'chat p99':>11}{'chat max':>11}{'chats':>7}")
+    for label, login in (("inline bcrypt", login_inline), ("bounded pool", login_pooled)):
+        burst, latencies = asyncio.run(run(login, args.logins, interval, password_hash))
+        print(
+            f"{label:18}{burst:>8.2f}s"
+            f"{statistics.median(latencies) * 1000:>9.2f}ms"
+            f"{percentile(latencies, 0.99) * 1000:>9.2f}ms"
+            f"{max(latencies) * 1000:>9.2f}ms"
+            f"{len(latencies):>7}"
+        )
+    stats = hasher.stats()
+    print(f"\npool: avg queue {stats['avg_queue_ms']}ms, max queue {stats['max_queue_ms']}ms, avg bcrypt {stats['avg_run_ms']}ms")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: PDF text extraction on large synthetic documents
+
+Compares the previous implementation (string concatenation over every page)
+with the page-streaming extractor, without limits and with the default text
+budget (EXTRACTION_MAX_CHARS), which stops parsing once enough text is
+collected.
+
+Run from the repository root:
+    python test/benchmarks/bench_pdf_extraction.py [--pages 500 2000] [--lines 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../apps/server")))
+os.environ.setdefault("ENVIRONMENT", "test")
+
+from config.settings import settings
+from utils.file_extractor import extract_text_from_pdf
+
+
+def make_pdf(path: str, pages: int, lines: int):
+    """Write a PDF with `lines` lines of text on each page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages
+        )).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        body = " ".join(f"(Page {i + 1} line {n}: the quick brown fox jumps over the lazy dog) Tj T*" for n in range(lines))
+        content = f"BT /F1 9 Tf 11 TL 36 760 Td {body} ET".encode()
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        ).encode())
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        f.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def previous_extract(file_path: str) -> str:
+    # The implementation this replaced
+    import PyPDF2
+    text = ""
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        for page in pdf_reader.pages:
+            text += page.extract_text() + "\n"
+    return text.strip()
+
+
+def measure(label: str, fn, path: str):
+    start = time.perf_counter()
+    text = fn(path)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:28}{elapsed:>9.2f}s{len(text) / 1000:>10.0f}k chars")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--lines", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"doc{pages}.pdf")
+            make_pdf(path, pages, args.lines)
+            print(f"{pages} pages, {os.path.getsize(path) / (1024 * 1024):.1f}MB")
+            measure("previous (+= per page)", previous_extract, path)
+            measure("streaming, no limits", lambda p: extract_text_from_pdf(p, max_pages=0, max_chars=0), path)
+            measure(f"streaming, {settings.extraction_max_chars // 1000}k char budget", extract_text_from_pdf, path)
+            print()
+
+
+if __name__ == "__main__":
+    main()
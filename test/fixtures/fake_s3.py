@@ -0,0 +1,73 @@
+"""
+In-process stand-in for an S3-compatible object store
+Implements the subset of the boto3 S3 client used by utils.storage.S3Storage.
+"""
+import io
+from datetime import datetime, timezone
+
+
+class FakeS3Error(Exception):
+    """Shaped like botocore's ClientError"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """Minimal in-process subset of the boto3 S3 client"""
+
+    def __init__(self, page_size=1000):
+        self.objects = {}
+        self.modified = {}
+        self.calls = []
+        self.page_size = page_size
+
+    def _get(self, bucket, key):
+        if (bucket, key) not in self.objects:
+            raise FakeS3Error("404")
+        return self.objects[(bucket, key)]
+
+    def upload_fileobj(self, stream, bucket, key):
+        self.calls.append(("upload", key))
+        data = bytearray()
+        while True:
+            chunk = stream.read(4)
+            if not chunk:
+                break
+            data += chunk
+        self.objects[(bucket, key)] = bytes(data)
+        self.modified[(bucket, key)] = datetime.now(timezone.utc)
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.calls.append(("get", Key, Range))
+        data = self._get(Bucket, Key)
+        if Range:
+            start, end = Range[len("bytes="):].split("-")
+            if int(start) >= len(data):
+                raise FakeS3Error("InvalidRange")
+            data = data[int(start):int(end) + 1]
+        return {"Body": io.BytesIO(data)}
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self._get(Bucket, Key))}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+        self.modified.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix="", StartAfter="", ContinuationToken=None):
+        self.calls.append(("list", Prefix, ContinuationToken))
+        after = ContinuationToken or StartAfter
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix) and key > after)
+        page = keys[:self.page_size]
+        response = {
+            "Contents": [
+                {"Key": key, "Size": len(self.objects[(Bucket, key)]), "LastModified": self.modified[(Bucket, key)]}
+                for key in page
+            ],
+            "IsTruncated": len(keys) > self.page_size
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
@@ -29,7 +29,9 @@ def make_authenticated_request(
     Returns:
         Response object
     """
-    auth_headers = {"X-User-ID": user_id}
+    from utils.tokens import create_access_token
+    token, _ = create_access_token(user_id)
+    auth_headers = {"Authorization": f"Bearer {token}"}
     if headers:
         auth_headers.update(headers)
     
@@ -192,20 +192,29 @@ def test_conversation(test_db, test_user):
     return conversation
 
 
+def bearer_headers(user) -> dict:
+    """
+    Authorization header with a fresh access token for the user
+    """
+    from utils.tokens import create_access_token
+    token, _ = create_access_token(user.id, user.email)
+    return {"Authorization": f"Bearer {token}"}
+
+
 @pytest.fixture
 def auth_headers(test_user):
     """
-    Get authentication headers for test user
+    Get authentication headers (a bearer access token) for test user
     """
-    return {"X-User-ID": test_user.id}
+    return bearer_headers(test_user)
 
 
 @pytest.fixture
 def auth_headers_user_2(test_user_2):
     """
-    Get authentication headers for second test user
+    Get authentication headers (a bearer access token) for second test user
     """
-    return {"X-User-ID": test_user_2.id}
+    return bearer_headers(test_user_2)
 
 
 @pytest.fixture(autouse=True)
@@ -223,6 +232,16 @@ def setup_test_env(monkeypatch):
     # Settings object is created at import time, so we need to update it directly
     from config.settings import settings
     settings.encryption_key = TEST_ENCRYPTION_KEY
+    
+    # Process-wide caches would otherwise carry keys and negative entries
+    # from one test's database into the next
+    from utils.cache import api_key_cache, integration_cache
+    api_key_cache.clear()
+    integration_cache.clear()
+    
+    # Revocations (password changes, logouts) would refuse later tests' tokens
+    from utils.tokens import denylist
+    denylist.clear()
 
 
 @pytest.fixture
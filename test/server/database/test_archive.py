@@ -0,0 +1,106 @@
+"""
+Tests for conversation archival (hot/cold storage)
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from database import crud
+from database.archive import archive_old_conversations, archive_conversation, ensure_conversation_hot
+from database.models import ConversationArchive, Message
+
+
+def _age(test_db, conversation_id, days):
+    """Backdate a conversation's last activity"""
+    test_db.execute(
+        text("UPDATE conversations SET updated_at = :ts WHERE id = :id"),
+        {"ts": datetime.utcnow() - timedelta(days=days), "id": conversation_id}
+    )
+    test_db.commit()
+
+
+@pytest.mark.database
+class TestArchiveConversations:
+    """Test moving conversations between hot and cold storage"""
+    
+    def test_archive_old_conversations(self, test_db, test_user):
+        """Test only stale conversations are archived and their messages leave the hot table"""
+        old = crud.create_conversation(test_db, test_user.id, title="Old")
+        fresh = crud.create_conversation(test_db, test_user.id, title="Fresh")
+        for i in range(3):
+            crud.create_message(test_db, old.id, "user", f"old message {i}")
+        crud.create_message(test_db, fresh.id, "user", "fresh message")
+        _age(test_db, old.id, 400)
+        
+        stats = archive_old_conversations(test_db, older_than_days=180, chunk_size=1)
+        assert stats == {"conversations": 1, "messages": 3}
+        
+        test_db.expire_all()
+        assert crud.get_conversation(test_db, old.id).is_archived is True
+        assert crud.get_conversation(test_db, fresh.id).is_archived is False
+        assert test_db.query(Message).filter(Message.conversation_id == old.id).count() == 0
+        archive = test_db.get(ConversationArchive, old.id)
+        assert archive.message_count == 3
+        assert archive.payload_encoding == "zlib"
+    
+    def test_dry_run_changes_nothing(self, test_db, test_conversation):
+        """Test a dry run only reports what would be archived"""
+        crud.create_message(test_db, test_conversation.id, "user", "hello")
+        _age(test_db, test_conversation.id, 400)
+        
+        stats = archive_old_conversations(test_db, older_than_days=180, dry_run=True)
+        assert stats["conversations"] == 1
+        test_db.expire_all()
+        assert crud.get_conversation(test_db, test_conversation.id).is_archived is False
+        assert len(crud.get_conversation_messages(test_db, test_conversation.id)) == 1
+    
+    def test_restore_round_trip(self, test_db, test_conversation):
+        """Test restoring brings back identical messages without touching updated_at"""
+        originals = [
+            crud.create_message(test_db, test_conversation.id, "user", "question", model=None),
+            crud.create_message(test_db, test_conversation.id, "assistant", "x" * 5000, model="gpt-4o-mini"),
+        ]
+        expected = [(m.id, m.role, m.content, m.model) for m in originals]
+        _age(test_db, test_conversation.id, 400)
+        test_db.expire_all()
+        updated_at = crud.get_conversation(test_db, test_conversation.id).updated_at
+        
+        archive_conversation(test_db, test_conversation)
+        test_db.commit()
+        test_db.expire_all()
+        conversation = crud.get_conversation(test_db, test_conversation.id)
+        assert conversation.updated_at == updated_at
+        
+        ensure_conversation_hot(test_db, conversation)
+        assert conversation.is_archived is False
+        assert conversation.updated_at == updated_at
+        assert test_db.get(ConversationArchive, conversation.id) is None
+        restored = crud.get_conversation_messages(test_db, conversation.id)
+        assert [(m.id, m.role, m.content, m.model) for m in restored] == expected
+    
+    def test_deleting_conversation_drops_archive(self, test_db, test_conversation):
+        """Test archives are removed along with their conversation"""
+        crud.create_message(test_db, test_conversation.id, "user", "hello")
+        archive_conversation(test_db, test_conversation)
+        test_db.commit()
+        
+        test_db.delete(crud.get_conversation(test_db, test_conversation.id))
+        test_db.commit()
+        assert test_db.query(ConversationArchive).count() == 0
+
+
+@pytest.mark.api
+class TestArchivedConversationAPI:
+    """Test archived conversations are transparent to API clients"""
+    
+    def test_get_messages_restores_archive(self, client, test_db, test_user, test_conversation, auth_headers):
+        """Test opening an archived conversation returns its messages"""
+        crud.create_message(test_db, test_conversation.id, "user", "remember this")
+        archive_conversation(test_db, test_conversation)
+        test_db.commit()
+        
+        response = client.get(f"/conversations/{test_conversation.id}/messages", headers=auth_headers)
+        assert response.status_code == 200
+        assert [m["content"] for m in response.json()] == ["remember this"]
+        
+        details = client.get(f"/conversations/{test_conversation.id}/details", headers=auth_headers)
+        assert details.json()["is_archived"] is False
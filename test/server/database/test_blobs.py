@@ -0,0 +1,284 @@
+"""
+Tests for content-addressed upload storage
+"""
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from unittest.mock import patch
+import pytest
+from config.settings import settings
+from database import crud
+from database import blobs
+from database.blobs import (
+    acquire_blob, acquire_blob_async, release_blobs, remove_blob_files, get_file_text, get_file_text_async, get_files_text_async
+)
+from database.models import FileBlob, FileBlobMember
+from utils.storage import S3Storage, CachedStorage, set_storage
+from test.fixtures.fake_s3 import FakeS3Client
+from utils.uploads import StoredUpload
+
+
+@pytest.fixture
+def blob_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_blob_dir", str(tmp_path / "blobs"))
+    return tmp_path
+
+
+def write_upload(directory, data: bytes, name: str) -> StoredUpload:
+    path = os.path.join(str(directory), name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return StoredUpload(path, name, len(data), hashlib.sha256(data).hexdigest())
+
+
+@pytest.mark.database
+class TestFileBlobs:
+    """Test blob storage and reference counting"""
+
+    def test_identical_uploads_share_a_blob(self, test_db, blob_dir):
+        """Test the second copy of the same content is discarded"""
+        first = write_upload(blob_dir, b"same bytes", "a.part")
+        second = write_upload(blob_dir, b"same bytes", "b.part")
+
+        blob_a = acquire_blob(test_db, first)
+        blob_b = acquire_blob(test_db, second)
+
+        assert blob_a.id == blob_b.id
+        assert blob_b.ref_count == 2
+        assert os.path.exists(blob_a.storage_path)
+        assert not os.path.exists(first.path)
+        assert not os.path.exists(second.path)
+        assert test_db.query(FileBlob).count() == 1
+
+    def test_different_content_gets_separate_blobs(self, test_db, blob_dir):
+        """Test different content is stored separately"""
+        blob_a = acquire_blob(test_db, write_upload(blob_dir, b"one", "a.part"))
+        blob_b = acquire_blob(test_db, write_upload(blob_dir, b"two", "b.part"))
+        assert blob_a.id != blob_b.id
+        assert blob_a.storage_path != blob_b.storage_path
+
+    def test_release_removes_blob_at_zero(self, test_db, blob_dir):
+        """Test the file is only removed once the last reference is released"""
+        blob = acquire_blob(test_db, write_upload(blob_dir, b"data", "a.part"), refs=2)
+        path = blob.storage_path
+
+        assert release_blobs(test_db, [blob.id]) == []
+        test_db.commit()
+        assert os.path.exists(path)
+
+        released = release_blobs(test_db, [blob.id])
+        test_db.commit()
+        remove_blob_files(released)
+
+        assert released == [path]
+        assert not os.path.exists(path)
+        assert test_db.query(FileBlob).count() == 0
+
+    def test_missing_file_is_restored(self, test_db, blob_dir):
+        """Test a blob whose file vanished is repaired by the next identical upload"""
+        blob = acquire_blob(test_db, write_upload(blob_dir, b"data", "a.part"))
+        os.remove(blob.storage_path)
+
+        blob = acquire_blob(test_db, write_upload(blob_dir, b"data", "b.part"))
+        with open(blob.storage_path, "rb") as f:
+            assert f.read() == b"data"
+
+    @pytest.mark.asyncio
+    async def test_async_keeps_session_on_calling_thread(self, test_db, blob_dir, monkeypatch):
+        """Test only the storage step leaves the event loop thread"""
+        threads = {"db": set(), "storage": set()}
+        execute, store_content = test_db.execute, blobs._store_content
+
+        def recording_execute(*args, **kwargs):
+            threads["db"].add(threading.get_ident())
+            return execute(*args, **kwargs)
+
+        def recording_store_content(*args):
+            threads["storage"].add(threading.get_ident())
+            return store_content(*args)
+        monkeypatch.setattr(test_db, "execute", recording_execute)
+        monkeypatch.setattr(blobs, "_store_content", recording_store_content)
+
+        first = await acquire_blob_async(test_db, write_upload(blob_dir, b"data", "a.part"))
+        second = await acquire_blob_async(test_db, write_upload(blob_dir, b"data", "b.part"))
+        assert first.id == second.id and second.ref_count == 2
+        assert threads["db"] == {threading.get_ident()}
+        assert threads["storage"] and threading.get_ident() not in threads["storage"]
+
+
+@pytest.mark.database
+class TestFileBlobCRUD:
+    """Test file rows keep blob reference counts right"""
+
+    def test_delete_project_file_releases_blob(self, test_db, test_project, blob_dir):
+        """Test deleting file rows drops references and finally the file"""
+        files = []
+        for name in ("a.part", "b.part"):
+            blob = acquire_blob(test_db, write_upload(blob_dir, b"shared", name))
+            files.append(crud.create_project_file(
+                test_db, test_project.id, "doc.txt", blob.size, blob.storage_path, blob_id=blob.id
+            ))
+        path = blob.storage_path
+
+        crud.delete_project_file(test_db, files[0].id)
+        assert os.path.exists(path)
+        assert test_db.query(FileBlob).one().ref_count == 1
+
+        crud.delete_project_file(test_db, files[1].id)
+        assert not os.path.exists(path)
+        assert test_db.query(FileBlob).count() == 0
+
+    def test_delete_conversation_releases_blobs(self, test_db, test_conversation, blob_dir):
+        """Test deleting a conversation releases its attachments"""
+        blob = acquire_blob(test_db, write_upload(blob_dir, b"attached", "a.part"))
+        crud.create_chat_file(
+            test_db, test_conversation.id, "doc.txt", blob.size, blob.storage_path, blob_id=blob.id
+        )
+        path = blob.storage_path
+
+        assert crud.delete_conversation(test_db, test_conversation.id)
+        assert not os.path.exists(path)
+        assert test_db.query(FileBlob).count() == 0
+
+    def test_delete_user_releases_blobs(self, test_db, test_user, test_project, test_conversation, blob_dir):
+        """Test deleting a user releases chat and project attachments"""
+        blob = acquire_blob(test_db, write_upload(blob_dir, b"both", "a.part"), refs=2)
+        crud.create_chat_file(
+            test_db, test_conversation.id, "doc.txt", blob.size, blob.storage_path, blob_id=blob.id
+        )
+        crud.create_project_file(
+            test_db, test_project.id, "doc.txt", blob.size, blob.storage_path, blob_id=blob.id
+        )
+        path = blob.storage_path
+
+        assert crud.delete_user(test_db, test_user.id)
+        assert not os.path.exists(path)
+        assert test_db.query(FileBlob).count() == 0
+
+    def test_extracted_text_shared_per_blob(self, test_db, test_project, blob_dir):
+        """Test identical files are only parsed once"""
+        blob = acquire_blob(test_db, write_upload(blob_dir, b"hello from a file", "a.part"), refs=2)
+        first = crud.create_project_file(
+            test_db, test_project.id, "one.txt", blob.size, blob.storage_path, blob_id=blob.id
+        )
+        second = crud.create_project_file(
+            test_db, test_project.id, "two.txt", blob.size, blob.storage_path, blob_id=blob.id
+        )
+
+        with patch("database.blobs.extract_text_from_file", return_value="hello from a file") as mock_extract:
+            assert get_file_text(test_db, first) == "hello from a file"
+            assert get_file_text(test_db, second) == "hello from a file"
+        assert mock_extract.call_count == 1
+
+    def test_extraction_errors_not_stored(self, test_db, test_project, blob_dir):
+        """Test a failed extraction is retried on the next read"""
+        blob = acquire_blob(test_db, write_upload(blob_dir, b"%PDF", "a.part"))
+        project_file = crud.create_project_file(
+            test_db, test_project.id, "doc.pdf", blob.size, blob.storage_path, blob_id=blob.id
+        )
+
+        with patch("database.blobs.extract_text_from_file", return_value="[Error: broken]"):
+            get_file_text(test_db, project_file)
+        test_db.refresh(blob)
+        assert blob.extracted_text is None
+
+    def test_archive_members_indexed_per_blob(self, test_db, test_project, blob_dir):
+        """Test archive members are stored once and only relevant ones are returned"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("billing/invoice.txt", "invoice totals are computed nightly")
+            archive.writestr("deploy/notes.txt", "rollout uses kubernetes")
+        blob = acquire_blob(test_db, write_upload(blob_dir, buffer.getvalue(), "a.part"))
+        project_file = crud.create_project_file(
+            test_db, test_project.id, "bundle.zip", blob.size, blob.storage_path,
+            file_type="application/zip", blob_id=blob.id
+        )
+
+        text = get_file_text(test_db, project_file, "how are invoice totals computed?")
+        assert "invoice totals are computed nightly" in text
+        assert "kubernetes" not in text
+        assert test_db.query(FileBlobMember).filter(FileBlobMember.blob_id == blob.id).count() == 2
+
+        with patch("database.blobs.extract_archive") as mock_extract:
+            text = get_file_text(test_db, project_file, "what does the kubernetes rollout do?")
+        mock_extract.assert_not_called()
+        assert "rollout uses kubernetes" in text
+        assert "invoice totals" not in text
+
+        assert crud.delete_project_file(test_db, project_file.id)
+        assert test_db.query(FileBlobMember).count() == 0
+
+    @pytest.mark.asyncio
+    async def test_archive_extracted_in_pool(self, test_db, test_project, blob_dir, monkeypatch):
+        """Test archives go through the extraction pool and are indexed"""
+        monkeypatch.setattr(settings, "extraction_workers", 0)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("notes.txt", "pooled archive member")
+        blob = acquire_blob(test_db, write_upload(blob_dir, buffer.getvalue(), "a.part"))
+        project_file = crud.create_project_file(
+            test_db, test_project.id, "bundle.zip", blob.size, blob.storage_path, blob_id=blob.id
+        )
+
+        assert "pooled archive member" in await get_file_text_async(test_db, project_file, "notes")
+        assert test_db.query(FileBlobMember).filter(FileBlobMember.blob_id == blob.id).count() == 1
+
+    @pytest.mark.asyncio
+    async def test_several_files_stored_after_parsing(self, test_db, test_project, blob_dir, monkeypatch):
+        """Test files are parsed concurrently but stored one at a time, after all parsing"""
+        monkeypatch.setattr(settings, "extraction_workers", 0)
+        files = []
+        for name, data in (("a.txt", b"first file"), ("b.txt", b"second file")):
+            blob = acquire_blob(test_db, write_upload(blob_dir, data, name + ".part"))
+            files.append(crud.create_project_file(
+                test_db, test_project.id, name, blob.size, blob.storage_path, blob_id=blob.id
+            ))
+        missing = acquire_blob(test_db, write_upload(blob_dir, b"gone", "c.part"))
+        os.remove(missing.storage_path)
+        files.append(crud.create_project_file(
+            test_db, test_project.id, "c.txt", missing.size, missing.storage_path, blob_id=missing.id
+        ))
+
+        parsing = 0
+        extract = blobs.extract_file_async
+        store = blobs.store_extraction
+
+        async def counting_extract(file):
+            nonlocal parsing
+            parsing += 1
+            try:
+                return await extract(file)
+            finally:
+                parsing -= 1
+
+        def checked_store(*args, **kwargs):
+            assert parsing == 0
+            return store(*args, **kwargs)
+
+        monkeypatch.setattr(blobs, "extract_file_async", counting_extract)
+        monkeypatch.setattr(blobs, "store_extraction", checked_store)
+        assert await get_files_text_async(test_db, files) == ["first file", "second file", ""]
+        assert [f.blob.extracted_text for f in files[:2]] == ["first file", "second file"]
+
+    def test_remote_storage(self, test_db, test_project, blob_dir):
+        """Test blobs can live in an S3-compatible store, read through the local cache"""
+        s3 = FakeS3Client()
+        storage = CachedStorage(S3Storage(s3, "bucket"), str(blob_dir / "cache"), max_bytes=0)
+        set_storage(storage)
+        try:
+            blob = acquire_blob(test_db, write_upload(blob_dir, b"stored remotely", "a.part"))
+            assert s3.objects[("bucket", blob.storage_path)] == b"stored remotely"
+            project_file = crud.create_project_file(
+                test_db, test_project.id, "remote.txt", blob.size, blob.storage_path, blob_id=blob.id
+            )
+
+            os.remove(storage._cache_path(blob.storage_path))  # As seen from another node
+            assert get_file_text(test_db, project_file) == "stored remotely"
+            assert storage.misses == 1
+
+            assert crud.delete_project_file(test_db, project_file.id)
+            assert s3.objects == {}
+        finally:
+            set_storage(None)
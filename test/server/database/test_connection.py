@@ -0,0 +1,201 @@
+"""
+Tests for database connection routing
+"""
+import time
+import pytest
+from sqlalchemy import create_engine, event, text, exc
+from sqlalchemy.orm import object_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from database.connection import Base, RoutingSession, use_replica, _create_engine
+from database import crud
+from database.models import User
+from database import pool_metrics
+from database.pool_metrics import InstrumentedQueuePool, PoolMetrics, instrument_engine, pool_summary
+
+
+def _memory_engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def routed_session():
+    """Session bound to a primary engine with a separate replica engine"""
+    primary = _memory_engine()
+    replica = _memory_engine()
+
+    # Seed the replica with a row the primary doesn't have
+    with sessionmaker(bind=replica)() as seed:
+        seed.add(User(id="replica_user", email="replica@example.com", password_hash="x"))
+        seed.commit()
+
+    session = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=primary,
+        class_=RoutingSession,
+        replica_bind=replica
+    )()
+    try:
+        yield session, primary, replica
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=primary)
+        Base.metadata.drop_all(bind=replica)
+
+
+@pytest.mark.database
+class TestRoutingSession:
+    """Test read replica routing"""
+
+    def test_reads_default_to_primary(self, routed_session):
+        """Test queries outside use_replica go to the primary"""
+        session, primary, replica = routed_session
+        assert session.get_bind() is primary
+        assert session.query(User).filter(User.id == "replica_user").first() is None
+
+    def test_use_replica_routes_reads(self, routed_session):
+        """Test queries inside use_replica go to the replica"""
+        session, primary, replica = routed_session
+        with use_replica(session):
+            assert session.get_bind() is replica
+            user = session.query(User).filter(User.id == "replica_user").first()
+        assert user is not None
+        assert session.get_bind() is primary
+
+    def test_sticks_to_primary_after_write(self, routed_session):
+        """Test a session reads its own writes once it has written"""
+        session, primary, replica = routed_session
+        session.add(User(id="primary_user", email="primary@example.com", password_hash="x"))
+        session.commit()
+
+        with use_replica(session):
+            assert session.get_bind() is primary
+            assert session.query(User).filter(User.id == "primary_user").first() is not None
+            assert session.query(User).filter(User.id == "replica_user").first() is None
+
+    def test_flush_goes_to_primary(self, routed_session):
+        """Test statements issued while flushing inside use_replica use the primary"""
+        session, primary, replica = routed_session
+        binds = []
+
+        def record_bind(mapper, connection, target):
+            binds.append(object_session(target).get_bind(mapper))
+        event.listen(User, "before_insert", record_bind)
+        try:
+            with use_replica(session):
+                session.add(User(id="primary_user", email="primary@example.com", password_hash="x"))
+                session.flush()
+        finally:
+            event.remove(User, "before_insert", record_bind)
+        assert binds == [primary]
+        assert session.info["wrote"] is True
+
+    def test_crud_read_paths_use_replica(self, routed_session):
+        """Test read-only CRUD helpers are replica routed"""
+        session, primary, replica = routed_session
+        with sessionmaker(bind=replica)() as seed:
+            crud.create_conversation(seed, user_id="replica_user", title="Replica chat")
+
+        conversations = crud.get_user_conversations(session, "replica_user")
+        assert [c.title for c in conversations] == ["Replica chat"]
+
+    def test_plain_session_ignores_hint(self, test_db, test_user):
+        """Test use_replica is a no-op for sessions without a replica"""
+        with use_replica(test_db):
+            user = crud.get_user_by_id(test_db, test_user.id)
+        assert user is not None
+        assert "use_replica" in test_db.info
+        assert test_db.info["use_replica"] is False
+
+
+@pytest.mark.database
+class TestPoolMetrics:
+    """Test connection pool instrumentation"""
+    
+    def _pooled_engine(self, tmp_path, **kwargs):
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            connect_args={"check_same_thread": False},
+            poolclass=InstrumentedQueuePool,
+            **kwargs
+        )
+        instrument_engine(engine)
+        return engine
+    
+    def test_checkouts_and_connects_are_counted(self, tmp_path):
+        """Test checkouts, checkins and new connections are recorded"""
+        engine = self._pooled_engine(tmp_path, pool_size=2, max_overflow=0)
+        for _ in range(3):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        
+        stats = pool_summary(engine)
+        assert stats["checkouts"] == 3
+        assert stats["checkins"] == 3
+        assert stats["connects"] == 1
+        assert stats["open_connections"] == 1
+        assert stats["size"] == 2
+        assert stats["pool_class"] == "InstrumentedQueuePool"
+        engine.dispose()
+    
+    def test_overflow_and_timeouts(self, tmp_path):
+        """Test overflow usage is tracked and exhausted pools count timeouts"""
+        engine = self._pooled_engine(tmp_path, pool_size=1, max_overflow=1, pool_timeout=0.05)
+        first = engine.connect()
+        second = engine.connect()
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        
+        stats = pool_summary(engine)
+        assert stats["overflow_peak"] == 1
+        assert stats["overflow_checkouts"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["recent_timeouts"] == 1
+        assert stats["checked_out"] == 2
+        assert stats["wait_ms_max"] >= 50
+        first.close()
+        second.close()
+        engine.dispose()
+    
+    def test_old_timeouts_no_longer_recent(self, monkeypatch):
+        """Test a timeout drops out of recent_timeouts after the window"""
+        metrics = PoolMetrics()
+        metrics.record_timeout(0.01)
+        assert metrics.snapshot()["recent_timeouts"] == 1
+        later = time.monotonic() + pool_metrics.RECENT_TIMEOUT_WINDOW_S + 1
+        monkeypatch.setattr(pool_metrics.time, "monotonic", lambda: later)
+        stats = metrics.snapshot()
+        assert (stats["timeouts"], stats["recent_timeouts"]) == (1, 0)
+    
+    def test_metrics_survive_dispose(self, tmp_path):
+        """Test counters carry over when the engine recreates its pool"""
+        engine = self._pooled_engine(tmp_path)
+        with engine.connect():
+            pass
+        engine.dispose()
+        with engine.connect():
+            pass
+        
+        stats = pool_summary(engine)
+        assert stats["checkouts"] == 2
+        assert stats["connects"] == 2
+        engine.dispose()
+    
+    def test_sqlite_file_pool_is_configurable(self, tmp_path):
+        """Test SQLite file engines use the configured pool size and overflow"""
+        engine = _create_engine(f"sqlite:///{tmp_path / 'sized.db'}", pool_size=3, max_overflow=4)
+        assert isinstance(engine.pool, InstrumentedQueuePool)
+        assert engine.pool.size() == 3
+        assert engine.pool._max_overflow == 4
+        engine.dispose()
+    
+    def test_uninstrumented_engine(self):
+        """Test engines without metrics report nothing"""
+        assert pool_summary(None) is None
+        assert pool_summary(create_engine("sqlite://")) is None
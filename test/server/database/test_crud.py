@@ -246,6 +246,39 @@ class TestMessageCRUD:
         assert len(messages) == 2
         assert messages[0].role == "user"
         assert messages[1].role == "assistant"
+    
+    def test_large_message_stored_compressed(self, test_db, test_user):
+        """Test large bodies are compressed at rest and read back transparently"""
+        from sqlalchemy import text
+        conversation = crud.create_conversation(test_db, test_user.id, "Test Conv")
+        body = "A long assistant reply with plenty of repetition. " * 200
+        
+        message = crud.create_message(test_db, conversation.id, "assistant", body)
+        assert message.content == body
+        
+        stored, encoding = test_db.execute(
+            text("SELECT content, content_encoding FROM messages WHERE id = :id"),
+            {"id": message.id}
+        ).one()
+        assert encoding == "zlib"
+        assert len(stored) < len(body)
+        
+        test_db.expire_all()
+        assert crud.get_conversation_messages(test_db, conversation.id)[0].content == body
+    
+    def test_small_message_stored_plain(self, test_db, test_user):
+        """Test small bodies are stored as plain text"""
+        conversation = crud.create_conversation(test_db, test_user.id, "Test Conv")
+        message = crud.create_message(test_db, conversation.id, "user", "Hi")
+        assert message.content_encoding is None
+    
+    def test_content_refused_in_sql(self, test_db, test_user):
+        """Test querying on content raises rather than missing compressed rows"""
+        from sqlalchemy.exc import CompileError
+        conversation = crud.create_conversation(test_db, test_user.id, "Test Conv")
+        crud.create_message(test_db, conversation.id, "assistant", "A long reply. " * 200)
+        with pytest.raises(CompileError, match="Message.content"):
+            test_db.query(Message).filter(Message.content.like("%long reply%")).all()
 
 
 @pytest.mark.database
@@ -0,0 +1,160 @@
+"""
+Tests for garbage collection of unreferenced stored files
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from config.settings import settings
+from database import crud
+from database.blobs import acquire_blob
+from database.file_gc import FileCollector
+from database.models import FileBlob, UploadSession, UploadChunk
+from database.upload_sessions import create_session, COMPLETING
+from utils.storage import S3Storage, CachedStorage, set_storage
+from utils.uploads import StoredUpload
+from test.fixtures.fake_s3 import FakeS3Client
+
+GRACE = 3600
+
+
+@pytest.fixture
+def upload_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_blob_dir", str(tmp_path / "uploads" / "blobs"))
+    monkeypatch.setattr(settings, "upload_session_dir", str(tmp_path / "uploads" / "sessions"))
+    monkeypatch.setattr(settings, "storage_cache_dir", str(tmp_path / "uploads" / "cache"))
+    monkeypatch.setattr(settings, "file_gc_legacy_dirs", [str(tmp_path / "uploads"), str(tmp_path / "uploads" / "projects")])
+    return tmp_path / "uploads"
+
+
+@pytest.fixture
+def collector(test_db):
+    return FileCollector(test_db.get_bind(), batch_size=100, grace_period=GRACE)
+
+
+def write_file(path, data: bytes = b"content", age: float = 2 * GRACE) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    then = time.time() - age
+    os.utime(path, (then, then))
+    return str(path)
+
+
+def make_blob(test_db, directory, data: bytes, refs: int, age: float = 2 * GRACE) -> FileBlob:
+    path = write_file(os.path.join(str(directory), f".upload-{hashlib.sha256(data).hexdigest()[:8]}.part"), data, age=0)
+    stored = StoredUpload(path, os.path.basename(path), len(data), hashlib.sha256(data).hexdigest())
+    blob = acquire_blob(test_db, stored, refs)
+    blob.created_at = datetime.utcnow() - timedelta(seconds=age)
+    test_db.commit()
+    return blob
+
+
+@pytest.mark.database
+class TestFileCollector:
+    """Test reconciling stored files against the tables"""
+
+    def test_unattached_blob_removed_after_grace(self, test_db, upload_root, collector):
+        """Test uploads never attached to anything are removed once old enough"""
+        old = make_blob(test_db, upload_root, b"abandoned", refs=0)
+        recent = make_blob(test_db, upload_root, b"just uploaded", refs=0, age=10)
+        used = make_blob(test_db, upload_root, b"attached", refs=1)
+        old_path, recent_path, used_path = old.storage_path, recent.storage_path, used.storage_path
+
+        result = collector.run_once()
+        assert result["blobs_removed"] == 1
+        assert result["bytes_reclaimed"] == len(b"abandoned")
+        assert not os.path.exists(old_path)
+        assert os.path.exists(recent_path) and os.path.exists(used_path)
+        assert {blob.sha256 for blob in test_db.query(FileBlob)} == {
+            hashlib.sha256(b"just uploaded").hexdigest(), hashlib.sha256(b"attached").hexdigest()
+        }
+
+    def test_orphaned_blob_content_removed(self, test_db, upload_root, collector):
+        """Test content without a blob row is removed, but not while it may be in flight"""
+        blob = make_blob(test_db, upload_root, b"kept", refs=1)
+        os.utime(blob.storage_path, (0, 0))
+        orphan = write_file(upload_root / "blobs" / "ab" / "abcd-1234", b"left by a crash")
+        young = write_file(upload_root / "blobs" / "cd" / "cdef-5678", b"being stored", age=10)
+        spool = write_file(upload_root / "blobs" / ".upload-dead.part", b"interrupted")
+
+        result = collector.run_once()
+        assert result["files_removed"] == 2
+        assert not os.path.exists(orphan) and not os.path.exists(spool)
+        assert os.path.exists(young) and os.path.exists(blob.storage_path)
+
+    def test_legacy_files(self, test_db, test_conversation, upload_root, collector):
+        """Test files from before blobs are removed once no row points at them"""
+        kept = write_file(upload_root / "report.pdf")
+        crud.create_chat_file(test_db, test_conversation.id, "report.pdf", 7, kept, "application/pdf")
+        deleted = write_file(upload_root / "projects" / "old.txt")
+
+        result = collector.run_once()
+        assert result["files_removed"] == 1
+        assert os.path.exists(kept)
+        assert not os.path.exists(deleted)
+
+    def test_works_through_batches(self, test_db, upload_root):
+        """Test a pass checks a bounded number of keys and the next pass resumes"""
+        collector = FileCollector(test_db.get_bind(), batch_size=2, grace_period=GRACE)
+        orphans = [write_file(upload_root / "blobs" / "aa" / f"orphan-{n}") for n in range(5)]
+
+        removed = [collector.run_once()["files_removed"] for _ in range(3)]
+        assert removed == [2, 2, 1]
+        assert not any(os.path.exists(path) for path in orphans)
+        assert collector.stats["passes"] == 3
+        assert collector.stats["files_removed"] == 5
+        assert collector.stats["bytes_reclaimed"] == 5 * len(b"content")
+
+    def test_expired_sessions_and_orphaned_chunks(self, test_db, test_user, test_project, upload_root, collector):
+        """Test expired upload sessions go, and so do chunks whose session row is gone"""
+        session = create_session(test_db, test_user.id, "big.pdf", 100, project_id=test_project.id)
+        chunk = write_file(upload_root / "sessions" / session.id / "000000000000-aaaa")
+        test_db.add(UploadChunk(session_id=session.id, offset=0, size=7, sha256="0" * 64, storage_path=chunk))
+        session.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        test_db.commit()
+        orphan_chunk = write_file(upload_root / "sessions" / "gone" / "000000000000-bbbb")
+
+        result = collector.run_once()
+        assert result["sessions_purged"] == 1
+        assert test_db.query(UploadSession).count() == 0
+        assert not os.path.exists(chunk)
+        assert not os.path.exists(orphan_chunk)
+
+    def test_session_being_completed_kept(self, test_db, test_user, test_project, upload_root, collector):
+        """Test a session still being assembled keeps its chunks past its expiry"""
+        session = create_session(test_db, test_user.id, "big.pdf", 100, project_id=test_project.id)
+        chunk = write_file(upload_root / "sessions" / session.id / "000000000000-aaaa")
+        test_db.add(UploadChunk(session_id=session.id, offset=0, size=7, sha256="0" * 64, storage_path=chunk))
+        session.status = COMPLETING
+        session.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        test_db.commit()
+
+        assert collector.run_once()["sessions_purged"] == 0
+        assert os.path.exists(chunk)
+
+        # Unless its finalize call died long ago
+        session.expires_at = datetime.utcnow() - timedelta(seconds=settings.upload_session_ttl + 1)
+        test_db.commit()
+        assert collector.run_once()["sessions_purged"] == 1
+        assert not os.path.exists(chunk)
+
+    def test_object_storage(self, test_db, upload_root, collector):
+        """Test orphaned objects in a remote store are removed, as are local spool files"""
+        s3 = FakeS3Client()
+        set_storage(CachedStorage(S3Storage(s3, "bucket"), settings.storage_cache_dir, max_bytes=0))
+        try:
+            blob = make_blob(test_db, upload_root, b"remote", refs=1)
+            orphan_key = os.path.join(settings.upload_blob_dir, "ff", "ffff-0000")
+            s3.objects[("bucket", orphan_key)] = b"orphan"
+            s3.modified[("bucket", orphan_key)] = datetime.fromtimestamp(0).astimezone()
+            s3.modified[("bucket", blob.storage_path)] = datetime.fromtimestamp(0).astimezone()
+            spool = write_file(upload_root / "blobs" / ".upload-dead.part")
+
+            result = collector.run_once()
+            assert result["files_removed"] == 2
+            assert set(key for _, key in s3.objects) == {blob.storage_path}
+            assert not os.path.exists(spool)
+        finally:
+            set_storage(None)
@@ -0,0 +1,108 @@
+"""
+Tests for the database-backed cache invalidation bus
+Two buses on one SQLite file stand in for two worker processes.
+"""
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from database.invalidation import InvalidationBus
+from database.models import CacheInvalidation
+from utils.cache import (
+    get_cached_api_key, set_cached_api_key, clear_api_key_cache,
+    get_cached_integration, set_cached_integration
+)
+
+
+@pytest.fixture
+def buses(tmp_path):
+    """Two started buses sharing one database file"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'bus.db'}", connect_args={"check_same_thread": False})
+    # Long interval: tests drive polling themselves
+    first = InvalidationBus(engine, poll_interval=60)
+    second = InvalidationBus(engine, poll_interval=60)
+    first.start()
+    second.start()
+    yield first, second, engine
+    first.stop()
+    second.stop()
+    engine.dispose()
+
+
+@pytest.mark.database
+class TestInvalidationBus:
+    """Test cross-process cache invalidation"""
+    
+    def test_key_invalidation_reaches_other_process(self, buses):
+        """Test an invalidation published by one process evicts the key in another"""
+        first, second, _ = buses
+        first.publish("api_keys", key="api_key:bus_user:openai")
+        set_cached_api_key("bus_user", "openai", "sk-stale")
+        
+        assert second.poll() == 1
+        assert get_cached_api_key("bus_user", "openai") is None
+    
+    def test_tag_invalidation(self, buses):
+        """Test group invalidations are applied through the tag index"""
+        first, second, _ = buses
+        first.publish("integrations", tag="user:bus_user")
+        set_cached_integration("bus_user", type("Integration", (), {
+            "id": 1, "name": "Local", "provider_id": "custom_local",
+            "base_url": "http://localhost", "api_type": "openai", "is_active": True
+        })())
+        
+        second.poll()
+        assert get_cached_integration("bus_user", "custom_local") is None
+    
+    def test_own_invalidations_are_skipped(self, buses):
+        """Test a process doesn't re-apply what it published"""
+        first, _, _ = buses
+        first.publish("api_keys", key="api_key:bus_user:openai")
+        set_cached_api_key("bus_user", "openai", "sk-fresh")
+        
+        assert first.poll() == 0
+        assert get_cached_api_key("bus_user", "openai") == "sk-fresh"
+    
+    def test_idle_poll_skips_table(self, buses):
+        """Test data_version short-circuits polls when nothing was committed"""
+        first, second, _ = buses
+        second.poll()
+        assert second._changed() is False
+        
+        first.publish("api_keys", key="anything")
+        assert second._changed() is True
+    
+    def test_local_clears_are_published(self, buses):
+        """Test clearing a cache records the invalidation for other processes"""
+        _, _, engine = buses
+        clear_api_key_cache("bus_user")
+        
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT namespace, tag FROM cache_invalidations")).all()
+        # One row per started bus (each stands in for a process)
+        assert rows == [("api_keys", "user:bus_user")] * 2
+    
+    def test_start_ignores_history(self, buses):
+        """Test a newly started process doesn't replay old invalidations"""
+        first, _, engine = buses
+        first.publish("api_keys", key="api_key:bus_user:openai")
+        late = InvalidationBus(engine, poll_interval=60)
+        late.start()
+        try:
+            set_cached_api_key("bus_user", "openai", "sk-current")
+            assert late.poll() == 0
+            assert get_cached_api_key("bus_user", "openai") == "sk-current"
+        finally:
+            late.stop()
+    
+    def test_prune(self, buses):
+        """Test old log rows are removed"""
+        first, _, engine = buses
+        first.publish("api_keys", key="old")
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE cache_invalidations SET created_at = :ts"),
+                {"ts": datetime.utcnow() - timedelta(hours=2)}
+            )
+        first.publish("api_keys", key="new")
+        
+        assert first.prune() == 1
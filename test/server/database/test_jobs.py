@@ -0,0 +1,177 @@
+"""
+Tests for the database-backed background job queue
+Most tests drive the queue with run_once()/claim() rather than starting workers.
+"""
+import asyncio
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import sessionmaker
+from database.jobs import (
+    JobQueue, JobCancelled, enqueue, register_handler,
+    QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED
+)
+from database.models import Job
+
+
+async def _succeed(db, job, report):
+    report(50, "halfway")
+
+
+async def _fail(db, job, report):
+    raise RuntimeError("parser exploded")
+
+
+async def _cancel(db, job, report):
+    raise JobCancelled("nothing to do")
+
+
+async def _hang(db, job, report):
+    await asyncio.sleep(10)
+
+
+register_handler("test_succeed", _succeed)
+register_handler("test_fail", _fail)
+register_handler("test_cancel", _cancel)
+register_handler("test_hang", _hang)
+
+
+@pytest.fixture
+def queue(test_db):
+    return JobQueue(
+        sessionmaker(bind=test_db.get_bind()),
+        workers=1,
+        user_concurrency=1,
+        retry_base_delay=5,
+        retry_max_delay=60
+    )
+
+
+def reload(test_db, job) -> Job:
+    test_db.expire_all()
+    return test_db.get(Job, job.id)
+
+
+@pytest.mark.database
+class TestJobQueue:
+    """Test claiming, running and retrying jobs"""
+
+    @pytest.mark.asyncio
+    async def test_job_runs_to_completion(self, test_db, test_user, queue):
+        """Test a queued job is claimed, reports progress and succeeds"""
+        job = enqueue(test_db, test_user.id, "test_succeed", {"n": 1})
+        assert job.status == QUEUED
+
+        assert await queue.run_once()
+        job = reload(test_db, job)
+        assert (job.status, job.progress, job.stage, job.attempts) == (SUCCEEDED, 100, "done", 1)
+        assert job.finished_at is not None
+        assert not await queue.run_once()
+
+    @pytest.mark.asyncio
+    async def test_failure_retried_with_backoff(self, test_db, test_user, queue):
+        """Test a failed attempt is requeued for later, then failed for good"""
+        job = enqueue(test_db, test_user.id, "test_fail", {}, max_attempts=2)
+
+        before = datetime.utcnow()
+        await queue.run_once()
+        job = reload(test_db, job)
+        assert (job.status, job.attempts, job.error) == (QUEUED, 1, "parser exploded")
+        assert job.run_after >= before + timedelta(seconds=5)
+        assert not await queue.run_once()  # Not due yet
+
+        job.run_after = datetime.utcnow()
+        test_db.commit()
+        await queue.run_once()
+        job = reload(test_db, job)
+        assert (job.status, job.attempts) == (FAILED, 2)
+        assert queue.failed == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_writes_off_event_loop(self, test_db, test_user, queue, monkeypatch):
+        """Test claims, progress and outcomes are written from worker threads"""
+        threads = []
+        for name in ("claim", "_apply"):
+            def recording(*args, _original=getattr(queue, name), **kwargs):
+                threads.append(threading.get_ident())
+                return _original(*args, **kwargs)
+            monkeypatch.setattr(queue, name, recording)
+        job = enqueue(test_db, test_user.id, "test_succeed", {})
+
+        assert await queue.run_once()
+        assert reload(test_db, job).status == SUCCEEDED
+        assert len(threads) == 3  # Claim, progress, outcome
+        assert threading.get_ident() not in threads
+
+    def test_retry_delay_grows_exponentially(self, queue):
+        """Test the backoff doubles per attempt up to the cap"""
+        assert [queue.retry_delay(n) for n in (1, 2, 3, 4, 10)] == [5, 10, 20, 40, 60]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_job_not_retried(self, test_db, test_user, queue):
+        """Test a handler can end a job without it counting as a failure"""
+        job = enqueue(test_db, test_user.id, "test_cancel", {})
+        await queue.run_once()
+        job = reload(test_db, job)
+        assert (job.status, job.error) == (CANCELLED, "nothing to do")
+
+    @pytest.mark.asyncio
+    async def test_unknown_kind_fails(self, test_db, test_user, queue):
+        """Test a job nobody can run ends up failed"""
+        job = enqueue(test_db, test_user.id, "no_such_kind", {}, max_attempts=1)
+        await queue.run_once()
+        job = reload(test_db, job)
+        assert job.status == FAILED
+        assert "no_such_kind" in job.error
+
+    @pytest.mark.asyncio
+    async def test_timeout_counts_as_failed_attempt(self, test_db, test_user, queue):
+        """Test a job running past the time limit is stopped and retried"""
+        queue.job_timeout = 0.05
+        job = enqueue(test_db, test_user.id, "test_hang", {})
+        await queue.run_once()
+        job = reload(test_db, job)
+        assert (job.status, job.attempts, job.error) == (QUEUED, 1, "Timed out")
+
+    def test_per_user_concurrency(self, test_db, test_user, test_user_2, queue):
+        """Test a user at the limit doesn't block other users' jobs"""
+        first = enqueue(test_db, test_user.id, "test_succeed", {})
+        second = enqueue(test_db, test_user.id, "test_succeed", {})
+        other = enqueue(test_db, test_user_2.id, "test_succeed", {})
+
+        with queue.Session() as db:
+            assert queue.claim(db).id == first.id
+            assert queue.claim(db).id == other.id
+            assert queue.claim(db) is None
+        assert reload(test_db, second).status == QUEUED
+
+    def test_stale_job_recovered(self, test_db, test_user, queue):
+        """Test a job left running by a dead process is picked up again"""
+        job = enqueue(test_db, test_user.id, "test_succeed", {})
+        job.status = RUNNING
+        job.attempts = 1
+        job.worker = "deadprocess"
+        job.updated_at = datetime.utcnow() - timedelta(seconds=3 * queue.job_timeout)
+        test_db.commit()
+
+        with queue.Session() as db:
+            assert queue.recover_stale(db) == 1
+        job = reload(test_db, job)
+        assert (job.status, job.error) == (QUEUED, "Job stopped responding")
+
+    @pytest.mark.asyncio
+    async def test_workers_woken_by_notify(self, test_db, test_user, queue):
+        """Test started workers run a new job without waiting for the next poll"""
+        queue.poll_interval = 60
+        queue.start()
+        try:
+            await asyncio.sleep(0.05)  # Workers are idle, waiting
+            job = enqueue(test_db, test_user.id, "test_succeed", {})
+            queue.notify()
+            for _ in range(100):
+                if reload(test_db, job).status == SUCCEEDED:
+                    break
+                await asyncio.sleep(0.02)
+            assert reload(test_db, job).status == SUCCEEDED
+        finally:
+            await queue.stop()
@@ -0,0 +1,120 @@
+"""
+Tests for chunked maintenance jobs
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from database import crud
+from cryptography.fernet import Fernet
+from config.settings import settings
+from database.maintenance import compress_existing_messages, reencrypt_api_keys
+from database.connection import Base
+from database.models import Message, APIKey, User
+from utils.encryption import encrypt_key, decrypt_and_rotate
+
+
+LARGE_BODY = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 100
+
+
+def _insert_plain(test_db, conversation_id, body):
+    """Insert a message the way a pre-compression server would have"""
+    test_db.execute(
+        text("INSERT INTO messages (conversation_id, role, content) VALUES (:cid, 'user', :body)"),
+        {"cid": conversation_id, "body": body}
+    )
+    test_db.commit()
+
+
+@pytest.mark.database
+class TestCompressExistingMessages:
+    """Test the message compression backfill"""
+    
+    def test_backfill_compresses_large_rows(self, test_db, test_conversation):
+        """Test large legacy rows are compressed in chunks"""
+        for _ in range(5):
+            _insert_plain(test_db, test_conversation.id, LARGE_BODY)
+        _insert_plain(test_db, test_conversation.id, "small")
+        
+        stats = compress_existing_messages(test_db, chunk_size=2, threshold=1000)
+        assert stats["scanned"] == 5
+        assert stats["compressed"] == 5
+        assert stats["bytes_after"] < stats["bytes_before"]
+        
+        encodings = test_db.execute(text("SELECT content_encoding FROM messages ORDER BY id")).scalars().all()
+        assert encodings == ["zlib"] * 5 + [None]
+        
+        messages = crud.get_conversation_messages(test_db, test_conversation.id)
+        assert [m.content for m in messages] == [LARGE_BODY] * 5 + ["small"]
+    
+    def test_backfill_dry_run(self, test_db, test_conversation):
+        """Test dry runs measure without writing"""
+        _insert_plain(test_db, test_conversation.id, LARGE_BODY)
+        
+        stats = compress_existing_messages(test_db, threshold=1000, dry_run=True)
+        assert stats["compressed"] == 1
+        assert test_db.query(Message).filter(Message.content_encoding.isnot(None)).count() == 0
+    
+    def test_backfill_skips_compressed_rows(self, test_db, test_conversation):
+        """Test rows compressed on write are not revisited"""
+        crud.create_message(test_db, test_conversation.id, "assistant", LARGE_BODY)
+        stats = compress_existing_messages(test_db, threshold=1000)
+        assert stats["scanned"] == 0
+
+
+@pytest.fixture
+def rotated_key(monkeypatch):
+    """Rotate ENCRYPTION_KEY, keeping the old key as a previous key"""
+    old_key = settings.encryption_key
+    monkeypatch.setattr(settings, "encryption_key", Fernet.generate_key().decode())
+    monkeypatch.setattr(settings, "encryption_previous_keys", old_key)
+
+
+@pytest.mark.database
+class TestReencryptAPIKeys:
+    """Test API key re-encryption after a key rotation"""
+    
+    def test_job_reencrypts_old_rows(self, test_db, test_user, test_api_key, rotated_key):
+        """Test rows under a retired key are re-encrypted in chunks"""
+        crud.create_api_key(test_db, test_user.id, "anthropic", encrypt_key("sk-new"))
+        
+        stats = reencrypt_api_keys(test_db, chunk_size=1)
+        assert stats == {"scanned": 2, "rotated": 1, "failed": 0}
+        for api_key in test_db.query(APIKey).all():
+            assert decrypt_and_rotate(api_key.encrypted_key)[1] is None
+    
+    def test_dry_run(self, test_db, test_api_key, rotated_key):
+        """Test a dry run counts without writing"""
+        before = test_api_key.encrypted_key
+        assert reencrypt_api_keys(test_db, dry_run=True)["rotated"] == 1
+        assert test_db.query(APIKey).first().encrypted_key == before
+    
+    def test_lazy_reencrypt_on_read(self, test_db, test_api_key, rotated_key):
+        """Test reading a key through crud rotates it in place"""
+        assert crud.decrypt_api_key(test_db, test_api_key) == "sk-test123456789"
+        
+        test_db.expire_all()
+        stored = test_db.query(APIKey).first().encrypted_key
+        assert decrypt_and_rotate(stored) == ("sk-test123456789", None)
+    
+    def test_lazy_reencrypt_leaves_caller_transaction_alone(self, tmp_path, monkeypatch):
+        """Test the rotation is written separately from the caller's pending changes"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'keys.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            db.add(User(id="key_owner", email="owner@example.com", password_hash="x"))
+            api_key = crud.create_api_key(db, "key_owner", "openai", encrypt_key("sk-old"))
+            monkeypatch.setattr(settings, "encryption_previous_keys", settings.encryption_key)
+            monkeypatch.setattr(settings, "encryption_key", Fernet.generate_key().decode())
+            
+            db.add(User(id="pending_user", email="pending@example.com", password_hash="x"))
+            assert crud.decrypt_api_key(db, api_key) == "sk-old"
+            assert decrypt_and_rotate(api_key.encrypted_key)[1] is None
+            db.rollback()
+            
+            assert db.get(User, "pending_user") is None
+            stored = db.query(APIKey).filter(APIKey.id == api_key.id).one().encrypted_key
+            assert decrypt_and_rotate(stored) == ("sk-old", None)
+        finally:
+            db.close()
+            engine.dispose()
@@ -0,0 +1,177 @@
+"""
+Tests for full-text search
+"""
+import sqlite3
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from database import crud
+from database.connection import Base
+from database.maintenance import compress_existing_messages
+from database.search import install_search_index, search_conversations, build_match_expression
+
+
+@pytest.fixture
+def search_db(test_db):
+    """Test database with the search index installed"""
+    install_search_index(test_db.get_bind())
+    return test_db
+
+
+@pytest.mark.database
+class TestBuildMatchExpression:
+    """Test FTS5 match expression building"""
+
+    def test_terms_are_quoted(self):
+        """Test each term is quoted and the last is a prefix"""
+        assert build_match_expression("hello world") == '"hello" "world"*'
+
+    def test_operators_are_neutralized(self):
+        """Test FTS5 syntax in user input is not interpreted"""
+        assert build_match_expression('foo" OR bar*') == '"foo" "OR" "bar"*'
+
+    def test_empty_query(self):
+        """Test punctuation-only input produces no expression"""
+        assert build_match_expression("?!") == ""
+
+
+@pytest.mark.database
+class TestSearchConversations:
+    """Test message and title search"""
+
+    def test_search_messages(self, search_db, test_user, test_conversation):
+        """Test message bodies are indexed on insert"""
+        crud.create_message(search_db, test_conversation.id, "user", "How do I configure the kubernetes ingress?")
+        crud.create_message(search_db, test_conversation.id, "assistant", "Something unrelated")
+
+        hits = search_conversations(search_db, test_user.id, "kubernetes")
+        assert len(hits) == 1
+        assert hits[0]["conversation_id"] == test_conversation.id
+        assert hits[0]["role"] == "user"
+        assert "**kubernetes**" in hits[0]["snippet"]
+
+    def test_search_compressed_messages(self, search_db, test_user, test_conversation):
+        """Test bodies stored compressed are indexed and snippeted as plain text"""
+        body = "filler text " * 300 + "the needle is here"
+        message = crud.create_message(search_db, test_conversation.id, "assistant", body)
+        assert message.content_encoding == "zlib"
+
+        hits = search_conversations(search_db, test_user.id, "needle")
+        assert len(hits) == 1
+        assert "**needle**" in hits[0]["snippet"]
+
+    def test_search_titles_rank_first(self, search_db, test_user):
+        """Test title hits are returned and ranked above body hits"""
+        titled = crud.create_conversation(search_db, test_user.id, title="Postgres tuning")
+        other = crud.create_conversation(search_db, test_user.id, title="Other")
+        crud.create_message(search_db, other.id, "user", "a note about postgres")
+
+        hits = search_conversations(search_db, test_user.id, "postgres")
+        assert [h["conversation_id"] for h in hits] == [titled.id, other.id]
+        assert hits[0]["message_id"] is None
+
+    def test_prefix_search(self, search_db, test_user, test_conversation):
+        """Test the last term matches as a prefix"""
+        crud.create_message(search_db, test_conversation.id, "user", "documentation please")
+        assert len(search_conversations(search_db, test_user.id, "docu")) == 1
+
+    def test_search_is_scoped_to_user(self, search_db, test_user, test_user_2):
+        """Test other users' conversations are never returned"""
+        conversation = crud.create_conversation(search_db, test_user_2.id, title="Secret plans")
+        crud.create_message(search_db, conversation.id, "user", "secret content")
+        assert search_conversations(search_db, test_user.id, "secret") == []
+
+    def test_index_updates_on_delete(self, search_db, test_user, test_conversation):
+        """Test deleted messages disappear from results"""
+        message = crud.create_message(search_db, test_conversation.id, "user", "ephemeral words")
+        assert len(search_conversations(search_db, test_user.id, "ephemeral")) == 1
+
+        search_db.delete(message)
+        search_db.commit()
+        assert search_conversations(search_db, test_user.id, "ephemeral") == []
+
+    def test_index_updates_on_title_change(self, search_db, test_user, test_conversation):
+        """Test renamed conversations are re-indexed"""
+        crud.update_conversation_title(search_db, test_conversation.id, "Quarterly roadmap")
+        assert len(search_conversations(search_db, test_user.id, "roadmap")) == 1
+        assert search_conversations(search_db, test_user.id, "Test") == []
+
+    def test_install_backfills_existing_rows(self, test_db, test_user, test_conversation):
+        """Test rows written before install are indexed"""
+        crud.create_message(test_db, test_conversation.id, "user", "legacy message")
+        install_search_index(test_db.get_bind())
+        assert len(search_conversations(test_db, test_user.id, "legacy")) == 1
+
+    def test_pagination(self, search_db, test_user, test_conversation):
+        """Test limit and offset page through hits"""
+        for i in range(5):
+            crud.create_message(search_db, test_conversation.id, "user", f"paged result {i}")
+
+        first = search_conversations(search_db, test_user.id, "paged", limit=3)
+        second = search_conversations(search_db, test_user.id, "paged", limit=3, offset=3)
+        assert len(first) == 3
+        assert len(second) == 2
+        assert not {h["message_id"] for h in first} & {h["message_id"] for h in second}
+
+    def test_compressing_existing_rows_keeps_them_indexed(self, search_db, test_user, test_conversation, monkeypatch):
+        """Test a plain row rewritten compressed is still found, once"""
+        from config.settings import settings
+        monkeypatch.setattr(settings, "message_compression_threshold", 0)
+        crud.create_message(search_db, test_conversation.id, "user", "archived needle " * 200)
+
+        stats = compress_existing_messages(search_db, threshold=100)
+        assert stats["compressed"] == 1
+        assert len(search_conversations(search_db, test_user.id, "needle")) == 1
+
+
+@pytest.mark.database
+class TestSearchIndexOutsideApp:
+    """Test the index stays usable from connections the app didn't set up"""
+
+    def test_raw_connection_writes(self, tmp_path, test_user):
+        """Test inserts and deletes over a plain sqlite3 connection keep working and indexed"""
+        path = tmp_path / "search.db"
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        install_search_index(engine)
+        with sessionmaker(bind=engine)() as db:
+            crud.create_user(db, test_user.id, test_user.email, password_hash="x")
+            conversation = crud.create_conversation(db, test_user.id, title="Chat")
+            compressed = crud.create_message(db, conversation.id, "assistant", "filler " * 500 + "zebra")
+            assert compressed.content_encoding == "zlib"
+            conversation_id, compressed_id = conversation.id, compressed.id
+
+        raw = sqlite3.connect(path)
+        raw.execute(
+            "INSERT INTO messages (conversation_id, role, content) VALUES (?, 'user', 'giraffe facts')",
+            (conversation_id,)
+        )
+        raw.execute("DELETE FROM messages WHERE id = ?", (compressed_id,))
+        raw.commit()
+        raw.close()
+
+        with sessionmaker(bind=engine)() as db:
+            assert len(search_conversations(db, test_user.id, "giraffe")) == 1
+            assert search_conversations(db, test_user.id, "zebra") == []
+            assert db.execute(text("SELECT count(*) FROM messages_fts")).scalar() == 1
+        engine.dispose()
+
+    def test_outdated_index_rebuilt(self, test_db, test_user, test_conversation):
+        """Test an index whose triggers call a Python SQL function is replaced"""
+        engine = test_db.get_bind()
+        crud.create_message(test_db, test_conversation.id, "user", "migrated words")
+        crud.create_message(test_db, test_conversation.id, "assistant", "filler " * 500 + "compressed words")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE VIEW messages_search_source AS SELECT id, content FROM messages"))
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages_search_source', content_rowid='id')"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN "
+                "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, message_text(old.content, NULL)); END"
+            ))
+
+        install_search_index(engine)
+        assert len(search_conversations(test_db, test_user.id, "words")) == 2
+        crud.delete_conversation(test_db, test_conversation.id)
+        assert search_conversations(test_db, test_user.id, "words") == []
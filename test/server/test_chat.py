@@ -62,6 +62,62 @@ class TestChat:
         data = response.json()
         assert "api key" in data["detail"].lower()
     
+    @patch('api.routes.chat.mem0_client')
+    def test_chat_missing_api_key_is_negatively_cached(self, mock_mem0_client, client: TestClient, test_user, auth_headers):
+        """Test repeated requests for a missing key don't query the database again"""
+        mock_mem0_client.search_memories.return_value = []
+        request = {
+            "user_id": test_user.id,
+            "message": "Hello",
+            "model_provider": "anthropic",
+            "model_choice": "claude-3-5-sonnet-20241022",
+        }
+        
+        with patch('api.routes.chat.crud.get_api_key', return_value=None) as mock_get_api_key:
+            for _ in range(3):
+                response = client.post("/chat", json=request, headers=auth_headers)
+                assert response.status_code == 400
+        assert mock_get_api_key.call_count == 1
+    
+    @patch('api.routes.chat.route_chat', new_callable=AsyncMock)
+    @patch('api.routes.chat.mem0_client')
+    def test_chat_after_adding_missing_key(self, mock_mem0_client, mock_route_chat, client: TestClient, test_user, auth_headers):
+        """Test adding a key clears the negative cache entry immediately"""
+        mock_mem0_client.search_memories.return_value = []
+        mock_route_chat.return_value = ("Response", "gpt-4o-mini")
+        request = {
+            "user_id": test_user.id,
+            "message": "Hello",
+            "model_provider": "openai",
+            "model_choice": "gpt-4o-mini",
+        }
+        assert client.post("/chat", json=request, headers=auth_headers).status_code == 400
+        
+        with patch('api.routes.api_keys.validate_api_key', new_callable=AsyncMock, return_value=(True, None)):
+            created = client.post(
+                f"/api-keys/{test_user.id}",
+                json={"provider": "openai", "api_key": "sk-test123456789"},
+                headers=auth_headers
+            )
+        assert created.status_code == 200
+        assert client.post("/chat", json=request, headers=auth_headers).status_code == 200
+    
+    @patch('api.routes.chat.mem0_client')
+    def test_chat_unknown_custom_integration_is_negatively_cached(self, mock_mem0_client, client: TestClient, test_user, auth_headers):
+        """Test unknown custom providers 404 without repeated lookups"""
+        mock_mem0_client.search_memories.return_value = []
+        request = {
+            "user_id": test_user.id,
+            "message": "Hello",
+            "model_provider": "custom_missing",
+            "model_choice": "llama3",
+        }
+        
+        with patch('api.routes.chat.crud.get_custom_integration_by_provider_id', return_value=None) as mock_lookup:
+            for _ in range(3):
+                assert client.post("/chat", json=request, headers=auth_headers).status_code == 404
+        assert mock_lookup.call_count == 1
+    
     @patch('api.routes.chat.route_chat', new_callable=AsyncMock)
     @patch('api.routes.chat.mem0_client')
     def test_chat_with_existing_conversation(self, mock_mem0_client, mock_route_chat, client: TestClient, test_user, test_api_key, test_conversation, auth_headers):
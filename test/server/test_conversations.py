@@ -73,11 +73,11 @@ class TestConversations:
         assert isinstance(data, list)
         assert len(data) == 0
     
-    def test_get_messages_unauthorized(self, client: TestClient, test_user_2, test_conversation, auth_headers):
+    def test_get_messages_unauthorized(self, client: TestClient, test_user_2, test_conversation, auth_headers, auth_headers_user_2):
         """Test getting messages from another user's conversation (should fail)"""
         response = client.get(
             f"/conversations/{test_conversation.id}/messages",
-            headers={"X-User-ID": test_user_2.id}
+            headers=auth_headers_user_2
         )
         assert response.status_code == 403
     
@@ -212,3 +212,60 @@ class TestConversations:
         assert response.status_code == 200
         data = response.json()
         assert "id" in data
+    
+    def test_search_conversations_success(self, client: TestClient, test_user, test_conversation, auth_headers, test_db):
+        """Test searching messages and titles"""
+        from database import crud
+        from database.search import install_search_index
+        
+        install_search_index(test_db.get_bind())
+        crud.create_message(test_db, test_conversation.id, "user", "Where is the invoice template?")
+        
+        response = client.get(
+            f"/conversations/{test_user.id}/search",
+            params={"q": "invoice", "limit": 10},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["query"] == "invoice"
+        assert data["has_more"] is False
+        assert len(data["results"]) == 1
+        assert data["results"][0]["conversation_id"] == test_conversation.id
+        assert "**invoice**" in data["results"][0]["snippet"]
+    
+    def test_search_conversations_has_more(self, client: TestClient, test_user, test_conversation, auth_headers, test_db):
+        """Test search pagination flag"""
+        from database import crud
+        from database.search import install_search_index
+        
+        install_search_index(test_db.get_bind())
+        for i in range(3):
+            crud.create_message(test_db, test_conversation.id, "user", f"repeat {i}")
+        
+        response = client.get(
+            f"/conversations/{test_user.id}/search",
+            params={"q": "repeat", "limit": 2},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["results"]) == 2
+        assert data["has_more"] is True
+    
+    def test_search_conversations_unauthorized(self, client: TestClient, test_user_2, auth_headers):
+        """Test searching another user's conversations (should fail)"""
+        response = client.get(
+            f"/conversations/{test_user_2.id}/search",
+            params={"q": "anything"},
+            headers=auth_headers
+        )
+        assert response.status_code == 403
+    
+    def test_search_conversations_missing_query(self, client: TestClient, test_user, auth_headers):
+        """Test searching without a query"""
+        response = client.get(
+            f"/conversations/{test_user.id}/search",
+            headers=auth_headers
+        )
+        assert response.status_code == 422
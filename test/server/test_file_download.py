@@ -0,0 +1,142 @@
+"""
+Tests for file download endpoints
+"""
+import hashlib
+import os
+import pytest
+from io import BytesIO
+from fastapi.testclient import TestClient
+from config.settings import settings
+from database.models import ChatFile, ProjectFile
+from utils.storage import S3Storage, CachedStorage, set_storage
+from test.fixtures.fake_s3 import FakeS3Client
+
+
+@pytest.fixture(autouse=True)
+def blob_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_blob_dir", str(tmp_path / "blobs"))
+    return tmp_path
+
+
+def upload_project_file(client, headers, project_id, filename, content, content_type="application/pdf"):
+    response = client.post(
+        f"/projects/{project_id}/upload",
+        files={"file": (filename, BytesIO(content), content_type)},
+        headers=headers
+    )
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.api
+class TestFileDownload:
+    """Test downloading stored chat and project files"""
+
+    def test_download_project_file(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test a project file comes back with its content, type and hash ETag"""
+        content = b"%PDF-1.4\n" + b"page " * 1000
+        upload_project_file(client, auth_headers, test_project.id, "report.pdf", content)
+        file_id = test_db.query(ProjectFile).one().id
+
+        response = client.get(f"/files/project/{file_id}", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.content == content
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.headers["content-disposition"].startswith("inline")
+        assert response.headers["etag"] == f'"{hashlib.sha256(content).hexdigest()}"'
+        assert response.headers["accept-ranges"] == "bytes"
+
+    def test_download_chat_file(self, client: TestClient, test_user, test_conversation, auth_headers, test_db):
+        """Test a file attached to a conversation can be fetched back"""
+        client.post(
+            "/upload",
+            files={"file": ("notes.txt", BytesIO(b"meeting notes"), "text/plain")},
+            data={"user_id": test_user.id, "conversation_id": str(test_conversation.id)},
+            headers=auth_headers
+        )
+        file_id = test_db.query(ChatFile).one().id
+
+        response = client.get(f"/files/chat/{file_id}", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.content == b"meeting notes"
+        assert response.headers["content-type"].startswith("text/plain")
+
+    def test_range_request(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test a viewer can fetch part of a large file"""
+        content = bytes(range(256)) * 40
+        upload_project_file(client, auth_headers, test_project.id, "big.pdf", content)
+        file_id = test_db.query(ProjectFile).one().id
+
+        response = client.get(f"/files/project/{file_id}", headers={**auth_headers, "Range": "bytes=1000-1099"})
+        assert response.status_code == 206
+        assert response.content == content[1000:1100]
+        assert response.headers["content-range"] == f"bytes 1000-1099/{len(content)}"
+
+        response = client.get(f"/files/project/{file_id}", headers={**auth_headers, "Range": "bytes=99999-"})
+        assert response.status_code == 416
+
+    def test_if_none_match(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test a cached copy is revalidated with a 304 and no body"""
+        upload_project_file(client, auth_headers, test_project.id, "report.pdf", b"%PDF-1.4 v1")
+        file_id = test_db.query(ProjectFile).one().id
+        etag = client.get(f"/files/project/{file_id}", headers=auth_headers).headers["etag"]
+
+        response = client.get(f"/files/project/{file_id}", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        response = client.get(f"/files/project/{file_id}", headers={**auth_headers, "If-None-Match": '"stale"'})
+        assert response.status_code == 200
+
+    def test_unsafe_types_sent_as_attachment(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test SVG isn't rendered inline whatever type the uploader claimed"""
+        upload_project_file(
+            client, auth_headers, test_project.id, "logo.svg", b"<svg><script>alert(1)</script></svg>", "image/svg+xml"
+        )
+        file_id = test_db.query(ProjectFile).one().id
+
+        response = client.get(f"/files/project/{file_id}", headers=auth_headers)
+        assert response.headers["content-disposition"].startswith("attachment")
+        assert response.headers["x-content-type-options"] == "nosniff"
+
+    def test_forced_download(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test ?download=true asks the browser to save the file"""
+        upload_project_file(client, auth_headers, test_project.id, "report.pdf", b"%PDF-1.4")
+        file_id = test_db.query(ProjectFile).one().id
+
+        response = client.get(f"/files/project/{file_id}?download=true", headers=auth_headers)
+        assert response.headers["content-disposition"] == 'attachment; filename="report.pdf"'
+
+    def test_other_users_file(self, client: TestClient, test_project, auth_headers, auth_headers_user_2, test_db):
+        """Test users can't download each other's files"""
+        upload_project_file(client, auth_headers, test_project.id, "report.pdf", b"%PDF-1.4")
+        file_id = test_db.query(ProjectFile).one().id
+        assert client.get(f"/files/project/{file_id}", headers=auth_headers_user_2).status_code == 403
+
+    def test_missing_file(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test a missing row or missing stored content is a 404"""
+        assert client.get("/files/project/99999", headers=auth_headers).status_code == 404
+
+        upload_project_file(client, auth_headers, test_project.id, "report.pdf", b"%PDF-1.4")
+        project_file = test_db.query(ProjectFile).one()
+        os.remove(project_file.storage_path)
+        assert client.get(f"/files/project/{project_file.id}", headers=auth_headers).status_code == 404
+
+    def test_download_from_object_storage(self, client: TestClient, test_project, auth_headers, test_db, blob_dir):
+        """Test files in a remote backend are served through the local cache"""
+        s3 = FakeS3Client()
+        storage = CachedStorage(S3Storage(s3, "bucket"), str(blob_dir / "cache"), max_bytes=0)
+        set_storage(storage)
+        try:
+            upload_project_file(client, auth_headers, test_project.id, "report.pdf", b"%PDF-1.4 remote")
+            file_id = test_db.query(ProjectFile).one().id
+            for path in os.listdir(blob_dir / "cache"):
+                os.remove(blob_dir / "cache" / path)
+
+            response = client.get(f"/files/project/{file_id}", headers={**auth_headers, "Range": "bytes=9-"})
+            assert response.status_code == 206
+            assert response.content == b"remote"
+            assert storage.misses == 1
+        finally:
+            set_storage(None)
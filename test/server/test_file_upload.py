@@ -6,6 +6,7 @@ import os
 import tempfile
 from fastapi.testclient import TestClient
 from io import BytesIO
+from database.models import FileBlob, ProjectFile
 
 
 @pytest.mark.api
@@ -163,8 +164,34 @@ class TestProjectFileUpload:
         assert data["file"]["filename"] == "project_file.txt"
         assert data["file"]["size"] == len(file_content)
         assert "id" in data["file"]
-    
-    def test_upload_project_file_unauthorized(self, client: TestClient, test_user_2, test_project, auth_headers):
+
+    def test_upload_project_file_deduplicated(self, client: TestClient, test_user, test_project, auth_headers, test_db):
+        """Test uploading the same content twice stores it once"""
+        file_content = b"Shared project file content"
+        file_ids = []
+        for name in ("first.txt", "second.txt"):
+            response = client.post(
+                f"/projects/{test_project.id}/upload",
+                files={"file": (name, BytesIO(file_content), "text/plain")},
+                headers=auth_headers
+            )
+            assert response.status_code == 200
+            file_ids.append(response.json()["file"]["id"])
+
+        files = test_db.query(ProjectFile).filter(ProjectFile.id.in_(file_ids)).all()
+        assert len(files) == 2
+        assert files[0].blob_id == files[1].blob_id
+        assert files[0].storage_path == files[1].storage_path
+        blob = test_db.query(FileBlob).filter(FileBlob.id == files[0].blob_id).first()
+        assert blob.ref_count == 2
+
+        # Removing one copy keeps the content for the other
+        client.delete(f"/projects/files/{file_ids[0]}", headers=auth_headers)
+        test_db.refresh(blob)
+        assert blob.ref_count == 1
+        assert os.path.exists(blob.storage_path)
+
+    def test_upload_project_file_unauthorized(self, client: TestClient, test_user_2, test_project, auth_headers, auth_headers_user_2):
         """Test uploading file to another user's project (should fail)"""
         file_content = b"Test content"
         file_data = BytesIO(file_content)
@@ -172,7 +199,7 @@ class TestProjectFileUpload:
         response = client.post(
             f"/projects/{test_project.id}/upload",
             files={"file": ("test.txt", file_data, "text/plain")},
-            headers={"X-User-ID": test_user_2.id}
+            headers=auth_headers_user_2
         )
         assert response.status_code == 403
     
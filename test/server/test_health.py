@@ -43,3 +43,38 @@ class TestHealth:
         assert isinstance(data["available_models"], list)
         assert "openai" in data["available_models"]
 
+    
+    def test_database_health(self, client: TestClient):
+        """Test database health endpoint reports reachability and pool metrics"""
+        response = client.get("/health/db")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ok"
+        assert data["latency_ms"] is not None
+        assert data["pool"]["checkouts"] >= 1
+        assert data["replica_pool"] is None
+
+    def test_database_health_degraded_by_recent_timeouts(self, client: TestClient, monkeypatch):
+        """Test only timeouts in the recent window mark the database degraded"""
+        from api.routes import health
+        summary = {"timeouts": 3, "recent_timeouts": 0}
+        monkeypatch.setattr(health, "pool_summary", lambda engine: dict(summary) if engine is not None else None)
+        assert client.get("/health/db").json()["status"] == "ok"
+        summary["recent_timeouts"] = 1
+        assert client.get("/health/db").json()["status"] == "degraded"
+
+    def test_storage_health(self, client: TestClient):
+        """Test storage endpoint reports the backend (no collector runs under test)"""
+        response = client.get("/health/storage")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["backend"] == "local"
+        assert data["gc"] is None
+
+    def test_auth_health(self, client: TestClient):
+        """Test auth endpoint reports password hashing pool metrics"""
+        response = client.get("/health/auth")
+        assert response.status_code == 200
+        stats = response.json()["password_hashing"]
+        assert stats["workers"] >= 1
+        assert {"calls", "rejected", "avg_queue_ms", "max_queue_ms"} <= set(stats)
@@ -0,0 +1,157 @@
+"""
+Tests for background ingestion jobs and the job status endpoints
+"""
+import asyncio
+from io import BytesIO
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from config.settings import settings
+from database import crud
+from database.jobs import JobQueue, enqueue, SUCCEEDED, CANCELLED, QUEUED
+from database.models import Job, FileBlob, ProjectFile
+
+
+@pytest.fixture
+def run_jobs(test_db, tmp_path, monkeypatch):
+    """Run every due job once, in this process, against the test database"""
+    monkeypatch.setattr(settings, "upload_blob_dir", str(tmp_path / "blobs"))
+    monkeypatch.setattr(settings, "extraction_workers", 0)
+    queue = JobQueue(sessionmaker(bind=test_db.get_bind()), workers=1)
+
+    def run():
+        while asyncio.run(queue.run_once()):
+            pass
+        test_db.expire_all()
+    return run
+
+
+def upload_project_file(client, project_id, headers, content=b"Quarterly numbers are up", name="report.txt"):
+    response = client.post(
+        f"/projects/{project_id}/upload",
+        files={"file": (name, BytesIO(content), "text/plain")},
+        headers=headers
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.api
+class TestIngestionJobs:
+    """Test uploads are processed by background jobs"""
+
+    def test_project_upload_returns_job(self, client: TestClient, test_project, auth_headers, test_db, run_jobs, mock_mem0_add):
+        """Test the upload returns before extraction, which the job then does"""
+        data = upload_project_file(client, test_project.id, auth_headers)
+        job = test_db.get(Job, data["job_id"])
+        assert job.status == QUEUED
+        project_file = test_db.get(ProjectFile, data["file"]["id"])
+        assert project_file.blob.extracted_text is None
+
+        run_jobs()
+        job = test_db.get(Job, data["job_id"])
+        assert (job.status, job.progress) == (SUCCEEDED, 100)
+        blob = test_db.get(FileBlob, project_file.blob_id)
+        assert blob.extracted_text == "Quarterly numbers are up"
+
+    def test_project_memory_seeded(self, client: TestClient, test_user, test_project, auth_headers, run_jobs, mock_mem0_add):
+        """Test the start of a new project file is added to the project's memory"""
+        upload_project_file(client, test_project.id, auth_headers)
+        run_jobs()
+
+        mock_mem0_add.assert_called_once()
+        kwargs = mock_mem0_add.call_args.kwargs
+        assert (kwargs["user_id"], kwargs["project_id"]) == (test_user.id, test_project.id)
+        assert "report.txt" in kwargs["messages"][0]["content"]
+        assert "Quarterly numbers are up" in kwargs["messages"][0]["content"]
+
+    def test_memory_failure_retried(self, client: TestClient, test_project, auth_headers, test_db, run_jobs, mock_mem0_add):
+        """Test a failed memory update is retried without parsing the file again"""
+        mock_mem0_add.return_value = False
+        data = upload_project_file(client, test_project.id, auth_headers)
+        run_jobs()
+
+        job = test_db.get(Job, data["job_id"])
+        assert (job.status, job.attempts, job.stage) == (QUEUED, 1, "seeding memory")
+        assert job.error == "Could not add the file to project memory"
+        assert test_db.get(ProjectFile, data["file"]["id"]).blob.extracted_text is not None
+
+    def test_chat_upload_returns_job(self, client: TestClient, test_conversation, auth_headers, test_db, run_jobs, mock_mem0_add):
+        """Test chat attachments are processed in the background, without memory seeding"""
+        response = client.post(
+            "/upload",
+            files={"file": ("notes.txt", BytesIO(b"chat attachment"), "text/plain")},
+            data={"conversation_id": str(test_conversation.id)},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        job_id = response.json()["job_id"]
+
+        run_jobs()
+        assert test_db.get(Job, job_id).status == SUCCEEDED
+        mock_mem0_add.assert_not_called()
+
+    def test_unattached_upload_has_no_job(self, client: TestClient, test_user, auth_headers, run_jobs):
+        """Test an upload not attached to a conversation isn't processed"""
+        response = client.post(
+            "/upload",
+            files={"file": ("loose.txt", BytesIO(b"loose"), "text/plain")},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["job_id"] is None
+
+    def test_deleted_file_cancels_job(self, client: TestClient, test_project, auth_headers, test_db, run_jobs, mock_mem0_add):
+        """Test a job whose file was deleted before it ran is cancelled"""
+        data = upload_project_file(client, test_project.id, auth_headers)
+        assert crud.delete_project_file(test_db, data["file"]["id"])
+
+        run_jobs()
+        assert test_db.get(Job, data["job_id"]).status == CANCELLED
+        mock_mem0_add.assert_not_called()
+
+
+@pytest.mark.api
+class TestJobEndpoints:
+    """Test job status and progress endpoints"""
+
+    def test_get_job(self, client: TestClient, test_user, auth_headers, test_db):
+        """Test a job's status can be read by its owner"""
+        job = enqueue(test_db, test_user.id, "ingest_file", {"file_kind": "project", "file_id": 7})
+        response = client.get(f"/jobs/{job.id}", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["status"], data["progress"], data["file_id"]) == ("queued", 0, 7)
+        assert data["finished_at"] is None
+
+    def test_get_job_progress(self, client: TestClient, test_user, auth_headers, test_db):
+        """Test the polling endpoint returns just the progress"""
+        job = enqueue(test_db, test_user.id, "ingest_file", {})
+        job.status, job.stage, job.progress = "running", "extracting", 10
+        test_db.commit()
+
+        response = client.get(f"/jobs/{job.id}/progress", headers=auth_headers)
+        assert response.json() == {"id": job.id, "status": "running", "stage": "extracting", "progress": 10}
+
+    def test_list_jobs(self, client: TestClient, test_user, test_user_2, auth_headers, test_db):
+        """Test listing returns only the user's jobs, newest first, filterable by status"""
+        first = enqueue(test_db, test_user.id, "ingest_file", {})
+        second = enqueue(test_db, test_user.id, "ingest_file", {})
+        enqueue(test_db, test_user_2.id, "ingest_file", {})
+        first.status = "failed"
+        test_db.commit()
+
+        response = client.get("/jobs", headers=auth_headers)
+        assert [j["id"] for j in response.json()] == [second.id, first.id]
+        response = client.get("/jobs?status=failed", headers=auth_headers)
+        assert [j["id"] for j in response.json()] == [first.id]
+
+    def test_other_users_job_forbidden(self, client: TestClient, test_user_2, auth_headers, test_db):
+        """Test a job can't be read by another user"""
+        job = enqueue(test_db, test_user_2.id, "ingest_file", {})
+        assert client.get(f"/jobs/{job.id}", headers=auth_headers).status_code == 403
+        assert client.get(f"/jobs/{job.id}/progress", headers=auth_headers).status_code == 403
+
+    def test_missing_job(self, client: TestClient, auth_headers):
+        """Test an unknown job id returns 404"""
+        assert client.get("/jobs/999", headers=auth_headers).status_code == 404
@@ -80,20 +80,20 @@ class TestProjects:
         )
         assert response.status_code == 404
     
-    def test_update_project_unauthorized(self, client: TestClient, test_user, test_user_2, test_project, auth_headers):
+    def test_update_project_unauthorized(self, client: TestClient, test_user, test_user_2, test_project, auth_headers, auth_headers_user_2):
         """Test updating another user's project (should fail)"""
         # Create project for user 2
         project2 = client.post(
             f"/projects/{test_user_2.id}",
             json=SAMPLE_PROJECT_2,
-            headers={"X-User-ID": test_user_2.id}
+            headers=auth_headers_user_2
         ).json()["project"]
         
         # Try to update user 2's project as user 1 (should fail)
         response = client.patch(
             f"/projects/{project2['id']}",
             json={"name": "Hacked Name"},
-            headers={"X-User-ID": test_user.id}
+            headers=auth_headers
         )
         assert response.status_code == 403
     
@@ -126,19 +126,19 @@ class TestProjects:
         )
         assert response.status_code == 404
     
-    def test_delete_project_unauthorized(self, client: TestClient, test_user, test_user_2, test_project, auth_headers):
+    def test_delete_project_unauthorized(self, client: TestClient, test_user, test_user_2, test_project, auth_headers, auth_headers_user_2):
         """Test deleting another user's project (should fail)"""
         # Create project for user 2
         project2 = client.post(
             f"/projects/{test_user_2.id}",
             json=SAMPLE_PROJECT_2,
-            headers={"X-User-ID": test_user_2.id}
+            headers=auth_headers_user_2
         ).json()["project"]
         
         # Try to delete user 2's project as user 1 (should fail)
         response = client.delete(
             f"/projects/{project2['id']}",
-            headers={"X-User-ID": test_user.id}
+            headers=auth_headers
         )
         assert response.status_code == 403
 
@@ -167,7 +167,7 @@ class TestProjectFiles:
         assert data["file"]["filename"] == "test.txt"
         assert "id" in data["file"]
     
-    def test_upload_project_file_unauthorized(self, client: TestClient, test_user_2, test_project, auth_headers, tmpdir):
+    def test_upload_project_file_unauthorized(self, client: TestClient, test_user_2, test_project, auth_headers, tmpdir, auth_headers_user_2):
         """Test uploading file to another user's project (should fail)"""
         test_file = tmpdir.join("test.txt")
         test_file.write("Test content")
@@ -176,7 +176,7 @@ class TestProjectFiles:
             response = client.post(
                 f"/projects/{test_project.id}/upload",
                 files={"file": ("test.txt", f, "text/plain")},
-                headers={"X-User-ID": test_user_2.id}
+                headers=auth_headers_user_2
             )
         
         assert response.status_code == 403
@@ -229,11 +229,11 @@ class TestProjectFiles:
         data = response.json()
         assert isinstance(data, list)
     
-    def test_get_project_files_unauthorized(self, client: TestClient, test_user_2, test_project, auth_headers):
+    def test_get_project_files_unauthorized(self, client: TestClient, test_user_2, test_project, auth_headers, auth_headers_user_2):
         """Test getting files from another user's project (should fail)"""
         response = client.get(
             f"/projects/{test_project.id}/files",
-            headers={"X-User-ID": test_user_2.id}
+            headers=auth_headers_user_2
         )
         
         assert response.status_code == 403
@@ -276,7 +276,7 @@ class TestProjectFiles:
         
         assert response.status_code == 404
     
-    def test_delete_project_file_unauthorized(self, client: TestClient, test_user, test_user_2, test_project, auth_headers, test_db, tmpdir):
+    def test_delete_project_file_unauthorized(self, client: TestClient, test_user, test_user_2, test_project, auth_headers, test_db, tmpdir, auth_headers_user_2):
         """Test deleting file from another user's project (should fail)"""
         # Upload a file to user 1's project (as user 1)
         test_file = tmpdir.join("test.txt")
@@ -294,7 +294,7 @@ class TestProjectFiles:
         # Try to delete as user 2 (should fail)
         response = client.delete(
             f"/projects/files/{file_id}",
-            headers={"X-User-ID": test_user_2.id}
+            headers=auth_headers_user_2
         )
         
         assert response.status_code == 403
@@ -0,0 +1,192 @@
+"""
+Tests for resumable (chunked) uploads
+"""
+import hashlib
+import os
+import pytest
+from fastapi.testclient import TestClient
+from config.settings import settings
+from database.models import FileBlob, ProjectFile, ChatFile, UploadChunk, Job
+from utils.security import MAX_FILE_SIZE
+from utils.storage import S3Storage, CachedStorage, set_storage
+from test.fixtures.fake_s3 import FakeS3Client
+
+
+@pytest.fixture(autouse=True)
+def upload_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_blob_dir", str(tmp_path / "blobs"))
+    monkeypatch.setattr(settings, "upload_session_dir", str(tmp_path / "sessions"))
+    return tmp_path
+
+
+def start(client, headers, size, **fields):
+    body = {"filename": "handbook.txt", "size": size, "content_type": "text/plain", **fields}
+    return client.post("/uploads", json=body, headers=headers)
+
+
+def put_chunk(client, headers, upload_id, offset, data, sha256=None):
+    chunk_headers = dict(headers)
+    if sha256:
+        chunk_headers["X-Chunk-SHA256"] = sha256
+    return client.put(f"/uploads/{upload_id}?offset={offset}", content=data, headers=chunk_headers)
+
+
+@pytest.mark.api
+class TestResumableUploads:
+    """Test the create / PUT chunks / complete protocol"""
+
+    def test_upload_in_chunks(self, client: TestClient, test_project, auth_headers, test_db, upload_dirs):
+        """Test chunks are stored as they arrive and joined into one file on completion"""
+        content = b"chapter one. " * 100
+        session = start(client, auth_headers, len(content), project_id=test_project.id).json()
+        assert session["offset"] == 0
+
+        response = put_chunk(client, auth_headers, session["id"], 0, content[:500])
+        assert response.json()["offset"] == 500
+        assert test_db.query(UploadChunk).count() == 1
+        response = put_chunk(client, auth_headers, session["id"], 500, content[500:])
+        assert response.json()["offset"] == len(content)
+
+        response = client.post(f"/uploads/{session['id']}/complete", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        project_file = test_db.get(ProjectFile, data["file"]["id"])
+        assert project_file.project_id == test_project.id
+        with open(project_file.storage_path, "rb") as f:
+            assert f.read() == content
+        assert project_file.blob.sha256 == hashlib.sha256(content).hexdigest()
+        assert test_db.get(Job, data["job_id"]).status == "queued"
+        # Chunks are gone once the file is assembled
+        assert test_db.query(UploadChunk).count() == 0
+        assert not any(files for _, _, files in os.walk(upload_dirs / "sessions"))
+
+    def test_complete_is_idempotent(self, client: TestClient, test_conversation, auth_headers, test_db):
+        """Test repeating the finalize call returns the same file instead of a second copy"""
+        session = start(client, auth_headers, 5, conversation_id=test_conversation.id).json()
+        put_chunk(client, auth_headers, session["id"], 0, b"hello")
+
+        first = client.post(f"/uploads/{session['id']}/complete", headers=auth_headers).json()
+        second = client.post(f"/uploads/{session['id']}/complete", headers=auth_headers).json()
+        assert first == second
+        assert test_db.query(ChatFile).count() == 1
+        assert test_db.query(FileBlob).one().ref_count == 1
+
+    def test_resume_after_lost_chunk(self, client: TestClient, test_project, auth_headers):
+        """Test a chunk at the wrong offset is refused and the session says where to resume"""
+        session = start(client, auth_headers, 10, project_id=test_project.id).json()
+        put_chunk(client, auth_headers, session["id"], 0, b"01234")
+
+        response = put_chunk(client, auth_headers, session["id"], 7, b"789")
+        assert response.status_code == 409
+        assert client.get(f"/uploads/{session['id']}", headers=auth_headers).json()["offset"] == 5
+        # A retransmission of a chunk that did arrive is refused too
+        assert put_chunk(client, auth_headers, session["id"], 0, b"01234").status_code == 409
+        assert put_chunk(client, auth_headers, session["id"], 5, b"56789").json()["offset"] == 10
+
+    def test_chunk_checksum(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test a corrupted chunk is rejected and not recorded"""
+        session = start(client, auth_headers, 4, project_id=test_project.id).json()
+        wrong = hashlib.sha256(b"other").hexdigest()
+        response = put_chunk(client, auth_headers, session["id"], 0, b"data", sha256=wrong)
+        assert response.status_code == 400
+        assert test_db.query(UploadChunk).count() == 0
+
+        right = hashlib.sha256(b"data").hexdigest()
+        assert put_chunk(client, auth_headers, session["id"], 0, b"data", sha256=right).json()["offset"] == 4
+
+    def test_file_checksum_mismatch(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test a file that doesn't match its declared hash is discarded"""
+        session = start(
+            client, auth_headers, 4, project_id=test_project.id, sha256=hashlib.sha256(b"good").hexdigest()
+        ).json()
+        put_chunk(client, auth_headers, session["id"], 0, b"evil")
+
+        response = client.post(f"/uploads/{session['id']}/complete", headers=auth_headers)
+        assert response.status_code == 400
+        assert client.get(f"/uploads/{session['id']}", headers=auth_headers).status_code == 404
+        assert test_db.query(ProjectFile).count() == 0
+        assert test_db.query(FileBlob).count() == 0
+
+    def test_incomplete_upload_not_finalized(self, client: TestClient, test_project, auth_headers):
+        """Test completing before all bytes arrived is refused"""
+        session = start(client, auth_headers, 10, project_id=test_project.id).json()
+        put_chunk(client, auth_headers, session["id"], 0, b"01234")
+        response = client.post(f"/uploads/{session['id']}/complete", headers=auth_headers)
+        assert response.status_code == 409
+        assert "5 of 10" in response.json()["detail"]
+
+    def test_chunk_past_declared_size(self, client: TestClient, test_project, auth_headers, test_db):
+        """Test a chunk can't carry more bytes than the file has left"""
+        session = start(client, auth_headers, 3, project_id=test_project.id).json()
+        assert put_chunk(client, auth_headers, session["id"], 0, b"toolong").status_code == 400
+        assert test_db.query(UploadChunk).count() == 0
+
+    def test_larger_than_single_request_limit(self, client: TestClient, test_project, auth_headers, monkeypatch):
+        """Test files over the single-request limit can be uploaded in chunks"""
+        monkeypatch.setattr(settings, "upload_session_max_chunk", 4 * 1024 * 1024)
+        content = os.urandom(MAX_FILE_SIZE + 1024)
+        session = start(client, auth_headers, len(content), project_id=test_project.id).json()
+        step = settings.upload_session_max_chunk
+        for offset in range(0, len(content), step):
+            assert put_chunk(client, auth_headers, session["id"], offset, content[offset:offset + step]).status_code == 200
+
+        response = client.post(f"/uploads/{session['id']}/complete", headers=auth_headers)
+        assert response.json()["file"]["size"] == len(content)
+
+    def test_abort_removes_chunks(self, client: TestClient, test_project, auth_headers, test_db, upload_dirs):
+        """Test an abandoned upload leaves nothing behind"""
+        session = start(client, auth_headers, 10, project_id=test_project.id).json()
+        put_chunk(client, auth_headers, session["id"], 0, b"01234")
+
+        assert client.delete(f"/uploads/{session['id']}", headers=auth_headers).status_code == 200
+        assert test_db.query(UploadChunk).count() == 0
+        assert not any(files for _, _, files in os.walk(upload_dirs / "sessions"))
+
+    def test_chunks_in_object_storage(self, client: TestClient, test_project, auth_headers, test_db, upload_dirs):
+        """Test chunks go to the configured storage backend, so any node can take the next one"""
+        s3 = FakeS3Client()
+        set_storage(CachedStorage(S3Storage(s3, "bucket"), str(upload_dirs / "cache"), max_bytes=0))
+        try:
+            session = start(client, auth_headers, 6, project_id=test_project.id).json()
+            put_chunk(client, auth_headers, session["id"], 0, b"abc")
+            put_chunk(client, auth_headers, session["id"], 3, b"def")
+            assert sorted(s3.objects.values()) == [b"abc", b"def"]
+
+            data = client.post(f"/uploads/{session['id']}/complete", headers=auth_headers).json()
+            blob = test_db.get(ProjectFile, data["file"]["id"]).blob
+            assert s3.objects == {("bucket", blob.storage_path): b"abcdef"}
+        finally:
+            set_storage(None)
+
+
+@pytest.mark.api
+class TestResumableUploadValidation:
+    """Test what a session can be created for"""
+
+    def test_size_limit(self, client: TestClient, test_project, auth_headers):
+        """Test the resumable size limit applies at creation"""
+        response = start(client, auth_headers, settings.upload_session_max_size + 1, project_id=test_project.id)
+        assert response.status_code == 400
+
+    def test_one_destination_required(self, client: TestClient, test_project, test_conversation, auth_headers):
+        """Test a session needs exactly one of project_id and conversation_id"""
+        assert start(client, auth_headers, 10).status_code == 400
+        both = start(client, auth_headers, 10, project_id=test_project.id, conversation_id=test_conversation.id)
+        assert both.status_code == 400
+
+    def test_other_users_project(self, client: TestClient, test_project, auth_headers_user_2):
+        """Test files can't be uploaded into another user's project"""
+        assert start(client, auth_headers_user_2, 10, project_id=test_project.id).status_code == 403
+
+    def test_other_users_session(self, client: TestClient, test_project, auth_headers, auth_headers_user_2):
+        """Test another user can't add to or read a session"""
+        session = start(client, auth_headers, 10, project_id=test_project.id).json()
+        assert put_chunk(client, auth_headers_user_2, session["id"], 0, b"x").status_code == 403
+        assert client.get(f"/uploads/{session['id']}", headers=auth_headers_user_2).status_code == 403
+
+    def test_open_session_limit(self, client: TestClient, test_project, auth_headers, monkeypatch):
+        """Test a user can only have a few uploads in progress"""
+        monkeypatch.setattr(settings, "upload_session_max_open", 2)
+        for _ in range(2):
+            assert start(client, auth_headers, 10, project_id=test_project.id).status_code == 200
+        assert start(client, auth_headers, 10, project_id=test_project.id).status_code == 429
@@ -0,0 +1,141 @@
+"""
+Tests for signed session tokens on the API
+"""
+import pytest
+from fastapi.testclient import TestClient
+from config.settings import settings
+from utils.tokens import denylist
+
+
+@pytest.fixture(autouse=True)
+def clean_denylist():
+    denylist.clear()
+    yield
+    denylist.clear()
+
+
+def login(client: TestClient, test_user, password: str = "testpassword123") -> dict:
+    response = client.post("/auth/login", json={"email": test_user.email, "password": password})
+    assert response.status_code == 200
+    return response.json()
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.api
+class TestSessionTokens:
+    """Test issuing, using and revoking tokens"""
+
+    def test_login_returns_tokens(self, client: TestClient, test_user):
+        """Test login issues an access and a refresh token"""
+        data = login(client, test_user)
+        assert data["token_type"] == "bearer"
+        assert data["expires_in"] == settings.auth_access_token_ttl
+        assert data["access_token"] and data["refresh_token"]
+
+    def test_bearer_token_authenticates(self, client: TestClient, test_user, monkeypatch):
+        """Test a request with only a token is authenticated without reading the user"""
+        from database import crud
+        token = login(client, test_user)["access_token"]
+
+        def no_lookup(*args, **kwargs):
+            raise AssertionError("user looked up")
+        monkeypatch.setattr(crud, "get_user_by_id", no_lookup)
+        response = client.get(f"/projects/{test_user.id}", headers=bearer(token))
+        assert response.status_code == 200
+
+    def test_token_only_grants_own_resources(self, client: TestClient, test_user, test_user_2):
+        """Test the token's user, not a header, decides ownership"""
+        token = login(client, test_user)["access_token"]
+        response = client.get(
+            f"/projects/{test_user_2.id}",
+            headers={**bearer(token), "X-User-ID": test_user_2.id}
+        )
+        assert response.status_code == 403
+
+    def test_invalid_token_rejected(self, client: TestClient, test_user, monkeypatch):
+        """Test a bad token is refused even alongside a valid X-User-ID"""
+        monkeypatch.setattr(settings, "auth_legacy_user_id_header", True)
+        response = client.get(
+            f"/projects/{test_user.id}",
+            headers={"X-User-ID": test_user.id, **bearer("not.a.token")}
+        )
+        assert response.status_code == 401
+        assert response.headers["www-authenticate"] == "Bearer"
+
+    def test_user_id_header_only_when_legacy_enabled(self, client: TestClient, test_user, monkeypatch):
+        """Test the X-User-ID fallback is refused unless the legacy setting is on"""
+        headers = {"X-User-ID": test_user.id}
+        assert client.get(f"/projects/{test_user.id}", headers=headers).status_code == 401
+        monkeypatch.setattr(settings, "auth_legacy_user_id_header", True)
+        assert client.get(f"/projects/{test_user.id}", headers=headers).status_code == 200
+
+    def test_signup_returns_tokens(self, client: TestClient):
+        """Test a new account is signed in straight away"""
+        response = client.post(
+            "/auth/signup",
+            json={"email": "new@example.com", "password": "newpassword123", "display_name": "New"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["token_type"] == "bearer"
+        user_id = data["user"]["id"]
+        assert client.get(f"/projects/{user_id}", headers=bearer(data["access_token"])).status_code == 200
+        assert client.post("/auth/refresh", json={"refresh_token": data["refresh_token"]}).status_code == 200
+
+    def test_refresh_rotates(self, client: TestClient, test_user):
+        """Test a refresh token gives a new pair and can't be exchanged twice"""
+        tokens = login(client, test_user)
+        response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == 200
+        rotated = response.json()
+        assert rotated["refresh_token"] != tokens["refresh_token"]
+        assert client.get(f"/projects/{test_user.id}", headers=bearer(rotated["access_token"])).status_code == 200
+
+        # Reusing the old refresh token ends every session
+        response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == 401
+        assert client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+        assert client.get(f"/projects/{test_user.id}", headers=bearer(rotated["access_token"])).status_code == 401
+
+    def test_refresh_rejects_access_token(self, client: TestClient, test_user):
+        """Test an access token can't be exchanged at /auth/refresh"""
+        tokens = login(client, test_user)
+        response = client.post("/auth/refresh", json={"refresh_token": tokens["access_token"]})
+        assert response.status_code == 401
+
+    def test_logout_revokes(self, client: TestClient, test_user):
+        """Test logging out revokes both tokens"""
+        tokens = login(client, test_user)
+        other = login(client, test_user)
+        response = client.post(
+            "/auth/logout",
+            json={"refresh_token": tokens["refresh_token"]},
+            headers=bearer(tokens["access_token"])
+        )
+        assert response.status_code == 200
+        assert client.get(f"/projects/{test_user.id}", headers=bearer(tokens["access_token"])).status_code == 401
+        # Other sessions continue
+        assert client.get(f"/projects/{test_user.id}", headers=bearer(other["access_token"])).status_code == 200
+        assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+    def test_password_change_revokes_other_sessions(self, client: TestClient, test_user):
+        """Test changing the password ends other sessions and issues new tokens"""
+        other = login(client, test_user)
+        current = login(client, test_user)
+        response = client.post(
+            "/auth/change-password",
+            json={
+                "user_id": test_user.id,
+                "current_password": "testpassword123",
+                "new_password": "newpassword123"
+            },
+            headers=bearer(current["access_token"])
+        )
+        assert response.status_code == 200
+        renewed = response.json()
+        assert client.get(f"/projects/{test_user.id}", headers=bearer(other["access_token"])).status_code == 401
+        assert client.get(f"/projects/{test_user.id}", headers=bearer(renewed["access_token"])).status_code == 200
+        assert client.post("/auth/refresh", json={"refresh_token": other["refresh_token"]}).status_code == 401
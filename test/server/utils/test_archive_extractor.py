@@ -0,0 +1,165 @@
+"""
+Tests for archive text extraction
+"""
+import gzip
+import io
+import tarfile
+import zipfile
+import pytest
+from utils.archive_extractor import (
+    archive_kind, extract_archive, select_archive_text, select_members, index_terms
+)
+from utils.file_extractor import extract_text_from_file
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def make_tar(path, members, mode="w:gz"):
+    with tarfile.open(path, mode) as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+@pytest.mark.unit
+class TestArchiveKind:
+    """Test archive_kind"""
+
+    def test_detects_by_content(self, tmp_path):
+        """Test archives are recognised whatever they are called"""
+        assert archive_kind(make_zip(tmp_path / "upload", {"a.txt": "a"})) == "zip"
+        assert archive_kind(make_tar(tmp_path / "upload2", {"a.txt": b"a"})) == "tar"
+        path = tmp_path / "upload3"
+        path.write_bytes(gzip.compress(b"text"))
+        assert archive_kind(str(path)) == "gzip"
+
+    def test_documents_not_treated_as_archives(self, tmp_path):
+        """Test zip-based documents and plain files are left to their extractors"""
+        path = make_zip(tmp_path / "report.docx", {"word/document.xml": "<w/>"})
+        assert archive_kind(path, "docx") is None
+        text = tmp_path / "notes.txt"
+        text.write_text("plain text")
+        assert archive_kind(str(text)) is None
+
+
+@pytest.mark.unit
+class TestExtractArchive:
+    """Test extract_archive"""
+
+    def test_zip_members_through_extractors(self, tmp_path):
+        """Test each member goes through the extractor for its type"""
+        path = make_zip(tmp_path / "a.zip", {
+            "docs/readme.md": "# Readme\nhello",
+            "data/config.json": '{"debug": true}',
+        })
+        archive = extract_archive(path)
+        assert [m.name for m in archive.members] == ["docs/readme.md", "data/config.json"]
+        assert archive.members[1].text == "debug: true"
+        assert "with 2 files, text extracted from 2" in archive.summary
+
+    def test_tar_gz_members(self, tmp_path):
+        """Test compressed tarballs are read as a stream"""
+        path = make_tar(tmp_path / "a.tar.gz", {"src/main.py": b"print('hi')", "notes.txt": b"notes"})
+        archive = extract_archive(path)
+        assert [(m.name, m.text) for m in archive.members] == [("src/main.py", "print('hi')"), ("notes.txt", "notes")]
+
+    def test_single_gzip_file_keeps_its_name(self, tmp_path):
+        """Test a gzipped file is extracted by its original name"""
+        path = tmp_path / "upload"
+        with open(path, "wb") as raw, gzip.GzipFile(filename="rows.csv", mode="wb", fileobj=raw) as f:
+            f.write(b"n\n1\n2\n")
+        archive = extract_archive(str(path))
+        assert archive.members[0].name == "rows.csv"
+        assert "CSV with 2 rows" in archive.members[0].text
+
+    def test_binaries_and_nested_archives_skipped(self, tmp_path):
+        """Test binary members are listed but not extracted"""
+        path = make_zip(tmp_path / "a.zip", {
+            "logo.png": b"\x89PNG",
+            "blob.dat2": b"abc\0def",
+            "inner.zip": b"PK",
+            "ok.txt": "text",
+        })
+        archive = extract_archive(path)
+        assert [m.name for m in archive.members] == ["ok.txt"]
+        assert "logo.png (4 bytes, skipped: binary)" in archive.summary
+        assert "blob.dat2 (7 bytes, skipped: binary)" in archive.summary
+        assert "inner.zip (2 bytes, skipped: nested archive)" in archive.summary
+
+    def test_member_limit(self, tmp_path):
+        """Test reading stops at the member limit"""
+        path = make_zip(tmp_path / "a.zip", {f"{i}.txt": str(i) for i in range(10)})
+        archive = extract_archive(path, max_members=3)
+        assert len(archive.members) == 3
+        assert "[Stopped: archive limit of 3 files reached]" in archive.summary
+
+    def test_zip_bomb_member_skipped(self, tmp_path):
+        """Test a highly compressed member over the size limit is never inflated"""
+        path = make_zip(tmp_path / "bomb.zip", {"zeros.txt": b"0" * (5 * 1024 * 1024), "ok.txt": "fine"})
+        archive = extract_archive(path, max_member_bytes=1024 * 1024)
+        assert [m.name for m in archive.members] == ["ok.txt"]
+        assert "zeros.txt (5.0 MB, skipped: too large)" in archive.summary
+
+    def test_total_size_limit(self, tmp_path):
+        """Test reading stops once the decompressed byte budget is used"""
+        members = {f"{i}.txt": b"x" * 1000 for i in range(10)}
+        for path in (make_zip(tmp_path / "a.zip", members), make_tar(tmp_path / "a.tar.gz", members)):
+            archive = extract_archive(path, max_total_bytes=4500)
+            assert 1 <= len(archive.members) < 5
+            assert "decompressed reached" in archive.summary
+
+    def test_corrupt_archive(self, tmp_path):
+        """Test an unreadable archive yields error text"""
+        path = tmp_path / "a.zip"
+        path.write_bytes(b"PK\x03\x04 not really a zip")
+        assert extract_archive(str(path), "zip").summary.startswith("[Error")
+
+    def test_via_extract_text_from_file(self, tmp_path):
+        """Test archives are no longer read as raw bytes"""
+        path = make_zip(tmp_path / "upload", {"notes.txt": "inside the zip"})
+        text = extract_text_from_file(path, "application/zip")
+        assert "=== notes.txt ===\ninside the zip" in text
+        assert "PK" not in text
+
+
+@pytest.mark.unit
+class TestMemberSelection:
+    """Test picking the members relevant to a question"""
+
+    def test_relevant_members_first(self):
+        """Test members sharing the rarer query terms are chosen"""
+        members = [
+            (index_terms("readme.md", "project overview"), 100),
+            (index_terms("billing.py", "compute invoice totals for the project"), 100),
+            (index_terms("deploy.sh", "kubernetes rollout for the project"), 100),
+        ]
+        assert select_members("how are invoice totals computed in the project?", members, 0) == [1]
+
+    def test_file_name_matches(self):
+        """Test asking about a file by name selects it"""
+        members = [(index_terms("a/alpha.txt", "one"), 10), (index_terms("b/beta.txt", "two"), 10)]
+        assert select_members("show me beta", members, 0) == [1]
+
+    def test_no_match_falls_back_to_archive_order(self):
+        """Test members are taken in order, within the budget, when nothing matches"""
+        members = [(index_terms(f"{i}.txt", "text"), 40) for i in range(5)]
+        assert select_members("unrelated question", members, 100) == [0, 1]
+
+    def test_prompt_text_only_includes_selected(self, tmp_path):
+        """Test the other members are listed but their text left out"""
+        path = make_zip(tmp_path / "a.zip", {
+            "sales.csv": "region,amount\nnorth,10\n",
+            "readme.md": "general notes",
+        })
+        text = select_archive_text(extract_archive(path), "north region amount")
+        assert "=== sales.csv ===" in text
+        assert "general notes" not in text
+        assert "- readme.md" in text
+        assert "[1 more files not included" in text
@@ -3,10 +3,14 @@ Tests for cache utilities
 """
 import pytest
 import time
+from types import SimpleNamespace
 from utils.cache import (
-    SimpleCache, get_cached_api_key, set_cached_api_key,
-    clear_api_key_cache, api_key_cache
+    CacheBackend, SimpleCache, get_cached_api_key, set_cached_api_key,
+    clear_api_key_cache, api_key_cache, get_cached_integration,
+    set_cached_integration, clear_integration_cache, clear_user_cache,
+    create_cache, set_api_key_missing, set_integration_missing, is_missing
 )
+from config.settings import settings
 
 
 @pytest.mark.unit
@@ -75,6 +79,111 @@ class TestSimpleCache:
         assert value is None
 
 
+@pytest.mark.unit
+class TestBoundedCache:
+    """Test LRU bounds, expiry sweeping and counters"""
+    
+    def test_max_entries_evicts_least_recently_used(self):
+        """Test the least recently read entry is evicted first"""
+        cache = SimpleCache(default_ttl=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", 3)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+    
+    def test_max_bytes_budget(self):
+        """Test entries are evicted to stay within the byte budget"""
+        cache = SimpleCache(default_ttl=60, max_bytes=3000)
+        for i in range(10):
+            cache.set(f"key{i}", "x" * 1000)
+        
+        stats = cache.stats()
+        assert stats["bytes"] <= 3000
+        assert stats["entries"] == 2
+        assert cache.get("key9") is not None
+        assert cache.get("key0") is None
+    
+    def test_overwrite_keeps_accounting(self):
+        """Test replacing a key doesn't double count its size"""
+        cache = SimpleCache(default_ttl=60)
+        cache.set("key", "x" * 1000)
+        cache.set("key", "y")
+        assert cache.stats()["bytes"] < 1000
+        cache.delete("key")
+        assert cache.stats()["bytes"] == 0
+    
+    def test_purge_expired(self):
+        """Test expired entries are removed without being read"""
+        cache = SimpleCache(default_ttl=60)
+        cache.set("short", "value", ttl=0)
+        cache.set("long", "value")
+        cache.set("renewed", "old", ttl=0)
+        cache.set("renewed", "new")
+        
+        assert cache.purge_expired() == 1
+        assert cache.size() == 2
+        assert cache.get("renewed") == "new"
+        assert cache.stats()["expirations"] == 1
+    
+    def test_background_sweeper(self):
+        """Test the sweeper thread removes expired entries on its own"""
+        cache = SimpleCache(default_ttl=60, sweep_interval=0.05)
+        try:
+            cache.set("key", "value", ttl=0)
+            deadline = time.time() + 2
+            while cache.size() and time.time() < deadline:
+                time.sleep(0.02)
+            assert cache.size() == 0
+        finally:
+            cache.close()
+    
+    def test_hit_miss_counters(self):
+        """Test hits and misses are counted"""
+        cache = SimpleCache(default_ttl=60)
+        cache.set("key", "value")
+        cache.get("key")
+        cache.get("missing")
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+    
+    def test_delete_prefix(self):
+        """Test deleting every key under a prefix"""
+        cache = SimpleCache(default_ttl=60)
+        cache.set("user:1:a", 1)
+        cache.set("user:1:b", 2)
+        cache.set("user:2:a", 3)
+        assert cache.delete_prefix("user:1:") == 2
+        assert cache.size() == 1
+    
+    def test_delete_tag(self):
+        """Test deleting every entry carrying a tag"""
+        cache = SimpleCache(default_ttl=60)
+        cache.set("a", 1, tags=("user:1",))
+        cache.set("b", 2, tags=("user:1", "provider:openai"))
+        cache.set("c", 3, tags=("user:2",))
+        
+        assert cache.delete_tag("user:1") == 2
+        assert cache.get("c") == 3
+        assert cache.delete_tag("provider:openai") == 0
+        assert cache.delete_tag("unknown") == 0
+    
+    def test_tag_index_follows_removals(self):
+        """Test evicted, expired and overwritten entries leave the tag index"""
+        cache = SimpleCache(default_ttl=60, max_entries=1)
+        cache.set("a", 1, tags=("user:1",))
+        cache.set("b", 2, tags=("user:2",))  # evicts "a"
+        cache.set("b", 3)  # overwrite without tags
+        cache.set("c", 4, ttl=0, tags=("user:3",))
+        cache.purge_expired()
+        assert cache._tags == {}
+
+
 @pytest.mark.unit
 class TestAPIKeyCache:
     """Test API key cache functions"""
@@ -151,3 +260,86 @@ class TestAPIKeyCache:
         clear_api_key_cache(user1_id, provider)
         assert get_cached_api_key(user1_id, provider) is None
         assert get_cached_api_key(user2_id, provider) == "sk-user2"
+
+    def test_clear_user_keys_leaves_other_users(self):
+        """Test clearing one user's keys doesn't touch keys with a similar prefix"""
+        set_cached_api_key("user1", "openai", "sk-1")
+        set_cached_api_key("user10", "openai", "sk-10")
+        
+        clear_api_key_cache("user1")
+        assert get_cached_api_key("user1", "openai") is None
+        assert get_cached_api_key("user10", "openai") == "sk-10"
+
+
+@pytest.mark.unit
+class TestIntegrationCache:
+    """Test custom integration cache functions"""
+    
+    def _integration(self, provider_id="custom_local"):
+        return SimpleNamespace(
+            id=1, name="Local", provider_id=provider_id,
+            base_url="http://localhost:11434", api_type="openai", is_active=True
+        )
+    
+    def test_set_get_cached_integration(self):
+        """Test integrations are cached as detached snapshots"""
+        snapshot = set_cached_integration("int_user", self._integration())
+        cached = get_cached_integration("int_user", "custom_local")
+        assert cached is snapshot
+        assert cached.base_url == "http://localhost:11434"
+        clear_integration_cache("int_user")
+        assert get_cached_integration("int_user", "custom_local") is None
+    
+    def test_clear_user_cache(self):
+        """Test clearing a user drops their API keys and integrations"""
+        set_cached_api_key("gone_user", "openai", "sk-gone")
+        set_cached_integration("gone_user", self._integration())
+        
+        clear_user_cache("gone_user")
+        assert get_cached_api_key("gone_user", "openai") is None
+        assert get_cached_integration("gone_user", "custom_local") is None
+
+    
+    def test_negative_entries(self):
+        """Test missing keys/integrations are remembered until cleared"""
+        set_api_key_missing("neg_user", "openai")
+        set_integration_missing("neg_user", "custom_gone")
+        assert is_missing(get_cached_api_key("neg_user", "openai"))
+        assert is_missing(get_cached_integration("neg_user", "custom_gone"))
+        
+        clear_api_key_cache("neg_user", "openai")
+        clear_integration_cache("neg_user")
+        assert get_cached_api_key("neg_user", "openai") is None
+        assert get_cached_integration("neg_user", "custom_gone") is None
+    
+    def test_is_missing(self):
+        """Test only the sentinel counts as a negative entry"""
+        assert not is_missing(None)
+        assert not is_missing("sk-real")
+        assert not is_missing(self._integration())
+
+@pytest.mark.unit
+class TestCreateCache:
+    """Test cache backend selection"""
+    
+    def test_default_is_in_process(self):
+        """Test no shared backend is used unless configured"""
+        cache = create_cache("test", default_ttl=60)
+        assert isinstance(cache, SimpleCache)
+        cache.close()
+    
+    def test_unreachable_shared_backend_falls_back(self, monkeypatch):
+        """Test a broken shared backend config doesn't stop the app"""
+        monkeypatch.setattr(settings, "cache_redis_url", "redis://127.0.0.1:1/0")
+        cache = create_cache("test", default_ttl=60)
+        assert isinstance(cache, SimpleCache)
+        cache.close()
+    
+    def test_incomplete_backend_cannot_be_created(self):
+        """Test a backend missing part of the interface fails when instantiated"""
+        class GetOnlyCache(CacheBackend):
+            def get(self, key):
+                return None
+        
+        with pytest.raises(TypeError):
+            GetOnlyCache()
@@ -0,0 +1,56 @@
+"""
+Tests for compression utilities
+"""
+import pytest
+from utils.compression import compress_text, decompress_text, sqlite_message_text, ENCODING_ZLIB
+
+
+@pytest.mark.unit
+class TestCompression:
+    """Test text compression helpers"""
+    
+    def test_small_values_stay_plain(self):
+        """Test values below the threshold are not compressed"""
+        stored, encoding = compress_text("short", threshold=100)
+        assert stored == "short"
+        assert encoding is None
+    
+    def test_large_values_are_compressed(self):
+        """Test values above the threshold are compressed and round-trip"""
+        text = "The quick brown fox jumps over the lazy dog. " * 200
+        stored, encoding = compress_text(text, threshold=100)
+        assert encoding == ENCODING_ZLIB
+        assert len(stored) < len(text)
+        assert decompress_text(stored, encoding) == text
+    
+    def test_unicode_round_trip(self):
+        """Test non-ASCII text survives compression"""
+        text = "Grüße, 世界! 🎉 " * 300
+        stored, encoding = compress_text(text, threshold=10)
+        assert decompress_text(stored, encoding) == text
+    
+    def test_threshold_zero_disables(self):
+        """Test a zero threshold disables compression"""
+        text = "a" * 10000
+        assert compress_text(text, threshold=0) == (text, None)
+    
+    def test_incompressible_values_stay_plain(self):
+        """Test values that would grow are stored as-is"""
+        import secrets
+        text = secrets.token_urlsafe(3000)
+        stored, encoding = compress_text(text, threshold=10)
+        assert encoding is None
+        assert stored == text
+    
+    def test_decompress_plain(self):
+        """Test plain values pass through"""
+        assert decompress_text("plain", None) == "plain"
+    
+    def test_decompress_unknown_encoding(self):
+        """Test unknown encodings are rejected"""
+        with pytest.raises(ValueError):
+            decompress_text("data", "lz4")
+    
+    def test_sqlite_function_never_raises(self):
+        """Test the lenient decoder falls back to the stored value"""
+        assert sqlite_message_text("not-base64!", ENCODING_ZLIB) == "not-base64!"
@@ -61,3 +61,43 @@ class TestEncryption:
         finally:
             settings.encryption_key = original_key
 
+
+
+@pytest.mark.unit
+class TestKeyRotation:
+    """Test cipher caching and key rotation"""
+    
+    def test_cipher_is_reused(self):
+        """Test the cipher is built once per key configuration"""
+        from utils.encryption import get_cipher
+        assert get_cipher() is get_cipher()
+    
+    def test_cipher_follows_settings(self, monkeypatch):
+        """Test changing the configured key takes effect immediately"""
+        from utils.encryption import get_cipher, encrypt_key
+        from config.settings import settings
+        
+        before = get_cipher()
+        token = encrypt_key("sk-test")
+        monkeypatch.setattr(settings, "encryption_key", Fernet.generate_key().decode())
+        assert get_cipher() is not before
+        with pytest.raises(Exception):
+            get_cipher().decrypt(token.encode())
+    
+    def test_previous_keys_still_decrypt(self, monkeypatch):
+        """Test values written with a retired key decrypt and are re-encrypted"""
+        from utils.encryption import encrypt_key, decrypt_key, decrypt_and_rotate
+        from config.settings import settings
+        
+        old_key = settings.encryption_key
+        token = encrypt_key("sk-rotate-me")
+        monkeypatch.setattr(settings, "encryption_key", Fernet.generate_key().decode())
+        monkeypatch.setattr(settings, "encryption_previous_keys", old_key)
+        
+        assert decrypt_key(token) == "sk-rotate-me"
+        plaintext, rotated = decrypt_and_rotate(token)
+        assert plaintext == "sk-rotate-me"
+        assert rotated is not None
+        # The new token is under the current key and needs no further rotation
+        assert Fernet(settings.encryption_key.encode()).decrypt(rotated.encode()) == b"sk-rotate-me"
+        assert decrypt_and_rotate(rotated) == ("sk-rotate-me", None)
@@ -0,0 +1,109 @@
+"""
+Tests for the document extraction process pool
+"""
+import asyncio
+import os
+import time
+import pytest
+from config.settings import settings
+from utils.extraction_pool import ExtractionPool, extract_text_async, shutdown_extraction_pool
+
+
+def _sleep_then_pid(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+@pytest.fixture
+def pool():
+    pool = ExtractionPool(workers=2, timeout=20, memory_mb=512)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.unit
+class TestExtractionPool:
+    """Test ExtractionPool"""
+
+    @pytest.mark.asyncio
+    async def test_runs_in_worker_process(self, pool):
+        """Test calls run in another process"""
+        assert await pool.run(os.getpid) != os.getpid()
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_worker_and_recovers(self, pool):
+        """Test a runaway call is killed and the pool keeps working"""
+        start = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(time.sleep, 30, timeout=1)
+        assert time.monotonic() - start < 10
+
+        assert pool.timeouts == 1
+        assert pool.restarts == 1
+        assert await pool.run(len, "abc") == 3
+
+    @pytest.mark.asyncio
+    async def test_timeout_spares_other_workers(self, pool):
+        """Test killing a runaway call doesn't abort a call running on another worker"""
+        slow = asyncio.ensure_future(pool.run(time.sleep, 30, timeout=1))
+        other = asyncio.ensure_future(pool.run(_sleep_then_pid, 2))
+        with pytest.raises(asyncio.TimeoutError):
+            await slow
+        survivor = await other
+        assert survivor != os.getpid()
+        assert pool.restarts == 1
+        # The surviving worker is reused
+        assert await pool.run(os.getpid) == survivor
+
+    @pytest.mark.asyncio
+    async def test_memory_limit(self, pool):
+        """Test a worker cannot allocate past the memory cap"""
+        with pytest.raises(MemoryError):
+            await pool.run(bytearray, 2 * 1024 ** 3)
+        assert await pool.run(len, "still alive") == 11
+
+    @pytest.mark.asyncio
+    async def test_calls_run_in_parallel(self, pool):
+        """Test files are extracted concurrently up to the worker count"""
+        # Warm up both workers so process start-up isn't measured
+        await asyncio.gather(pool.run(time.sleep, 0.1), pool.run(time.sleep, 0.1))
+        start = time.monotonic()
+        await asyncio.gather(pool.run(time.sleep, 1), pool.run(time.sleep, 1))
+        assert time.monotonic() - start < 1.8
+
+
+@pytest.mark.unit
+class TestExtractTextAsync:
+    """Test extract_text_async"""
+
+    @pytest.mark.asyncio
+    async def test_extracts_in_pool(self, tmp_path, monkeypatch):
+        """Test text files are extracted through the shared pool"""
+        path = tmp_path / "notes.txt"
+        path.write_text("pooled extraction")
+        monkeypatch.setattr(settings, "extraction_workers", 1)
+        try:
+            assert await extract_text_async(str(path), ".txt") == "pooled extraction"
+        finally:
+            shutdown_extraction_pool()
+
+    @pytest.mark.asyncio
+    async def test_thread_fallback(self, tmp_path, monkeypatch):
+        """Test extraction still works with the pool disabled"""
+        path = tmp_path / "notes.txt"
+        path.write_text("threaded extraction")
+        monkeypatch.setattr(settings, "extraction_workers", 0)
+        assert await extract_text_async(str(path), ".txt") == "threaded extraction"
+
+    @pytest.mark.asyncio
+    async def test_timeout_returns_error_text(self, tmp_path, monkeypatch):
+        """Test a file that takes too long comes back as error text"""
+        path = tmp_path / "notes.txt"
+        path.write_text("slow")
+        monkeypatch.setattr(settings, "extraction_workers", 1)
+        monkeypatch.setattr(settings, "extraction_timeout", 0.001)
+        try:
+            text = await extract_text_async(str(path), ".txt")
+        finally:
+            shutdown_extraction_pool()
+        assert text.startswith("[Error")
@@ -0,0 +1,372 @@
+"""
+Tests for file text extraction
+"""
+import json
+import zipfile
+import pytest
+from utils.file_extractor import (
+    extract_text_from_file, extract_text_from_pdf, iter_pdf_pages, parse_page_range,
+    extract_text_from_csv, extract_text_from_json, extract_text_from_xml, iter_json_items, _JsonStream,
+    extract_text_from_docx, _TextBuilder
+)
+
+WORD_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def make_pdf(path, page_texts):
+    """Write a minimal PDF with one line of text per page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(page_texts))), len(page_texts)
+        )).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(page_texts):
+        content = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        ).encode())
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+    return str(path)
+
+
+def make_docx(path, body_xml):
+    """Write a minimal DOCX whose body is the given WordprocessingML"""
+    with zipfile.ZipFile(path, "w") as package:
+        package.writestr("[Content_Types].xml", (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        package.writestr("_rels/.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="word/document.xml" Type='
+            '"http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ))
+        package.writestr("word/document.xml", f'<w:document xmlns:w="{WORD_NS}"><w:body>{body_xml}</w:body></w:document>')
+    return str(path)
+
+
+def paragraph(text):
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def table(rows):
+    return "<w:tbl>" + "".join(
+        "<w:tr>" + "".join(f"<w:tc>{paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>" for row in rows
+    ) + "</w:tbl>"
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return make_pdf(tmp_path / "doc.pdf", [f"Page {n} text" for n in range(1, 11)])
+
+
+@pytest.mark.unit
+class TestTextBuilder:
+    """Test the character budget shared by the extractors"""
+
+    def test_full_budget_then_another_line(self):
+        """Test a line that exactly fills the budget leaves no room for the next"""
+        builder = _TextBuilder(10)
+        assert builder.add("a" * 10)
+        assert not builder.add("bbbbb")
+        assert builder.text().splitlines() == ["a" * 10, "[Truncated: text limit of 10 characters reached]"]
+
+    def test_newlines_count_towards_budget(self):
+        """Test the text kept, newlines included, never exceeds the budget"""
+        builder = _TextBuilder(10)
+        assert builder.add("aaaa")
+        assert not builder.add("bbbbbbbb")
+        kept = builder.text().rsplit("\n", 1)[0]
+        assert kept == "aaaa\nbbbbb"
+        assert len(kept) == 10
+
+
+@pytest.mark.unit
+class TestPageRange:
+    """Test parse_page_range"""
+
+    def test_single_pages_and_ranges(self):
+        """Test pages and ranges are 1-based and inclusive"""
+        assert parse_page_range("1-3,7", 10) == [0, 1, 2, 6]
+
+    def test_open_ranges(self):
+        """Test open-ended ranges run to the first/last page"""
+        assert parse_page_range("-2,9-", 10) == [0, 1, 8, 9]
+
+    def test_pages_past_end_dropped(self):
+        """Test selections beyond the document are ignored"""
+        assert parse_page_range("8-20,30", 10) == [7, 8, 9]
+
+    def test_invalid_range(self):
+        """Test malformed ranges are rejected"""
+        with pytest.raises(ValueError):
+            parse_page_range("5-2", 10)
+
+
+@pytest.mark.unit
+class TestPdfExtraction:
+    """Test PDF text extraction"""
+
+    def test_extracts_all_pages(self, pdf_path):
+        """Test every page is extracted in order"""
+        text = extract_text_from_pdf(pdf_path, max_pages=0, max_chars=0)
+        assert text.splitlines() == [f"Page {n} text" for n in range(1, 11)]
+
+    def test_streams_pages(self, pdf_path):
+        """Test pages come out one at a time"""
+        pages = iter_pdf_pages(pdf_path)
+        assert next(pages) == "Page 1 text"
+        pages.close()
+
+    def test_page_limit(self, pdf_path):
+        """Test extraction stops at the page limit"""
+        text = extract_text_from_pdf(pdf_path, max_pages=3, max_chars=0)
+        assert text.splitlines() == ["Page 1 text", "Page 2 text", "Page 3 text"]
+
+    def test_character_limit(self, pdf_path):
+        """Test extraction stops once the text budget is used"""
+        text = extract_text_from_pdf(pdf_path, max_pages=0, max_chars=30)
+        assert text.startswith("Page 1 text\nPage 2 text\nPage 3")
+        assert "Page 4" not in text
+        assert "[Truncated" in text
+
+    def test_page_selection(self, pdf_path):
+        """Test only the selected pages are extracted"""
+        text = extract_text_from_pdf(pdf_path, max_pages=0, max_chars=0, pages="2,9-")
+        assert text.splitlines() == ["Page 2 text", "Page 9 text", "Page 10 text"]
+
+    def test_via_extract_text_from_file(self, pdf_path):
+        """Test PDFs are dispatched by MIME type"""
+        assert "Page 5 text" in extract_text_from_file(pdf_path, "application/pdf")
+
+    def test_corrupt_pdf(self, tmp_path):
+        """Test an unreadable PDF yields no text"""
+        path = tmp_path / "broken.pdf"
+        path.write_bytes(b"not a pdf")
+        assert extract_text_from_pdf(str(path)) == ""
+
+
+@pytest.mark.unit
+class TestDocxExtraction:
+    """Test DOCX text extraction"""
+
+    def test_paragraphs_and_tables_in_order(self, tmp_path):
+        """Test table rows come out between the paragraphs around them"""
+        path = make_docx(tmp_path / "doc.docx", (
+            paragraph("Intro") + table([["Name", "Qty"], ["Apples", "3"]]) + paragraph("Outro")
+        ))
+        assert extract_text_from_docx(path).splitlines() == ["Intro", "Name | Qty", "Apples | 3", "Outro"]
+
+    def test_runs_tabs_and_breaks(self, tmp_path):
+        """Test runs are joined and tabs/breaks kept"""
+        path = make_docx(tmp_path / "doc.docx", (
+            "<w:p><w:r><w:t>Hello </w:t></w:r><w:r><w:t>world</w:t><w:tab/><w:t>tabbed</w:t>"
+            "<w:br/><w:t>next line</w:t></w:r></w:p>"
+        ))
+        assert extract_text_from_docx(path) == "Hello world\ttabbed\nnext line"
+
+    def test_nested_table_flattened_into_cell(self, tmp_path):
+        """Test an inner table's rows become part of the outer cell"""
+        inner = table([["a", "b"]])
+        path = make_docx(tmp_path / "doc.docx", (
+            f"<w:tbl><w:tr><w:tc>{paragraph('outer')}{inner}</w:tc><w:tc>{paragraph('right')}</w:tc></w:tr></w:tbl>"
+        ))
+        assert extract_text_from_docx(path) == "outer a | b | right"
+
+    def test_character_limit(self, tmp_path):
+        """Test reading stops once the text budget is used"""
+        path = make_docx(tmp_path / "doc.docx", "".join(paragraph(f"Paragraph {n}") for n in range(1000)))
+        text = extract_text_from_docx(path, max_chars=50)
+        assert text.startswith("Paragraph 0\nParagraph 1")
+        assert "Paragraph 10" not in text
+        assert "[Truncated" in text
+
+    def test_matches_python_docx_paragraphs(self, tmp_path):
+        """Test paragraph text matches what python-docx reads"""
+        docx = pytest.importorskip("docx")
+        path = make_docx(tmp_path / "doc.docx", "".join(paragraph(f"Line {n}") for n in range(20)))
+        expected = "\n".join(p.text for p in docx.Document(path).paragraphs)
+        assert extract_text_from_docx(path) == expected
+
+    def test_dispatch_by_mime_type(self, tmp_path):
+        """Test DOCX uploads are recognised by their MIME type"""
+        path = make_docx(tmp_path / "upload", paragraph("From a docx"))
+        mime = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        assert extract_text_from_file(path, mime) == "From a docx"
+
+    def test_not_a_docx(self, tmp_path):
+        """Test an invalid DOCX yields no text"""
+        path = tmp_path / "broken.docx"
+        path.write_bytes(b"not a zip")
+        assert extract_text_from_docx(str(path)) == ""
+
+    def test_entity_declarations_refused(self, tmp_path):
+        """Test a document.xml declaring entities yields no text instead of expanding them"""
+        path = make_docx(tmp_path / "doc.docx", paragraph("&big;"))
+        with zipfile.ZipFile(path) as package:
+            document = package.read("word/document.xml").decode()
+        with zipfile.ZipFile(path, "a") as package:
+            package.writestr("word/document.xml", '<!DOCTYPE w:document [<!ENTITY big "expanded">]>' + document)
+        assert "expanded" not in extract_text_from_docx(path)
+
+
+@pytest.mark.unit
+class TestCsvExtraction:
+    """Test CSV text extraction"""
+
+    def test_column_summary_and_rows(self, tmp_path):
+        """Test columns are summarised and rows included"""
+        path = tmp_path / "data.csv"
+        path.write_text("id,city,amount\n1,Paris,10\n2,Berlin,20.5\n3,Paris,\n")
+        text = extract_text_from_csv(str(path))
+
+        assert "3 rows and 3 columns" in text
+        assert "- id: numeric, min 1, max 3, mean 2" in text
+        assert "- city: text, 2 distinct values, most common: Paris (2)" in text
+        assert "- amount: numeric, min 10, max 20.5, mean 15.25, 1 empty" in text
+        assert "2, Berlin, 20.5" in text
+
+    def test_row_limit(self, tmp_path):
+        """Test only the first rows are included but all are summarised"""
+        path = tmp_path / "data.csv"
+        path.write_text("n\n" + "".join(f"{i}\n" for i in range(1, 101)))
+        text = extract_text_from_csv(str(path), max_rows=5)
+
+        assert "100 rows" in text
+        assert "max 100" in text
+        assert "\n5\n" in text
+        assert "\n6\n" not in text
+        assert "first 5 of 100 rows" in text
+
+    def test_quoted_fields(self, tmp_path):
+        """Test quoted commas and newlines are parsed as one field"""
+        path = tmp_path / "data.csv"
+        path.write_text('name,note\nAda,"hello, world"\nBob,"two\nlines"\n')
+        text = extract_text_from_csv(str(path))
+        assert "2 rows" in text
+        assert "Ada, hello, world" in text
+
+    def test_empty_file(self, tmp_path):
+        """Test an empty CSV yields no text"""
+        path = tmp_path / "empty.csv"
+        path.write_text("")
+        assert extract_text_from_csv(str(path)) == ""
+
+
+@pytest.mark.unit
+class TestJsonExtraction:
+    """Test JSON text extraction"""
+
+    def test_array_items(self, tmp_path):
+        """Test array elements are streamed one per line"""
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps([{"id": i, "name": f"item {i}"} for i in range(3)]))
+        text = extract_text_from_json(str(path))
+        assert text.splitlines() == [json.dumps({"id": i, "name": f"item {i}"}) for i in range(3)]
+
+    def test_object_items(self, tmp_path):
+        """Test top-level keys become labelled lines"""
+        path = tmp_path / "data.json"
+        path.write_text('{"title": "Report", "pages": 12, "tags": ["a", "b"]}')
+        assert extract_text_from_json(str(path)).splitlines() == [
+            "title: Report", "pages: 12", 'tags: ["a", "b"]'
+        ]
+
+    def test_json_lines(self, tmp_path):
+        """Test newline-delimited JSON is read record by record"""
+        path = tmp_path / "data.jsonl"
+        path.write_text('{"a": 1}\n{"a": 2}\n')
+        assert extract_text_from_json(str(path)).splitlines() == ['{"a": 1}', '{"a": 2}']
+
+    def test_values_across_chunks(self, tmp_path, monkeypatch):
+        """Test values split between read chunks are parsed correctly"""
+        monkeypatch.setattr(_JsonStream, "CHUNK_SIZE", 7)
+        items = [123456789, "a longer string value", {"nested": [1, 2, 3]}, 4.5]
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps(items))
+        assert [value for _, value in iter_json_items(str(path))] == items
+
+    def test_item_limit(self, tmp_path):
+        """Test reading stops at the item limit"""
+        path = tmp_path / "data.json"
+        path.write_text(json.dumps(list(range(100))))
+        text = extract_text_from_json(str(path), max_rows=3)
+        assert text.splitlines()[:3] == ["0", "1", "2"]
+        assert "first 3 items" in text
+
+    def test_invalid_json_read_as_text(self, tmp_path):
+        """Test malformed JSON falls back to plain text"""
+        path = tmp_path / "data.json"
+        path.write_text("{not json")
+        assert extract_text_from_json(str(path)) == "{not json"
+
+    def test_dispatch_by_mime_type(self, tmp_path):
+        """Test JSON files are dispatched by MIME type"""
+        path = tmp_path / "upload"
+        path.write_text('{"key": "value"}')
+        assert extract_text_from_file(str(path), "application/json") == "key: value"
+
+
+@pytest.mark.unit
+class TestXmlExtraction:
+    """Test XML text extraction"""
+
+    def test_text_with_paths(self, tmp_path):
+        """Test element text is labelled with its path"""
+        path = tmp_path / "data.xml"
+        path.write_text(
+            '<catalog><book id="1"><title>Dune</title><author>Herbert</author></book>'
+            '<book id="2"><title>Emma</title></book></catalog>'
+        )
+        assert extract_text_from_xml(str(path)).splitlines() == [
+            "book/title: Dune", "book/author: Herbert", "book [id=1]",
+            "book/title: Emma", "book [id=2]",
+        ]
+
+    def test_namespaces_stripped(self, tmp_path):
+        """Test namespace URIs are left out of labels"""
+        path = tmp_path / "data.xml"
+        path.write_text('<root xmlns="urn:x"><item>value</item></root>')
+        assert extract_text_from_xml(str(path)) == "item: value"
+
+    def test_record_limit(self, tmp_path):
+        """Test reading stops after the record limit"""
+        path = tmp_path / "data.xml"
+        path.write_text("<rows>" + "".join(f"<row>{i}</row>" for i in range(50)) + "</rows>")
+        text = extract_text_from_xml(str(path), max_rows=2)
+        assert text.splitlines()[:2] == ["row: 0", "row: 1"]
+        assert "first 2 records" in text
+
+    def test_entity_expansion_refused(self, tmp_path):
+        """Test entity declarations are refused instead of expanded"""
+        path = tmp_path / "bomb.xml"
+        levels = ['<!ENTITY lol0 "lol">'] + [
+            f'<!ENTITY lol{i} "{f"&lol{i - 1};" * 10}">' for i in range(1, 10)
+        ]
+        path.write_text(f'<?xml version="1.0"?><!DOCTYPE lolz [{"".join(levels)}]><lolz>&lol9;</lolz>')
+        assert extract_text_from_xml(str(path)) == ""
+
+    def test_malformed_xml_keeps_parsed_text(self, tmp_path):
+        """Test text read before a parse error is kept"""
+        path = tmp_path / "data.xml"
+        path.write_text("<rows><row>ok</row><row>broken")
+        assert extract_text_from_xml(str(path)) == "row: ok"
@@ -0,0 +1,104 @@
+"""
+Tests for password hashing on the bounded thread pool
+"""
+import asyncio
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from utils.passwords import (
+    PasswordHasher, hash_password, check_password, hash_password_async, check_password_async
+)
+
+
+@pytest.mark.unit
+class TestPasswordHashing:
+    """Test hashing and checking passwords"""
+
+    def test_hash_and_check(self):
+        """Test a hash verifies its password and nothing else"""
+        password_hash = hash_password("correct horse")
+        assert password_hash.startswith("$2")
+        assert check_password("correct horse", password_hash)
+        assert not check_password("wrong horse", password_hash)
+
+    @pytest.mark.asyncio
+    async def test_async_helpers(self):
+        """Test the async helpers give the same results as the plain functions"""
+        password_hash = await hash_password_async("correct horse")
+        assert await check_password_async("correct horse", password_hash)
+        assert not await check_password_async("wrong horse", password_hash)
+        assert check_password("correct horse", password_hash)
+
+
+@pytest.mark.unit
+class TestPasswordHasher:
+    """Test the bounded pool"""
+
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running(self):
+        """Test other coroutines run while a hash is being computed"""
+        hasher = PasswordHasher(workers=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            await hasher.run(time.sleep, 0.1)
+        finally:
+            task.cancel()
+            hasher.shutdown()
+        assert ticks >= 5
+
+    @pytest.mark.asyncio
+    async def test_concurrency_cap(self):
+        """Test at most `workers` calls run at once"""
+        hasher = PasswordHasher(workers=2)
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+
+        try:
+            await asyncio.gather(*(hasher.run(work) for _ in range(6)))
+        finally:
+            hasher.shutdown()
+        assert peak == 2
+        stats = hasher.stats()
+        assert stats["calls"] == 6
+        assert stats["in_flight"] == 0
+        # Later calls waited for a thread
+        assert stats["max_queue_ms"] >= 20
+
+    @pytest.mark.asyncio
+    async def test_full_queue_refused(self):
+        """Test calls beyond the pending limit get a 503 instead of waiting"""
+        hasher = PasswordHasher(workers=1, max_pending=1)
+        release = threading.Event()
+        try:
+            first = asyncio.ensure_future(hasher.run(release.wait))
+            second = asyncio.ensure_future(hasher.run(release.wait))
+            await asyncio.sleep(0)
+            with pytest.raises(HTTPException) as exc_info:
+                await hasher.run(release.wait)
+            assert exc_info.value.status_code == 503
+            assert hasher.rejected == 1
+            release.set()
+            await asyncio.gather(first, second)
+        finally:
+            release.set()
+            hasher.shutdown()
+        assert hasher.stats()["in_flight"] == 0
@@ -0,0 +1,207 @@
+"""
+Tests for the shared (Redis protocol) cache backend
+Runs against an in-process fake server; two RedisCache instances sharing it
+stand in for two uvicorn workers.
+"""
+import fnmatch
+import queue
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from utils.redis_cache import RedisCache
+
+
+class FakeRedisServer:
+    """Minimal in-process subset of the Redis commands RedisCache uses"""
+    
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+    
+    def _alive(self, name):
+        expires_at = self.expires.get(name)
+        if expires_at is not None and time.time() >= expires_at:
+            self.data.pop(name, None)
+            self.expires.pop(name, None)
+        return name in self.data
+
+
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.channels = set()
+        self.messages = queue.Queue()
+    
+    def subscribe(self, channel):
+        self.channels.add(channel)
+        self.server.subscribers.append(self)
+    
+    def get_message(self, ignore_subscribe_messages=True, timeout=0.0):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def close(self):
+        if self in self.server.subscribers:
+            self.server.subscribers.remove(self)
+
+
+class FakeRedis:
+    def __init__(self, server):
+        self.server = server
+        self.fail = False
+    
+    def _check(self):
+        if self.fail:
+            raise ConnectionError("connection refused")
+    
+    def get(self, name):
+        self._check()
+        with self.server.lock:
+            return self.server.data.get(name) if self.server._alive(name) else None
+    
+    def set(self, name, value, ex=None):
+        self._check()
+        with self.server.lock:
+            self.server.data[name] = value.encode() if isinstance(value, str) else value
+            if ex:
+                self.server.expires[name] = time.time() + ex
+    
+    def delete(self, *names):
+        self._check()
+        with self.server.lock:
+            for name in names:
+                name = name.decode() if isinstance(name, bytes) else name
+                self.server.data.pop(name, None)
+                self.server.expires.pop(name, None)
+    
+    def sadd(self, name, member):
+        with self.server.lock:
+            self.server.data.setdefault(name, set()).add(member.encode())
+    
+    def smembers(self, name):
+        self._check()
+        with self.server.lock:
+            return set(self.server.data.get(name, set())) if self.server._alive(name) else set()
+    
+    def expire(self, name, seconds):
+        with self.server.lock:
+            self.server.expires[name] = time.time() + seconds
+    
+    def scan_iter(self, match="*"):
+        with self.server.lock:
+            return [name for name in list(self.server.data) if fnmatch.fnmatch(name, match)]
+    
+    def publish(self, channel, message):
+        for subscriber in list(self.server.subscribers):
+            if channel in subscriber.channels:
+                subscriber.messages.put({"type": "message", "channel": channel, "data": message.encode()})
+    
+    def pubsub(self):
+        return FakePubSub(self.server)
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def workers():
+    """Two caches on one shared server, as two workers would be"""
+    server = FakeRedisServer()
+    first = RedisCache(FakeRedis(server), "api_keys", default_ttl=600, near_ttl=60)
+    second = RedisCache(FakeRedis(server), "api_keys", default_ttl=600, near_ttl=60)
+    yield first, second, server
+    first.close()
+    second.close()
+
+
+@pytest.mark.unit
+class TestRedisCache:
+    """Test the shared cache backend"""
+    
+    def test_values_are_shared(self, workers):
+        """Test a value set by one worker is read by another"""
+        first, second, _ = workers
+        first.set("api_key:u1:openai", "sk-shared")
+        assert second.get("api_key:u1:openai") == "sk-shared"
+        assert second.stats()["shared_hits"] == 1
+    
+    def test_values_are_encrypted_at_rest(self, workers):
+        """Test plaintext values never reach the shared server"""
+        first, _, server = workers
+        first.set("api_key:u1:openai", "sk-secret-value")
+        stored = server.data["cache:api_keys:api_key:u1:openai"]
+        assert b"sk-secret-value" not in stored
+    
+    def test_namespace_values_round_trip(self, workers):
+        """Test snapshot objects survive serialization"""
+        first, second, _ = workers
+        first.set("integration", SimpleNamespace(name="Local", base_url="http://localhost"))
+        value = second.get("integration")
+        assert value.name == "Local"
+        assert value.base_url == "http://localhost"
+    
+    def test_delete_is_broadcast(self, workers):
+        """Test deleting in one worker drops the other worker's local copy"""
+        first, second, _ = workers
+        first.set("key", "old")
+        assert second.get("key") == "old"  # now in second's near cache
+        
+        first.delete("key")
+        assert _wait_for(lambda: second.local.get("key") is None)
+        assert second.get("key") is None
+    
+    def test_overwrite_is_broadcast(self, workers):
+        """Test an updated value replaces other workers' local copies"""
+        first, second, _ = workers
+        first.set("key", "old")
+        assert second.get("key") == "old"
+        
+        first.set("key", "new")
+        assert _wait_for(lambda: second.get("key") == "new")
+    
+    def test_delete_tag_is_shared_and_broadcast(self, workers):
+        """Test tag invalidation removes the group everywhere"""
+        first, second, _ = workers
+        first.set("api_key:u1:openai", "sk-1", tags=("user:u1",))
+        first.set("api_key:u1:anthropic", "sk-2", tags=("user:u1",))
+        first.set("api_key:u2:openai", "sk-3", tags=("user:u2",))
+        assert second.get("api_key:u1:openai") == "sk-1"
+        
+        assert first.delete_tag("user:u1") == 2
+        assert _wait_for(lambda: second.local.get("api_key:u1:openai") is None)
+        assert second.get("api_key:u1:anthropic") is None
+        assert second.get("api_key:u2:openai") == "sk-3"
+    
+    def test_clear(self, workers):
+        """Test clearing removes only this namespace"""
+        first, second, server = workers
+        other = RedisCache(FakeRedis(server), "integrations")
+        try:
+            first.set("key", "value")
+            other.set("key", "other")
+            first.clear()
+            assert second.get("key") is None
+            assert other.get("key") == "other"
+        finally:
+            other.close()
+    
+    def test_server_errors_degrade_to_local(self, workers):
+        """Test an unreachable server never fails the caller"""
+        first, _, _ = workers
+        first.client.fail = True
+        first.set("key", "value")
+        assert first.get("key") == "value"  # near cache still works
+        first.local.clear()
+        assert first.get("key") is None
+        assert first.stats()["errors"] >= 2
@@ -0,0 +1,235 @@
+"""
+Tests for blob storage backends
+The S3 driver runs against an in-process fake of the client (test/fixtures/fake_s3.py).
+"""
+import io
+import os
+import time
+from pathlib import Path
+import pytest
+from test.fixtures.fake_s3 import FakeS3Client
+from utils import storage as storage_module
+from utils.storage import StorageBackend, LocalStorage, S3Storage, CachedStorage
+
+
+@pytest.fixture
+def s3():
+    return FakeS3Client()
+
+
+def write(path, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+@pytest.mark.unit
+class TestStorageBackend:
+    """Test the backend interface"""
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """Test a backend missing part of the interface fails when instantiated"""
+        class WriteOnlyStorage(StorageBackend):
+            def put(self, key, stream):
+                pass
+
+        with pytest.raises(TypeError):
+            WriteOnlyStorage()
+
+    def test_s3_needs_cache_for_local_paths(self, s3):
+        """Test the bare S3 driver refuses local_path() instead of returning nothing"""
+        with pytest.raises(NotImplementedError):
+            S3Storage(s3, "bucket").local_path("key")
+
+
+@pytest.mark.unit
+class TestLocalStorage:
+    """Test the local filesystem driver"""
+
+    def test_store_and_read(self, tmp_path):
+        """Test a stored file can be streamed back and read by range"""
+        storage = LocalStorage(str(tmp_path / "store"))
+        source = write(tmp_path / "upload.part", b"0123456789")
+        storage.store_file("blobs/ab/key", source)
+
+        assert not os.path.exists(source)
+        with storage.open("blobs/ab/key") as f:
+            assert f.read() == b"0123456789"
+        assert storage.read_range("blobs/ab/key", 3, 4) == b"3456"
+        assert storage.size("blobs/ab/key") == 10
+        assert storage.local_path("blobs/ab/key") == str(tmp_path / "store" / "blobs" / "ab" / "key")
+
+    def test_put_stream(self, tmp_path):
+        """Test content can be stored from a stream"""
+        storage = LocalStorage(str(tmp_path))
+        storage.put("a/b", io.BytesIO(b"streamed"))
+        assert storage.read_range("a/b", 0, 100) == b"streamed"
+
+    def test_missing_keys(self, tmp_path):
+        """Test missing keys report as missing and delete quietly"""
+        storage = LocalStorage(str(tmp_path))
+        assert not storage.exists("nope")
+        storage.delete("nope")
+        with pytest.raises(FileNotFoundError):
+            storage.local_path("nope")
+
+    def test_list_in_key_order(self, tmp_path):
+        """Test listing walks nested directories in key order and can resume"""
+        storage = LocalStorage(str(tmp_path))
+        for key in ("d/b/2", "d/a", "d/b.txt", "d/b/1", "d/c/x", "other/z"):
+            storage.put(key, io.BytesIO(b"xy"))
+
+        keys = [obj.key for obj in storage.list("d")]
+        assert keys == sorted(keys) == ["d/a", "d/b.txt", "d/b/1", "d/b/2", "d/c/x"]
+        assert [obj.key for obj in storage.list("d", start_after="d/b/1")] == ["d/b/2", "d/c/x"]
+        assert next(storage.list("d")).size == 2
+        assert list(storage.list("missing")) == []
+
+
+@pytest.mark.unit
+class TestS3Storage:
+    """Test the S3-compatible driver"""
+
+    def test_store_and_read(self, tmp_path, s3):
+        """Test uploads stream in and come back whole or by range"""
+        storage = S3Storage(s3, "bucket", prefix="sharedlm/")
+        source = write(tmp_path / "upload.part", b"0123456789")
+        storage.store_file("blobs/key", source)
+
+        assert not os.path.exists(source)
+        assert s3.objects[("bucket", "sharedlm/blobs/key")] == b"0123456789"
+        assert storage.exists("blobs/key")
+        assert storage.size("blobs/key") == 10
+        with storage.open("blobs/key") as body:
+            assert body.read() == b"0123456789"
+        assert storage.read_range("blobs/key", 2, 3) == b"234"
+        assert s3.calls[-1] == ("get", "sharedlm/blobs/key", "bytes=2-4")
+        assert storage.read_range("blobs/key", 50, 3) == b""
+
+    def test_missing_keys(self, s3):
+        """Test a missing object is reported the same way as a missing file"""
+        storage = S3Storage(s3, "bucket")
+        assert not storage.exists("nope")
+        with pytest.raises(FileNotFoundError):
+            storage.open("nope")
+
+    def test_download(self, tmp_path, s3):
+        """Test an object can be copied to a local file"""
+        storage = S3Storage(s3, "bucket")
+        storage.put("key", io.BytesIO(b"remote bytes"))
+        storage.download("key", str(tmp_path / "copy"))
+        assert (tmp_path / "copy").read_bytes() == b"remote bytes"
+
+    def test_list_pages(self):
+        """Test listing follows continuation pages and stays within the prefix"""
+        s3 = FakeS3Client(page_size=2)
+        storage = S3Storage(s3, "bucket", prefix="sharedlm/")
+        for key in ("d/1", "d/2", "d/3", "d2/x"):
+            storage.put(key, io.BytesIO(b"abc"))
+
+        assert [obj.key for obj in storage.list("d")] == ["d/1", "d/2", "d/3"]
+        assert [obj.key for obj in storage.list("d", start_after="d/1")] == ["d/2", "d/3"]
+        assert next(storage.list("d")).size == 3
+
+
+@pytest.mark.unit
+class TestCachedStorage:
+    """Test the read-through cache in front of a remote driver"""
+
+    def test_fetches_once(self, tmp_path, s3):
+        """Test a remote blob is downloaded on first use only"""
+        remote = S3Storage(s3, "bucket")
+        remote.put("key", io.BytesIO(b"hot blob"))
+        storage = CachedStorage(remote, str(tmp_path / "cache"), max_bytes=0)
+
+        first = storage.local_path("key")
+        second = storage.local_path("key")
+        assert first == second
+        assert Path(first).read_bytes() == b"hot blob"
+        assert (storage.misses, storage.hits) == (1, 1)
+        assert [c for c in s3.calls if c[0] == "get"] == [("get", "key", None)]
+
+    def test_upload_keeps_local_copy(self, tmp_path, s3):
+        """Test a fresh upload is served from the cache without a download"""
+        storage = CachedStorage(S3Storage(s3, "bucket"), str(tmp_path / "cache"), max_bytes=0)
+        storage.store_file("key", write(tmp_path / "upload.part", b"new upload"))
+
+        assert s3.objects[("bucket", "key")] == b"new upload"
+        assert Path(storage.local_path("key")).read_bytes() == b"new upload"
+        assert storage.misses == 0
+
+    def test_uncached_range_goes_to_remote(self, tmp_path, s3):
+        """Test a ranged read doesn't pull the whole blob into the cache"""
+        remote = S3Storage(s3, "bucket")
+        remote.put("key", io.BytesIO(b"0123456789"))
+        storage = CachedStorage(remote, str(tmp_path / "cache"), max_bytes=0)
+
+        assert storage.read_range("key", 5, 2) == b"56"
+        assert s3.calls[-1] == ("get", "key", "bytes=5-6")
+        assert not os.path.exists(tmp_path / "cache") or not os.listdir(tmp_path / "cache")
+
+    def test_least_recently_used_evicted(self, tmp_path, s3):
+        """Test the cache stays under its size limit, dropping the coldest blobs"""
+        remote = S3Storage(s3, "bucket")
+        for key in ("a", "b", "c"):
+            remote.put(key, io.BytesIO(b"x" * 100))
+        storage = CachedStorage(remote, str(tmp_path / "cache"), max_bytes=250)
+
+        path_a = storage.local_path("a")
+        past = time.time() - 60
+        os.utime(path_a, (past, past))
+        path_b = storage.local_path("b")
+        os.utime(path_b, (past + 1, past + 1))
+        storage.local_path("a")  # Touch: "a" is now the most recent
+        storage.local_path("c")
+
+        assert os.path.exists(path_a)
+        assert not os.path.exists(path_b)
+        assert storage.misses == 3
+
+    def test_file_in_use_not_evicted(self, tmp_path, s3):
+        """Test a blob bigger than the cache stays until its reader is done"""
+        remote = S3Storage(s3, "bucket")
+        remote.put("big", io.BytesIO(b"x" * 300))
+        remote.put("small", io.BytesIO(b"y" * 10))
+        storage = CachedStorage(remote, str(tmp_path / "cache"), max_bytes=100)
+
+        with storage.local_file("big") as local:
+            storage.local_path("small")
+            assert Path(local.path).read_bytes() == b"x" * 300
+        assert not os.path.exists(local.path)
+
+    def test_evicts_without_rescanning(self, tmp_path, s3, monkeypatch):
+        """Test the cache directory is read once, not on every miss"""
+        remote = S3Storage(s3, "bucket")
+        for key in ("a", "b", "c"):
+            remote.put(key, io.BytesIO(b"x" * 100))
+        storage = CachedStorage(remote, str(tmp_path / "cache"), max_bytes=250)
+        scans = []
+        scandir = os.scandir
+        monkeypatch.setattr(storage_module.os, "scandir", lambda path: scans.append(path) or scandir(path))
+
+        paths = [storage.local_path(key) for key in ("a", "b", "c")]
+        assert len(scans) == 1
+        assert [os.path.exists(path) for path in paths] == [False, True, True]
+
+    def test_file_locked_by_other_process_kept(self, tmp_path):
+        """Test eviction skips a file another process holds open"""
+        fcntl = pytest.importorskip("fcntl")
+        path = write(tmp_path / "cached", b"data")
+        with open(path, "rb") as other:
+            fcntl.flock(other.fileno(), fcntl.LOCK_SH)
+            assert not storage_module._remove_unused(path)
+        assert os.path.exists(path)
+        assert storage_module._remove_unused(path)
+        assert not os.path.exists(path)
+
+    def test_delete_drops_cached_copy(self, tmp_path, s3):
+        """Test deleting a blob removes it remotely and from the cache"""
+        storage = CachedStorage(S3Storage(s3, "bucket"), str(tmp_path / "cache"), max_bytes=0)
+        storage.store_file("key", write(tmp_path / "upload.part", b"data"))
+        path = storage.local_path("key")
+
+        storage.delete("key")
+        assert not os.path.exists(path)
+        assert ("bucket", "key") not in s3.objects
@@ -0,0 +1,114 @@
+"""
+Tests for signed session tokens
+"""
+import time
+import pytest
+from config.settings import settings
+from utils.tokens import (
+    TokenDenylist, TokenError, ACCESS, REFRESH, denylist, encode_token, decode_token,
+    create_access_token, create_refresh_token
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_denylist():
+    denylist.clear()
+    yield
+    denylist.clear()
+
+
+@pytest.mark.unit
+class TestTokens:
+    """Test signing and verifying tokens"""
+
+    def test_access_token_round_trip(self):
+        """Test an access token verifies and carries the user"""
+        token, claims = create_access_token("user_1", "user@example.com")
+        decoded = decode_token(token)
+        assert decoded == claims
+        assert decoded["sub"] == "user_1"
+        assert decoded["email"] == "user@example.com"
+        assert decoded["type"] == ACCESS
+        assert decoded["exp"] - time.time() <= settings.auth_access_token_ttl
+
+    def test_tampered_token_rejected(self):
+        """Test changing any part of a token breaks its signature"""
+        token, claims = create_access_token("user_1")
+        header, _, signature = token.split(".")
+        forged = encode_token({**claims, "sub": "user_2"}).split(".")[1]
+        with pytest.raises(TokenError):
+            decode_token(f"{header}.{forged}.{signature}")
+        with pytest.raises(TokenError):
+            decode_token(token[:-2] + ("AA" if not token.endswith("AA") else "BB"))
+
+    @pytest.mark.parametrize("token", ["", "abc", "a.b", "a.b.c.d", "é.é.é"])
+    def test_malformed_token_rejected(self, token):
+        """Test garbage is rejected with TokenError rather than crashing"""
+        with pytest.raises(TokenError):
+            decode_token(token)
+
+    def test_expired_token_rejected(self, monkeypatch):
+        """Test a token is refused once past its expiry"""
+        monkeypatch.setattr(settings, "auth_access_token_ttl", -1)
+        token, _ = create_access_token("user_1")
+        with pytest.raises(TokenError, match="expired"):
+            decode_token(token)
+
+    def test_wrong_type_rejected(self):
+        """Test a refresh token can't be used as an access token, or the reverse"""
+        refresh_token, _ = create_refresh_token("user_1")
+        access_token, _ = create_access_token("user_1")
+        with pytest.raises(TokenError):
+            decode_token(refresh_token)
+        with pytest.raises(TokenError):
+            decode_token(access_token, REFRESH)
+        assert decode_token(refresh_token, REFRESH)["sub"] == "user_1"
+
+
+@pytest.mark.unit
+class TestTokenDenylist:
+    """Test revoking access tokens"""
+
+    def test_revoke_token(self):
+        """Test a revoked token is refused and others aren't"""
+        token, claims = create_access_token("user_1")
+        other, _ = create_access_token("user_1")
+        denylist.revoke(claims)
+        with pytest.raises(TokenError, match="revoked"):
+            decode_token(token)
+        assert decode_token(other)["sub"] == "user_1"
+
+    def test_revoke_user(self):
+        """Test revoking a user refuses earlier tokens but not later ones"""
+        old, _ = create_access_token("user_1")
+        unrelated, _ = create_access_token("user_2")
+        time.sleep(0.002)
+        denylist.revoke_user("user_1")
+        new, _ = create_access_token("user_1")
+        with pytest.raises(TokenError):
+            decode_token(old)
+        assert decode_token(new)["sub"] == "user_1"
+        assert decode_token(unrelated)["sub"] == "user_2"
+
+    def test_expired_entries_pruned(self, monkeypatch):
+        """Test entries are dropped once the tokens they cover have expired"""
+        entries = TokenDenylist()
+        entries.revoke({"jti": "old", "sub": "user_1", "exp": time.time() - 1})
+        entries.revoke({"jti": "live", "sub": "user_1", "exp": time.time() + 60})
+        assert len(entries) == 1
+        monkeypatch.setattr(settings, "auth_access_token_ttl", -1)
+        entries.revoke_user("user_1")
+        entries.revoke({"jti": "later", "sub": "user_2", "exp": time.time() + 60})
+        assert len(entries) == 2
+
+    def test_clear(self):
+        """Test clearing drops revoked tokens and user cutoffs alike"""
+        entries = TokenDenylist()
+        _, old_claims = create_access_token("user_1")
+        time.sleep(0.002)
+        entries.revoke({"jti": "live", "sub": "user_2", "exp": time.time() + 60})
+        entries.revoke_user("user_1")
+        assert entries.is_revoked(old_claims)
+        entries.clear()
+        assert len(entries) == 0
+        assert not entries.is_revoked(old_claims)
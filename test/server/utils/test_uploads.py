@@ -0,0 +1,81 @@
+"""
+Tests for streaming upload storage
+"""
+import hashlib
+import os
+from io import BytesIO
+import pytest
+from fastapi import HTTPException, UploadFile
+from utils.uploads import save_upload
+
+
+class CountingFile(BytesIO):
+    """In-memory file that records the size of each read"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+def make_upload(data: bytes, filename: str = "notes.txt", size=None) -> UploadFile:
+    return UploadFile(file=CountingFile(data), filename=filename, size=size)
+
+
+@pytest.mark.unit
+class TestSaveUpload:
+    """Test save_upload"""
+
+    @pytest.mark.asyncio
+    async def test_writes_file_and_hash(self, tmp_path):
+        """Test content is stored under a unique name with its size and hash"""
+        data = b"hello world\n" * 1000
+        stored = await save_upload(make_upload(data), str(tmp_path), chunk_size=1024)
+
+        assert stored.size == len(data)
+        assert stored.sha256 == hashlib.sha256(data).hexdigest()
+        assert stored.stored_name.endswith(".txt")
+        assert stored.path == os.path.join(str(tmp_path), stored.stored_name)
+        with open(stored.path, "rb") as f:
+            assert f.read() == data
+        # Only the final file remains
+        assert os.listdir(tmp_path) == [stored.stored_name]
+
+    @pytest.mark.asyncio
+    async def test_reads_in_chunks(self, tmp_path):
+        """Test the upload is never read in one piece"""
+        upload = make_upload(b"x" * 10000)
+        await save_upload(upload, str(tmp_path), chunk_size=4096)
+        assert max(upload.file.reads) <= 4096
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_stops_early(self, tmp_path):
+        """Test reading stops once the limit is passed and nothing is kept"""
+        upload = make_upload(b"x" * 100000)
+        with pytest.raises(HTTPException) as exc_info:
+            await save_upload(upload, str(tmp_path), max_size=5000, chunk_size=1000)
+
+        assert exc_info.value.status_code == 400
+        assert "size" in exc_info.value.detail.lower()
+        assert sum(upload.file.reads) <= 6000
+        assert os.listdir(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_known_size_rejected_without_reading(self, tmp_path):
+        """Test a declared size over the limit is rejected before any read"""
+        upload = make_upload(b"x" * 100, size=10 ** 9)
+        with pytest.raises(HTTPException):
+            await save_upload(upload, str(tmp_path), max_size=5000)
+        assert upload.file.reads == []
+
+    @pytest.mark.asyncio
+    async def test_empty_upload(self, tmp_path):
+        """Test an empty upload is stored as an empty file"""
+        stored = await save_upload(make_upload(b""), str(tmp_path))
+        assert stored.size == 0
+        assert stored.sha256 == hashlib.sha256(b"").hexdigest()
+        assert os.path.getsize(stored.path) == 0